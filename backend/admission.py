@@ -0,0 +1,190 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Route classes in priority order: a lower number is admitted first when
+# requests are waiting, and shed last.
+PRIORITIES = {'auth': 0, 'write': 0, 'health': 1, 'read': 2}
+
+AUTH_PATHS = {'/api/login', '/api/refresh-token'}
+# Monitoring stays reachable while reads are shed
+HEALTH_PATHS = {'/api/health', '/api/admission', '/api/debug/profile'}
+READ_METHODS = {'GET', 'HEAD'}
+
+# Weight of the newest request in the moving average of service time
+SERVICE_TIME_WEIGHT = 0.2
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; retry_after is in whole seconds"""
+
+    def __init__(self, route_class, retry_after):
+        super().__init__(f"{route_class} requests are being shed")
+        self.route_class = route_class
+        self.retry_after = retry_after
+
+
+def classify(method, path):
+    if path in AUTH_PATHS:
+        return 'auth'
+    if method not in READ_METHODS:
+        return 'write'
+    if path in HEALTH_PATHS:
+        return 'health'
+    return 'read'
+
+
+def parse_class_values(value, cast=int):
+    """Parse a comma separated list of class=value pairs, e.g. 'read=24,write=16'"""
+    values = {}
+    for entry in [e.strip() for e in (value or '').split(',') if e.strip()]:
+        name, sep, amount = entry.partition('=')
+        name = name.strip()
+        if not sep or name not in PRIORITIES:
+            raise ValueError(f"Invalid admission setting: {entry}")
+        values[name] = cast(amount)
+    return values
+
+
+class _Waiter:
+    __slots__ = ('route_class', 'admitted')
+
+    def __init__(self, route_class):
+        self.route_class = route_class
+        self.admitted = False
+
+
+class AdmissionController:
+    """Per-process concurrency limits with priority queueing and load shedding.
+
+    Every class has its own in-flight limit and wait queue, and all classes
+    share max_concurrent slots (sized to the database pool). When a slot
+    frees up, waiting requests are admitted highest priority first. A
+    request is shed with Overloaded instead of queued when its queue is
+    full, when it would wait longer than queue_timeout, or, for the lowest
+    priority class, as soon as a higher priority request is waiting.
+    """
+
+    def __init__(self, max_concurrent, limits, queue_limits, queue_timeout, retry_after=1):
+        self.max_concurrent = max_concurrent
+        self.limits = {name: limits.get(name, max_concurrent) for name in PRIORITIES}
+        self.queue_limits = {name: queue_limits.get(name, 0) for name in PRIORITIES}
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._cond = threading.Condition()
+        self._in_flight = dict.fromkeys(PRIORITIES, 0)
+        self._queues = {name: deque() for name in PRIORITIES}
+        self._admitted = dict.fromkeys(PRIORITIES, 0)
+        self._shed = dict.fromkeys(PRIORITIES, 0)
+        self._wait_seconds = dict.fromkeys(PRIORITIES, 0.0)
+        self._max_queued = dict.fromkeys(PRIORITIES, 0)
+        self._service_time = dict.fromkeys(PRIORITIES, 0.0)
+
+    def _fits(self, route_class):
+        return (sum(self._in_flight.values()) < self.max_concurrent
+                and self._in_flight[route_class] < self.limits[route_class])
+
+    def _waiting_ahead(self, route_class):
+        """Whether a request of equal or higher priority is already queued"""
+        priority = PRIORITIES[route_class]
+        return any(self._queues[name] for name, p in PRIORITIES.items() if p <= priority)
+
+    def _higher_priority_waiting(self, route_class):
+        priority = PRIORITIES[route_class]
+        return any(self._queues[name] for name, p in PRIORITIES.items() if p < priority)
+
+    def _retry_after(self, route_class):
+        # Roughly how long the requests ahead of this one take to drain
+        queued = len(self._queues[route_class]) + 1
+        estimate = self._service_time[route_class] * queued / max(self.limits[route_class], 1)
+        return max(self.retry_after, math.ceil(estimate))
+
+    def _shed_request(self, route_class):
+        self._shed[route_class] += 1
+        logger.debug(f"Shedding {route_class} request")
+        return Overloaded(route_class, self._retry_after(route_class))
+
+    def _dispatch(self):
+        """Admit queued requests, highest priority first, while slots are free"""
+        for name in sorted(PRIORITIES, key=PRIORITIES.get):
+            queue = self._queues[name]
+            while queue and self._fits(name):
+                waiter = queue.popleft()
+                waiter.admitted = True
+                self._in_flight[name] += 1
+        self._cond.notify_all()
+
+    def acquire(self, route_class):
+        """Take a slot for route_class, waiting if needed; raises Overloaded when shed"""
+        with self._cond:
+            if self._fits(route_class) and not self._waiting_ahead(route_class):
+                self._in_flight[route_class] += 1
+                self._admitted[route_class] += 1
+                return
+            lowest = PRIORITIES[route_class] == max(PRIORITIES.values())
+            if (len(self._queues[route_class]) >= self.queue_limits[route_class]
+                    or (lowest and self._higher_priority_waiting(route_class))):
+                raise self._shed_request(route_class)
+
+            waiter = _Waiter(route_class)
+            queue = self._queues[route_class]
+            queue.append(waiter)
+            self._max_queued[route_class] = max(self._max_queued[route_class], len(queue))
+            started = time.monotonic()
+            deadline = started + self.queue_timeout
+            while not waiter.admitted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    queue.remove(waiter)
+                    raise self._shed_request(route_class)
+                self._cond.wait(remaining)
+            self._admitted[route_class] += 1
+            self._wait_seconds[route_class] += time.monotonic() - started
+
+    def release(self, route_class, service_seconds=None):
+        with self._cond:
+            self._in_flight[route_class] -= 1
+            if service_seconds is not None:
+                previous = self._service_time[route_class]
+                self._service_time[route_class] = (service_seconds if not previous else
+                                                   previous + SERVICE_TIME_WEIGHT * (service_seconds - previous))
+            self._dispatch()
+
+    def metrics(self):
+        with self._cond:
+            classes = {}
+            for name in PRIORITIES:
+                admitted = self._admitted[name]
+                classes[name] = {
+                    'priority': PRIORITIES[name],
+                    'limit': self.limits[name],
+                    'queue_limit': self.queue_limits[name],
+                    'in_flight': self._in_flight[name],
+                    'queued': len(self._queues[name]),
+                    'max_queued': self._max_queued[name],
+                    'admitted': admitted,
+                    'shed': self._shed[name],
+                    'avg_wait_ms': round(self._wait_seconds[name] / admitted * 1000, 2) if admitted else 0.0,
+                    'avg_service_ms': round(self._service_time[name] * 1000, 2),
+                }
+            return {
+                'max_concurrent': self.max_concurrent,
+                'in_flight': sum(self._in_flight.values()),
+                'queued': sum(len(q) for q in self._queues.values()),
+                'queue_timeout': self.queue_timeout,
+                'classes': classes,
+            }
+
+
+def build_admission(config):
+    return AdmissionController(
+        max_concurrent=config['ADMISSION_MAX_CONCURRENT'],
+        limits=parse_class_values(config['ADMISSION_LIMITS']),
+        queue_limits=parse_class_values(config['ADMISSION_QUEUE_LIMITS']),
+        queue_timeout=config['ADMISSION_QUEUE_TIMEOUT'],
+        retry_after=config['ADMISSION_RETRY_AFTER']
+    )
@@ -0,0 +1,206 @@
+import json
+import logging
+import smtplib
+import urllib.request
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from models.models import db, Project, ComplianceFramework, AlertState, SentAlert
+from tenancy import bound_tenant
+
+logger = logging.getLogger(__name__)
+
+# How far back the very first evaluation of a rule looks, so items already
+# inside a rule's window when alerting is switched on are reported once
+INITIAL_LOOKBACK = timedelta(days=30)
+
+ALERT_BATCH_SIZE = 100
+
+# An item triggers a rule once now passes (deadline - lead). Each rule is a
+# range scan over an indexed deadline column, plus one over updated_at for
+# items created or rescheduled with their trigger time already passed.
+ALERT_RULES = {
+    'project_due_soon': {
+        'entity_type': 'project',
+        'column': Project.due_date,
+        'lead': timedelta(days=7),
+        'filter': lambda: Project.status != 'Completed',
+        'message': lambda p: f"Project '{p.name}' is due on {p.due_date:%Y-%m-%d}",
+    },
+    'project_overdue': {
+        'entity_type': 'project',
+        'column': Project.due_date,
+        'lead': timedelta(0),
+        'filter': lambda: Project.status != 'Completed',
+        'message': lambda p: f"Project '{p.name}' is overdue (due {p.due_date:%Y-%m-%d})",
+    },
+    'assessment_due_soon': {
+        'entity_type': 'compliance_framework',
+        'column': ComplianceFramework.next_assessment_date,
+        'lead': timedelta(days=30),
+        'filter': None,
+        'message': lambda f: f"{f.name} assessment is due on {f.next_assessment_date:%Y-%m-%d}",
+    },
+}
+
+
+class AlertSink:
+    """Destination for batches of alerts; send() raises to signal failure"""
+
+    def send(self, alerts):
+        raise NotImplementedError
+
+
+class LogSink(AlertSink):
+    def send(self, alerts):
+        for alert in alerts:
+            logger.warning(f"ALERT [{alert['rule']}] {alert['message']}")
+
+
+class MemorySink(AlertSink):
+    """Collects batches in memory; stands in for real sinks locally and in tests"""
+
+    def __init__(self):
+        self.batches = []
+
+    def send(self, alerts):
+        self.batches.append(list(alerts))
+
+
+class WebhookSink(AlertSink):
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alerts):
+        body = json.dumps({'alerts': alerts}, default=str).encode('utf-8')
+        req = urllib.request.Request(self.url, data=body, method='POST',
+                                     headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            if response.status >= 300:
+                raise RuntimeError(f"Webhook returned {response.status}")
+
+
+class SmtpSink(AlertSink):
+    def __init__(self, host, port, sender, recipients, username=None, password=None, timeout=10):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = recipients
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+
+    def send(self, alerts):
+        message = EmailMessage()
+        message['Subject'] = f"Cybether: {len(alerts)} deadline alert(s)"
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        message.set_content('\n'.join(f"- {alert['message']}" for alert in alerts))
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.username:
+                smtp.starttls()
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+
+def build_sinks(config):
+    """Create the sinks named in ALERT_SINKS (comma separated: log, webhook, smtp)"""
+    sinks = []
+    for name in [n.strip() for n in config.get('ALERT_SINKS', 'log').split(',') if n.strip()]:
+        if name == 'log':
+            sinks.append(LogSink())
+        elif name == 'webhook':
+            sinks.append(WebhookSink(config['ALERT_WEBHOOK_URL']))
+        elif name == 'smtp':
+            sinks.append(SmtpSink(
+                config['ALERT_SMTP_HOST'], config['ALERT_SMTP_PORT'], config['ALERT_EMAIL_FROM'],
+                [r.strip() for r in config['ALERT_EMAIL_TO'].split(',') if r.strip()],
+                username=config.get('ALERT_SMTP_USERNAME'), password=config.get('ALERT_SMTP_PASSWORD')
+            ))
+        else:
+            raise ValueError(f"Unknown alert sink: {name}")
+    return sinks
+
+
+def _find_crossed(rule, spec, since, now):
+    """Items whose trigger time (deadline - lead) falls in (since, now], or that changed since and are already past it.
+
+    The second scan catches items created, edited or rescheduled with the
+    trigger time already behind them, which the deadline range never
+    revisits; SentAlert drops any deadline that was alerted before. A
+    warning ahead of a deadline (lead > 0) is not sent once it has passed.
+    """
+    column = spec['column']
+    model = column.class_
+    crossed = model.query.filter(column > since + spec['lead'], column <= now + spec['lead'])
+    changed = model.query.filter(model.updated_at > since, column <= now + spec['lead'])
+    if spec['lead']:
+        changed = changed.filter(column > now)
+    if spec['filter'] is not None:
+        crossed = crossed.filter(spec['filter']())
+        changed = changed.filter(spec['filter']())
+    items = {item.id: item for query in (crossed, changed) for item in query}
+    if not items:
+        return []
+    items = sorted(items.values(), key=lambda item: (getattr(item, column.key), item.id))
+
+    already_sent = {
+        (sent.entity_id, sent.due_at) for sent in SentAlert.query.filter(
+            SentAlert.rule == rule,
+            SentAlert.entity_type == spec['entity_type'],
+            SentAlert.entity_id.in_([item.id for item in items])
+        )
+    }
+    alerts = []
+    for item in items:
+        due_at = getattr(item, column.key)
+        if (item.id, due_at) in already_sent:
+            continue
+        alerts.append({
+            'tenant_id': item.tenant_id,
+            'rule': rule,
+            'entity_type': spec['entity_type'],
+            'entity_id': item.id,
+            'due_at': due_at,
+            'message': spec['message'](item)
+        })
+    return alerts
+
+
+def evaluate_alerts(sinks, now=None):
+    """Evaluate every rule for the bound tenant over the interval since its last run and notify.
+
+    Alerts are recorded and watermarks advanced only after every sink has
+    accepted the batch, so a failing sink means a retry on the next run
+    rather than a lost alert.
+    """
+    now = now or datetime.utcnow()
+    pending = []
+    states = {}
+    for rule, spec in ALERT_RULES.items():
+        state = db.session.get(AlertState, {'tenant_id': bound_tenant(), 'rule': rule})
+        if state is None:
+            state = AlertState(rule=rule, evaluated_until=now - INITIAL_LOOKBACK)
+            db.session.add(state)
+        states[rule] = state
+        pending.extend(_find_crossed(rule, spec, state.evaluated_until, now))
+
+    try:
+        for start in range(0, len(pending), ALERT_BATCH_SIZE):
+            batch = [dict(alert, due_at=alert['due_at'].isoformat())
+                     for alert in pending[start:start + ALERT_BATCH_SIZE]]
+            for sink in sinks:
+                sink.send(batch)
+    except Exception:
+        db.session.rollback()
+        raise
+
+    db.session.add_all(SentAlert(sent_at=now, **alert) for alert in pending)
+    for state in states.values():
+        state.evaluated_until = now
+    db.session.commit()
+
+    if pending:
+        logger.info(f"Sent {len(pending)} deadline alerts")
+    return {'sent': len(pending)}
@@ -1,8 +1,33 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response, send_file
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token, create_refresh_token, jwt_required, get_jwt_identity, verify_jwt_in_request
-from models.models import MaturityTrendPoint, db, User, ThreatLevel, MaturityRating, Risk, Project, ComplianceFramework
+from flask_migrate import Migrate
+from flask_jwt_extended import JWTManager, create_access_token, create_refresh_token, jwt_required, get_jwt, get_jwt_identity, verify_jwt_in_request
+from models.models import MaturityTrendPoint, db, check_dialect, User, Tenant, ThreatLevel, MaturityRating, Risk, Project, ComplianceFramework, SavedFrameworkView, Control, ControlAssessment, ReportJob, ScheduledJob, SentAlert, AuditLog, risk_project, risk_framework
 from config import Config
+from schema import MIGRATIONS_DIR, init_schema
+from tenancy import TENANT_CLAIM, bind_tenant, reset_tenant, bound_tenant, tenant_claims, init_tenancy, ensure_default_tenant, for_each_tenant
+from search import init_search_index, search, SEARCH_TARGETS
+from temporal import init_temporal, parse_as_of
+from history import METRICS, BUCKETS, record_current, get_current, get_history, compact_history
+from controls import DuplicateControl, create_controls, bulk_update_status, delete_control, family_summary
+from scoring import get_scoring_config, seed_scoring_config, score_risk, rescore_risks, validate_weights, risk_heatmap
+from stats import compute_project_stats, compute_compliance_stats, read_result
+from scheduler import Scheduler, JOBS
+from audit import AuditWriter, init_audit, AUDITED_MODELS
+from batch import (BatchError, apply_batch, build_risk, apply_risk, build_project, apply_project,
+                   build_framework, apply_framework, parse_trend_point)
+from outbox import build_targets, init_outbox, outbox_status
+from findings import ingest_findings, FORMATS as FINDINGS_FORMATS
+from archive import archived_query
+from reports import FORMATS as REPORT_FORMATS, ReportService, default_month
+from admission import Overloaded, build_admission, classify
+from idempotency import IDEMPOTENT_METHODS, MAX_KEY_LENGTH, IdempotencyConflict, IdempotencyStore, StoredResponse, request_fingerprint
+from snapshot import SNAPSHOT_PATHS, SnapshotPublisher, build_store, init_snapshot
+from profiler import ProfilerBusy, RequestProfiler, sample_stacks, track_request, untrack_request
+from queries import (DEFAULT_FRAMEWORK_VIEW, risks_statement, projects_statement, trend_statement,
+                     saved_view_statement, compliance_statement, metric_payload)
+import jobs  # registers the background jobs
+from trend import parse_month, upsert_trend_points, derive_trend, recent_trend_scores, rollup_maturity_trend, SOURCE_MANUAL
 from functools import wraps
 import bcrypt
 from datetime import datetime, timedelta
@@ -10,7 +35,11 @@ import logging
 import sys
 import traceback
 import os
-from sqlalchemy import Case, desc
+import time
+import atexit
+import io
+from sqlalchemy import desc
+from sqlalchemy.orm import selectinload
 
 logging.basicConfig(
     level=logging.DEBUG,  # Set to DEBUG for more info
@@ -48,24 +77,247 @@ def admin_required():
 @app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,X-Profile,Idempotency-Key,Range,If-Range')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     response.headers.add('Access-Control-Max-Age', '3600')
+    response.headers.add('Access-Control-Expose-Headers', 'Retry-After,X-Profile-Id,Idempotent-Replayed,X-Snapshot-Version,'
+                                                          'Content-Disposition,Content-Range,Accept-Ranges,ETag')
     logger.debug(f"Response headers: {dict(response.headers)}")
     return response
 
 jwt = JWTManager(app)
 db.init_app(app)
+migrate = Migrate(app, db, directory=MIGRATIONS_DIR, render_as_batch=True)
+# Before anything queries: every statement is scoped to the request's tenant
+init_tenancy()
 
 with app.app_context():
+    # Not caught below: the app cannot run on any other backend
+    check_dialect(db.engine.dialect.name)
     try:
-        logger.info("Creating database tables...")
-        db.create_all()
+        logger.info("Setting up database schema...")
+        init_schema(db)
+        ensure_default_tenant()
+        init_search_index(db)
+        init_temporal(db)
+        for_each_tenant(seed_scoring_config)
+        db.session.commit()
+        for_each_tenant(rescore_risks, only_missing=True)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error creating database tables: {str(e)}")
         logger.error(traceback.format_exc())
 
+audit_writer = AuditWriter(
+    app,
+    maxsize=app.config['AUDIT_QUEUE_SIZE'],
+    batch_size=app.config['AUDIT_BATCH_SIZE'],
+    flush_interval=app.config['AUDIT_FLUSH_INTERVAL']
+)
+if app.config['AUDIT_ENABLED']:
+    init_audit(audit_writer)
+    audit_writer.start()
+    atexit.register(audit_writer.stop)
+
+# Change events are recorded whether or not a target is configured yet; they
+# are kept for OUTBOX_RETENTION_DAYS
+init_outbox()
+
+# Dashboard reads are served from a per-tenant snapshot shared by every worker;
+# commits touching a tenant's dashboard rows mark its snapshot stale and
+# republish it from this worker
+if app.config['SNAPSHOT_ENABLED']:
+    snapshot_publisher = SnapshotPublisher(app)
+    init_snapshot(app.config, snapshot_publisher)
+    snapshot_publisher.start()
+    snapshot_publisher.request()
+    atexit.register(snapshot_publisher.stop)
+
+report_service = ReportService(
+    app,
+    directory=app.config['REPORT_DIR'],
+    workers=app.config['REPORT_WORKERS'],
+    job_timeout=app.config['REPORT_JOB_TIMEOUT']
+)
+atexit.register(report_service.stop)
+
+scheduler = Scheduler(app, tick_seconds=app.config['SCHEDULER_TICK_SECONDS'])
+if app.config['SCHEDULER_ENABLED']:
+    scheduler.start()
+    atexit.register(scheduler.stop)
+
+idempotency_store = IdempotencyStore(
+    ttl=app.config['IDEMPOTENCY_TTL_SECONDS'],
+    max_entries=app.config['IDEMPOTENCY_MAX_ENTRIES'],
+    max_body_bytes=app.config['IDEMPOTENCY_MAX_RESPONSE_BYTES'],
+    wait_seconds=app.config['IDEMPOTENCY_WAIT_SECONDS']
+)
+
+# Routes that run before a tenant is known, or without one
+TENANT_FREE_PATHS = {'/api/login', '/api/refresh-token', '/api/health'}
+
+# Registered first: every later hook and view runs scoped to the tenant
+@app.before_request
+def bind_request_tenant():
+    """Bind the tenant of the access token, or ANONYMOUS_TENANT_ID for requests without one.
+
+    A token that is present but expired or invalid is rejected here, with
+    the usual JWT error responses, rather than read as anonymous: a
+    signed-in user never falls back to another tenant's dashboard.
+    """
+    if request.method == 'OPTIONS' or request.path in TENANT_FREE_PATHS:
+        return None
+    verify_jwt_in_request(optional=True)
+    claims = get_jwt()
+    if not claims:
+        tenant_id = app.config['ANONYMOUS_TENANT_ID']
+        if tenant_id is None:
+            return jsonify({'error': 'Authorization token is missing', 'code': 'authorization_required'}), 401
+    elif TENANT_CLAIM not in claims:
+        # Issued before tenants existed; api.jsx refreshes it into one with the claim
+        return jsonify({'error': 'Token has expired', 'code': 'token_expired'}), 401
+    else:
+        tenant_id = claims[TENANT_CLAIM]
+    g.tenant_id = tenant_id
+    g.tenant_token = bind_tenant(tenant_id)
+    return None
+
+@app.teardown_request
+def unbind_request_tenant(error):
+    token = g.pop('tenant_token', None)
+    if token is not None:
+        reset_tenant(token)
+
+def idempotency_scope():
+    # Keys belong to the user rather than the token, so the replay after a
+    # token refresh in api.jsx still matches
+    try:
+        verify_jwt_in_request(optional=True)
+        return g.get('tenant_id'), get_jwt_identity() or 'anonymous'
+    except Exception:
+        return g.get('tenant_id'), 'anonymous'
+
+# Registered before admission control so replays and waiting retries do not take a slot
+@app.before_request
+def replay_idempotent_request():
+    key = request.headers.get('Idempotency-Key')
+    if not key or request.method not in IDEMPOTENT_METHODS or not app.config['IDEMPOTENCY_ENABLED']:
+        return None
+    if len(key) > MAX_KEY_LENGTH:
+        return jsonify({'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+    # JSON bodies are hashed (and cached for the view); streamed uploads
+    # such as findings imports are matched on their length so they stay unread
+    body = request.get_data(cache=True) if request.is_json else str(request.content_length).encode()
+    store_key = (idempotency_scope(), key)
+    try:
+        stored = idempotency_store.begin(
+            store_key, request_fingerprint(request.method, request.path, request.query_string, body)
+        )
+    except IdempotencyConflict as ic:
+        return jsonify({'error': str(ic)}), ic.status
+    if stored is not None:
+        logger.info(f"Replaying {request.method} {request.path} for idempotency key {key}")
+        response = Response(stored.body, status=stored.status, mimetype=stored.mimetype)
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+    g.idempotency_key = store_key
+    return None
+
+@app.after_request
+def store_idempotent_response(response):
+    store_key = g.pop('idempotency_key', None)
+    if store_key is not None:
+        stored = None
+        if response.status_code < 400 and not response.is_streamed:
+            stored = StoredResponse(response.status_code, response.mimetype, response.get_data())
+        idempotency_store.complete(store_key, stored)
+    return response
+
+@app.teardown_request
+def release_idempotency_key(error):
+    store_key = g.pop('idempotency_key', None)
+    if store_key is not None:
+        idempotency_store.abandon(store_key)
+
+admission = build_admission(app.config)
+
+@app.before_request
+def admit_request():
+    if not app.config['ADMISSION_ENABLED'] or request.method == 'OPTIONS':
+        return None
+    route_class = classify(request.method, request.path)
+    try:
+        admission.acquire(route_class)
+    except Overloaded as o:
+        response = jsonify({'error': 'Server is busy, please retry shortly', 'code': 'overloaded'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(o.retry_after)
+        return response
+    g.admission = (route_class, time.perf_counter())
+    return None
+
+@app.teardown_request
+def release_admission(error):
+    admitted = g.pop('admission', None)
+    if admitted:
+        route_class, started = admitted
+        admission.release(route_class, time.perf_counter() - started)
+
+request_profiler = RequestProfiler(
+    max_concurrent=app.config['PROFILE_REQUESTS_MAX_CONCURRENT'],
+    min_interval=app.config['PROFILE_REQUESTS_MIN_INTERVAL'],
+    keep=app.config['PROFILE_REQUESTS_KEEP']
+)
+
+def is_admin_request():
+    try:
+        verify_jwt_in_request()
+        user = db.session.get(User, get_jwt_identity())
+        return bool(user and user.is_admin)
+    except Exception:
+        return False
+
+@app.before_request
+def start_request_profile():
+    g.route = f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+    track_request(g.route)
+    if (request.headers.get('X-Profile') == 'cprofile' and app.config['PROFILE_REQUESTS_ENABLED']
+            and is_admin_request()):
+        g.profile = request_profiler.start()
+    return None
+
+@app.after_request
+def finish_request_profile(response):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        response.headers['X-Profile-Id'] = request_profiler.finish(profile, g.route)
+    return response
+
+@app.before_request
+def serve_dashboard_snapshot():
+    # Only the unfiltered reads are in the snapshot; anything else, or a
+    # stale snapshot, goes on to the route
+    if request.method != 'GET' or request.args or not app.config['SNAPSHOT_ENABLED']:
+        return None
+    key = SNAPSHOT_PATHS.get(request.path)
+    snapshot = build_store(app.config, g.tenant_id).get(key) if key else None
+    if snapshot is None:
+        return None
+    version, body = snapshot
+    # Sent straight from the shared mapping
+    response = Response([body], mimetype='application/json')
+    response.headers['X-Snapshot-Version'] = str(version)
+    return response
+
+@app.teardown_request
+def stop_request_tracking(error):
+    # A request that failed before after_request still frees its profiling slot
+    profile = g.pop('profile', None)
+    if profile is not None:
+        request_profiler.finish(profile, g.route)
+    untrack_request()
+
 # Basic OPTIONS request handler for all routes
 @app.route('/', defaults={'path': ''}, methods=['OPTIONS'])
 @app.route('/<path:path>', methods=['OPTIONS'])
@@ -90,8 +342,9 @@ def login():
             return jsonify({'error': 'Invalid credentials'}), 401
         
         if bcrypt.checkpw(data['password'].encode('utf-8'), user.password_hash.encode('utf-8')):
-            access_token = create_access_token(identity=str(user.id))
-            refresh_token = create_refresh_token(identity=str(user.id))
+            # The tenant travels with the user id, so no request needs a lookup to scope itself
+            access_token = create_access_token(identity=str(user.id), additional_claims=tenant_claims(user))
+            refresh_token = create_refresh_token(identity=str(user.id), additional_claims=tenant_claims(user))
             logger.info(f"Login successful for user: {user.username}")
             return jsonify({
                 'token': access_token,
@@ -111,21 +364,12 @@ def login():
 def get_threat_level():
     logger.info("Processing get threat level request")
     try:
-        threat = ThreatLevel.query.order_by(ThreatLevel.updated_at.desc()).first()
+        threat = get_current('threat_level')
         if not threat:
             logger.debug("No threat level found, returning default values")
-            return jsonify({
-                'level': 'Low',
-                'description': 'No current threats',
-                'updated_at': datetime.utcnow()
-            })
-        
-        logger.debug(f"Retrieved threat level: {threat.level}")
-        return jsonify({
-            'level': threat.level,
-            'description': threat.description,
-            'updated_at': threat.updated_at
-        })
+        else:
+            logger.debug(f"Retrieved threat level: {threat.label}")
+        return jsonify(metric_payload('threat_level', threat))
     except Exception as e:
         logger.error(f"Error retrieving threat level: {str(e)}")
         logger.error(traceback.format_exc())
@@ -155,6 +399,7 @@ def update_threat_level():
         
         logger.debug("Adding new threat level to database")
         db.session.add(new_threat)
+        record_current('threat_level', new_threat)
         db.session.commit()
         logger.info(f"Threat level updated successfully to: {data['level']}")
         
@@ -176,21 +421,12 @@ def update_threat_level():
 def get_maturity_rating():
     logger.info("Processing get maturity rating request")
     try:
-        rating = MaturityRating.query.order_by(MaturityRating.updated_at.desc()).first()
+        rating = get_current('maturity_rating')
         if not rating:
             logger.debug("No maturity rating found, returning default values")
-            return jsonify({
-                'score': 1.0,
-                'trend': 'Stable',
-                'updated_at': datetime.utcnow()
-            })
-        
-        logger.debug(f"Retrieved maturity rating: {rating.score}")
-        return jsonify({
-            'score': rating.score,
-            'trend': rating.trend,
-            'updated_at': rating.updated_at
-        })
+        else:
+            logger.debug(f"Retrieved maturity rating: {rating.value}")
+        return jsonify(metric_payload('maturity_rating', rating))
     except Exception as e:
         logger.error(f"Error retrieving maturity rating: {str(e)}")
         logger.error(traceback.format_exc())
@@ -220,8 +456,11 @@ def health_check():
 @jwt_required(refresh=True)
 def refresh_token():
     try:
-        current_user = get_jwt_identity()
-        new_token = create_access_token(identity=current_user)
+        # Looked up rather than copied from the refresh token, which may predate tenants
+        user = db.session.get(User, int(get_jwt_identity()))
+        if user is None:
+            return jsonify({'error': 'Token refresh failed'}), 401
+        new_token = create_access_token(identity=str(user.id), additional_claims=tenant_claims(user))
         return jsonify({'token': new_token}), 200
     except Exception as e:
         logger.error(f"Error refreshing token: {str(e)}")
@@ -239,9 +478,9 @@ def update_maturity_rating():
             logger.error("No data provided in request")
             return jsonify({'error': 'No data provided'}), 400
             
-        if 'score' not in data or 'trend' not in data:
+        if 'score' not in data:
             logger.error("Missing required fields in request")
-            return jsonify({'error': 'Score and trend are required'}), 400
+            return jsonify({'error': 'Score is required'}), 400
 
         try:
             score = float(data['score'])
@@ -250,14 +489,18 @@ def update_maturity_rating():
         except ValueError:
             return jsonify({'error': 'Invalid score value'}), 400
 
+        # Without an explicit trend, derive it from the rolled-up monthly points
+        trend = data.get('trend') or derive_trend(recent_trend_scores() + [score])
+
         new_rating = MaturityRating(
             score=score,
-            trend=data['trend'],
+            trend=trend,
             updated_at=datetime.utcnow()
         )
         
         logger.debug("Adding new maturity rating to database")
         db.session.add(new_rating)
+        record_current('maturity_rating', new_rating)
         db.session.commit()
         logger.info(f"Maturity rating updated successfully to: {data['score']}")
         
@@ -275,23 +518,79 @@ def update_maturity_rating():
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+# Metric History Routes
+def parse_datetime_arg(value, name):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid {name} value. Use ISO 8601, e.g. YYYY-MM-DD')
+
+@app.route('/api/history/<string:metric>', methods=['GET'])
+def get_metric_history(metric):
+    logger.info(f"Processing get history request for metric: {metric}")
+    try:
+        if metric not in METRICS:
+            return jsonify({'error': f'Metric must be one of: {", ".join(METRICS)}'}), 404
+
+        bucket = request.args.get('bucket', 'day')
+        if bucket not in BUCKETS:
+            return jsonify({'error': f'Bucket must be one of: {", ".join(BUCKETS)}'}), 400
+
+        try:
+            end = parse_datetime_arg(request.args['end'], 'end') if 'end' in request.args else datetime.utcnow()
+            start = parse_datetime_arg(request.args['start'], 'start') if 'start' in request.args else end - timedelta(days=90)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+        if start >= end:
+            return jsonify({'error': 'Start must be before end'}), 400
+
+        points = get_history(metric, start, end, bucket)
+        logger.debug(f"Retrieved {len(points)} {bucket} history points for {metric}")
+        return jsonify({
+            'metric': metric,
+            'bucket': bucket,
+            'start': start,
+            'end': end,
+            'points': points
+        })
+    except Exception as e:
+        logger.error(f"Error retrieving metric history: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving metric history'}), 500
+
+@app.route('/api/history/compact', methods=['POST'])
+@admin_required()
+def compact_metric_history():
+    logger.info("Processing compact metric history request")
+    try:
+        compacted = compact_history(app.config['HISTORY_RAW_RETENTION_DAYS'])
+        return jsonify({
+            'message': 'Metric history compacted successfully',
+            'data': compacted
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error compacting metric history: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error compacting metric history'}), 500
+
 # Risk Management Routes
 @app.route('/api/risks', methods=['GET'])
 def get_risks():
     logger.info("Processing get risks request")
     try:
-        risks = Risk.query.order_by(
-            Case(
-                (Risk.severity == 'Critical', 1),
-                (Risk.severity == 'High', 2),
-                (Risk.severity == 'Medium', 3),
-                (Risk.severity == 'Low', 4)
-            ),
-            Risk.updated_at.desc()
-        ).all()
+        try:
+            as_of = parse_as_of(request.args)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+        risks = db.session.execute(risks_statement(as_of)).scalars().all()
         
         logger.debug(f"Retrieved {len(risks)} risks")
-        return jsonify([risk.to_dict() for risk in risks])
+        items = [risk.to_dict() for risk in risks]
+        # Archival leaves a risk's current version open, so as_of already has archived risks
+        if as_of is None and request.args.get('include_archived', 'false').lower() == 'true':
+            items.extend(risk.to_dict() for risk in archived_query('risks'))
+        return jsonify(items)
     except Exception as e:
         logger.error(f"Error retrieving risks: {str(e)}")
         logger.error(traceback.format_exc())
@@ -304,29 +603,13 @@ def create_risk():
     try:
         data = request.get_json()
         logger.debug(f"Received risk creation data: {data}")
-        
-        required_fields = ['title', 'severity', 'status']
-        if not all(field in data for field in required_fields):
-            logger.error("Missing required fields in request")
-            return jsonify({'error': 'Title, severity, and status are required'}), 400
-            
-        if data['severity'] not in ['Low', 'Medium', 'High', 'Critical']:
-            return jsonify({'error': 'Invalid severity level'}), 400
-            
-        if data['status'] not in ['Open', 'In Progress', 'Closed']:
-            return jsonify({'error': 'Invalid status'}), 400
-
-        new_risk = Risk(
-            title=data['title'],
-            description=data.get('description', ''),
-            severity=data['severity'],
-            status=data['status'],
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
-        )
-        
-        logger.debug("Adding new risk to database")
-        db.session.add(new_risk)
+
+        try:
+            new_risk = build_risk(data)
+        except ValueError as ve:
+            db.session.rollback()
+            return jsonify({'error': str(ve)}), 400
+
         db.session.commit()
         logger.info(f"Risk created successfully: {new_risk.title}")
         
@@ -341,6 +624,70 @@ def create_risk():
         logger.error(traceback.format_exc())
         return jsonify({'error': 'Error creating risk'}), 500
 
+@app.route('/api/risks/heatmap', methods=['GET'])
+def get_risk_heatmap():
+    logger.info("Processing get risk heatmap request")
+    try:
+        include_closed = request.args.get('include_closed', 'false').lower() == 'true'
+        try:
+            as_of = parse_as_of(request.args)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+        return jsonify({
+            'include_closed': include_closed,
+            'as_of': as_of,
+            'matrix': risk_heatmap(include_closed, as_of)
+        })
+    except Exception as e:
+        logger.error(f"Error retrieving risk heatmap: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving risk heatmap'}), 500
+
+@app.route('/api/risks/scoring', methods=['GET'])
+def get_risk_scoring():
+    try:
+        config = get_scoring_config()
+        return jsonify(config.to_dict())
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error retrieving risk scoring config: {str(e)}")
+        return jsonify({'error': 'Error retrieving risk scoring config'}), 500
+
+@app.route('/api/risks/scoring', methods=['PUT'])
+@admin_required()
+def update_risk_scoring():
+    logger.info("Processing update risk scoring request")
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        try:
+            cleaned = validate_weights(data)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+
+        seed_scoring_config()
+        config = get_scoring_config()
+        for field, value in cleaned.items():
+            setattr(config, field, value)
+        config.updated_at = datetime.utcnow()
+
+        # New weights apply to the whole register at once
+        rescored = rescore_risks()
+        logger.info(f"Risk scoring updated, rescored {rescored} risks")
+
+        return jsonify({
+            'message': 'Risk scoring updated successfully',
+            'data': config.to_dict(),
+            'rescored': rescored
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error updating risk scoring: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error updating risk scoring'}), 500
+
 @app.route('/api/risks/<int:risk_id>', methods=['PUT'])
 @admin_required()
 def update_risk(risk_id):
@@ -353,23 +700,12 @@ def update_risk(risk_id):
         data = request.get_json()
         logger.debug(f"Received risk update data: {data}")
 
-        if 'severity' in data and data['severity'] not in ['Low', 'Medium', 'High', 'Critical']:
-            return jsonify({'error': 'Invalid severity level'}), 400
-            
-        if 'status' in data and data['status'] not in ['Open', 'In Progress', 'Closed']:
-            return jsonify({'error': 'Invalid status'}), 400
-
-        # Update fields if they exist in the request
-        if 'title' in data:
-            risk.title = data['title']
-        if 'description' in data:
-            risk.description = data['description']
-        if 'severity' in data:
-            risk.severity = data['severity']
-        if 'status' in data:
-            risk.status = data['status']
-
-        risk.updated_at = datetime.utcnow()
+        try:
+            apply_risk(risk, data)
+        except ValueError as ve:
+            db.session.rollback()
+            return jsonify({'error': str(ve)}), 400
+
         db.session.commit()
         logger.info(f"Risk updated successfully: {risk.title}")
 
@@ -412,9 +748,16 @@ def delete_risk(risk_id):
 def get_projects():
     logger.info("Processing get projects request")
     try:
-        projects = Project.query.order_by(Project.due_date.asc()).all()
+        try:
+            as_of = parse_as_of(request.args)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+        projects = db.session.execute(projects_statement(as_of)).scalars().all()
         logger.debug(f"Retrieved {len(projects)} projects")
-        return jsonify([project.to_dict() for project in projects])
+        items = [project.to_dict() for project in projects]
+        if as_of is None and request.args.get('include_archived', 'false').lower() == 'true':
+            items.extend(project.to_dict() for project in archived_query('projects'))
+        return jsonify(items)
     except Exception as e:
         logger.error(f"Error retrieving projects: {str(e)}")
         logger.error(traceback.format_exc())
@@ -427,32 +770,13 @@ def create_project():
     try:
         data = request.get_json()
         logger.debug(f"Received project creation data: {data}")
-        
-        required_fields = ['name', 'status', 'completion_percentage']
-        if not all(field in data for field in required_fields):
-            logger.error("Missing required fields in request")
-            return jsonify({'error': 'Name, status, and completion percentage are required'}), 400
-            
-        valid_statuses = ['Not Started', 'In Progress', 'Completed', 'On Hold']
-        if data['status'] not in valid_statuses:
-            return jsonify({'error': f'Status must be one of: {", ".join(valid_statuses)}'}), 400
-            
-        if not (0 <= float(data['completion_percentage']) <= 100):
-            return jsonify({'error': 'Completion percentage must be between 0 and 100'}), 400
-
-        new_project = Project(
-            name=data['name'],
-            description=data.get('description', ''),
-            status=data['status'],
-            completion_percentage=float(data['completion_percentage']),
-            start_date=datetime.strptime(data['start_date'], '%Y-%m-%d') if 'start_date' in data else datetime.utcnow(),
-            due_date=datetime.strptime(data['due_date'], '%Y-%m-%d') if 'due_date' in data else None,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
-        )
-        
-        logger.debug("Adding new project to database")
-        db.session.add(new_project)
+
+        try:
+            new_project = build_project(data)
+        except ValueError as ve:
+            db.session.rollback()
+            return jsonify({'error': str(ve)}), 400
+
         db.session.commit()
         logger.info(f"Project created successfully: {new_project.name}")
         
@@ -461,10 +785,6 @@ def create_project():
             'data': new_project.to_dict()
         }), 201
 
-    except ValueError as ve:
-        db.session.rollback()
-        logger.error(f"Validation error creating project: {str(ve)}")
-        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error creating project: {str(e)}")
@@ -483,28 +803,12 @@ def update_project(project_id):
         data = request.get_json()
         logger.debug(f"Received project update data: {data}")
 
-        valid_statuses = ['Not Started', 'In Progress', 'Completed', 'On Hold']
-        if 'status' in data and data['status'] not in valid_statuses:
-            return jsonify({'error': f'Status must be one of: {", ".join(valid_statuses)}'}), 400
-            
-        if 'completion_percentage' in data and not (0 <= float(data['completion_percentage']) <= 100):
-            return jsonify({'error': 'Completion percentage must be between 0 and 100'}), 400
-
-        # Update fields if they exist in the request
-        if 'name' in data:
-            project.name = data['name']
-        if 'description' in data:
-            project.description = data['description']
-        if 'status' in data:
-            project.status = data['status']
-        if 'completion_percentage' in data:
-            project.completion_percentage = float(data['completion_percentage'])
-        if 'due_date' in data:
-            project.due_date = datetime.strptime(data['due_date'], '%Y-%m-%d')
-        if 'start_date' in data:
-            project.start_date = datetime.strptime(data['start_date'], '%Y-%m-%d')
-
-        project.updated_at = datetime.utcnow()
+        try:
+            apply_project(project, data)
+        except ValueError as ve:
+            db.session.rollback()
+            return jsonify({'error': str(ve)}), 400
+
         db.session.commit()
         logger.info(f"Project updated successfully: {project.name}")
 
@@ -513,10 +817,6 @@ def update_project(project_id):
             'data': project.to_dict()
         })
 
-    except ValueError as ve:
-        db.session.rollback()
-        logger.error(f"Validation error updating project: {str(ve)}")
-        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error updating project: {str(e)}")
@@ -551,21 +851,14 @@ def delete_project(project_id):
 def get_project_stats():
     logger.info("Processing get project statistics request")
     try:
-        total_projects = Project.query.count()
-        completed_projects = Project.query.filter_by(status='Completed').count()
-        in_progress_projects = Project.query.filter_by(status='In Progress').count()
-        overdue_projects = Project.query.filter(
-            Project.due_date < datetime.utcnow(),
-            Project.status != 'Completed'
-        ).count()
-
-        return jsonify({
-            'total_projects': total_projects,
-            'completed_projects': completed_projects,
-            'in_progress_projects': in_progress_projects,
-            'overdue_projects': overdue_projects,
-            'completion_rate': (completed_projects / total_projects * 100) if total_projects > 0 else 0
-        })
+        try:
+            as_of = parse_as_of(request.args)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+        # Past figures never change, so they are computed on request rather than precomputed
+        if as_of is not None:
+            return jsonify(compute_project_stats(as_of=as_of))
+        return jsonify(read_result('project_stats', compute_project_stats))
 
     except Exception as e:
         logger.error(f"Error retrieving project statistics: {str(e)}")
@@ -573,13 +866,27 @@ def get_project_stats():
         return jsonify({'error': 'Error retrieving project statistics'}), 500
     
 # Compliance Framework Routes
+def get_saved_framework_names(user_id):
+    return db.session.execute(saved_view_statement(user_id)).scalars().all() or DEFAULT_FRAMEWORK_VIEW
+
 @app.route('/api/compliance', methods=['GET'])
 def get_compliance_frameworks():
     logger.info("Processing get compliance frameworks request")
+    # view=saved narrows the list to the caller's saved framework selection
+    user_id = None
+    if request.args.get('view') == 'saved':
+        verify_jwt_in_request()
+        user_id = int(get_jwt_identity())
+
     try:
-        frameworks = ComplianceFramework.query.order_by(
-            ComplianceFramework.current_score.desc()
-        ).all()
+        try:
+            saved_names = get_saved_framework_names(user_id) if user_id is not None else None
+            stmt = compliance_statement(request.args, saved_names)
+        except ValueError as ve:
+            logger.error(f"Invalid compliance filter: {str(ve)}")
+            return jsonify({'error': str(ve)}), 400
+
+        frameworks = db.session.execute(stmt).scalars().all()
         logger.debug(f"Retrieved {len(frameworks)} compliance frameworks")
         return jsonify([framework.to_dict() for framework in frameworks])
     except Exception as e:
@@ -587,6 +894,55 @@ def get_compliance_frameworks():
         logger.error(traceback.format_exc())
         return jsonify({'error': 'Error retrieving compliance frameworks'}), 500
 
+@app.route('/api/compliance/view', methods=['GET'])
+@jwt_required()
+def get_compliance_view():
+    logger.info("Processing get compliance view request")
+    try:
+        user_id = int(get_jwt_identity())
+        has_saved = SavedFrameworkView.query.filter_by(user_id=user_id).first() is not None
+        return jsonify({
+            'frameworks': get_saved_framework_names(user_id),
+            'is_default': not has_saved
+        })
+    except Exception as e:
+        logger.error(f"Error retrieving compliance view: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving compliance view'}), 500
+
+@app.route('/api/compliance/view', methods=['PUT'])
+@jwt_required()
+def update_compliance_view():
+    logger.info("Processing update compliance view request")
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('frameworks'), list):
+            return jsonify({'error': 'A list of frameworks is required'}), 400
+
+        user_id = int(get_jwt_identity())
+        names = list(dict.fromkeys(str(name).strip() for name in data['frameworks'] if str(name).strip()))
+        if any(len(name) > 50 for name in names):
+            return jsonify({'error': 'Framework names must be at most 50 characters'}), 400
+
+        # An empty list resets the user back to the default view
+        SavedFrameworkView.query.filter_by(user_id=user_id).delete()
+        db.session.add_all(SavedFrameworkView(user_id=user_id, framework_name=name) for name in names)
+        db.session.commit()
+        logger.info(f"Compliance view saved for user {user_id}: {names}")
+
+        return jsonify({
+            'message': 'Compliance view updated successfully',
+            'data': {
+                'frameworks': get_saved_framework_names(user_id),
+                'is_default': not names
+            }
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error updating compliance view: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error updating compliance view'}), 500
+
 @app.route('/api/compliance', methods=['POST'])
 @admin_required()
 def create_compliance_framework():
@@ -594,36 +950,13 @@ def create_compliance_framework():
     try:
         data = request.get_json()
         logger.debug(f"Received compliance framework creation data: {data}")
-        
-        required_fields = ['name', 'current_score', 'target_score', 'last_assessment_date']
-        if not all(field in data for field in required_fields):
-            logger.error("Missing required fields in request")
-            return jsonify({
-                'error': 'Name, current score, target score, and last assessment date are required'
-            }), 400
-            
-        # Validate scores
-        if not (0 <= float(data['current_score']) <= 100):
-            return jsonify({'error': 'Current score must be between 0 and 100'}), 400
-        if not (0 <= float(data['target_score']) <= 100):
-            return jsonify({'error': 'Target score must be between 0 and 100'}), 400
-
-        # Calculate next assessment date (default: 3 months from last assessment)
-        last_assessment = datetime.strptime(data['last_assessment_date'], '%Y-%m-%d')
-        next_assessment = last_assessment + timedelta(days=90)
-
-        new_framework = ComplianceFramework(
-            name=data['name'],
-            current_score=float(data['current_score']),
-            target_score=float(data['target_score']),
-            last_assessment_date=last_assessment,
-            next_assessment_date=next_assessment,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
-        )
-        
-        logger.debug("Adding new compliance framework to database")
-        db.session.add(new_framework)
+
+        try:
+            new_framework = build_framework(data)
+        except ValueError as ve:
+            db.session.rollback()
+            return jsonify({'error': str(ve)}), 400
+
         db.session.commit()
         logger.info(f"Compliance framework created successfully: {new_framework.name}")
         
@@ -632,10 +965,6 @@ def create_compliance_framework():
             'data': new_framework.to_dict()
         }), 201
 
-    except ValueError as ve:
-        db.session.rollback()
-        logger.error(f"Validation error creating compliance framework: {str(ve)}")
-        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error creating compliance framework: {str(e)}")
@@ -654,24 +983,12 @@ def update_compliance_framework(framework_id):
         data = request.get_json()
         logger.debug(f"Received compliance framework update data: {data}")
 
-        # Validate scores if provided
-        if 'current_score' in data and not (0 <= float(data['current_score']) <= 100):
-            return jsonify({'error': 'Current score must be between 0 and 100'}), 400
-        if 'target_score' in data and not (0 <= float(data['target_score']) <= 100):
-            return jsonify({'error': 'Target score must be between 0 and 100'}), 400
-
-        # Update fields if they exist in the request
-        if 'name' in data:
-            framework.name = data['name']
-        if 'current_score' in data:
-            framework.current_score = float(data['current_score'])
-        if 'target_score' in data:
-            framework.target_score = float(data['target_score'])
-        if 'last_assessment_date' in data:
-            framework.last_assessment_date = datetime.strptime(data['last_assessment_date'], '%Y-%m-%d')
-            framework.next_assessment_date = framework.last_assessment_date + timedelta(days=90)
-
-        framework.updated_at = datetime.utcnow()
+        try:
+            apply_framework(framework, data)
+        except ValueError as ve:
+            db.session.rollback()
+            return jsonify({'error': str(ve)}), 400
+
         db.session.commit()
         logger.info(f"Compliance framework updated successfully: {framework.name}")
 
@@ -680,10 +997,6 @@ def update_compliance_framework(framework_id):
             'data': framework.to_dict()
         })
 
-    except ValueError as ve:
-        db.session.rollback()
-        logger.error(f"Validation error updating compliance framework: {str(ve)}")
-        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error updating compliance framework: {str(e)}")
@@ -717,44 +1030,726 @@ def delete_compliance_framework(framework_id):
 def get_compliance_stats():
     logger.info("Processing get compliance statistics request")
     try:
-        frameworks = ComplianceFramework.query.all()
-        total_frameworks = len(frameworks)
-        
-        if total_frameworks == 0:
-            return jsonify({
-                'average_score': 0,
-                'frameworks_meeting_target': 0,
-                'frameworks_below_target': 0,
-                'overall_compliance_status': 'No frameworks defined'
-            })
+        try:
+            as_of = parse_as_of(request.args)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+        if as_of is not None:
+            return jsonify(compute_compliance_stats(as_of=as_of))
+        return jsonify(read_result('compliance_stats', compute_compliance_stats))
+
+    except Exception as e:
+        logger.error(f"Error retrieving compliance statistics: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving compliance statistics'}), 500
+
+# Compliance Control Routes
+def get_pagination_args(default_per_page=100, max_per_page=500):
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', default_per_page)), 1), max_per_page)
+    except ValueError:
+        raise ValueError('Invalid page or per_page value')
+    return page, per_page
+
+@app.route('/api/compliance/<int:framework_id>/families', methods=['GET'])
+def get_control_families(framework_id):
+    logger.info(f"Processing get control families request for framework_id: {framework_id}")
+    try:
+        framework = db.session.get(ComplianceFramework, framework_id)
+        if not framework:
+            return jsonify({'error': 'Compliance framework not found'}), 404
+
+        return jsonify({
+            'framework': framework.to_dict(),
+            'families': family_summary(framework_id)
+        })
+    except Exception as e:
+        logger.error(f"Error retrieving control families: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving control families'}), 500
+
+@app.route('/api/compliance/<int:framework_id>/controls', methods=['GET'])
+def get_controls(framework_id):
+    logger.info(f"Processing get controls request for framework_id: {framework_id}")
+    try:
+        if not db.session.get(ComplianceFramework, framework_id):
+            return jsonify({'error': 'Compliance framework not found'}), 404
+
+        try:
+            page, per_page = get_pagination_args()
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+
+        query = Control.query.filter(Control.framework_id == framework_id)
+        if 'family' in request.args:
+            query = query.filter(Control.family == request.args['family'])
+        if 'status' in request.args:
+            query = query.filter(Control.status == request.args['status'])
+
+        total = query.count()
+        controls = query.order_by(Control.family, Control.reference).offset(
+            (page - 1) * per_page
+        ).limit(per_page).all()
+
+        return jsonify({
+            'items': [control.to_dict() for control in controls],
+            'page': page,
+            'per_page': per_page,
+            'total': total
+        })
+    except Exception as e:
+        logger.error(f"Error retrieving controls: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving controls'}), 500
+
+@app.route('/api/compliance/<int:framework_id>/controls', methods=['POST'])
+@admin_required()
+def create_framework_controls(framework_id):
+    logger.info(f"Processing create controls request for framework_id: {framework_id}")
+    try:
+        framework = db.session.get(ComplianceFramework, framework_id)
+        if not framework:
+            return jsonify({'error': 'Compliance framework not found'}), 404
+
+        data = request.get_json()
+        # Accept a single control or a list of controls
+        items = data if isinstance(data, list) else [data] if data else []
+        if not items:
+            return jsonify({'error': 'No data provided'}), 400
+
+        try:
+            controls = create_controls(framework_id, items)
+        except ValueError as ve:
+            db.session.rollback()
+            return jsonify({'error': str(ve)}), 400
+        except DuplicateControl as dc:
+            db.session.rollback()
+            return jsonify({'error': str(dc)}), 409
+
+        db.session.commit()
+        db.session.refresh(framework)
+        logger.info(f"Created {len(controls)} controls for framework: {framework.name}")
+
+        return jsonify({
+            'message': 'Controls created successfully',
+            'data': [control.to_dict() for control in controls],
+            'framework': framework.to_dict()
+        }), 201
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error creating controls: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error creating controls'}), 500
+
+@app.route('/api/compliance/<int:framework_id>/controls/status', methods=['PUT'])
+@admin_required()
+def update_control_statuses(framework_id):
+    logger.info(f"Processing bulk control status update for framework_id: {framework_id}")
+    try:
+        framework = db.session.get(ComplianceFramework, framework_id)
+        if not framework:
+            return jsonify({'error': 'Compliance framework not found'}), 404
+
+        data = request.get_json()
+        if not data or not isinstance(data.get('updates'), list) or not data['updates']:
+            return jsonify({'error': 'A list of updates is required'}), 400
+
+        try:
+            changed = bulk_update_status(framework_id, data['updates'], int(get_jwt_identity()))
+        except ValueError as ve:
+            db.session.rollback()
+            return jsonify({'error': str(ve)}), 400
+        except LookupError as le:
+            db.session.rollback()
+            return jsonify({'error': str(le)}), 404
+
+        db.session.commit()
+        db.session.refresh(framework)
+        logger.info(f"Updated {len(changed)} control statuses for framework: {framework.name}")
+
+        return jsonify({
+            'message': 'Control statuses updated successfully',
+            'data': [control.to_dict() for control in changed],
+            'framework': framework.to_dict()
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error updating control statuses: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error updating control statuses'}), 500
+
+@app.route('/api/compliance/<int:framework_id>/controls/<int:control_id>', methods=['DELETE'])
+@admin_required()
+def delete_framework_control(framework_id, control_id):
+    logger.info(f"Processing delete control request for control_id: {control_id}")
+    try:
+        control = Control.query.filter_by(id=control_id, framework_id=framework_id).first()
+        if not control:
+            return jsonify({'error': 'Control not found'}), 404
+
+        delete_control(control)
+        db.session.commit()
+        logger.info(f"Control deleted successfully: {control.reference}")
+
+        return jsonify({
+            'message': 'Control deleted successfully'
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error deleting control: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error deleting control'}), 500
+
+@app.route('/api/compliance/<int:framework_id>/controls/<int:control_id>/assessments', methods=['GET'])
+def get_control_assessments(framework_id, control_id):
+    try:
+        control = Control.query.filter_by(id=control_id, framework_id=framework_id).first()
+        if not control:
+            return jsonify({'error': 'Control not found'}), 404
+
+        assessments = control.assessments.order_by(ControlAssessment.assessed_at.desc()).limit(100).all()
+        return jsonify([assessment.to_dict() for assessment in assessments])
+    except Exception as e:
+        logger.error(f"Error retrieving control assessments: {str(e)}")
+        return jsonify({'error': 'Error retrieving control assessments'}), 500
+
+# Relationship Routes
+def risk_with_links(risk):
+    data = risk.to_dict()
+    data['projects'] = [project.to_summary() for project in risk.projects]
+    data['frameworks'] = [framework.to_summary() for framework in risk.frameworks]
+    return data
+
+def load_links_by_id(model, ids):
+    """Fetch the linked rows for a set of ids in one query, rejecting unknown ids"""
+    ids = {int(i) for i in ids}
+    rows = model.query.filter(model.id.in_(ids)).all() if ids else []
+    if len(rows) != len(ids):
+        missing = sorted(ids - {row.id for row in rows})
+        raise LookupError(f'{model.__name__} not found: {", ".join(map(str, missing))}')
+    return rows
+
+@app.route('/api/risks/links', methods=['GET'])
+def get_risks_with_links():
+    logger.info("Processing get risks with links request")
+    try:
+        try:
+            page, per_page = get_pagination_args(default_per_page=100, max_per_page=100)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+
+        # One query for the page plus one IN query per relationship; the page
+        # size bounds each IN list, so the query count is fixed per request
+        query = Risk.query.options(
+            selectinload(Risk.projects),
+            selectinload(Risk.frameworks)
+        ).order_by(Risk.score.desc().nulls_last(), Risk.updated_at.desc(), Risk.id)
+        total = Risk.query.count()
+        risks = query.offset((page - 1) * per_page).limit(per_page).all()
+
+        return jsonify({
+            'items': [risk_with_links(risk) for risk in risks],
+            'page': page,
+            'per_page': per_page,
+            'total': total
+        })
+    except Exception as e:
+        logger.error(f"Error retrieving risks with links: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving risks with links'}), 500
+
+@app.route('/api/risks/<int:risk_id>/links', methods=['GET'])
+def get_risk_links(risk_id):
+    try:
+        risk = Risk.query.options(
+            selectinload(Risk.projects),
+            selectinload(Risk.frameworks)
+        ).filter_by(id=risk_id).first()
+        if not risk:
+            return jsonify({'error': 'Risk not found'}), 404
+        return jsonify(risk_with_links(risk))
+    except Exception as e:
+        logger.error(f"Error retrieving risk links: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving risk links'}), 500
+
+@app.route('/api/risks/<int:risk_id>/links', methods=['PUT'])
+@admin_required()
+def update_risk_links(risk_id):
+    logger.info(f"Processing update risk links request for risk_id: {risk_id}")
+    try:
+        risk = Risk.query.options(
+            selectinload(Risk.projects),
+            selectinload(Risk.frameworks)
+        ).filter_by(id=risk_id).first()
+        if not risk:
+            return jsonify({'error': 'Risk not found'}), 404
+
+        data = request.get_json()
+        if not data or not any(key in data for key in ('project_ids', 'framework_ids')):
+            return jsonify({'error': 'project_ids or framework_ids is required'}), 400
+
+        # Each list replaces the current links of that kind
+        try:
+            if 'project_ids' in data:
+                risk.projects = load_links_by_id(Project, data['project_ids'])
+            if 'framework_ids' in data:
+                risk.frameworks = load_links_by_id(ComplianceFramework, data['framework_ids'])
+        except (TypeError, ValueError):
+            db.session.rollback()
+            return jsonify({'error': 'Link ids must be a list of integers'}), 400
+        except LookupError as le:
+            db.session.rollback()
+            return jsonify({'error': str(le)}), 404
+
+        db.session.commit()
+        logger.info(f"Risk links updated successfully: {risk.title}")
+
+        return jsonify({
+            'message': 'Risk links updated successfully',
+            'data': risk_with_links(risk)
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error updating risk links: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error updating risk links'}), 500
+
+@app.route('/api/projects/<int:project_id>/risks', methods=['GET'])
+def get_project_risks(project_id):
+    try:
+        if not db.session.get(Project, project_id):
+            return jsonify({'error': 'Project not found'}), 404
+
+        risks = Risk.query.join(risk_project, risk_project.c.risk_id == Risk.id).filter(
+            risk_project.c.project_id == project_id
+        ).order_by(Risk.score.desc().nulls_last(), Risk.id).all()
+        return jsonify([risk.to_summary() for risk in risks])
+    except Exception as e:
+        logger.error(f"Error retrieving project risks: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving project risks'}), 500
+
+@app.route('/api/compliance/<int:framework_id>/risks', methods=['GET'])
+def get_framework_risks(framework_id):
+    try:
+        if not db.session.get(ComplianceFramework, framework_id):
+            return jsonify({'error': 'Compliance framework not found'}), 404
+
+        risks = Risk.query.join(risk_framework, risk_framework.c.risk_id == Risk.id).filter(
+            risk_framework.c.framework_id == framework_id
+        ).order_by(Risk.score.desc().nulls_last(), Risk.id).all()
+        return jsonify([risk.to_summary() for risk in risks])
+    except Exception as e:
+        logger.error(f"Error retrieving framework risks: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving framework risks'}), 500
+
+# Background Job Routes
+@app.route('/api/jobs', methods=['GET'])
+@admin_required()
+def get_jobs():
+    try:
+        jobs_state = ScheduledJob.query.order_by(ScheduledJob.name).all()
+        return jsonify([job.to_dict() for job in jobs_state])
+    except Exception as e:
+        logger.error(f"Error retrieving jobs: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving jobs'}), 500
+
+@app.route('/api/jobs/<string:name>/run', methods=['POST'])
+@admin_required()
+def run_job(name):
+    logger.info(f"Processing run job request for job: {name}")
+    try:
+        if name not in JOBS:
+            return jsonify({'error': 'Job not found'}), 404
+
+        scheduler.sync_jobs()
+        result = scheduler.run_now(name)
+        if result is None:
+            return jsonify({'error': 'Job is already running on another worker'}), 409
+
+        return jsonify({
+            'message': f'Job {name} finished with status {result["status"]}',
+            'data': result
+        }), 200 if result['status'] == 'success' else 500
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error running job: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error running job'}), 500
+
+# Alert Routes
+@app.route('/api/alerts', methods=['GET'])
+@admin_required()
+def get_alerts():
+    try:
+        try:
+            page, per_page = get_pagination_args(default_per_page=50, max_per_page=200)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+
+        query = SentAlert.query
+        if 'rule' in request.args:
+            query = query.filter(SentAlert.rule == request.args['rule'])
+        alerts = query.order_by(SentAlert.sent_at.desc(), SentAlert.id.desc()).offset(
+            (page - 1) * per_page
+        ).limit(per_page).all()
+
+        return jsonify({
+            'items': [alert.to_dict() for alert in alerts],
+            'page': page,
+            'per_page': per_page
+        })
+    except Exception as e:
+        logger.error(f"Error retrieving alerts: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving alerts'}), 500
+
+# Scanner Findings Routes
+@app.route('/api/findings/import', methods=['POST'])
+@admin_required()
+def import_findings():
+    logger.info("Processing findings import request")
+    try:
+        scanner = request.args.get('scanner', '')
+        fmt = request.args.get('format', 'jsonl')
+        if not scanner.strip():
+            return jsonify({'error': 'Scanner name is required'}), 400
+        if fmt not in FINDINGS_FORMATS:
+            return jsonify({'error': f'Format must be one of: {", ".join(FINDINGS_FORMATS)}'}), 400
+
+        # Read the request body as it arrives rather than buffering the export
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        stats = ingest_findings(
+            stream, scanner, fmt,
+            chunk_size=app.config['FINDINGS_CHUNK_SIZE'],
+            workers=app.config['FINDINGS_WORKERS']
+        )
+        return jsonify({
+            'message': 'Findings imported successfully',
+            'data': stats
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error importing findings: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error importing findings'}), 500
+
+# Archive Routes
+@app.route('/api/archive/<string:kind>', methods=['GET'])
+@admin_required()
+def get_archived(kind):
+    logger.info(f"Processing get archived {kind} request")
+    try:
+        try:
+            page, per_page = get_pagination_args()
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
 
-        total_score = sum(f.current_score for f in frameworks)
-        average_score = total_score / total_frameworks
-        frameworks_meeting_target = sum(1 for f in frameworks if f.current_score >= f.target_score)
-        frameworks_below_target = total_frameworks - frameworks_meeting_target
-
-        # Calculate overall compliance status
-        if average_score >= 90:
-            status = 'Excellent'
-        elif average_score >= 75:
-            status = 'Good'
-        elif average_score >= 60:
-            status = 'Fair'
+        try:
+            query = archived_query(kind)
+        except LookupError:
+            return jsonify({'error': 'Archive must be one of: risks, projects'}), 404
+
+        total = query.count()
+        items = query.offset((page - 1) * per_page).limit(per_page).all()
+        return jsonify({
+            'items': [item.to_dict() for item in items],
+            'page': page,
+            'per_page': per_page,
+            'total': total
+        })
+    except Exception as e:
+        logger.error(f"Error retrieving archived {kind}: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': f'Error retrieving archived {kind}'}), 500
+
+# Batch Routes
+@app.route('/api/batch', methods=['POST'])
+@admin_required()
+def run_batch():
+    logger.info("Processing batch mutation request")
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            result = apply_batch(data.get('operations'))
+        except BatchError as be:
+            return jsonify({'error': str(be), 'index': be.index}), be.status
+
+        logger.info(f"Batch applied successfully: {len(result['results'])} operations")
+        return jsonify({
+            'message': 'Batch applied successfully',
+            'data': result
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error applying batch: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error applying batch'}), 500
+
+# Debug Routes
+@app.route('/api/debug/profile', methods=['GET'])
+@admin_required()
+def get_debug_profile():
+    logger.info("Processing debug profile request")
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval_ms = float(request.args.get('interval_ms', app.config['PROFILE_SAMPLE_INTERVAL_MS']))
+        if not 0 < seconds <= app.config['PROFILE_MAX_SECONDS']:
+            return jsonify({'error': f"Seconds must be between 0 and {app.config['PROFILE_MAX_SECONDS']}"}), 400
+        if interval_ms < 1:
+            return jsonify({'error': 'Interval must be at least 1 ms'}), 400
+
+        result = sample_stacks(seconds, interval_ms / 1000, all_threads=request.args.get('threads') == 'all')
+        if request.args.get('format') == 'collapsed':
+            return Response(result['collapsed'] + '\n', mimetype='text/plain')
+        return jsonify({
+            'message': 'Profile collected successfully',
+            'data': result
+        })
+    except ValueError:
+        return jsonify({'error': 'Seconds and interval_ms must be numbers'}), 400
+    except ProfilerBusy as pb:
+        return jsonify({'error': str(pb)}), 409
+    except Exception as e:
+        logger.error(f"Error collecting profile: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error collecting profile'}), 500
+
+@app.route('/api/debug/profile/requests', methods=['GET'])
+@admin_required()
+def get_request_profiles():
+    logger.info("Processing get request profiles request")
+    try:
+        return jsonify(request_profiler.list())
+    except Exception as e:
+        logger.error(f"Error retrieving request profiles: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving request profiles'}), 500
+
+@app.route('/api/debug/profile/requests/<string:profile_id>', methods=['GET'])
+@admin_required()
+def get_request_profile(profile_id):
+    logger.info(f"Processing get request profile request for {profile_id}")
+    try:
+        result = request_profiler.get(profile_id)
+        if request.args.get('format') == 'text':
+            return Response(result['report'], mimetype='text/plain')
+        return jsonify(result)
+    except LookupError:
+        return jsonify({'error': 'Profile not found'}), 404
+    except Exception as e:
+        logger.error(f"Error retrieving request profile: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving request profile'}), 500
+
+# Admission Routes
+@app.route('/api/admission', methods=['GET'])
+@admin_required()
+def get_admission_metrics():
+    logger.info("Processing get admission metrics request")
+    try:
+        return jsonify(admission.metrics())
+    except Exception as e:
+        logger.error(f"Error retrieving admission metrics: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving admission metrics'}), 500
+
+# Outbox Routes
+@app.route('/api/outbox', methods=['GET'])
+@admin_required()
+def get_outbox_status():
+    logger.info("Processing get outbox status request")
+    try:
+        return jsonify(outbox_status(build_targets(app.config)))
+    except Exception as e:
+        logger.error(f"Error retrieving outbox status: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving outbox status'}), 500
+
+# Audit Routes
+@app.route('/api/audit', methods=['GET'])
+@admin_required()
+def get_audit_log():
+    logger.info("Processing get audit log request")
+    try:
+        try:
+            page, per_page = get_pagination_args(default_per_page=50, max_per_page=200)
+            start = parse_datetime_arg(request.args['start'], 'start') if 'start' in request.args else None
+            end = parse_datetime_arg(request.args['end'], 'end') if 'end' in request.args else None
+            entity_id = int(request.args['entity_id']) if 'entity_id' in request.args else None
+            actor_id = int(request.args['actor_id']) if 'actor_id' in request.args else None
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+
+        entity_type = request.args.get('entity_type')
+        if entity_type and entity_type not in AUDITED_MODELS.values():
+            return jsonify({'error': f'Entity type must be one of: {", ".join(AUDITED_MODELS.values())}'}), 400
+        if entity_id is not None and not entity_type:
+            return jsonify({'error': 'entity_id requires entity_type'}), 400
+
+        # Filters follow ix_audit_log_entity (entity_type, entity_id, created_at)
+        query = AuditLog.query
+        if entity_type:
+            query = query.filter(AuditLog.entity_type == entity_type)
+        if entity_id is not None:
+            query = query.filter(AuditLog.entity_id == entity_id)
+        if actor_id is not None:
+            query = query.filter(AuditLog.actor_id == actor_id)
+        if start:
+            query = query.filter(AuditLog.created_at >= start)
+        if end:
+            query = query.filter(AuditLog.created_at < end)
+
+        entries = query.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).offset(
+            (page - 1) * per_page
+        ).limit(per_page).all()
+
+        return jsonify({
+            'items': [entry.to_dict() for entry in entries],
+            'page': page,
+            'per_page': per_page
+        })
+    except Exception as e:
+        logger.error(f"Error retrieving audit log: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving audit log'}), 500
+
+# Search Routes
+@app.route('/api/search', methods=['GET'])
+def search_entities():
+    logger.info("Processing search request")
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'Query parameter q is required'}), 400
+
+        requested_type = request.args.get('type', 'all')
+        if requested_type == 'all':
+            types = list(SEARCH_TARGETS.keys())
+        elif requested_type in SEARCH_TARGETS:
+            types = [requested_type]
         else:
-            status = 'Needs Improvement'
+            return jsonify({'error': f'Type must be one of: all, {", ".join(SEARCH_TARGETS.keys())}'}), 400
+
+        try:
+            limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        except ValueError:
+            return jsonify({'error': 'Invalid limit value'}), 400
 
+        results = search(db, query, types=types, limit=limit)
+        logger.debug(f"Search for '{query}' returned {len(results)} results")
         return jsonify({
-            'average_score': round(average_score, 2),
-            'frameworks_meeting_target': frameworks_meeting_target,
-            'frameworks_below_target': frameworks_below_target,
-            'overall_compliance_status': status,
-            'upcoming_assessments': sum(1 for f in frameworks if f.next_assessment_date <= datetime.utcnow() + timedelta(days=30))
+            'query': query,
+            'results': results
         })
+    except Exception as e:
+        logger.error(f"Error running search: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error running search'}), 500
+
+# Report Routes
+def report_payload(job):
+    payload = job.to_dict()
+    if job.status == 'done':
+        payload['download_url'] = f"/api/reports/{job.id}/download"
+    return payload
+
+@app.route('/api/reports', methods=['POST'])
+@admin_required()
+def create_report():
+    logger.info("Processing create report request")
+    try:
+        data = request.get_json(silent=True) or {}
+        fmt = data.get('format', 'pdf')
+        if fmt not in REPORT_FORMATS:
+            return jsonify({'error': f'Format must be one of: {", ".join(REPORT_FORMATS)}'}), 400
+        try:
+            month = parse_month(str(data['month'])) if data.get('month') else default_month()
+        except ValueError:
+            return jsonify({'error': 'Invalid month. Use YYYY-MM'}), 400
+
+        try:
+            job = report_service.create(month, fmt, user_id=int(get_jwt_identity()))
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
 
+        if job.status == 'done':
+            return jsonify({'message': 'Report is ready', 'data': report_payload(job)}), 200
+        return jsonify({'message': 'Report queued', 'data': report_payload(job)}), 202
     except Exception as e:
-        logger.error(f"Error retrieving compliance statistics: {str(e)}")
+        db.session.rollback()
+        logger.error(f"Error creating report: {str(e)}")
         logger.error(traceback.format_exc())
-        return jsonify({'error': 'Error retrieving compliance statistics'}), 500
+        return jsonify({'error': 'Error creating report'}), 500
+
+@app.route('/api/reports', methods=['GET'])
+@admin_required()
+def get_reports():
+    try:
+        try:
+            page, per_page = get_pagination_args(default_per_page=50, max_per_page=200)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+
+        jobs = ReportJob.query.order_by(ReportJob.created_at.desc(), ReportJob.id).offset(
+            (page - 1) * per_page
+        ).limit(per_page).all()
+        return jsonify({
+            'items': [report_payload(job) for job in jobs],
+            'page': page,
+            'per_page': per_page
+        })
+    except Exception as e:
+        logger.error(f"Error retrieving reports: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving reports'}), 500
+
+@app.route('/api/reports/<string:report_id>', methods=['GET'])
+@admin_required()
+def get_report(report_id):
+    try:
+        job = db.session.get(ReportJob, report_id)
+        if job is None:
+            return jsonify({'error': 'Report not found'}), 404
+        return jsonify(report_payload(job))
+    except Exception as e:
+        logger.error(f"Error retrieving report: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error retrieving report'}), 500
+
+@app.route('/api/reports/<string:report_id>/download', methods=['GET'])
+@admin_required()
+def download_report(report_id):
+    logger.info(f"Processing download report {report_id} request")
+    try:
+        job = db.session.get(ReportJob, report_id)
+        if job is None:
+            return jsonify({'error': 'Report not found'}), 404
+        if job.status != 'done':
+            return jsonify({'error': f'Report is {job.status}'}), 409
+
+        path = report_service.path(job)
+        if not os.path.exists(path):
+            return jsonify({'error': 'Report has expired, request it again'}), 410
+        # conditional=True answers Range and If-Range with 206 partial content;
+        # the artifact is named after its data, so the data version is a strong ETag
+        return send_file(
+            path,
+            mimetype=REPORT_FORMATS[job.format],
+            as_attachment=True,
+            download_name=f"cybether-report-{job.month.strftime('%Y-%m')}.{job.format}",
+            conditional=True,
+            etag=f"{job.data_version}-{job.format}",
+            max_age=0
+        )
+    except Exception as e:
+        logger.error(f"Error downloading report: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error downloading report'}), 500
 
 # Utility function for date validation
 def validate_date_format(date_string):
@@ -794,7 +1789,7 @@ def internal_error(error):
 @app.route('/api/maturity-trend', methods=['GET'])
 def get_maturity_trend():
     try:
-        points = MaturityTrendPoint.query.order_by(MaturityTrendPoint.month).all()
+        points = db.session.execute(trend_statement()).scalars().all()
         return jsonify([point.to_dict() for point in points])
     except Exception as e:
         logger.error(f"Error retrieving maturity trend: {str(e)}")
@@ -805,21 +1800,17 @@ def get_maturity_trend():
 def add_maturity_trend_point():
     try:
         data = request.get_json()
-        if not data or 'month' not in data or 'score' not in data:
+        if not data:
             return jsonify({'error': 'Month and score are required'}), 400
 
-        # Check if point already exists for this month
-        existing_point = MaturityTrendPoint.query.filter_by(month=data['month']).first()
-        if existing_point:
-            existing_point.score = float(data['score'])
-            db.session.commit()
-        else:
-            new_point = MaturityTrendPoint(
-                month=data['month'],
-                score=float(data['score'])
-            )
-            db.session.add(new_point)
-            db.session.commit()
+        try:
+            month, score = parse_trend_point(data)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+
+        # Manual points override the rollup for their month
+        upsert_trend_points([{'month': month, 'score': score}], SOURCE_MANUAL)
+        db.session.commit()
 
         return jsonify({'message': 'Maturity trend point added successfully'})
     except Exception as e:
@@ -827,10 +1818,31 @@ def add_maturity_trend_point():
         logger.error(f"Error adding maturity trend point: {str(e)}")
         return jsonify({'error': 'Error adding maturity trend point'}), 500
 
+@app.route('/api/maturity-trend/rollup', methods=['POST'])
+@admin_required()
+def rollup_maturity_trend_points():
+    logger.info("Processing maturity trend rollup request")
+    try:
+        result = rollup_maturity_trend()
+        return jsonify({
+            'message': 'Maturity trend rolled up successfully',
+            'data': result
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error rolling up maturity trend: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Error rolling up maturity trend'}), 500
+
 @app.route('/api/maturity-trend/<string:month>', methods=['DELETE'])
 @admin_required()
 def delete_maturity_trend_point(month):
     try:
+        try:
+            month = parse_month(month)
+        except ValueError:
+            return jsonify({'error': 'Invalid month. Use YYYY-MM'}), 400
+
         point = MaturityTrendPoint.query.filter_by(month=month).first()
         if not point:
             return jsonify({'error': 'Point not found'}), 404
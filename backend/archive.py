@@ -0,0 +1,129 @@
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select
+
+from models.models import db, Risk, Project, ArchivedRisk, ArchivedProject, risk_project, risk_framework
+from tenancy import bound_tenant
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH_SIZE = 1000
+
+# Rows in a final status whose updated_at is older than the cutoff move to
+# the archive table. Link tables are captured as id lists on the archived
+# row, since the live association rows go with the hot row.
+ARCHIVE_TIERS = {
+    'risks': {
+        'model': Risk,
+        'archive': ArchivedRisk,
+        'status': 'Closed',
+        'links': {
+            'project_ids': (risk_project, 'risk_id', 'project_id'),
+            'framework_ids': (risk_framework, 'risk_id', 'framework_id'),
+        },
+    },
+    'projects': {
+        'model': Project,
+        'archive': ArchivedProject,
+        'status': 'Completed',
+        'links': {
+            'risk_ids': (risk_project, 'project_id', 'risk_id'),
+        },
+    },
+}
+
+
+def _links_by_id(table, key, value, ids):
+    links = {}
+    for owner_id, linked_id in db.session.execute(
+        select(table.c[key], table.c[value]).where(table.c[key].in_(ids))
+    ):
+        links.setdefault(owner_id, []).append(linked_id)
+    return links
+
+
+def archive_tier(name, cutoff, now=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move one tier's eligible rows of the bound tenant into its archive table, a batch per transaction.
+
+    Each batch copies the rows and then deletes them from the hot table in
+    the same transaction, so a row is always in exactly one of the two.
+    """
+    now = now or datetime.utcnow()
+    spec = ARCHIVE_TIERS[name]
+    table = spec['model'].__table__
+    moved = 0
+    while True:
+        rows = db.session.execute(
+            select(table)
+            .where(table.c.tenant_id == bound_tenant(), table.c.status == spec['status'],
+                   table.c.updated_at < cutoff)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).mappings().all()
+        if not rows:
+            break
+
+        ids = [row['id'] for row in rows]
+        links = {field: _links_by_id(link_table, key, value, ids)
+                 for field, (link_table, key, value) in spec['links'].items()}
+        db.session.execute(insert(spec['archive'].__table__), [
+            dict(row, archived_at=now, **{field: links[field].get(row['id'], []) for field in links})
+            for row in rows
+        ])
+        for link_table, key, _ in spec['links'].values():
+            db.session.execute(delete(link_table).where(link_table.c[key].in_(ids)))
+        db.session.execute(delete(table).where(table.c.id.in_(ids)))
+        db.session.commit()
+
+        moved += len(ids)
+        if len(rows) < batch_size:
+            break
+
+    if moved:
+        logger.info(f"Archived {moved} {name}")
+    return moved
+
+
+def archive_rows(after_days, now=None, batch_size=ARCHIVE_BATCH_SIZE):
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=after_days)
+    return {name: archive_tier(name, cutoff, now, batch_size) for name in ARCHIVE_TIERS}
+
+
+def restore_rows(name, *criteria):
+    """Move the bound tenant's archived rows matching criteria back into the hot table; returns their ids.
+
+    Links are restored to the rows that are still live. Runs in the
+    caller's transaction.
+    """
+    spec = ARCHIVE_TIERS[name]
+    table, archive = spec['model'].__table__, spec['archive'].__table__
+    rows = db.session.execute(
+        select(archive).where(archive.c.tenant_id == bound_tenant(), *criteria)
+    ).mappings().all()
+    if not rows:
+        return []
+
+    ids = [row['id'] for row in rows]
+    db.session.execute(insert(table), [{column: row[column] for column in table.c.keys()} for row in rows])
+    for field, (link_table, key, value) in spec['links'].items():
+        linked_table = next(iter(link_table.c[value].foreign_keys)).column.table
+        linked_ids = {linked_id for row in rows for linked_id in row[field]}
+        live = set(db.session.execute(
+            select(linked_table.c.id).where(linked_table.c.id.in_(linked_ids))
+        ).scalars()) if linked_ids else set()
+        links = [{key: row['id'], value: linked_id} for row in rows for linked_id in row[field] if linked_id in live]
+        if links:
+            db.session.execute(insert(link_table), links)
+    # After the insert: the versioning trigger tells a restore by the archived copy
+    db.session.execute(delete(archive).where(archive.c.id.in_(ids)))
+    logger.info(f"Restored {len(ids)} archived {name}")
+    return ids
+
+
+def archived_query(name):
+    if name not in ARCHIVE_TIERS:
+        raise LookupError(name)
+    model = ARCHIVE_TIERS[name]['archive']
+    return model.query.order_by(model.archived_at.desc(), model.id.desc())
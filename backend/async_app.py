@@ -0,0 +1,265 @@
+"""Async read path for the dashboard's polling endpoints.
+
+A small ASGI app serving the read-only GET routes (threat level, maturity
+rating, risks, projects, compliance, maturity trend) on an async
+SQLAlchemy engine, so a poller waiting on the database holds a coroutine
+rather than a worker thread. Responses match the Flask routes, which stay
+the source of truth for every write. Run it next to the Flask app:
+
+    uvicorn async_app:app --host 0.0.0.0 --port 5002
+
+GET /api/dashboard returns all six payloads at once, with the queries
+issued concurrently through asyncio.gather. Reads are scoped to the tenant
+in the access token, as on the Flask side. GET /api/health checks the
+database like the Flask route of the same name.
+"""
+import asyncio
+import json
+import logging
+import traceback
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+import jwt
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import http_date
+
+from config import Config
+from models.models import CurrentMetric
+from queries import (risks_statement, projects_statement, trend_statement, saved_view_statement,
+                     compliance_statement, latest_metric_statement, metric_from_row, metric_payload)
+from temporal import parse_as_of
+from tenancy import TENANT_CLAIM, bound_tenant, init_tenancy, tenant_scope
+
+logger = logging.getLogger(__name__)
+
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-headers', b'Content-Type,Authorization'),
+    (b'access-control-allow-methods', b'GET,OPTIONS'),
+    (b'access-control-max-age', b'3600'),
+]
+
+
+def async_database_url(url):
+    """Swap the sync driver in a database URL for its asyncio counterpart"""
+    scheme, sep, rest = url.partition('://')
+    backend = scheme.split('+')[0]
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}")
+    return f"{ASYNC_DRIVERS[backend]}://{rest}"
+
+
+engine = create_async_engine(
+    async_database_url(Config.SQLALCHEMY_DATABASE_URI),
+    pool_size=Config.ASYNC_POOL_SIZE,
+    max_overflow=Config.ASYNC_POOL_OVERFLOW,
+    pool_pre_ping=True
+)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+init_tenancy()
+
+
+class HTTPError(Exception):
+    def __init__(self, status, payload):
+        super().__init__(payload.get('error'))
+        self.status = status
+        self.payload = payload
+
+
+def _json_default(value):
+    # Same wire format as Flask's jsonify for the types these payloads hold
+    if hasattr(value, 'timetuple'):
+        return http_date(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(payload):
+    return json.dumps(payload, default=_json_default, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def _bearer(headers):
+    auth = headers.get(b'authorization', b'').decode('latin-1')
+    return auth[len('Bearer '):] if auth.startswith('Bearer ') else None
+
+
+def _claims(headers):
+    """Claims of a Bearer access token; mirrors the Flask JWT error responses"""
+    token = _bearer(headers)
+    if token is None:
+        raise HTTPError(401, {'error': 'Authorization token is missing', 'code': 'authorization_required'})
+    try:
+        claims = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        raise HTTPError(401, {'error': 'Token has expired', 'code': 'token_expired'})
+    except jwt.InvalidTokenError:
+        raise HTTPError(422, {'error': 'Invalid token', 'code': 'invalid_token'})
+    if claims.get('type') != 'access':
+        raise HTTPError(422, {'error': 'Invalid token', 'code': 'invalid_token'})
+    return claims
+
+
+def _user_id(headers):
+    return int(_claims(headers)['sub'])
+
+
+def _tenant_id(headers):
+    """Tenant of the access token, or ANONYMOUS_TENANT_ID for requests without one"""
+    if _bearer(headers) is None and Config.ANONYMOUS_TENANT_ID is not None:
+        return Config.ANONYMOUS_TENANT_ID
+    claims = _claims(headers)
+    if TENANT_CLAIM not in claims:
+        # Issued before tenants existed; the client refreshes and gets one with the claim
+        raise HTTPError(401, {'error': 'Token has expired', 'code': 'token_expired'})
+    return claims[TENANT_CLAIM]
+
+
+# Each reader uses its own session, and so its own pooled connection, so
+# readers can run concurrently under asyncio.gather.
+async def _all(stmt):
+    async with Session() as session:
+        return (await session.execute(stmt)).scalars().all()
+
+
+async def _current_metric(metric):
+    async with Session() as session:
+        current = await session.get(CurrentMetric, {'tenant_id': bound_tenant(), 'metric': metric})
+        if current is None:
+            # Read-only: the sync path seeds CurrentMetric on its first read
+            row = (await session.execute(latest_metric_statement(metric))).scalars().first()
+            current = metric_from_row(metric, row) if row is not None else None
+        return metric_payload(metric, current)
+
+
+async def read_threat_level(args, headers):
+    return await _current_metric('threat_level')
+
+
+async def read_maturity_rating(args, headers):
+    return await _current_metric('maturity_rating')
+
+
+def _as_of(args):
+    try:
+        return parse_as_of(args)
+    except ValueError as ve:
+        raise HTTPError(400, {'error': str(ve)})
+
+
+async def read_risks(args, headers):
+    return [risk.to_dict() for risk in await _all(risks_statement(_as_of(args)))]
+
+
+async def read_projects(args, headers):
+    return [project.to_dict() for project in await _all(projects_statement(_as_of(args)))]
+
+
+async def read_compliance(args, headers):
+    saved_names = None
+    if args.get('view') == 'saved':
+        saved_names = await _all(saved_view_statement(_user_id(headers)))
+    try:
+        stmt = compliance_statement(args, saved_names)
+    except ValueError as ve:
+        raise HTTPError(400, {'error': str(ve)})
+    return [framework.to_dict() for framework in await _all(stmt)]
+
+
+async def read_maturity_trend(args, headers):
+    return [point.to_dict() for point in await _all(trend_statement())]
+
+
+async def read_dashboard(args, headers):
+    names = ('threat_level', 'maturity_rating', 'risks', 'projects', 'compliance', 'maturity_trend')
+    results = await asyncio.gather(
+        read_threat_level(args, headers),
+        read_maturity_rating(args, headers),
+        read_risks(args, headers),
+        read_projects(args, headers),
+        read_compliance(args, headers),
+        read_maturity_trend(args, headers),
+    )
+    return dict(zip(names, results))
+
+
+ROUTES = {
+    '/api/threat-level': (read_threat_level, 'threat level'),
+    '/api/maturity-rating': (read_maturity_rating, 'maturity rating'),
+    '/api/risks': (read_risks, 'risks'),
+    '/api/projects': (read_projects, 'projects'),
+    '/api/compliance': (read_compliance, 'compliance frameworks'),
+    '/api/maturity-trend': (read_maturity_trend, 'maturity trend'),
+    '/api/dashboard': (read_dashboard, 'dashboard'),
+}
+
+
+async def _respond(send, status, body=b'', content_type=b'application/json'):
+    headers = CORS_HEADERS + [(b'content-type', content_type), (b'content-length', str(len(body)).encode())]
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _health(send):
+    # Needs no tenant; used by the container healthcheck
+    try:
+        async with Session() as session:
+            await session.execute(text('SELECT 1'))
+        return await _respond(send, 200, _dumps({
+            'status': 'healthy',
+            'database': 'connected',
+            'timestamp': datetime.utcnow().isoformat()
+        }))
+    except Exception as e:
+        logger.error(f"Health check failed: {str(e)}")
+        return await _respond(send, 500, _dumps({
+            'status': 'unhealthy',
+            'error': str(e),
+            'timestamp': datetime.utcnow().isoformat()
+        }))
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    if scope['method'] == 'OPTIONS':
+        return await _respond(send, 200, content_type=b'text/plain')
+    if scope['path'] == '/api/health' and scope['method'] == 'GET':
+        return await _health(send)
+    route = ROUTES.get(scope['path'].rstrip('/') or '/')
+    if route is None:
+        return await _respond(send, 404, _dumps({'error': 'Not found'}))
+    if scope['method'] != 'GET':
+        return await _respond(send, 405, _dumps({'error': 'Method not allowed'}))
+
+    reader, label = route
+    args = MultiDict(parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True))
+    headers = dict(scope['headers'])
+    try:
+        # Tasks started by the reader (asyncio.gather) inherit the binding
+        with tenant_scope(_tenant_id(headers)):
+            payload = await reader(args, headers)
+    except HTTPError as he:
+        return await _respond(send, he.status, _dumps(he.payload))
+    except Exception as e:
+        logger.error(f"Error retrieving {label}: {str(e)}")
+        logger.error(traceback.format_exc())
+        return await _respond(send, 500, _dumps({'error': f'Error retrieving {label}'}))
+    await _respond(send, 200, _dumps(payload))
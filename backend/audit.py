@@ -0,0 +1,220 @@
+import logging
+import queue
+import threading
+import time
+from datetime import date, datetime
+
+from flask import has_request_context
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event, inspect, insert
+
+from models.models import (db, AuditLog, ThreatLevel, MaturityRating, MaturityTrendPoint, Risk, Project,
+                           ComplianceFramework, Control, User)
+
+logger = logging.getLogger(__name__)
+
+# Models whose ORM writes are audited, keyed to the entity_type recorded
+AUDITED_MODELS = {
+    ThreatLevel: 'threat_level',
+    MaturityRating: 'maturity_rating',
+    MaturityTrendPoint: 'maturity_trend_point',
+    Risk: 'risk',
+    Project: 'project',
+    ComplianceFramework: 'compliance_framework',
+    Control: 'control',
+    User: 'user',
+}
+
+# Bookkeeping columns that would only add noise to every diff
+IGNORED_FIELDS = {'created_at', 'updated_at', 'password_hash', 'tenant_id'}
+
+_PENDING_KEY = 'audit_pending'
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def column_values(obj):
+    mapper = inspect(obj).mapper
+    return {
+        attr.key: _json_value(getattr(obj, attr.key))
+        for attr in mapper.column_attrs if attr.key not in IGNORED_FIELDS
+    }
+
+
+def row_values(row):
+    """column_values for a row written with a Core statement, from its RETURNING mapping"""
+    return {key: _json_value(value) for key, value in row.items() if key not in IGNORED_FIELDS}
+
+
+def record_audit(entity_type, action, changes_by_id):
+    """Audit rows for Core writes, which the ORM audit hook does not see.
+
+    Written in the caller's transaction for the bound tenant, like users.py does.
+    """
+    if not changes_by_id:
+        return
+    now = datetime.utcnow()
+    db.session.execute(insert(AuditLog.__table__), [
+        {'entity_type': entity_type, 'entity_id': entity_id, 'action': action, 'actor_id': _current_actor(),
+         'changes': changes, 'created_at': now}
+        for entity_id, changes in changes_by_id.items()
+    ])
+
+
+def _changed_values(obj):
+    state = inspect(obj)
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        if attr.key in IGNORED_FIELDS:
+            continue
+        history = state.attrs[attr.key].history
+        if not history.has_changes():
+            continue
+        before = history.deleted[0] if history.deleted else None
+        after = history.added[0] if history.added else None
+        if before != after:
+            changes[attr.key] = [_json_value(before), _json_value(after)]
+    return changes
+
+
+def _current_actor():
+    if not has_request_context():
+        return None
+    try:
+        identity = get_jwt_identity()
+    except Exception:
+        return None
+    return int(identity) if identity is not None else None
+
+
+def _after_flush(session, flush_context):
+    """Capture diffs while attribute history is still available"""
+    records = []
+    actor = _current_actor()
+    now = datetime.utcnow()
+    for action, objects in (('create', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for obj in objects:
+            entity_type = AUDITED_MODELS.get(type(obj))
+            if entity_type is None:
+                continue
+            if action == 'create':
+                changes = {key: [None, value] for key, value in column_values(obj).items()}
+            elif action == 'delete':
+                changes = {key: [value, None] for key, value in column_values(obj).items()}
+            else:
+                changes = _changed_values(obj)
+                if not changes:
+                    continue
+            records.append({
+                # Taken from the row: the writer thread has no tenant bound
+                'tenant_id': obj.tenant_id,
+                'entity_type': entity_type,
+                'entity_id': getattr(obj, 'id', None),
+                'action': action,
+                'actor_id': actor,
+                'changes': changes,
+                'created_at': now
+            })
+    if records:
+        session.info.setdefault(_PENDING_KEY, []).extend(records)
+
+
+class AuditWriter:
+    """Write-behind queue for audit records.
+
+    Request threads only enqueue; a background thread inserts in batches.
+    When the queue is full the caller writes its own record synchronously,
+    so a full queue slows requests down rather than losing records. stop() drains
+    the queue before the process exits.
+    """
+
+    def __init__(self, app, maxsize=10000, batch_size=200, flush_interval=1.0):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name='cybether-audit-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=30):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        # Anything enqueued after the writer exited
+        self.flush()
+
+    def enqueue(self, records):
+        for i, record in enumerate(records):
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                logger.warning("Audit queue full, writing synchronously")
+                self._write(records[i:])
+                return
+
+    def flush(self):
+        """Write everything currently queued; used on shutdown and in tests"""
+        while True:
+            batch = self._take(block=False)
+            if not batch:
+                return
+            self._write(batch)
+
+    def _take(self, block=True):
+        batch = []
+        try:
+            batch.append(self.queue.get(timeout=self.flush_interval) if block else self.queue.get_nowait())
+            while len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _loop(self):
+        while not self._stop.is_set():
+            batch = self._take()
+            if batch:
+                self._write(batch)
+        self.flush()
+
+    def _write(self, batch, attempts=3):
+        for attempt in range(1, attempts + 1):
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as connection:
+                        connection.execute(insert(AuditLog), batch)
+                return
+            except Exception as e:
+                logger.error(f"Audit batch write failed (attempt {attempt}): {str(e)}")
+                time.sleep(0.1 * attempt)
+        # Leave a trace in the logs rather than losing the records silently
+        logger.error(f"Dropping {len(batch)} audit records: {batch}")
+
+
+def init_audit(writer):
+    """Hook session events so committed ORM writes are handed to the writer"""
+
+    @event.listens_for(db.session, 'after_flush')
+    def after_flush(session, flush_context):
+        _after_flush(session, flush_context)
+
+    @event.listens_for(db.session, 'after_commit')
+    def after_commit(session):
+        records = session.info.pop(_PENDING_KEY, None)
+        if records:
+            writer.enqueue(records)
+
+    @event.listens_for(db.session, 'after_soft_rollback')
+    def after_rollback(session, previous_transaction):
+        session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,290 @@
+import hashlib
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.exc import DataError, IntegrityError
+
+from scoring import get_scoring_config, score_risk
+from trend import SOURCE_MANUAL, parse_month, upsert_trend_points
+from models.models import db, Risk, Project, ComplianceFramework, MaturityTrendPoint
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_OPERATIONS = 100
+
+RISK_SEVERITIES = ['Low', 'Medium', 'High', 'Critical']
+RISK_STATUSES = ['Open', 'In Progress', 'Closed']
+PROJECT_STATUSES = ['Not Started', 'In Progress', 'Completed', 'On Hold']
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        raise ValueError('Invalid date format. Use YYYY-MM-DD')
+
+
+def _parse_percentage(data, field, label):
+    try:
+        value = float(data[field])
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid {field} value')
+    if not 0 <= value <= 100:
+        raise ValueError(f'{label} must be between 0 and 100')
+    return value
+
+
+def _require(data, fields, message):
+    if not all(field in data for field in fields):
+        raise ValueError(message)
+
+
+def parse_risk_scale_fields(data):
+    """Validate the optional 1-5 scoring inputs on a risk payload"""
+    fields = {}
+    for field in ('likelihood', 'impact', 'asset_criticality'):
+        if field in data and data[field] is not None:
+            try:
+                value = int(data[field])
+            except (TypeError, ValueError):
+                raise ValueError(f'Invalid {field} value')
+            if not 1 <= value <= 5:
+                raise ValueError(f'{field.replace("_", " ").capitalize()} must be between 1 and 5')
+            fields[field] = value
+        elif field in data and field != 'asset_criticality':
+            # Explicit null falls back to the severity default
+            fields[field] = None
+    return fields
+
+
+# Validation and field updates shared by the single-item routes in app.py
+# and batch operations; all raise ValueError with the message to return.
+
+def apply_risk(risk, data):
+    if 'severity' in data and data['severity'] not in RISK_SEVERITIES:
+        raise ValueError('Invalid severity level')
+    if 'status' in data and data['status'] not in RISK_STATUSES:
+        raise ValueError('Invalid status')
+    scale_fields = parse_risk_scale_fields(data)
+    for field in ('title', 'description', 'severity', 'status'):
+        if field in data:
+            setattr(risk, field, data[field])
+    for field, value in scale_fields.items():
+        setattr(risk, field, value)
+    risk.updated_at = datetime.utcnow()
+    risk.score = score_risk(risk, get_scoring_config())
+
+
+def build_risk(data):
+    _require(data, ['title', 'severity', 'status'], 'Title, severity, and status are required')
+    risk = Risk(description='', asset_criticality=3, created_at=datetime.utcnow())
+    apply_risk(risk, data)
+    db.session.add(risk)
+    return risk
+
+
+def apply_project(project, data):
+    if 'status' in data and data['status'] not in PROJECT_STATUSES:
+        raise ValueError(f'Status must be one of: {", ".join(PROJECT_STATUSES)}')
+    if 'completion_percentage' in data:
+        project.completion_percentage = _parse_percentage(
+            data, 'completion_percentage', 'Completion percentage')
+    for field in ('name', 'description', 'status'):
+        if field in data:
+            setattr(project, field, data[field])
+    for field in ('start_date', 'due_date'):
+        if field in data:
+            setattr(project, field, _parse_date(data[field]))
+    project.updated_at = datetime.utcnow()
+
+
+def build_project(data):
+    _require(data, ['name', 'status', 'completion_percentage'],
+             'Name, status, and completion percentage are required')
+    project = Project(description='', start_date=datetime.utcnow(), created_at=datetime.utcnow())
+    apply_project(project, data)
+    db.session.add(project)
+    return project
+
+
+def apply_framework(framework, data):
+    if 'current_score' in data:
+        if framework.control_count:
+            raise ValueError('Current score is calculated from controls for this framework')
+        framework.current_score = _parse_percentage(data, 'current_score', 'Current score')
+    if 'target_score' in data:
+        framework.target_score = _parse_percentage(data, 'target_score', 'Target score')
+    if 'name' in data:
+        framework.name = data['name']
+    if 'last_assessment_date' in data:
+        framework.last_assessment_date = _parse_date(data['last_assessment_date'])
+        framework.next_assessment_date = framework.last_assessment_date + timedelta(days=90)
+    framework.updated_at = datetime.utcnow()
+
+
+def build_framework(data):
+    _require(data, ['name', 'current_score', 'target_score', 'last_assessment_date'],
+             'Name, current score, target score, and last assessment date are required')
+    framework = ComplianceFramework(created_at=datetime.utcnow())
+    apply_framework(framework, data)
+    db.session.add(framework)
+    return framework
+
+
+def parse_trend_point(data):
+    """(month, score) of a manual trend point payload"""
+    _require(data, ['month', 'score'], 'Month and score are required')
+    try:
+        return parse_month(data['month']), float(data['score'])
+    except (TypeError, ValueError):
+        raise ValueError('Invalid month or score. Use YYYY-MM for month')
+
+
+def _upsert_trend_point(data):
+    month, score = parse_trend_point(data)
+    # The same ON CONFLICT upsert as the single-point route: a manual point replaces the rollup
+    upsert_trend_points([{'month': month, 'score': score}], SOURCE_MANUAL)
+    return MaturityTrendPoint.query.filter_by(month=month).populate_existing().one()
+
+
+def _get_trend_point(key):
+    try:
+        month = parse_month(str(key))
+    except ValueError:
+        raise ValueError('Invalid month. Use YYYY-MM')
+    return MaturityTrendPoint.query.filter_by(month=month).first()
+
+
+# Collections the admin console edits. 'version' lists the aggregates hashed
+# into a collection version: count and max id catch inserts and deletes,
+# the timestamp catches edits and the score sum catches the bulk rescoring
+# paths that deliberately leave updated_at alone.
+COLLECTIONS = {
+    'risks': {
+        'label': 'Risk',
+        'get': lambda key: db.session.get(Risk, key),
+        'create': build_risk,
+        'update': apply_risk,
+        'version': (func.count(Risk.id), func.max(Risk.id), func.max(Risk.updated_at),
+                    func.sum(Risk.score)),
+    },
+    'projects': {
+        'label': 'Project',
+        'get': lambda key: db.session.get(Project, key),
+        'create': build_project,
+        'update': apply_project,
+        'version': (func.count(Project.id), func.max(Project.id), func.max(Project.updated_at),
+                    func.sum(Project.completion_percentage)),
+    },
+    'compliance': {
+        'label': 'Compliance framework',
+        'get': lambda key: db.session.get(ComplianceFramework, key),
+        'create': build_framework,
+        'update': apply_framework,
+        'version': (func.count(ComplianceFramework.id), func.max(ComplianceFramework.id),
+                    func.max(ComplianceFramework.updated_at), func.sum(ComplianceFramework.current_score)),
+    },
+    'maturity_trend': {
+        'label': 'Trend point',
+        'get': _get_trend_point,
+        'create': _upsert_trend_point,
+        'update': lambda point, data: _upsert_trend_point(dict(data, month=point.month.strftime('%Y-%m'))),
+        'version': (func.count(MaturityTrendPoint.id), func.max(MaturityTrendPoint.id),
+                    func.max(MaturityTrendPoint.created_at), func.sum(MaturityTrendPoint.score)),
+    },
+}
+
+
+class BatchError(Exception):
+    """A batch operation failed; index points at the offending operation"""
+
+    def __init__(self, index, message, status=400):
+        super().__init__(message)
+        self.index = index
+        self.status = status
+
+
+def collection_version(name):
+    row = db.session.query(*COLLECTIONS[name]['version']).one()
+    return hashlib.sha1(repr(tuple(row)).encode('utf-8')).hexdigest()[:16]
+
+
+def _apply_operation(operation):
+    if not isinstance(operation, dict):
+        raise ValueError('Each operation must be an object')
+    op = operation.get('op')
+    name = operation.get('collection')
+    if name not in COLLECTIONS:
+        raise ValueError(f'Collection must be one of: {", ".join(COLLECTIONS)}')
+    if op not in ('create', 'update', 'delete'):
+        raise ValueError('Op must be one of: create, update, delete')
+    spec = COLLECTIONS[name]
+    data = operation.get('data') or {}
+    if not isinstance(data, dict):
+        raise ValueError('Data must be an object')
+
+    if op == 'create':
+        return name, op, spec['create'](data)
+
+    if operation.get('id') is None:
+        raise ValueError(f'Id is required for {op}')
+    item = spec['get'](operation['id'])
+    if item is None:
+        raise LookupError(f"{spec['label']} not found")
+    if op == 'delete':
+        db.session.delete(item)
+        return name, op, item
+    spec['update'](item, data)
+    return name, op, item
+
+
+def apply_batch(operations):
+    """Apply create/update/delete operations across collections atomically.
+
+    Every operation runs in the request's transaction and the batch is
+    committed once; the first failure rolls back all of it. Returns the
+    changed rows in operation order plus the new version of each touched
+    collection.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise BatchError(None, 'Operations must be a non-empty list')
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise BatchError(None, f'At most {MAX_BATCH_OPERATIONS} operations are allowed per batch')
+
+    applied = []
+    for index, operation in enumerate(operations):
+        try:
+            applied.append(_apply_operation(operation))
+            # Flush per operation so ids exist and constraint errors name the right op
+            db.session.flush()
+        except ValueError as ve:
+            db.session.rollback()
+            raise BatchError(index, str(ve))
+        except LookupError as le:
+            db.session.rollback()
+            raise BatchError(index, str(le), status=404)
+        except IntegrityError as ie:
+            db.session.rollback()
+            logger.info(f"Batch operation {index} violated a constraint: {ie.orig}")
+            raise BatchError(index, 'Operation conflicts with existing data', status=409)
+        except DataError as de:
+            db.session.rollback()
+            logger.info(f"Batch operation {index} has a value the database rejected: {de.orig}")
+            raise BatchError(index, 'Operation has a value out of range or of the wrong type')
+
+    # Serialise deleted rows' ids before commit expires them
+    results = [
+        {'collection': name, 'op': op, 'id': item.id, 'item': None if op == 'delete' else item}
+        for name, op, item in applied
+    ]
+    db.session.commit()
+
+    for result in results:
+        if result['item'] is not None:
+            result['item'] = result['item'].to_dict()
+    touched = dict.fromkeys(result['collection'] for result in results)
+    return {
+        'results': results,
+        'versions': {name: collection_version(name) for name in touched}
+    }
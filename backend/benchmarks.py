@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+"""Latency benchmarks for the backend.
+
+Runs against DATABASE_URL when it is set, otherwise against a throwaway
+SQLite database so the numbers can be reproduced on a laptop:
+
+    python benchmarks.py search --rows 30000
+    python benchmarks.py findings --rows 100000
+    python benchmarks.py readpath --pollers 1000
+    python benchmarks.py overload --pollers 300
+    python benchmarks.py snapshot --readers 4
+    python benchmarks.py asof --rows 5000 --rounds 50
+    python benchmarks.py tenants --rows 2000 --tenants 10
+
+The readpath and overload benchmarks start the Flask app (and, for
+readpath, async_app.py) as real servers; compare them on Postgres, since
+SQLite serialises the database side of both.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+
+import logging
+logging.disable(logging.CRITICAL)
+
+import bcrypt
+
+from app import app
+from findings import ingest_findings
+from models.models import db, Risk, RiskVersion, Project, User, DEFAULT_TENANT_ID
+from queries import risks_statement
+from scoring import rescore_risks, risk_heatmap
+from search import search
+from snapshot import SnapshotStore, build_store
+from stats import compute_project_stats
+from tenancy import bind_tenant, create_tenant, tenant_scope
+
+WORDS = [
+    'patch', 'firewall', 'phishing', 'ransomware', 'vendor', 'cloud', 'backup',
+    'endpoint', 'encryption', 'identity', 'privilege', 'logging', 'segmentation',
+    'vulnerability', 'exposure', 'password', 'mfa', 'audit', 'incident', 'network',
+]
+
+
+def print_result(name, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+    print(f"{name:<28} n={len(timings):<5} "
+          f"median={statistics.median(timings) * 1000:8.2f}ms "
+          f"p95={p95 * 1000:8.2f}ms max={timings[-1] * 1000:8.2f}ms")
+
+
+def sentence(rng, length):
+    return ' '.join(rng.choice(WORDS) for _ in range(length))
+
+
+def seed_search_data(rows, rng):
+    """Bulk insert risks and projects with random vocabulary"""
+    risks = [
+        {'title': sentence(rng, 4), 'description': sentence(rng, 30),
+         'severity': rng.choice(['Low', 'Medium', 'High', 'Critical']), 'status': 'Open'}
+        for _ in range(rows)
+    ]
+    projects = [
+        {'name': sentence(rng, 3), 'description': sentence(rng, 30),
+         'status': 'In Progress', 'completion_percentage': 0}
+        for _ in range(max(rows // 10, 1))
+    ]
+    db.session.execute(Risk.__table__.insert(), risks)
+    db.session.execute(Project.__table__.insert(), projects)
+    db.session.commit()
+
+
+def bench_search(args):
+    rng = random.Random(args.seed)
+    with app.app_context():
+        start = time.perf_counter()
+        seed_search_data(args.rows, rng)
+        print(f"Seeded {args.rows} risks in {time.perf_counter() - start:.2f}s "
+              f"({db.engine.dialect.name})")
+
+        queries = {
+            'single term': lambda: rng.choice(WORDS),
+            'prefix term': lambda: rng.choice(WORDS)[:3],
+            'two terms': lambda: f"{rng.choice(WORDS)} {rng.choice(WORDS)}",
+        }
+        for name, make_query in queries.items():
+            timings = []
+            for _ in range(args.iterations):
+                query = make_query()
+                start = time.perf_counter()
+                search(db, query, limit=20)
+                timings.append(time.perf_counter() - start)
+            print_result(name, timings)
+
+        # Single row writes pay for incremental index maintenance
+        timings = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            db.session.add(Risk(title=sentence(rng, 4), description=sentence(rng, 30),
+                                severity='Low', status='Open'))
+            db.session.commit()
+            timings.append(time.perf_counter() - start)
+        print_result('indexed insert', timings)
+
+
+def bench_scoring(args):
+    rng = random.Random(args.seed)
+    with app.app_context():
+        risks = [
+            {'title': sentence(rng, 4), 'severity': rng.choice(['Low', 'Medium', 'High', 'Critical']),
+             'status': rng.choice(['Open', 'In Progress', 'Closed']),
+             'likelihood': rng.randint(1, 5), 'impact': rng.randint(1, 5),
+             'asset_criticality': rng.randint(1, 5),
+             'updated_at': datetime.utcnow() - timedelta(days=rng.randint(0, 1000))}
+            for _ in range(args.rows)
+        ]
+        db.session.execute(Risk.__table__.insert(), risks)
+        db.session.commit()
+        print(f"Seeded {args.rows} scored risks ({db.engine.dialect.name})")
+
+        timings = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            rescore_risks()
+            timings.append(time.perf_counter() - start)
+        print_result('full rescore', timings)
+
+        timings = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            risk_heatmap()
+            timings.append(time.perf_counter() - start)
+        print_result('heatmap', timings)
+
+
+def write_findings(path, rows, rng, drop=0.0):
+    """Write a synthetic JSON Lines scanner export, leaving out a share of findings"""
+    severities = ['Low', 'Medium', 'High', 'Critical', 'Info']
+    with open(path, 'w', encoding='utf-8') as handle:
+        for i in range(rows):
+            if drop and rng.random() < drop:
+                continue
+            handle.write(json.dumps({
+                'plugin_id': i % 5000, 'plugin_name': sentence(rng, 4), 'host': f"10.0.{i // 5000}.{i % 250}",
+                'port': 443, 'severity': severities[i % len(severities)], 'synopsis': sentence(rng, 20)
+            }) + '\n')
+
+
+def bench_findings(args):
+    rng = random.Random(args.seed)
+    path = os.path.join(tempfile.mkdtemp(), 'findings.jsonl')
+    with app.app_context():
+        write_findings(path, args.rows, rng)
+        for run in ('first run', 'repeat run'):
+            with open(path, encoding='utf-8') as stream:
+                stats = ingest_findings(stream, 'benchmark', workers=args.workers)
+            print(f"{run:<28} {stats}")
+
+        # A later scan missing some findings closes them
+        write_findings(path, args.rows, rng, drop=0.05)
+        with open(path, encoding='utf-8') as stream:
+            stats = ingest_findings(stream, 'benchmark', workers=args.workers)
+        print(f"{'run with 5% fixed':<28} {stats}")
+        print(f"Risk rows: {Risk.query.count()} ({db.engine.dialect.name})")
+
+
+POLL_PATHS = ['/api/threat-level', '/api/maturity-rating', '/api/risks', '/api/projects',
+              '/api/compliance', '/api/maturity-trend']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+async def poll(port, rounds, timings, errors, timeout=60):
+    """One dashboard client fetching every poll path per round.
+
+    Reuses its connection while the server keeps it alive; the Flask
+    development server closes after each response, so it reconnects.
+    Backs off for Retry-After when a request is shed, as the dashboard does.
+    """
+    reader = writer = None
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for path in POLL_PATHS:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+                writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+                await writer.drain()
+                status = int((await asyncio.wait_for(reader.readline(), timeout)).split()[1])
+                length, keep_alive, retry_after = 0, True, 0
+                while (line := await asyncio.wait_for(reader.readline(), timeout)) not in (b'\r\n', b''):
+                    name, _, value = line.decode('latin-1').partition(':')
+                    if name.lower() == 'content-length':
+                        length = int(value)
+                    elif name.lower() == 'connection' and value.strip().lower() == 'close':
+                        keep_alive = False
+                    elif name.lower() == 'retry-after':
+                        retry_after = int(value)
+                await asyncio.wait_for(reader.readexactly(length), timeout)
+                if status != 200:
+                    errors.append(status)
+                if not keep_alive:
+                    writer.close()
+                    writer = None
+                if status == 503:
+                    await asyncio.sleep(retry_after)
+            timings.append(time.perf_counter() - start)
+    except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError, IndexError):
+        errors.append('connection')
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def run_pollers(port, pollers, rounds):
+    timings, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(poll(port, rounds, timings, errors) for _ in range(pollers)))
+    return timings, errors, time.perf_counter() - start
+
+
+def flask_server_command(port, db_latency=0.0):
+    """Run the Flask app; db_latency adds a sleep to every query to stand in for a slow database"""
+    slow_database = (
+        f"import time; from sqlalchemy import event; from models.models import db; "
+        f"app.app_context().push(); "
+        f"event.listen(db.engine, 'before_cursor_execute', lambda *args: time.sleep({db_latency})); "
+    ) if db_latency else ''
+    return [
+        sys.executable, '-c',
+        f"import logging; from app import app; logging.disable(logging.CRITICAL); {slow_database}"
+        f"app.run(port={port}, threaded=True)"
+    ]
+
+
+async def http_request(port, method, path, headers=None, body=None, timeout=60):
+    """One request on a fresh connection; returns (status, headers, body)"""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    try:
+        payload = json.dumps(body).encode() if body is not None else b''
+        lines = [f"{method} {path} HTTP/1.1", "Host: localhost", "Connection: close",
+                 "Content-Type: application/json", f"Content-Length: {len(payload)}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + payload)
+        await writer.drain()
+        status = int((await asyncio.wait_for(reader.readline(), timeout)).split()[1])
+        response_headers = {}
+        while (line := await asyncio.wait_for(reader.readline(), timeout)) not in (b'\r\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+        data = await asyncio.wait_for(reader.readexactly(int(response_headers.get('content-length', 0))), timeout)
+        return status, response_headers, data
+    finally:
+        writer.close()
+
+
+async def admin_traffic(port, writes, delay, login_timings, write_timings, statuses):
+    """Log in and post threat level updates one after another, as an admin would"""
+    await asyncio.sleep(delay)
+    token = None
+    for i in range(writes):
+        if token is None or i % 10 == 0:
+            start = time.perf_counter()
+            status, _, data = await http_request(port, 'POST', '/api/login',
+                                                 body={'username': 'bench', 'password': 'bench'})
+            login_timings.append(time.perf_counter() - start)
+            statuses.append(status)
+            if status == 200:
+                token = json.loads(data)['token']
+            continue
+        start = time.perf_counter()
+        status, _, _ = await http_request(port, 'POST', '/api/threat-level',
+                                          headers={'Authorization': f"Bearer {token}"},
+                                          body={'level': 'High', 'description': f'benchmark {i}'})
+        write_timings.append(time.perf_counter() - start)
+        statuses.append(status)
+
+
+def bench_overload(args):
+    rng = random.Random(args.seed)
+    with app.app_context():
+        seed_search_data(args.rows, rng)
+        db.session.add(User(username='bench', is_admin=True, password_hash=bcrypt.hashpw(
+            b'bench', bcrypt.gensalt(rounds=4)).decode('utf-8')))
+        db.session.commit()
+
+    async def run(port, pollers):
+        login_timings, write_timings, statuses = [], [], []
+        (timings, errors, elapsed), _ = await asyncio.gather(
+            run_pollers(port, pollers, args.rounds),
+            admin_traffic(port, args.writes, 1.0, login_timings, write_timings, statuses)
+        )
+        return timings, errors, elapsed, login_timings, write_timings, statuses
+
+    # Admin traffic on an idle server first, for reference
+    for admission, pollers in (('true', 0), ('false', args.pollers), ('true', args.pollers)):
+        env = dict(os.environ, LOG_LEVEL='WARNING', ADMISSION_ENABLED=admission)
+        port = free_port()
+        server = subprocess.Popen(flask_server_command(port, args.db_latency / 1000), env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(port)
+            timings, errors, elapsed, login_timings, write_timings, statuses = asyncio.run(run(port, pollers))
+        finally:
+            server.terminate()
+            server.wait()
+        shed = sum(1 for error in errors if error == 503)
+        print(f"admission={admission:<5} pollers={pollers:<5} "
+              f"{len(timings) * len(POLL_PATHS) / elapsed:8.1f} read req/s shed={shed} "
+              f"other errors={len(errors) - shed} admin non-2xx={sum(1 for s in statuses if s >= 300)}")
+        if timings:
+            print_result('  dashboard poll', timings)
+        if login_timings:
+            print_result('  login', login_timings)
+        if write_timings:
+            print_result('  threat level write', write_timings)
+
+
+def bench_readpath(args):
+    rng = random.Random(args.seed)
+    with app.app_context():
+        seed_search_data(args.rows, rng)
+    env = dict(os.environ, LOG_LEVEL='WARNING')
+    servers = {
+        'sync (flask threaded)': flask_server_command,
+        'async (uvicorn)': lambda port: [
+            sys.executable, '-m', 'uvicorn', 'async_app:app', '--port', str(port), '--log-level', 'warning',
+            '--backlog', str(max(args.pollers, 2048))
+        ],
+    }
+    for name, command in servers.items():
+        port = free_port()
+        server = subprocess.Popen(command(port), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(port)
+            timings, errors, elapsed = asyncio.run(run_pollers(port, args.pollers, args.rounds))
+        finally:
+            server.terminate()
+            server.wait()
+        requests_made = len(timings) * len(POLL_PATHS)
+        print(f"{name:<28} pollers={args.pollers} {requests_made / elapsed:8.1f} req/s errors={len(errors)}")
+        if timings:
+            print_result(f"  dashboard poll ({len(POLL_PATHS)} GETs)", timings)
+
+
+def snapshot_reader(directory, max_age, seconds, key):
+    """One worker process reading the shared snapshot as fast as it can"""
+    store = SnapshotStore(directory, max_age)
+    reads = fallbacks = errors = last = 0
+    versions = set()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        snapshot = store.get(key)
+        if snapshot is None:
+            fallbacks += 1
+            time.sleep(0.001)
+            continue
+        version, body = snapshot
+        if version < last:
+            errors += 1
+        last = version
+        versions.add(version)
+        # Spot check that every mapped payload is complete
+        if reads % 50 == 0:
+            json.loads(bytes(body))
+        reads += 1
+    return {'reads': reads, 'fallbacks': fallbacks, 'errors': errors, 'versions': len(versions)}
+
+
+def bench_snapshot(args):
+    rng = random.Random(args.seed)
+    with app.app_context():
+        seed_search_data(args.rows, rng)
+        store = build_store(app.config, DEFAULT_TENANT_ID)
+        store.publish(force=True)
+
+        # What each worker would do per poll without the snapshot
+        timings = []
+        for _ in range(20):
+            start = time.perf_counter()
+            risks = db.session.execute(Risk.query.order_by(Risk.score.desc()).statement).scalars().all()
+            app.json.response([risk.to_dict() for risk in risks]).get_data()
+            timings.append(time.perf_counter() - start)
+        print_result(f"live risks ({args.rows} rows)", timings)
+
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(args.readers) as pool:
+            pending = pool.starmap_async(snapshot_reader, [
+                (store.directory, store.max_age, args.seconds, 'risks') for _ in range(args.readers)
+            ])
+            # Writes while the readers run: each marks the snapshot stale and
+            # the publisher thread republishes it
+            writes = 0
+            deadline = time.monotonic() + args.seconds
+            ids = [risk_id for (risk_id,) in db.session.execute(db.select(Risk.id)).all()]
+            while time.monotonic() < deadline:
+                db.session.get(Risk, rng.choice(ids)).title = sentence(rng, 4)
+                db.session.commit()
+                writes += 1
+                time.sleep(args.write_interval)
+            results = pending.get()
+
+    reads = sum(result['reads'] for result in results)
+    print(f"readers={args.readers} writes={writes} snapshot reads={reads} "
+          f"({reads / args.seconds:,.0f}/s total) fallbacks={sum(r['fallbacks'] for r in results)} "
+          f"versions seen={max(r['versions'] for r in results)} "
+          f"out of order={sum(r['errors'] for r in results)}")
+
+
+def bench_asof(args):
+    rng = random.Random(args.seed)
+    with app.app_context():
+        seed_search_data(args.rows, rng)
+        ids = [risk_id for (risk_id,) in db.session.execute(db.select(Risk.id)).all()]
+
+        # Each round changes a tenth of the register; the versions pile up
+        checkpoints = []
+        for _ in range(args.rounds):
+            checkpoints.append(datetime.utcnow())
+            changed = rng.sample(ids, max(len(ids) // 10, 1))
+            db.session.execute(
+                Risk.__table__.update().where(Risk.id.in_(changed)).values(likelihood=rng.randint(1, 5))
+            )
+            db.session.commit()
+        versions = db.session.query(db.func.count(RiskVersion.version_id)).scalar()
+        print(f"{args.rows} risks, {versions} versions after {args.rounds} rounds ({db.engine.dialect.name})")
+
+        points = {'current': None, 'oldest as_of': checkpoints[0],
+                  'middle as_of': checkpoints[len(checkpoints) // 2], 'latest as_of': checkpoints[-1]}
+        for name, as_of in points.items():
+            timings = []
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                rows = db.session.execute(risks_statement(as_of)).scalars().all()
+                timings.append(time.perf_counter() - start)
+                db.session.expunge_all()
+            assert len(rows) == args.rows
+            print_result(name, timings)
+
+
+def bench_tenants(args):
+    """One tenant's reads before and after the other tenants' data lands next to it"""
+    rng = random.Random(args.seed)
+
+    def measure(label):
+        reads = {
+            'risks': lambda: db.session.execute(risks_statement()).scalars().all(),
+            'heatmap': lambda: risk_heatmap(),
+            'project stats': lambda: compute_project_stats(),
+            'search': lambda: search(db, rng.choice(WORDS), limit=20),
+        }
+        for name, read in reads.items():
+            timings = []
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                read()
+                timings.append(time.perf_counter() - start)
+                db.session.expunge_all()
+            print_result(f"{name} ({label})", timings)
+
+    with app.app_context():
+        seed_search_data(args.rows, rng)
+        rescore_risks()
+        measure('alone')
+
+        start = time.perf_counter()
+        for number in range(args.tenants):
+            tenant = create_tenant(f"bench-{number}-{rng.randrange(1 << 30)}", f"Benchmark unit {number}")
+            with tenant_scope(tenant.id):
+                seed_search_data(args.rows, rng)
+                rescore_risks()
+        others = db.session.query(db.func.count(Risk.id)).execution_options(all_tenants=True).scalar()
+        print(f"Seeded {args.tenants} more tenants in {time.perf_counter() - start:.2f}s, "
+              f"{others} risks in total ({db.engine.dialect.name})")
+        measure(f"{args.tenants + 1} tenants")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cybether backend benchmarks')
+    parser.add_argument('--seed', type=int, default=42)
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    search_parser = subparsers.add_parser('search', help='Full-text search latency')
+    search_parser.add_argument('--rows', type=int, default=30000)
+    search_parser.add_argument('--iterations', type=int, default=200)
+    search_parser.set_defaults(func=bench_search)
+
+    scoring_parser = subparsers.add_parser('scoring', help='Full register rescore and heatmap')
+    scoring_parser.add_argument('--rows', type=int, default=100000)
+    scoring_parser.add_argument('--iterations', type=int, default=5)
+    scoring_parser.set_defaults(func=bench_scoring)
+
+    findings_parser = subparsers.add_parser('findings', help='Scanner findings ingestion throughput')
+    findings_parser.add_argument('--rows', type=int, default=100000)
+    findings_parser.add_argument('--workers', type=int, default=2)
+    findings_parser.set_defaults(func=bench_findings)
+
+    readpath_parser = subparsers.add_parser('readpath', help='Concurrent dashboard pollers, sync vs async')
+    readpath_parser.add_argument('--rows', type=int, default=50)
+    readpath_parser.add_argument('--pollers', type=int, default=1000)
+    readpath_parser.add_argument('--rounds', type=int, default=3)
+    readpath_parser.set_defaults(func=bench_readpath)
+
+    overload_parser = subparsers.add_parser('overload', help='Admin writes while pollers saturate the API')
+    overload_parser.add_argument('--rows', type=int, default=50)
+    overload_parser.add_argument('--db-latency', type=float, default=50, help='Added per query, in ms')
+    overload_parser.add_argument('--pollers', type=int, default=300)
+    overload_parser.add_argument('--rounds', type=int, default=3)
+    overload_parser.add_argument('--writes', type=int, default=40)
+    overload_parser.set_defaults(func=bench_overload)
+
+    snapshot_parser = subparsers.add_parser('snapshot', help='Shared snapshot read by several processes during writes')
+    snapshot_parser.add_argument('--rows', type=int, default=500)
+    snapshot_parser.add_argument('--readers', type=int, default=4)
+    snapshot_parser.add_argument('--seconds', type=float, default=10)
+    snapshot_parser.add_argument('--write-interval', type=float, default=0.5)
+    snapshot_parser.set_defaults(func=bench_snapshot)
+
+    asof_parser = subparsers.add_parser('asof', help='Point-in-time risk list as history grows')
+    asof_parser.add_argument('--rows', type=int, default=5000)
+    asof_parser.add_argument('--rounds', type=int, default=50)
+    asof_parser.add_argument('--iterations', type=int, default=10)
+    asof_parser.set_defaults(func=bench_asof)
+
+    tenants_parser = subparsers.add_parser('tenants', help="One tenant's reads as other tenants' data grows")
+    tenants_parser.add_argument('--rows', type=int, default=2000, help='Risks per tenant')
+    tenants_parser.add_argument('--tenants', type=int, default=10, help='Other tenants seeded next to the first')
+    tenants_parser.add_argument('--iterations', type=int, default=50)
+    tenants_parser.set_defaults(func=bench_tenants)
+
+    args = parser.parse_args()
+    # Everything is seeded into and read from the default tenant
+    bind_tenant(DEFAULT_TENANT_ID)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,103 @@
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here')
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'postgresql://cybether:cybether_password@db:5432/grc_dashboard')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Raw threat level / maturity rating rows older than this are compacted into daily rollups
+    HISTORY_RAW_RETENTION_DAYS = int(os.getenv('HISTORY_RAW_RETENTION_DAYS', '90'))
+
+    # Background jobs (stats precomputation, deadline flags, compaction, ...)
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'true').lower() == 'true'
+    SCHEDULER_TICK_SECONDS = int(os.getenv('SCHEDULER_TICK_SECONDS', '5'))
+
+    # Audit log write-behind queue
+    AUDIT_ENABLED = os.getenv('AUDIT_ENABLED', 'true').lower() == 'true'
+    AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', '200'))
+    AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', '1.0'))
+
+    # Change event outbox; comma separated name=url webhook targets. Events are
+    # recorded without targets too and kept for the retention period
+    OUTBOX_TARGETS = os.getenv('OUTBOX_TARGETS', '')
+    OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '100'))
+    OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS', '7'))
+
+    # Connection pool of the async read path (async_app.py), per process
+    ASYNC_POOL_SIZE = int(os.getenv('ASYNC_POOL_SIZE', '20'))
+    ASYNC_POOL_OVERFLOW = int(os.getenv('ASYNC_POOL_OVERFLOW', '10'))
+
+    # Admission control, per process. Requests are classed as auth, write,
+    # health or read (in that priority); each class has its own in-flight
+    # limit and wait queue within ADMISSION_MAX_CONCURRENT, which should not
+    # exceed the database pool. Reads are shed with 503 + Retry-After first.
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', '15'))
+    ADMISSION_LIMITS = os.getenv('ADMISSION_LIMITS', 'auth=4,write=8,health=2,read=10')
+    ADMISSION_QUEUE_LIMITS = os.getenv('ADMISSION_QUEUE_LIMITS', 'auth=50,write=100,health=2,read=20')
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '5'))
+    ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', '2'))
+
+    # Idempotency-Key support on POST/PUT/DELETE. Successful responses are
+    # kept in memory per process; a retry still running after
+    # IDEMPOTENCY_WAIT_SECONDS gets 409 (kept below the 10s client timeout).
+    IDEMPOTENCY_ENABLED = os.getenv('IDEMPOTENCY_ENABLED', 'true').lower() == 'true'
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', '86400'))
+    IDEMPOTENCY_MAX_ENTRIES = int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', '10000'))
+    IDEMPOTENCY_MAX_RESPONSE_BYTES = int(os.getenv('IDEMPOTENCY_MAX_RESPONSE_BYTES', '65536'))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', '8'))
+
+    # Shared dashboard snapshot, memory-mapped by every worker. Defaults to a
+    # directory under /dev/shm named after the database; all workers of one
+    # deployment must see the same directory.
+    SNAPSHOT_ENABLED = os.getenv('SNAPSHOT_ENABLED', 'true').lower() == 'true'
+    SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', '')
+    SNAPSHOT_MAX_AGE = float(os.getenv('SNAPSHOT_MAX_AGE', '60'))
+
+    # Live profiling (admin only). The sampler runs at most one profile per
+    # worker; X-Profile: cprofile profiles single requests within the limits.
+    PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', '60'))
+    PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', '10'))
+    PROFILE_REQUESTS_ENABLED = os.getenv('PROFILE_REQUESTS_ENABLED', 'true').lower() == 'true'
+    PROFILE_REQUESTS_MAX_CONCURRENT = int(os.getenv('PROFILE_REQUESTS_MAX_CONCURRENT', '1'))
+    PROFILE_REQUESTS_MIN_INTERVAL = float(os.getenv('PROFILE_REQUESTS_MIN_INTERVAL', '1.0'))
+    PROFILE_REQUESTS_KEEP = int(os.getenv('PROFILE_REQUESTS_KEEP', '20'))
+
+    # Monthly report packs (reports.py). Rendering runs in spawned worker
+    # processes, which re-import the server's main module: serve with flask
+    # run or gunicorn rather than `python app.py`. Artifacts are deleted
+    # REPORT_RETENTION_DAYS after they were last requested.
+    REPORT_DIR = os.getenv('REPORT_DIR', os.path.join(tempfile.gettempdir(), 'cybether-reports'))
+    REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '2'))
+    REPORT_RETENTION_DAYS = int(os.getenv('REPORT_RETENTION_DAYS', '30'))
+    REPORT_JOB_TIMEOUT = int(os.getenv('REPORT_JOB_TIMEOUT', '900'))
+
+    # Closed risks and Completed projects untouched for this long move to the archive tables
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '180'))
+
+    # Scanner findings ingestion. Worker processes are spawned, which
+    # re-imports the server's main module: raise FINDINGS_WORKERS under
+    # gunicorn, not with `python app.py`. The findings.py CLI always can.
+    FINDINGS_CHUNK_SIZE = int(os.getenv('FINDINGS_CHUNK_SIZE', '1000'))
+    FINDINGS_WORKERS = int(os.getenv('FINDINGS_WORKERS', '1'))
+
+    # Deadline alert delivery: comma separated list of log, webhook, smtp
+    ALERT_SINKS = os.getenv('ALERT_SINKS', 'log')
+    ALERT_WEBHOOK_URL = os.getenv('ALERT_WEBHOOK_URL')
+    ALERT_SMTP_HOST = os.getenv('ALERT_SMTP_HOST', 'localhost')
+    ALERT_SMTP_PORT = int(os.getenv('ALERT_SMTP_PORT', '25'))
+    ALERT_SMTP_USERNAME = os.getenv('ALERT_SMTP_USERNAME')
+    ALERT_SMTP_PASSWORD = os.getenv('ALERT_SMTP_PASSWORD')
+    ALERT_EMAIL_FROM = os.getenv('ALERT_EMAIL_FROM', 'cybether@localhost')
+    ALERT_EMAIL_TO = os.getenv('ALERT_EMAIL_TO', '')
     
+    # Tenant (business unit) whose dashboard is served to requests without a
+    # token, as before tenants existed; empty requires a token for every read
+    ANONYMOUS_TENANT_ID = int(os.getenv('ANONYMOUS_TENANT_ID', '1') or 0) or None
+
     # JWT Configuration
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-jwt-secret-key-here')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
@@ -0,0 +1,254 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import Numeric, case, cast, func, update
+from sqlalchemy.exc import IntegrityError
+
+from audit import record_audit
+from models.models import db, ComplianceFramework, Control, ControlAssessment
+from outbox import record_events
+
+logger = logging.getLogger(__name__)
+
+# Credit each status earns towards the framework score. Not Applicable
+# controls are left out of the denominator entirely.
+CONTROL_STATUS_CREDIT = {
+    'Not Assessed': 0.0,
+    'Not Implemented': 0.0,
+    'Partially Implemented': 0.5,
+    'Implemented': 1.0,
+    'Not Applicable': None,
+}
+
+MAX_BULK_UPDATES = 5000
+
+# Running sums are floats; after many deltas a total that should be zero can
+# be left a rounding error away from it, so anything smaller is stored as 0
+SUM_EPSILON = 1e-9
+
+
+class DuplicateControl(Exception):
+    pass
+
+
+def contribution(weight, status):
+    """Return the (weight, score) a control adds to its framework's running sums"""
+    credit = CONTROL_STATUS_CREDIT[status]
+    if credit is None:
+        return 0.0, 0.0
+    return weight, weight * credit
+
+
+def _settled(total):
+    return case((func.abs(total) < SUM_EPSILON, 0.0), else_=total)
+
+
+def apply_framework_delta(framework_id, count_delta, weight_delta, score_delta):
+    """Adjust a framework's running sums in one UPDATE.
+
+    The increments are evaluated by the database against the stored values,
+    so concurrent control updates cannot lose each other's deltas, and the
+    cost is independent of how many controls the framework has. The new
+    score goes out as an outbox event and an audit row, which the ORM hooks
+    would not write for this Core-style update.
+    """
+    if not (count_delta or weight_delta or score_delta):
+        return
+    new_weight = _settled(ComplianceFramework.control_weight_total + weight_delta)
+    new_score = _settled(ComplianceFramework.control_score_total + score_delta)
+    updated = db.session.execute(
+        update(ComplianceFramework)
+        .where(ComplianceFramework.id == framework_id)
+        .values(
+            control_count=ComplianceFramework.control_count + count_delta,
+            control_weight_total=new_weight,
+            control_score_total=new_score,
+            current_score=case(
+                (new_weight > 0, func.round(cast(100.0 * new_score / new_weight, Numeric), 2)),
+                else_=ComplianceFramework.current_score
+            ),
+            updated_at=datetime.utcnow()
+        )
+        .returning(*ComplianceFramework.__table__.c)
+        .execution_options(synchronize_session=False)
+    ).mappings().all()
+    record_events('compliance_framework', 'update', updated)
+    # Other deltas may land concurrently, so only the new score is known
+    record_audit('compliance_framework', 'update', {row['id']: {'current_score': [None, row['current_score']]}
+                                                    for row in updated})
+
+
+def _validate_status(status):
+    if status not in CONTROL_STATUS_CREDIT:
+        raise ValueError(f'Status must be one of: {", ".join(CONTROL_STATUS_CREDIT)}')
+
+
+def create_controls(framework_id, items):
+    """Add controls to a framework and fold them into its running sums.
+
+    Raises DuplicateControl when a reference is repeated or already used in
+    the framework.
+    """
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError('Every control must be an object')
+        if not all(isinstance(item.get(field), str) and item[field] for field in ('family', 'reference', 'title')):
+            raise ValueError('Family, reference and title are required for every control')
+
+    references = [item['reference'] for item in items]
+    taken = {reference for (reference,) in db.session.query(Control.reference).filter(
+        Control.framework_id == framework_id,
+        Control.reference.in_(references)
+    )}
+    seen = set()
+    for reference in references:
+        if reference in taken or reference in seen:
+            raise DuplicateControl(f'Control reference already exists in this framework: {reference}')
+        seen.add(reference)
+
+    controls = []
+    weight_delta = score_delta = 0.0
+    for item in items:
+        status = item.get('status', 'Not Assessed')
+        _validate_status(status)
+        try:
+            weight = float(item.get('weight', 1.0))
+        except (TypeError, ValueError):
+            raise ValueError('Invalid weight value')
+        if weight <= 0:
+            raise ValueError('Weight must be greater than 0')
+
+        control = Control(
+            framework_id=framework_id,
+            family=item['family'],
+            reference=item['reference'],
+            title=item['title'],
+            description=item.get('description', ''),
+            weight=weight,
+            status=status
+        )
+        controls.append(control)
+        applicable, score = contribution(weight, status)
+        weight_delta += applicable
+        score_delta += score
+
+    db.session.add_all(controls)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # Added concurrently since the check above
+        raise DuplicateControl('Control reference already exists in this framework')
+    apply_framework_delta(framework_id, len(controls), weight_delta, score_delta)
+    return controls
+
+
+def bulk_update_status(framework_id, updates, user_id=None):
+    """Apply status changes to many controls in one transaction.
+
+    Each update is {'id' or 'reference', 'status', optional 'notes'}. Every
+    change writes a ControlAssessment row; the framework score moves by the
+    summed per-control deltas in a single UPDATE.
+    """
+    if len(updates) > MAX_BULK_UPDATES:
+        raise ValueError(f'At most {MAX_BULK_UPDATES} updates per request')
+    for item in updates:
+        if not isinstance(item, dict):
+            raise ValueError('Every update must be an object')
+        item_id = item.get('id', 0)
+        if (not isinstance(item_id, int) or isinstance(item_id, bool)
+                or not isinstance(item.get('reference', ''), str)):
+            raise ValueError('Control ids must be integers and references strings')
+
+    ids = {u['id'] for u in updates if 'id' in u}
+    references = {u['reference'] for u in updates if 'id' not in u and 'reference' in u}
+    if len(ids) + len(references) < len(updates):
+        raise ValueError('Every update needs an id or reference and appears once')
+
+    filters = []
+    if ids:
+        filters.append(Control.id.in_(ids))
+    if references:
+        filters.append(Control.reference.in_(references))
+    found = Control.query.filter(
+        Control.framework_id == framework_id,
+        db.or_(*filters)
+    ).all() if filters else []
+    by_id = {control.id: control for control in found}
+    by_reference = {control.reference: control for control in found}
+
+    changed = []
+    weight_delta = score_delta = 0.0
+    now = datetime.utcnow()
+    for item in updates:
+        control = by_id.get(item['id']) if 'id' in item else by_reference.get(item.get('reference'))
+        if control is None:
+            raise LookupError(f"Control not found: {item.get('id', item.get('reference'))}")
+        status = item.get('status')
+        _validate_status(status)
+
+        old_weight, old_score = contribution(control.weight, control.status)
+        new_weight, new_score = contribution(control.weight, status)
+        weight_delta += new_weight - old_weight
+        score_delta += new_score - old_score
+
+        control.status = status
+        control.updated_at = now
+        db.session.add(ControlAssessment(
+            control_id=control.id,
+            status=status,
+            notes=item.get('notes'),
+            assessed_by=user_id,
+            assessed_at=now
+        ))
+        changed.append(control)
+
+    apply_framework_delta(framework_id, 0, weight_delta, score_delta)
+    return changed
+
+
+def delete_control(control):
+    applicable, score = contribution(control.weight, control.status)
+    apply_framework_delta(control.framework_id, -1, -applicable, -score)
+    db.session.delete(control)
+
+
+def recalculate_framework_score(framework_id):
+    """Rebuild a framework's running sums from scratch.
+
+    Not used on the request path; this is a repair tool for drift after
+    manual database edits.
+    """
+    credit = case(
+        *[(Control.status == status, value) for status, value in CONTROL_STATUS_CREDIT.items()
+          if value is not None],
+        else_=None
+    )
+    count, weight, score = db.session.query(
+        func.count(Control.id),
+        func.coalesce(func.sum(case((credit.is_(None), 0.0), else_=Control.weight)), 0.0),
+        func.coalesce(func.sum(Control.weight * func.coalesce(credit, 0.0)), 0.0)
+    ).filter(Control.framework_id == framework_id).one()
+
+    framework = db.session.get(ComplianceFramework, framework_id)
+    framework.control_count = count
+    framework.control_weight_total = weight
+    framework.control_score_total = score
+    if weight > 0:
+        framework.current_score = round(100.0 * score / weight, 2)
+    return framework
+
+
+def family_summary(framework_id):
+    """Control counts per family and status, aggregated in SQL"""
+    rows = db.session.query(
+        Control.family, Control.status, func.count(Control.id)
+    ).filter(
+        Control.framework_id == framework_id
+    ).group_by(Control.family, Control.status).order_by(Control.family).all()
+
+    families = {}
+    for family, status, count in rows:
+        entry = families.setdefault(family, {'family': family, 'total': 0, 'statuses': {}})
+        entry['statuses'][status] = count
+        entry['total'] += count
+    return list(families.values())
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""Scanner findings ingestion.
+
+Streams a scanner export (JSON Lines or CSV) into the risk register:
+
+    python findings.py nessus nightly.jsonl
+    python findings.py qualys export.csv --format csv --workers 4
+
+Each finding gets a stable fingerprint so re-running the same scan updates
+the existing risks instead of adding duplicates. Findings of that scanner
+that are missing from a run are closed.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import case, select, update
+
+from archive import restore_rows
+from audit import record_audit, row_values
+from outbox import record_events
+from scoring import rescore_risks
+from tenancy import bound_tenant, tenant_by_slug, tenant_scope
+from models.models import db, dialect_insert, ArchivedRisk, Risk
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('jsonl', 'csv')
+
+# Scanner field names that carry the same meaning, in order of preference
+FIELD_ALIASES = {
+    'title': ('title', 'name', 'plugin_name', 'check', 'summary'),
+    'rule': ('rule_id', 'plugin_id', 'check_id', 'qid', 'cve', 'id'),
+    'asset': ('asset', 'host', 'hostname', 'ip', 'target'),
+    'port': ('port',),
+    'description': ('description', 'synopsis', 'details', 'solution'),
+    'severity': ('severity', 'risk', 'risk_factor', 'cvss', 'cvss_score'),
+}
+
+SEVERITY_NAMES = {
+    'critical': 'Critical', 'high': 'High', 'medium': 'Medium', 'moderate': 'Medium', 'low': 'Low',
+}
+# Informational findings are not risks
+IGNORED_SEVERITIES = {'info', 'informational', 'none', 'log'}
+
+
+def _field(finding, name):
+    for key in FIELD_ALIASES[name]:
+        value = finding.get(key)
+        if value not in (None, ''):
+            return str(value).strip()
+    return ''
+
+
+def normalize_severity(value):
+    """Map a scanner severity label or CVSS score to a Risk severity, or None to skip"""
+    label = value.strip().lower()
+    if label in SEVERITY_NAMES:
+        return SEVERITY_NAMES[label]
+    if label in IGNORED_SEVERITIES:
+        return None
+    try:
+        cvss = float(label)
+    except ValueError:
+        raise ValueError(f"Unknown severity: {value}")
+    if cvss >= 9.0:
+        return 'Critical'
+    if cvss >= 7.0:
+        return 'High'
+    if cvss >= 4.0:
+        return 'Medium'
+    return 'Low' if cvss > 0 else None
+
+
+def fingerprint(scanner, rule, asset, port):
+    """Identify a finding across runs: same scanner, check, asset and port"""
+    key = '\x1f'.join(part.strip().lower() for part in (scanner, rule, asset, port))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def normalize_finding(scanner, finding):
+    severity = normalize_severity(_field(finding, 'severity') or 'info')
+    if severity is None:
+        return None
+    title = _field(finding, 'title')
+    rule = _field(finding, 'rule') or title
+    if not rule:
+        raise ValueError('Finding has neither a title nor a rule id')
+    asset = _field(finding, 'asset')
+    port = _field(finding, 'port')
+    label = title or rule
+    if asset:
+        label = f"{label} on {asset}" + (f":{port}" if port else '')
+    return {
+        'fingerprint': fingerprint(scanner, rule, asset, port),
+        'title': label[:200],
+        'description': _field(finding, 'description'),
+        'severity': severity,
+    }
+
+
+def normalize_chunk(scanner, fmt, items):
+    """Parse and normalise one chunk; runs in the worker pool.
+
+    Returns (rows, skipped, read). Rows are de-duplicated by fingerprint since a
+    single upsert statement cannot touch the same row twice.
+    """
+    rows = {}
+    skipped = 0
+    for item in items:
+        try:
+            finding = json.loads(item) if fmt == 'jsonl' else item
+            row = normalize_finding(scanner, finding)
+        except (ValueError, TypeError, AttributeError):
+            skipped += 1
+            continue
+        if row is None:
+            skipped += 1
+        else:
+            rows[row['fingerprint']] = row
+    return list(rows.values()), skipped, len(items)
+
+
+def read_chunks(stream, fmt, chunk_size):
+    """Yield raw findings from a text stream in chunks of chunk_size.
+
+    JSON Lines are passed on unparsed so decoding happens in the workers.
+    """
+    if fmt == 'jsonl':
+        items = (line for line in stream if line.strip())
+    else:
+        items = csv.DictReader(stream)
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _normalized_chunks(chunks, scanner, fmt, workers):
+    if workers <= 1:
+        for chunk in chunks:
+            yield normalize_chunk(scanner, fmt, chunk)
+        return
+
+    # Keep a couple of chunks per worker in flight: enough to keep the pool
+    # busy while the database writes, without reading the whole file ahead.
+    # Spawned rather than forked since the caller may be a threaded server.
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(normalize_chunk, scanner, fmt, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# Moved on every run for every finding seen; not a change worth an event
+SEEN_FIELDS = {'last_seen_at'}
+
+
+def _changes(before, after):
+    before, after = row_values(before), row_values(after)
+    return {key: [before.get(key), value] for key, value in after.items()
+            if key not in SEEN_FIELDS and before.get(key) != value}
+
+
+def upsert_findings(rows, source, now):
+    """Insert new findings and refresh known ones with one statement.
+
+    A finding seen again keeps its title, description and updated_at (which
+    drives score decay) unless its severity changed; one that was
+    auto-closed is reopened, from the archive if it was archived since.
+    Changed severities clear the score so the
+    rescore at the end of the run picks them up. New and changed risks get
+    outbox events and audit rows in the same transaction.
+    """
+    if not rows:
+        return
+    table = Risk.__table__
+    tenant_id = bound_tenant()
+    fingerprints = [row['fingerprint'] for row in rows]
+    # A finding whose risk was archived since it was closed comes back as that risk
+    restore_rows('risks', ArchivedRisk.fingerprint.in_(fingerprints))
+    # The state before the upsert, to tell new, changed and merely seen findings apart
+    known = {row['fingerprint']: row for row in db.session.execute(
+        select(table).where(table.c.tenant_id == tenant_id,
+                            table.c.fingerprint.in_(fingerprints))
+    ).mappings()}
+    values = [dict(row, tenant_id=tenant_id, status='Open', asset_criticality=3, source=source, last_seen_at=now,
+                   auto_closed=False, created_at=now, updated_at=now) for row in rows]
+    # Executed with a list of parameter sets rather than .values(rows): the
+    # statement then compiles once and is served from the compiled cache,
+    # where a multi-row VALUES clause would be recompiled for every chunk
+    stmt = dialect_insert(db.engine.dialect.name)(table)
+    changed = table.c.severity != stmt.excluded.severity
+    reopened = table.c.auto_closed & (table.c.status == 'Closed')
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.tenant_id, table.c.fingerprint],
+        set_={
+            'severity': stmt.excluded.severity,
+            'score': case((changed, None), else_=table.c.score),
+            'status': case((reopened, 'Open'), else_=table.c.status),
+            'updated_at': case((changed | reopened, now), else_=table.c.updated_at),
+            'auto_closed': False,
+            'last_seen_at': stmt.excluded.last_seen_at,
+        }
+    ).returning(*table.c)
+    written = db.session.execute(stmt, values).mappings().all()
+
+    created, updated, changes = [], [], {}
+    for row in written:
+        before = known.get(row['fingerprint'])
+        if before is None:
+            created.append(row)
+        elif changed_values := _changes(before, row):
+            updated.append(row)
+            changes[row['id']] = changed_values
+    record_events('risk', 'create', created)
+    record_events('risk', 'update', updated)
+    record_audit('risk', 'create', {row['id']: {key: [None, value] for key, value in row_values(row).items()}
+                                    for row in created})
+    record_audit('risk', 'update', changes)
+
+
+def close_missing_findings(source, run_started):
+    """Close this scanner's open findings that the run did not report, with their events and audit rows"""
+    closed = db.session.execute(
+        update(Risk)
+        .where(
+            Risk.source == source,
+            Risk.last_seen_at < run_started,
+            Risk.status != 'Closed'
+        )
+        .values(status='Closed', auto_closed=True, updated_at=run_started)
+        .returning(*Risk.__table__.c)
+        .execution_options(synchronize_session=False)
+    ).mappings().all()
+    record_events('risk', 'update', closed)
+    # The statement only closes open findings, so auto_closed was False
+    record_audit('risk', 'update', {row['id']: {'status': [None, 'Closed'], 'auto_closed': [False, True]}
+                                    for row in closed})
+    return len(closed)
+
+
+def ingest_findings(stream, scanner, fmt='jsonl', chunk_size=1000, workers=1, now=None):
+    """Ingest a scanner export from a text stream into the bound tenant's register in a single pass.
+
+    The stream is read chunk by chunk, normalised in a process pool and
+    upserted one chunk per transaction, so memory stays flat however large
+    the export is. Auto-close only runs once the whole stream was read.
+    """
+    scanner = (scanner or '').strip().lower()
+    if not scanner:
+        raise ValueError('Scanner name is required')
+    if fmt not in FORMATS:
+        raise ValueError(f'Format must be one of: {", ".join(FORMATS)}')
+
+    now = now or datetime.utcnow()
+    started = time.perf_counter()
+    read = ingested = skipped = 0
+    for rows, chunk_skipped, chunk_read in _normalized_chunks(read_chunks(stream, fmt, chunk_size), scanner, fmt,
+                                                              workers):
+        upsert_findings(rows, scanner, now)
+        db.session.commit()
+        read += chunk_read
+        ingested += len(rows)
+        skipped += chunk_skipped
+
+    if ingested:
+        closed = close_missing_findings(scanner, now)
+        db.session.commit()
+    else:
+        # An empty export is more likely a failed scan than a clean estate
+        logger.warning(f"No findings ingested for {scanner}, skipping auto-close")
+        closed = 0
+    rescore_risks(only_missing=True)
+
+    seconds = time.perf_counter() - started
+    stats = {
+        'scanner': scanner,
+        'read': read,
+        'ingested': ingested,
+        'skipped': skipped,
+        'closed': closed,
+        'seconds': round(seconds, 3),
+        'findings_per_second': round(read / seconds) if seconds > 0 else read
+    }
+    logger.info(f"Ingested findings: {stats}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest scanner findings into the risk register')
+    parser.add_argument('scanner', help='Scanner name; findings are deduplicated and closed per scanner')
+    parser.add_argument('path', help="Export file, or '-' for stdin")
+    parser.add_argument('--format', choices=FORMATS, default='jsonl')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=max(min(multiprocessing.cpu_count(), 4), 1))
+    parser.add_argument('--tenant', default='default', help='Slug of the tenant whose register is updated')
+    args = parser.parse_args()
+
+    from app import app
+
+    with app.app_context(), tenant_scope(tenant_by_slug(args.tenant)):
+        if args.path == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+            stats = ingest_findings(stream, args.scanner, args.format, args.chunk_size, args.workers)
+        else:
+            with open(args.path, encoding='utf-8', newline='') as stream:
+                stats = ingest_findings(stream, args.scanner, args.format, args.chunk_size, args.workers)
+    print(json.dumps(stats))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,223 @@
+import logging
+from datetime import datetime, timedelta
+
+from models.models import db, dialect_insert, ThreatLevel, MaturityRating, CurrentMetric, MetricRollup
+from tenancy import bound_tenant
+
+logger = logging.getLogger(__name__)
+
+# Threat levels are categorical; history aggregates use their ordinal
+THREAT_LEVEL_ORDER = {'Low': 1, 'Medium': 2, 'High': 3, 'Critical': 4}
+
+METRICS = {
+    'threat_level': {
+        'model': ThreatLevel,
+        'value': lambda row: float(THREAT_LEVEL_ORDER.get(row.level, 0)),
+        'label': lambda row: row.level,
+        'description': lambda row: row.description,
+    },
+    'maturity_rating': {
+        'model': MaturityRating,
+        'value': lambda row: row.score,
+        'label': lambda row: row.trend,
+        'description': lambda row: None,
+    },
+}
+
+BUCKETS = ('raw', 'day', 'week')
+
+COMPACTION_CHUNK_SIZE = 1000
+
+
+def bucket_start(timestamp, bucket):
+    day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def record_current(metric, row):
+    """Upsert the current value for a metric from a newly added history row.
+
+    Runs in the caller's session so the history row and the current value
+    are committed together. ON CONFLICT, so two first writes (or first
+    reads, see get_current) never race on the primary key.
+    """
+    spec = METRICS[metric]
+    values = {
+        'tenant_id': bound_tenant(),
+        'metric': metric,
+        'value': spec['value'](row),
+        'label': spec['label'](row),
+        'description': spec['description'](row),
+        'updated_at': row.updated_at or datetime.utcnow(),
+    }
+    table = CurrentMetric.__table__
+    stmt = dialect_insert(db.engine.dialect.name)(table).values(values)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.tenant_id, table.c.metric],
+        set_={name: stmt.excluded[name] for name in ('value', 'label', 'description', 'updated_at')}
+    ))
+
+
+def get_current(metric):
+    """Return the bound tenant's current value by primary key, falling back to the history table"""
+    current = db.session.get(CurrentMetric, {'tenant_id': bound_tenant(), 'metric': metric})
+    if current is not None:
+        return current
+
+    # Databases created before CurrentMetric existed: seed it from the newest row
+    model = METRICS[metric]['model']
+    latest = model.query.order_by(model.updated_at.desc()).first()
+    if latest is None:
+        return None
+    record_current(metric, latest)
+    db.session.commit()
+    return db.session.get(CurrentMetric, {'tenant_id': bound_tenant(), 'metric': metric}, populate_existing=True)
+
+
+class _Bucket:
+    __slots__ = ('start', 'min', 'max', 'last', 'last_label', 'last_at', 'count')
+
+    def __init__(self, start):
+        self.start = start
+        self.min = None
+        self.max = None
+        self.last = None
+        self.last_label = None
+        self.last_at = None
+        self.count = 0
+
+    def add(self, value, label, at, min_value=None, max_value=None, count=1):
+        low = value if min_value is None else min_value
+        high = value if max_value is None else max_value
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        if self.last_at is None or at >= self.last_at:
+            self.last, self.last_label, self.last_at = value, label, at
+        self.count += count
+
+    def to_dict(self):
+        return {
+            'bucket_start': self.start,
+            'min': self.min,
+            'max': self.max,
+            'last': self.last,
+            'last_label': self.last_label,
+            'last_at': self.last_at,
+            'count': self.count
+        }
+
+
+def get_history(metric, start, end, bucket='day'):
+    """Return history for [start, end), either raw or downsampled per day/week.
+
+    Raw rows only exist inside the retention window; older ranges are served
+    from the daily rollups written by compact_history().
+    """
+    spec = METRICS[metric]
+    model = spec['model']
+    raw_rows = model.query.filter(
+        model.updated_at >= start,
+        model.updated_at < end
+    ).order_by(model.updated_at).yield_per(COMPACTION_CHUNK_SIZE)
+
+    if bucket == 'raw':
+        return [{
+            'timestamp': row.updated_at,
+            'value': spec['value'](row),
+            'label': spec['label'](row),
+            'description': spec['description'](row)
+        } for row in raw_rows]
+
+    buckets = {}
+
+    def bucket_for(timestamp):
+        key = bucket_start(timestamp, bucket)
+        if key not in buckets:
+            buckets[key] = _Bucket(key)
+        return buckets[key]
+
+    rollups = MetricRollup.query.filter(
+        MetricRollup.metric == metric,
+        MetricRollup.bucket_start >= bucket_start(start, 'day'),
+        MetricRollup.bucket_start < end
+    ).order_by(MetricRollup.bucket_start)
+    for rollup in rollups:
+        bucket_for(rollup.bucket_start).add(
+            rollup.last_value, rollup.last_label, rollup.last_at,
+            min_value=rollup.min_value, max_value=rollup.max_value, count=rollup.sample_count
+        )
+
+    for row in raw_rows:
+        bucket_for(row.updated_at).add(spec['value'](row), spec['label'](row), row.updated_at)
+
+    return [buckets[key].to_dict() for key in sorted(buckets)]
+
+
+def value_before(metric, moment):
+    """The metric's value in effect just before moment, from raw rows or daily rollups; None if it had none"""
+    spec = METRICS[metric]
+    model = spec['model']
+    row = model.query.filter(model.updated_at < moment).order_by(model.updated_at.desc()).first()
+    rollup = MetricRollup.query.filter(
+        MetricRollup.metric == metric,
+        MetricRollup.bucket_start < moment
+    ).order_by(MetricRollup.bucket_start.desc()).first()
+    # Raw rows older than retention are folded into rollups, so either may be newer
+    if rollup is not None and (row is None or rollup.last_at > row.updated_at):
+        return rollup.last_value
+    return spec['value'](row) if row is not None else None
+
+
+def compact_history(retention_days, now=None):
+    """Fold the bound tenant's raw rows older than the retention window into daily rollups.
+
+    Only whole days are compacted, and existing rollups are merged rather
+    than replaced, so the job can be re-run safely.
+    """
+    cutoff = bucket_start((now or datetime.utcnow()) - timedelta(days=retention_days), 'day')
+    compacted = {}
+
+    for metric, spec in METRICS.items():
+        model = spec['model']
+        buckets = {}
+        rows = model.query.filter(model.updated_at < cutoff).order_by(model.updated_at)
+        for row in rows.yield_per(COMPACTION_CHUNK_SIZE):
+            key = bucket_start(row.updated_at, 'day')
+            if key not in buckets:
+                buckets[key] = _Bucket(key)
+            buckets[key].add(spec['value'](row), spec['label'](row), row.updated_at)
+
+        if not buckets:
+            compacted[metric] = 0
+            continue
+
+        existing = {
+            rollup.bucket_start: rollup for rollup in MetricRollup.query.filter(
+                MetricRollup.metric == metric,
+                MetricRollup.bucket_start.in_(list(buckets))
+            )
+        }
+        for key, bucket in buckets.items():
+            rollup = existing.get(key)
+            if rollup is None:
+                rollup = MetricRollup(metric=metric, bucket_start=key, sample_count=0)
+                db.session.add(rollup)
+            else:
+                bucket.add(rollup.last_value, rollup.last_label, rollup.last_at,
+                           min_value=rollup.min_value, max_value=rollup.max_value,
+                           count=rollup.sample_count)
+            rollup.min_value = bucket.min
+            rollup.max_value = bucket.max
+            rollup.last_value = bucket.last
+            rollup.last_label = bucket.last_label
+            rollup.last_at = bucket.last_at
+            rollup.sample_count = bucket.count
+
+        deleted = model.query.filter(model.updated_at < cutoff).delete(synchronize_session=False)
+        compacted[metric] = deleted
+
+    db.session.commit()
+    logger.info(f"Compacted metric history older than {cutoff.date()}: {compacted}")
+    return compacted
@@ -0,0 +1,123 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = {'POST', 'PUT', 'DELETE'}
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyConflict(Exception):
+    """The key is in use by a different request, or its first request is still running"""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class StoredResponse:
+    __slots__ = ('status', 'mimetype', 'body')
+
+    def __init__(self, status, mimetype, body):
+        self.status = status
+        self.mimetype = mimetype
+        self.body = body
+
+
+class _Entry:
+    __slots__ = ('fingerprint', 'expires_at', 'done', 'response')
+
+    def __init__(self, fingerprint, expires_at):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.done = threading.Event()
+        self.response = None
+
+
+def request_fingerprint(method, path, query_string, body):
+    """What a retry must match to be answered from the store"""
+    digest = hashlib.sha256()
+    for part in (method.encode(), path.encode(), query_string, body):
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """Responses to write requests, keyed by caller and Idempotency-Key.
+
+    The first request with a key runs and its successful response is kept
+    for ttl seconds; a retry with the same key and the same request gets
+    that response back without running the view. A retry that arrives
+    while the first is still running waits for it (up to wait_seconds)
+    rather than running alongside it. Failed requests are not kept, since
+    their transaction was rolled back and a retry should run again.
+
+    Held in memory per process and bounded to max_entries, oldest first.
+    """
+
+    def __init__(self, ttl, max_entries, max_body_bytes, wait_seconds):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_body_bytes = max_body_bytes
+        self.wait_seconds = wait_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def _evict(self, now):
+        """Drop expired entries, then the oldest while over max_entries, never one in flight"""
+        for _ in range(len(self._entries)):
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now and len(self._entries) <= self.max_entries:
+                return
+            if entry.done.is_set():
+                del self._entries[key]
+            else:
+                # Still running: look at it again once the rest has been checked
+                entry.expires_at = now + self.ttl
+                self._entries.move_to_end(key)
+
+    def begin(self, key, fingerprint):
+        """Claim key for this request.
+
+        Returns a StoredResponse to replay, or None when the caller should
+        run the request and then call complete() or abandon().
+        """
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._evict(now)
+                entry = self._entries.get(key)
+                if entry is None:
+                    self._entries[key] = _Entry(fingerprint, now + self.ttl)
+                    return None
+                if entry.fingerprint != fingerprint:
+                    raise IdempotencyConflict('Idempotency-Key was already used for a different request', 422)
+                if entry.done.is_set():
+                    return entry.response
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not entry.done.wait(remaining):
+                raise IdempotencyConflict('A request with this Idempotency-Key is still in progress', 409)
+
+    def complete(self, key, response):
+        """Keep the response of a finished request, or release the key when it should not be replayed"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            if response is not None and len(response.body) <= self.max_body_bytes:
+                entry.response = response
+                entry.expires_at = time.monotonic() + self.ttl
+                self._entries.move_to_end(key)
+            else:
+                logger.debug(f"Not keeping the response for idempotency key {key[1]}")
+                del self._entries[key]
+            entry.done.set()
+
+    def abandon(self, key):
+        self.complete(key, None)
@@ -1,5 +1,6 @@
 from app import app, db
-from models.models import User
+from models.models import User, DEFAULT_TENANT_ID
+from tenancy import tenant_scope
 import bcrypt
 import logging
 
@@ -7,12 +8,10 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def init_db():
-    with app.app_context():
+    # The first admin belongs to the default tenant
+    with app.app_context(), tenant_scope(DEFAULT_TENANT_ID):
         try:
-            # Create tables
-            logger.info("Creating database tables...")
-            db.create_all()
-            logger.info("Database tables created successfully")
+            # Tables were created or migrated to the head revision when app was imported
 
             # Check if admin user exists
             logger.info("Checking for admin user...")
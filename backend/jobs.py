@@ -0,0 +1,107 @@
+import logging
+
+from flask import current_app
+
+from alerts import build_sinks, evaluate_alerts
+from archive import archive_rows
+from history import compact_history
+from outbox import build_targets, deliver_outbox, prune_outbox
+from reports import prune_reports
+from scheduler import register_job
+from scoring import rescore_risks
+from snapshot import build_store
+from stats import compute_project_stats, compute_compliance_stats, flag_deadlines, store_result
+from tenancy import bound_tenant, for_each_tenant
+from trend import rollup_maturity_trend
+from models.models import db
+
+logger = logging.getLogger(__name__)
+
+# Jobs run with no tenant bound. Work kept per tenant (stats, alert
+# watermarks, snapshots, trend points, scoring weights) runs once per tenant
+# through for_each_tenant; set-based flag updates span every tenant at once.
+
+
+def _store_stats(key, compute):
+    store_result(key, compute())
+    db.session.commit()
+
+
+@register_job('project_stats', interval_seconds=60)
+def precompute_project_stats():
+    for_each_tenant(_store_stats, 'project_stats', compute_project_stats)
+
+
+@register_job('compliance_stats', interval_seconds=60)
+def precompute_compliance_stats():
+    for_each_tenant(_store_stats, 'compliance_stats', compute_compliance_stats)
+
+
+@register_job('deadline_flags', interval_seconds=300)
+def refresh_deadline_flags():
+    return flag_deadlines()
+
+
+def _evaluate_tenant_alerts(sinks):
+    try:
+        return evaluate_alerts(sinks)
+    except Exception as e:
+        # Its watermarks did not move, so the next run retries this tenant
+        logger.error(f"Deadline alerts for tenant {bound_tenant()} failed: {str(e)}")
+        return {'error': str(e)}
+
+
+@register_job('deadline_alerts', interval_seconds=300)
+def send_deadline_alerts():
+    # One tenant's failure does not hold back the others' alerts; the run
+    # still fails afterwards so the job status shows it
+    results = for_each_tenant(_evaluate_tenant_alerts, build_sinks(current_app.config))
+    failed = sorted(tenant_id for tenant_id, result in results.items() if 'error' in result)
+    if failed:
+        raise RuntimeError(f"Deadline alerts failed for tenants {', '.join(map(str, failed))}")
+    return results
+
+
+@register_job('outbox_delivery', interval_seconds=5)
+def deliver_change_events():
+    return deliver_outbox(build_targets(current_app.config), current_app.config['OUTBOX_BATCH_SIZE'])
+
+
+@register_job('dashboard_snapshot', interval_seconds=15)
+def refresh_dashboard_snapshot():
+    # Republished once it is half way to SNAPSHOT_MAX_AGE, so it stays servable
+    if current_app.config['SNAPSHOT_ENABLED']:
+        config = current_app.config
+        return {'published': for_each_tenant(lambda: build_store(config, bound_tenant()).publish())}
+
+
+@register_job('outbox_prune', interval_seconds=3600)
+def prune_change_events():
+    return prune_outbox(build_targets(current_app.config), current_app.config['OUTBOX_RETENTION_DAYS'])
+
+
+@register_job('report_cleanup', interval_seconds=3600)
+def prune_report_artifacts():
+    config = current_app.config
+    return prune_reports(config['REPORT_DIR'], config['REPORT_RETENTION_DAYS'], config['REPORT_JOB_TIMEOUT'])
+
+
+@register_job('maturity_trend_rollup', interval_seconds=3600)
+def refresh_maturity_trend():
+    return for_each_tenant(rollup_maturity_trend)
+
+
+@register_job('risk_rescore', interval_seconds=86400)
+def refresh_risk_scores():
+    # Scores decay with age, so the register is rescored daily
+    return {'rescored': for_each_tenant(rescore_risks)}
+
+
+@register_job('history_compaction', interval_seconds=86400)
+def run_history_compaction():
+    return for_each_tenant(compact_history, current_app.config['HISTORY_RAW_RETENTION_DAYS'])
+
+
+@register_job('archive', interval_seconds=86400)
+def archive_finished_rows():
+    return for_each_tenant(archive_rows, current_app.config['ARCHIVE_AFTER_DAYS'])
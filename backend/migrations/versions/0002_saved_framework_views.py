@@ -0,0 +1,40 @@
+"""Saved framework views and compliance filter indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('saved_framework_view',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('framework_name', sa.String(length=50), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'framework_name', name='uq_saved_framework_view')
+    )
+    op.create_index(op.f('ix_saved_framework_view_user_id'), 'saved_framework_view', ['user_id'], unique=False)
+    op.create_index(op.f('ix_compliance_framework_current_score'), 'compliance_framework', ['current_score'], unique=False)
+    op.create_index(op.f('ix_compliance_framework_name'), 'compliance_framework', ['name'], unique=False)
+    op.create_index(op.f('ix_compliance_framework_next_assessment_date'), 'compliance_framework', ['next_assessment_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_compliance_framework_next_assessment_date'), table_name='compliance_framework')
+    op.drop_index(op.f('ix_compliance_framework_name'), table_name='compliance_framework')
+    op.drop_index(op.f('ix_compliance_framework_current_score'), table_name='compliance_framework')
+    op.drop_index(op.f('ix_saved_framework_view_user_id'), table_name='saved_framework_view')
+    op.drop_table('saved_framework_view')
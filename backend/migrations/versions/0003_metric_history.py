@@ -0,0 +1,49 @@
+"""Current metric values, history rollups and history indexes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('current_metric',
+    sa.Column('metric', sa.String(length=50), nullable=False),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.Column('label', sa.String(length=20), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('metric')
+    )
+    op.create_table('metric_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('metric', sa.String(length=50), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('min_value', sa.Float(), nullable=False),
+    sa.Column('max_value', sa.Float(), nullable=False),
+    sa.Column('last_value', sa.Float(), nullable=False),
+    sa.Column('last_label', sa.String(length=20), nullable=True),
+    sa.Column('last_at', sa.DateTime(), nullable=False),
+    sa.Column('sample_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('metric', 'bucket_start', name='uq_metric_rollup_bucket')
+    )
+    op.create_index(op.f('ix_maturity_rating_updated_at'), 'maturity_rating', ['updated_at'], unique=False)
+    op.create_index(op.f('ix_threat_level_updated_at'), 'threat_level', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_threat_level_updated_at'), table_name='threat_level')
+    op.drop_index(op.f('ix_maturity_rating_updated_at'), table_name='maturity_rating')
+    op.drop_table('metric_rollup')
+    op.drop_table('current_metric')
@@ -0,0 +1,53 @@
+"""Maturity trend months as unique dates with a manual or rollup source
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 09:00:00.000000
+
+Months were stored as YYYY-MM strings and could repeat; the newest point
+of a repeated month is kept. Existing points were all entered by hand.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        "DELETE FROM maturity_trend_point WHERE id NOT IN "
+        "(SELECT max(id) FROM maturity_trend_point GROUP BY month)"
+    )
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    if sqlite:
+        # SQLite keeps the text column; YYYY-MM-DD text reads back as a date
+        op.execute("UPDATE maturity_trend_point SET month = month || '-01' WHERE length(month) = 7")
+    with op.batch_alter_table('maturity_trend_point') as batch_op:
+        batch_op.add_column(sa.Column('source', sa.String(length=10), nullable=False, server_default='manual'))
+        if not sqlite:
+            batch_op.alter_column('month',
+                   existing_type=sa.String(length=10),
+                   type_=sa.Date(),
+                   existing_nullable=False,
+                   postgresql_using="to_date(month, 'YYYY-MM')")
+        batch_op.create_unique_constraint('maturity_trend_point_month_key', ['month'])
+
+
+def downgrade():
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    with op.batch_alter_table('maturity_trend_point') as batch_op:
+        batch_op.drop_constraint('maturity_trend_point_month_key', type_='unique')
+        if not sqlite:
+            batch_op.alter_column('month',
+                   existing_type=sa.Date(),
+                   type_=sa.String(length=10),
+                   existing_nullable=False,
+                   postgresql_using="to_char(month, 'YYYY-MM')")
+        batch_op.drop_column('source')
+    if sqlite:
+        op.execute("UPDATE maturity_trend_point SET month = substr(month, 1, 7)")
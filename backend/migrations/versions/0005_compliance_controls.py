@@ -0,0 +1,60 @@
+"""Compliance controls, their assessments and running framework totals
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('control',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('framework_id', sa.Integer(), nullable=False),
+    sa.Column('family', sa.String(length=100), nullable=False),
+    sa.Column('reference', sa.String(length=50), nullable=False),
+    sa.Column('title', sa.String(length=300), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('weight', sa.Float(), nullable=False),
+    sa.Column('status', sa.String(length=30), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['framework_id'], ['compliance_framework.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('framework_id', 'reference', name='uq_control_framework_reference')
+    )
+    op.create_index('ix_control_framework_family', 'control', ['framework_id', 'family', 'reference'], unique=False)
+    op.create_table('control_assessment',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('control_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=30), nullable=False),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('assessed_by', sa.Integer(), nullable=True),
+    sa.Column('assessed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['assessed_by'], ['user.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['control_id'], ['control.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_control_assessment_control_time', 'control_assessment', ['control_id', 'assessed_at'], unique=False)
+    # Frameworks start without controls, so their scores stay as entered
+    op.add_column('compliance_framework', sa.Column('control_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('compliance_framework', sa.Column('control_weight_total', sa.Float(), nullable=False, server_default='0'))
+    op.add_column('compliance_framework', sa.Column('control_score_total', sa.Float(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('compliance_framework', 'control_score_total')
+    op.drop_column('compliance_framework', 'control_weight_total')
+    op.drop_column('compliance_framework', 'control_count')
+    op.drop_index('ix_control_assessment_control_time', table_name='control_assessment')
+    op.drop_table('control_assessment')
+    op.drop_index('ix_control_framework_family', table_name='control')
+    op.drop_table('control')
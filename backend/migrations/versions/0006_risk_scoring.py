@@ -0,0 +1,43 @@
+"""Risk likelihood, impact, asset criticality and score
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 09:00:00.000000
+
+Existing risks get the default criticality and no score; app.py scores
+risks without one when it starts.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('risk_scoring_config',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('criticality_weights', sa.JSON(), nullable=False),
+    sa.Column('decay_half_life_days', sa.Float(), nullable=False),
+    sa.Column('decay_floor', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.add_column('risk', sa.Column('likelihood', sa.Integer(), nullable=True))
+    op.add_column('risk', sa.Column('impact', sa.Integer(), nullable=True))
+    op.add_column('risk', sa.Column('asset_criticality', sa.Integer(), nullable=False, server_default='3'))
+    op.add_column('risk', sa.Column('score', sa.Float(), nullable=True))
+    op.create_index(op.f('ix_risk_score'), 'risk', ['score'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_risk_score'), table_name='risk')
+    op.drop_column('risk', 'score')
+    op.drop_column('risk', 'asset_criticality')
+    op.drop_column('risk', 'impact')
+    op.drop_column('risk', 'likelihood')
+    op.drop_table('risk_scoring_config')
@@ -0,0 +1,42 @@
+"""Links from risks to the projects and frameworks that address them
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('risk_framework',
+    sa.Column('risk_id', sa.Integer(), nullable=False),
+    sa.Column('framework_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['framework_id'], ['compliance_framework.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['risk_id'], ['risk.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('risk_id', 'framework_id')
+    )
+    op.create_index('ix_risk_framework_framework_id', 'risk_framework', ['framework_id'], unique=False)
+    op.create_table('risk_project',
+    sa.Column('risk_id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['project.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['risk_id'], ['risk.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('risk_id', 'project_id')
+    )
+    op.create_index('ix_risk_project_project_id', 'risk_project', ['project_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_risk_project_project_id', table_name='risk_project')
+    op.drop_table('risk_project')
+    op.drop_index('ix_risk_framework_framework_id', table_name='risk_framework')
+    op.drop_table('risk_framework')
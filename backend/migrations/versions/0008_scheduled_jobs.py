@@ -0,0 +1,51 @@
+"""Background job leases, precomputed results and deadline flags
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('precomputed_result',
+    sa.Column('key', sa.String(length=100), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_table('scheduled_job',
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('interval_seconds', sa.Integer(), nullable=False),
+    sa.Column('next_run_at', sa.DateTime(), nullable=False),
+    sa.Column('last_run_at', sa.DateTime(), nullable=True),
+    sa.Column('last_status', sa.String(length=20), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('last_duration_ms', sa.Integer(), nullable=True),
+    sa.Column('locked_by', sa.String(length=100), nullable=True),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # Set by the deadline flags job on its first run
+    op.add_column('compliance_framework', sa.Column('assessment_due', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.create_index(op.f('ix_compliance_framework_assessment_due'), 'compliance_framework', ['assessment_due'], unique=False)
+    op.add_column('project', sa.Column('is_overdue', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.create_index(op.f('ix_project_is_overdue'), 'project', ['is_overdue'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_project_is_overdue'), table_name='project')
+    op.drop_column('project', 'is_overdue')
+    op.drop_index(op.f('ix_compliance_framework_assessment_due'), table_name='compliance_framework')
+    op.drop_column('compliance_framework', 'assessment_due')
+    op.drop_table('scheduled_job')
+    op.drop_table('precomputed_result')
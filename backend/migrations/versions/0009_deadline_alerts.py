@@ -0,0 +1,44 @@
+"""Deadline alert watermarks and sent alerts
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('alert_state',
+    sa.Column('rule', sa.String(length=50), nullable=False),
+    sa.Column('evaluated_until', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('rule')
+    )
+    op.create_table('sent_alert',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rule', sa.String(length=50), nullable=False),
+    sa.Column('entity_type', sa.String(length=50), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('due_at', sa.DateTime(), nullable=False),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('rule', 'entity_type', 'entity_id', 'due_at', name='uq_sent_alert')
+    )
+    op.create_index(op.f('ix_sent_alert_sent_at'), 'sent_alert', ['sent_at'], unique=False)
+    op.create_index(op.f('ix_project_due_date'), 'project', ['due_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_project_due_date'), table_name='project')
+    op.drop_index(op.f('ix_sent_alert_sent_at'), table_name='sent_alert')
+    op.drop_table('sent_alert')
+    op.drop_table('alert_state')
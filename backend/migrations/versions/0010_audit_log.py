@@ -0,0 +1,37 @@
+"""Append-only audit log
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('audit_log',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity_type', sa.String(length=50), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=True),
+    sa.Column('action', sa.String(length=20), nullable=False),
+    sa.Column('actor_id', sa.Integer(), nullable=True),
+    sa.Column('changes', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_audit_log_created_at'), 'audit_log', ['created_at'], unique=False)
+    op.create_index('ix_audit_log_entity', 'audit_log', ['entity_type', 'entity_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_audit_log_entity', table_name='audit_log')
+    op.drop_index(op.f('ix_audit_log_created_at'), table_name='audit_log')
+    op.drop_table('audit_log')
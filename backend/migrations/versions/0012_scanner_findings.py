@@ -0,0 +1,37 @@
+"""Scanner finding fingerprints, sources and auto-close
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Risks entered by hand have no fingerprint and are never auto-closed
+    with op.batch_alter_table('risk') as batch_op:
+        batch_op.add_column(sa.Column('fingerprint', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('source', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('last_seen_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('auto_closed', sa.Boolean(), nullable=False, server_default=sa.false()))
+        batch_op.create_unique_constraint('risk_fingerprint_key', ['fingerprint'])
+    op.create_index('ix_risk_source_last_seen', 'risk', ['source', 'last_seen_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_risk_source_last_seen', table_name='risk')
+    with op.batch_alter_table('risk') as batch_op:
+        batch_op.drop_constraint('risk_fingerprint_key', type_='unique')
+        batch_op.drop_column('auto_closed')
+        batch_op.drop_column('last_seen_at')
+        batch_op.drop_column('source')
+        batch_op.drop_column('fingerprint')
@@ -0,0 +1,70 @@
+"""Archive tables for closed risks and completed projects
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('archived_project',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('name', sa.String(length=200), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('completion_percentage', sa.Float(), nullable=True),
+    sa.Column('start_date', sa.DateTime(), nullable=True),
+    sa.Column('due_date', sa.DateTime(), nullable=True),
+    sa.Column('is_overdue', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.Column('risk_ids', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_archived_project_archived_at'), 'archived_project', ['archived_at'], unique=False)
+    op.create_table('archived_risk',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('severity', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('likelihood', sa.Integer(), nullable=True),
+    sa.Column('impact', sa.Integer(), nullable=True),
+    sa.Column('asset_criticality', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=True),
+    sa.Column('fingerprint', sa.String(length=64), nullable=True),
+    sa.Column('source', sa.String(length=50), nullable=True),
+    sa.Column('last_seen_at', sa.DateTime(), nullable=True),
+    sa.Column('auto_closed', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.Column('project_ids', sa.JSON(), nullable=False),
+    sa.Column('framework_ids', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_archived_risk_archived_at'), 'archived_risk', ['archived_at'], unique=False)
+    op.create_index(op.f('ix_archived_risk_fingerprint'), 'archived_risk', ['fingerprint'], unique=False)
+    op.create_index('ix_project_status_updated', 'project', ['status', 'updated_at'], unique=False)
+    op.create_index('ix_risk_status_updated', 'risk', ['status', 'updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_risk_status_updated', table_name='risk')
+    op.drop_index('ix_project_status_updated', table_name='project')
+    op.drop_index(op.f('ix_archived_risk_fingerprint'), table_name='archived_risk')
+    op.drop_index(op.f('ix_archived_risk_archived_at'), table_name='archived_risk')
+    op.drop_table('archived_risk')
+    op.drop_index(op.f('ix_archived_project_archived_at'), table_name='archived_project')
+    op.drop_table('archived_project')
@@ -0,0 +1,96 @@
+"""Temporal version tables for risks, projects and frameworks
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-19 09:00:00.000000
+
+The triggers that write versions are installed by temporal.py when the
+app starts, which also opens a version for every existing row.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0014'
+down_revision = '0013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('compliance_framework_version',
+    sa.Column('version_id', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('current_score', sa.Float(), nullable=False),
+    sa.Column('target_score', sa.Float(), nullable=False),
+    sa.Column('last_assessment_date', sa.DateTime(), nullable=True),
+    sa.Column('next_assessment_date', sa.DateTime(), nullable=True),
+    sa.Column('assessment_due', sa.Boolean(), nullable=False),
+    sa.Column('control_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('valid_from', sa.DateTime(), nullable=False),
+    sa.Column('valid_to', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('version_id')
+    )
+    op.create_index('ix_compliance_framework_version_entity', 'compliance_framework_version', ['id', 'valid_to'], unique=False)
+    op.create_index('ix_compliance_framework_version_valid_from', 'compliance_framework_version', ['valid_from', 'valid_to'], unique=False)
+    op.create_index('ix_compliance_framework_version_valid_to', 'compliance_framework_version', ['valid_to', 'valid_from'], unique=False)
+    op.create_table('project_version',
+    sa.Column('version_id', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=200), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('completion_percentage', sa.Float(), nullable=True),
+    sa.Column('start_date', sa.DateTime(), nullable=True),
+    sa.Column('due_date', sa.DateTime(), nullable=True),
+    sa.Column('is_overdue', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('valid_from', sa.DateTime(), nullable=False),
+    sa.Column('valid_to', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('version_id')
+    )
+    op.create_index('ix_project_version_entity', 'project_version', ['id', 'valid_to'], unique=False)
+    op.create_index('ix_project_version_valid_from', 'project_version', ['valid_from', 'valid_to'], unique=False)
+    op.create_index('ix_project_version_valid_to', 'project_version', ['valid_to', 'valid_from'], unique=False)
+    op.create_table('risk_version',
+    sa.Column('version_id', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('severity', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('likelihood', sa.Integer(), nullable=True),
+    sa.Column('impact', sa.Integer(), nullable=True),
+    sa.Column('asset_criticality', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=True),
+    sa.Column('source', sa.String(length=50), nullable=True),
+    sa.Column('last_seen_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('valid_from', sa.DateTime(), nullable=False),
+    sa.Column('valid_to', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('version_id')
+    )
+    op.create_index('ix_risk_version_entity', 'risk_version', ['id', 'valid_to'], unique=False)
+    op.create_index('ix_risk_version_valid_from', 'risk_version', ['valid_from', 'valid_to'], unique=False)
+    op.create_index('ix_risk_version_valid_to', 'risk_version', ['valid_to', 'valid_from'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_risk_version_valid_to', table_name='risk_version')
+    op.drop_index('ix_risk_version_valid_from', table_name='risk_version')
+    op.drop_index('ix_risk_version_entity', table_name='risk_version')
+    op.drop_table('risk_version')
+    op.drop_index('ix_project_version_valid_to', table_name='project_version')
+    op.drop_index('ix_project_version_valid_from', table_name='project_version')
+    op.drop_index('ix_project_version_entity', table_name='project_version')
+    op.drop_table('project_version')
+    op.drop_index('ix_compliance_framework_version_valid_to', table_name='compliance_framework_version')
+    op.drop_index('ix_compliance_framework_version_valid_from', table_name='compliance_framework_version')
+    op.drop_index('ix_compliance_framework_version_entity', table_name='compliance_framework_version')
+    op.drop_table('compliance_framework_version')
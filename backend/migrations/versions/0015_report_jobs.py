@@ -0,0 +1,44 @@
+"""Monthly report pack jobs
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0015'
+down_revision = '0014'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('report_job',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('format', sa.String(length=10), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('data_version', sa.String(length=64), nullable=False),
+    sa.Column('as_of', sa.DateTime(), nullable=False),
+    sa.Column('artifact', sa.String(length=200), nullable=False),
+    sa.Column('cached', sa.Boolean(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('requested_by', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_report_job_created_at'), 'report_job', ['created_at'], unique=False)
+    op.create_index('ix_report_job_version', 'report_job', ['month', 'format', 'data_version', 'status'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_report_job_version', table_name='report_job')
+    op.drop_index(op.f('ix_report_job_created_at'), table_name='report_job')
+    op.drop_table('report_job')
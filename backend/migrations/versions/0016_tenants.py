@@ -0,0 +1,197 @@
+"""Business units: a tenant table and tenant_id on every tenant-owned table
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-19 09:00:00.000000
+
+Existing rows all belong to the default tenant, created here as tenant 1.
+Keys and unique constraints that were deployment-wide now lead on
+tenant_id, and so do the indexes tenant reads go through.
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0016'
+down_revision = '0015'
+branch_labels = None
+depends_on = None
+
+# models.DEFAULT_TENANT_ID; the first id of the new tenant table
+DEFAULT_TENANT_ID = 1
+
+TENANT_TABLES = (
+    'user', 'threat_level', 'maturity_rating', 'maturity_trend_point', 'current_metric', 'metric_rollup',
+    'risk', 'risk_scoring_config', 'project', 'compliance_framework', 'control', 'control_assessment',
+    'saved_framework_view', 'precomputed_result', 'alert_state', 'sent_alert', 'audit_log', 'outbox_event',
+    'archived_risk', 'archived_project', 'risk_version', 'project_version', 'compliance_framework_version',
+    'report_job',
+)
+
+# Keys that become per tenant: table -> columns after tenant_id
+PRIMARY_KEYS = {
+    'current_metric': ['metric'],
+    'precomputed_result': ['key'],
+    'alert_state': ['rule'],
+}
+
+# table -> (constraint replaced or None, its columns, new constraint); the new one leads on tenant_id
+UNIQUE_CONSTRAINTS = {
+    'maturity_trend_point': ('maturity_trend_point_month_key', ['month'], 'uq_maturity_trend_point_tenant_month'),
+    'metric_rollup': ('uq_metric_rollup_bucket', ['metric', 'bucket_start'], 'uq_metric_rollup_bucket'),
+    'risk': ('risk_fingerprint_key', ['fingerprint'], 'uq_risk_tenant_fingerprint'),
+    'risk_scoring_config': (None, [], 'uq_risk_scoring_config_tenant'),
+    'sent_alert': ('uq_sent_alert', ['rule', 'entity_type', 'entity_id', 'due_at'], 'uq_sent_alert'),
+}
+
+# table -> (indexes replaced, tenant-leading indexes), each as (name, columns)
+INDEXES = {
+    'user': ([], [('ix_user_tenant_username', ['tenant_id', 'username'])]),
+    'threat_level': (
+        [('ix_threat_level_updated_at', ['updated_at'])],
+        [('ix_threat_level_tenant_updated', ['tenant_id', 'updated_at'])],
+    ),
+    'maturity_rating': (
+        [('ix_maturity_rating_updated_at', ['updated_at'])],
+        [('ix_maturity_rating_tenant_updated', ['tenant_id', 'updated_at'])],
+    ),
+    'risk': (
+        [('ix_risk_score', ['score']),
+         ('ix_risk_source_last_seen', ['source', 'last_seen_at']),
+         ('ix_risk_status_updated', ['status', 'updated_at'])],
+        [('ix_risk_tenant_score', ['tenant_id', 'score']),
+         ('ix_risk_tenant_source_last_seen', ['tenant_id', 'source', 'last_seen_at']),
+         ('ix_risk_tenant_status_updated', ['tenant_id', 'status', 'updated_at'])],
+    ),
+    'project': (
+        [('ix_project_due_date', ['due_date']),
+         ('ix_project_is_overdue', ['is_overdue']),
+         ('ix_project_status_updated', ['status', 'updated_at'])],
+        [('ix_project_tenant_due_date', ['tenant_id', 'due_date']),
+         ('ix_project_tenant_overdue', ['tenant_id', 'is_overdue']),
+         ('ix_project_tenant_status_updated', ['tenant_id', 'status', 'updated_at'])],
+    ),
+    'compliance_framework': (
+        [('ix_compliance_framework_assessment_due', ['assessment_due']),
+         ('ix_compliance_framework_current_score', ['current_score']),
+         ('ix_compliance_framework_name', ['name']),
+         ('ix_compliance_framework_next_assessment_date', ['next_assessment_date'])],
+        [('ix_compliance_framework_tenant_due', ['tenant_id', 'assessment_due']),
+         ('ix_compliance_framework_tenant_score', ['tenant_id', 'current_score']),
+         ('ix_compliance_framework_tenant_name', ['tenant_id', 'name']),
+         ('ix_compliance_framework_tenant_next_assessment', ['tenant_id', 'next_assessment_date'])],
+    ),
+    'control': (
+        [('ix_control_framework_family', ['framework_id', 'family', 'reference'])],
+        [('ix_control_tenant_framework_family', ['tenant_id', 'framework_id', 'family', 'reference'])],
+    ),
+    'control_assessment': (
+        [('ix_control_assessment_control_time', ['control_id', 'assessed_at'])],
+        [('ix_control_assessment_tenant_control_time', ['tenant_id', 'control_id', 'assessed_at'])],
+    ),
+    'saved_framework_view': (
+        [('ix_saved_framework_view_user_id', ['user_id'])],
+        [('ix_saved_framework_view_tenant_user', ['tenant_id', 'user_id'])],
+    ),
+    'sent_alert': (
+        [('ix_sent_alert_sent_at', ['sent_at'])],
+        [('ix_sent_alert_tenant_sent', ['tenant_id', 'sent_at'])],
+    ),
+    'audit_log': (
+        [('ix_audit_log_created_at', ['created_at']),
+         ('ix_audit_log_entity', ['entity_type', 'entity_id', 'created_at'])],
+        [('ix_audit_log_tenant_created', ['tenant_id', 'created_at']),
+         ('ix_audit_log_tenant_entity', ['tenant_id', 'entity_type', 'entity_id', 'created_at'])],
+    ),
+    'archived_risk': (
+        [('ix_archived_risk_archived_at', ['archived_at']),
+         ('ix_archived_risk_fingerprint', ['fingerprint'])],
+        [('ix_archived_risk_tenant_archived', ['tenant_id', 'archived_at']),
+         ('ix_archived_risk_tenant_fingerprint', ['tenant_id', 'fingerprint'])],
+    ),
+    'archived_project': (
+        [('ix_archived_project_archived_at', ['archived_at'])],
+        [('ix_archived_project_tenant_archived', ['tenant_id', 'archived_at'])],
+    ),
+    'report_job': (
+        [('ix_report_job_version', ['month', 'format', 'data_version', 'status'])],
+        [('ix_report_job_tenant_created', ['tenant_id', 'created_at']),
+         ('ix_report_job_tenant_version', ['tenant_id', 'month', 'format', 'data_version', 'status'])],
+    ),
+}
+for _version in ('risk_version', 'project_version', 'compliance_framework_version'):
+    INDEXES[_version] = (
+        [(f'ix_{_version}_valid_to', ['valid_to', 'valid_from']),
+         (f'ix_{_version}_valid_from', ['valid_from', 'valid_to'])],
+        [(f'ix_{_version}_tenant_valid_to', ['tenant_id', 'valid_to', 'valid_from']),
+         (f'ix_{_version}_tenant_valid_from', ['tenant_id', 'valid_from', 'valid_to'])],
+    )
+
+
+def upgrade():
+    tenant = op.create_table('tenant',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('slug', sa.String(length=50), nullable=False),
+    sa.Column('name', sa.String(length=200), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('slug')
+    )
+    # Left to the id sequence, which hands the empty table DEFAULT_TENANT_ID
+    op.bulk_insert(tenant, [{'slug': 'default', 'name': 'Default', 'created_at': datetime.utcnow()}])
+
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    for table in TENANT_TABLES:
+        old_indexes, new_indexes = INDEXES.get(table, ([], []))
+        for name, _ in old_indexes:
+            op.drop_index(name, table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            # The default only fills existing rows; new rows are always written with their tenant
+            batch_op.add_column(sa.Column('tenant_id', sa.Integer(), nullable=False,
+                                          server_default=str(DEFAULT_TENANT_ID)))
+        # A separate batch, so SQLite has filled the column before copying the table without its default
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('tenant_id', existing_type=sa.Integer(), existing_nullable=False,
+                                  server_default=None)
+            batch_op.create_foreign_key(f'{table}_tenant_id_fkey', 'tenant', ['tenant_id'], ['id'])
+            if table in PRIMARY_KEYS:
+                # SQLite's key is unnamed; the copied table takes the new one
+                if not sqlite:
+                    batch_op.drop_constraint(f'{table}_pkey', type_='primary')
+                batch_op.create_primary_key(f'{table}_pkey', ['tenant_id', *PRIMARY_KEYS[table]])
+            if table in UNIQUE_CONSTRAINTS:
+                old, columns, new = UNIQUE_CONSTRAINTS[table]
+                if old is not None:
+                    batch_op.drop_constraint(old, type_='unique')
+                batch_op.create_unique_constraint(new, ['tenant_id', *columns])
+        for name, columns in new_indexes:
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    if op.get_bind().execute(sa.text("SELECT count(*) FROM tenant")).scalar() > 1:
+        raise RuntimeError('More than one tenant exists; their rows cannot share deployment-wide keys')
+
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    for table in reversed(TENANT_TABLES):
+        old_indexes, new_indexes = INDEXES.get(table, ([], []))
+        for name, _ in new_indexes:
+            op.drop_index(name, table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            if table in UNIQUE_CONSTRAINTS:
+                old, columns, new = UNIQUE_CONSTRAINTS[table]
+                batch_op.drop_constraint(new, type_='unique')
+                if old is not None:
+                    batch_op.create_unique_constraint(old, columns)
+            if table in PRIMARY_KEYS:
+                if not sqlite:
+                    batch_op.drop_constraint(f'{table}_pkey', type_='primary')
+                batch_op.create_primary_key(f'{table}_pkey', PRIMARY_KEYS[table])
+            batch_op.drop_constraint(f'{table}_tenant_id_fkey', type_='foreignkey')
+            batch_op.drop_column('tenant_id')
+        for name, columns in old_indexes:
+            op.create_index(name, table, columns, unique=False)
+    op.drop_table('tenant')
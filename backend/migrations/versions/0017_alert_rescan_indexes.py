@@ -0,0 +1,26 @@
+"""Indexes for the deadline alert rescan of changed rows
+
+Revision ID: 0017
+Revises: 0016
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0017'
+down_revision = '0016'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_project_tenant_updated', 'project', ['tenant_id', 'updated_at'], unique=False)
+    op.create_index('ix_compliance_framework_tenant_updated', 'compliance_framework', ['tenant_id', 'updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_compliance_framework_tenant_updated', table_name='compliance_framework')
+    op.drop_index('ix_project_tenant_updated', table_name='project')
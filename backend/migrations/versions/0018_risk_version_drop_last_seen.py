@@ -0,0 +1,41 @@
+"""Stop copying last_seen_at into risk versions
+
+Revision ID: 0018
+Revises: 0017
+Create Date: 2026-10-19 09:00:00.000000
+
+Findings seen again only move last_seen_at, which no longer opens a
+version. temporal.py reinstalls the versioning triggers without the
+column when the app starts.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0018'
+down_revision = '0017'
+branch_labels = None
+depends_on = None
+
+# temporal.py's SQLite triggers on risk; they name the column being dropped
+SQLITE_TRIGGERS = ('risk_version_ai', 'risk_version_au', 'risk_version_ad', 'risk_version_ar')
+
+
+def _drop_sqlite_triggers():
+    # SQLite checks triggers when batch mode renames the rebuilt table into place
+    if op.get_bind().dialect.name == 'sqlite':
+        for name in SQLITE_TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def upgrade():
+    _drop_sqlite_triggers()
+    with op.batch_alter_table('risk_version') as batch_op:
+        batch_op.drop_column('last_seen_at')
+
+
+def downgrade():
+    _drop_sqlite_triggers()
+    with op.batch_alter_table('risk_version') as batch_op:
+        batch_op.add_column(sa.Column('last_seen_at', sa.DateTime(), nullable=True))
@@ -0,0 +1,30 @@
+"""Outbox cursors keep the ids they passed before those committed
+
+Revision ID: 0019
+Revises: 0018
+Create Date: 2026-10-19 09:00:00.000000
+
+Replaces the settle delay: delivery no longer waits for events to age.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0019'
+down_revision = '0018'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('outbox_cursor') as batch_op:
+        batch_op.add_column(sa.Column('gaps', sa.JSON(), nullable=False, server_default='{}'))
+    # A separate batch, so SQLite has filled the column before copying the table without its default
+    with op.batch_alter_table('outbox_cursor') as batch_op:
+        batch_op.alter_column('gaps', existing_type=sa.JSON(), existing_nullable=False, server_default=None)
+
+
+def downgrade():
+    with op.batch_alter_table('outbox_cursor') as batch_op:
+        batch_op.drop_column('gaps')
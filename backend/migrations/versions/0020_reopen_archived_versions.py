@@ -0,0 +1,46 @@
+"""Reopen the versions archival closed
+
+Revision ID: 0020
+Revises: 0019
+Create Date: 2026-10-19 09:00:00.000000
+
+Archival deleted hot rows through the versioning triggers, which closed
+their current version, so as_of reads after archival lost them. The
+triggers temporal.py installs now leave it open; this reopens the last
+version of every row archived before.
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0020'
+down_revision = '0019'
+branch_labels = None
+depends_on = None
+
+# models.OPEN_ENDED
+OPEN_ENDED = datetime(9999, 12, 31)
+
+# archive table -> version table
+ARCHIVED_VERSIONS = {
+    'archived_risk': 'risk_version',
+    'archived_project': 'project_version',
+}
+
+
+def upgrade():
+    for archive, history in ARCHIVED_VERSIONS.items():
+        archive_table = sa.table(archive, sa.column('id'))
+        version = sa.table(history, sa.column('version_id'), sa.column('id'), sa.column('valid_to', sa.DateTime()))
+        latest = sa.select(sa.func.max(version.c.version_id)).where(
+            version.c.id.in_(sa.select(archive_table.c.id))
+        ).group_by(version.c.id)
+        op.execute(version.update().where(version.c.version_id.in_(latest)).values(valid_to=OPEN_ENDED))
+
+
+def downgrade():
+    # The reopened versions are the rows as they were archived; nothing to undo
+    pass
@@ -1,12 +1,17 @@
 from app import app, db
-from models.models import ThreatLevel, MaturityRating, Risk, Project, ComplianceFramework
+from models.models import (ThreatLevel, MaturityRating, Risk, Project, ComplianceFramework, CurrentMetric, MetricRollup,
+                           DEFAULT_TENANT_ID)
+from history import record_current
+from tenancy import tenant_scope
 from datetime import datetime, timedelta
 
 def seed_mock_data():
-    with app.app_context():
-        # Clear existing data
+    with app.app_context(), tenant_scope(DEFAULT_TENANT_ID):
+        # Clear the default tenant's existing data
         db.session.query(ThreatLevel).delete()
         db.session.query(MaturityRating).delete()
+        db.session.query(CurrentMetric).delete()
+        db.session.query(MetricRollup).delete()
         db.session.query(Risk).delete()
         db.session.query(Project).delete()
         db.session.query(ComplianceFramework).delete()
@@ -14,10 +19,12 @@ def seed_mock_data():
         # Add Threat Level
         threat = ThreatLevel(level='Medium', description='Current threat level is medium due to increased phishing attempts')
         db.session.add(threat)
+        record_current('threat_level', threat)
 
         # Add Maturity Rating
         maturity = MaturityRating(score=4.0, trend='Increasing')
         db.session.add(maturity)
+        record_current('maturity_rating', maturity)
 
         # Add Risks
         risks = [
@@ -1,29 +1,154 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import declared_attr
+from contextvars import ContextVar
 from datetime import datetime
 
 db = SQLAlchemy()
 
-class ThreatLevel(db.Model):
+# Backends the upserts, raw SQL and versioning triggers are written for
+SUPPORTED_DIALECTS = {'postgresql': 'PostgreSQL', 'sqlite': 'SQLite'}
+
+def check_dialect(dialect):
+    if dialect not in SUPPORTED_DIALECTS:
+        raise RuntimeError(f"Unsupported database backend {dialect}: DATABASE_URL must point to "
+                           f"{' or '.join(SUPPORTED_DIALECTS.values())}")
+
+def dialect_insert(dialect):
+    # INSERT construct with on_conflict_do_update/do_nothing for the backend
+    check_dialect(dialect)
+    return postgresql.insert if dialect == 'postgresql' else sqlite.insert
+
+# Tenant (business unit) the current request or job works for; bound by
+# tenancy.py, which scopes every ORM statement to it. None outside a tenant.
+current_tenant = ContextVar('current_tenant', default=None)
+
+# Owns every row written before tenants existed, and anonymous dashboard reads
+DEFAULT_TENANT_ID = 1
+
+def _bound_tenant():
+    tenant_id = current_tenant.get()
+    if tenant_id is None:
+        raise RuntimeError('Tenant-owned row written outside a tenant scope')
+    return tenant_id
+
+class Tenant(db.Model):
+    # A business unit served by this deployment; usernames and row ids are global
+    id = db.Column(db.Integer, primary_key=True)
+    slug = db.Column(db.String(50), unique=True, nullable=False)
+    name = db.Column(db.String(200), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {'id': self.id, 'slug': self.slug, 'name': self.name, 'created_at': self.created_at}
+
+class TenantOwned:
+    # Rows belong to one tenant. New rows get the bound tenant, Core inserts
+    # included, and indexes lead on tenant_id so a tenant's reads only touch its rows
+    @declared_attr
+    def tenant_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('tenant.id'), nullable=False, default=_bound_tenant)
+
+# Projects that mitigate a risk
+risk_project = db.Table(
+    'risk_project',
+    db.Column('risk_id', db.Integer, db.ForeignKey('risk.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('project_id', db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_risk_project_project_id', 'project_id')
+)
+
+# Compliance frameworks a risk threatens
+risk_framework = db.Table(
+    'risk_framework',
+    db.Column('risk_id', db.Integer, db.ForeignKey('risk.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('framework_id', db.Integer, db.ForeignKey('compliance_framework.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_risk_framework_framework_id', 'framework_id')
+)
+
+class ThreatLevel(TenantOwned, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     level = db.Column(db.String(20), nullable=False)  # Low, Medium, High, Critical
     description = db.Column(db.Text)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-class MaturityRating(db.Model):
+    __table_args__ = (
+        db.Index('ix_threat_level_tenant_updated', 'tenant_id', 'updated_at'),
+    )
+
+class MaturityRating(TenantOwned, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     score = db.Column(db.Float, nullable=False)
     trend = db.Column(db.String(10))  # Increasing, Decreasing, Stable
     updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-class Risk(db.Model):
+    __table_args__ = (
+        db.Index('ix_maturity_rating_tenant_updated', 'tenant_id', 'updated_at'),
+    )
+
+class CurrentMetric(TenantOwned, db.Model):
+    # Latest value of an append-only metric, so reads never scan its history
+    metric = db.Column(db.String(50), nullable=False)  # threat_level, maturity_rating
+    value = db.Column(db.Float, nullable=False)
+    label = db.Column(db.String(20))
+    description = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.PrimaryKeyConstraint('tenant_id', 'metric'),
+    )
+
+class MetricRollup(TenantOwned, db.Model):
+    # Daily summary of raw metric rows that have aged out of retention
+    id = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(50), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    min_value = db.Column(db.Float, nullable=False)
+    max_value = db.Column(db.Float, nullable=False)
+    last_value = db.Column(db.Float, nullable=False)
+    last_label = db.Column(db.String(20))
+    last_at = db.Column(db.DateTime, nullable=False)
+    sample_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('tenant_id', 'metric', 'bucket_start', name='uq_metric_rollup_bucket'),
+    )
+
+class Risk(TenantOwned, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
     severity = db.Column(db.String(20), nullable=False)  # Low, Medium, High, Critical
     status = db.Column(db.String(20), nullable=False)  # Open, In Progress, Closed
+    likelihood = db.Column(db.Integer)  # 1-5, defaults from severity when unset
+    impact = db.Column(db.Integer)  # 1-5, defaults from severity when unset
+    asset_criticality = db.Column(db.Integer, nullable=False, default=3)  # 1-5
+    score = db.Column(db.Float)  # Maintained by scoring.py
+    # Set for risks imported from scanner findings; null for risks entered by hand
+    fingerprint = db.Column(db.String(64))
+    source = db.Column(db.String(50))  # Scanner name
+    last_seen_at = db.Column(db.DateTime)  # Last scan the finding appeared in
+    auto_closed = db.Column(db.Boolean, nullable=False, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Findings are upserted on their fingerprint within the tenant
+        db.UniqueConstraint('tenant_id', 'fingerprint', name='uq_risk_tenant_fingerprint'),
+        db.Index('ix_risk_tenant_score', 'tenant_id', 'score'),
+        # Auto-close scans one scanner's findings that were not seen in a run
+        db.Index('ix_risk_tenant_source_last_seen', 'tenant_id', 'source', 'last_seen_at'),
+        # Archival picks Closed risks by age
+        db.Index('ix_risk_tenant_status_updated', 'tenant_id', 'status', 'updated_at'),
+    )
+
+    # Lazy by default; list endpoints opt into selectinload() explicitly
+    projects = db.relationship('Project', secondary=risk_project, backref=db.backref('risks', lazy='select'))
+    frameworks = db.relationship('ComplianceFramework', secondary=risk_framework,
+                                 backref=db.backref('risks', lazy='select'))
+
+    def to_summary(self):
+        return {'id': self.id, 'title': self.title, 'severity': self.severity, 'status': self.status}
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -31,11 +156,37 @@ class Risk(db.Model):
             'description': self.description,
             'severity': self.severity,
             'status': self.status,
+            'likelihood': self.likelihood,
+            'impact': self.impact,
+            'asset_criticality': self.asset_criticality,
+            'score': self.score,
+            'source': self.source,
+            'last_seen_at': self.last_seen_at,
             'created_at': self.created_at,
             'updated_at': self.updated_at
         }
 
-class Project(db.Model):
+class RiskScoringConfig(TenantOwned, db.Model):
+    # One row per tenant holding the weights its register is scored with
+    id = db.Column(db.Integer, primary_key=True)
+    criticality_weights = db.Column(db.JSON, nullable=False)  # {"1": 0.6, ..., "5": 1.5}
+    decay_half_life_days = db.Column(db.Float, nullable=False, default=365)
+    decay_floor = db.Column(db.Float, nullable=False, default=0.5)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('tenant_id', name='uq_risk_scoring_config_tenant'),
+    )
+
+    def to_dict(self):
+        return {
+            'criticality_weights': self.criticality_weights,
+            'decay_half_life_days': self.decay_half_life_days,
+            'decay_floor': self.decay_floor,
+            'updated_at': self.updated_at
+        }
+
+class Project(TenantOwned, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
@@ -43,9 +194,22 @@ class Project(db.Model):
     completion_percentage = db.Column(db.Float, default=0)
     start_date = db.Column(db.DateTime, default=datetime.utcnow)
     due_date = db.Column(db.DateTime)
+    is_overdue = db.Column(db.Boolean, nullable=False, default=False)  # Maintained by the scheduler
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_project_tenant_due_date', 'tenant_id', 'due_date'),
+        db.Index('ix_project_tenant_overdue', 'tenant_id', 'is_overdue'),
+        # Archival picks Completed projects by age
+        db.Index('ix_project_tenant_status_updated', 'tenant_id', 'status', 'updated_at'),
+        # Deadline alerts rescan rows changed since their last evaluation
+        db.Index('ix_project_tenant_updated', 'tenant_id', 'updated_at'),
+    )
+
+    def to_summary(self):
+        return {'id': self.id, 'name': self.name, 'status': self.status}
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -55,20 +219,42 @@ class Project(db.Model):
             'completion_percentage': self.completion_percentage,
             'start_date': self.start_date,
             'due_date': self.due_date,
+            'is_overdue': self.is_overdue,
             'created_at': self.created_at,
             'updated_at': self.updated_at
         }
 
-class ComplianceFramework(db.Model):
+class ComplianceFramework(TenantOwned, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)  # PCI DSS, NIST CSF, etc.
     current_score = db.Column(db.Float, nullable=False)
     target_score = db.Column(db.Float, nullable=False)
     last_assessment_date = db.Column(db.DateTime)
     next_assessment_date = db.Column(db.DateTime)
+    assessment_due = db.Column(db.Boolean, nullable=False, default=False)  # Maintained by the scheduler
+    # Running sums over the framework's controls; current_score is derived from them once controls exist
+    control_count = db.Column(db.Integer, nullable=False, default=0)
+    control_weight_total = db.Column(db.Float, nullable=False, default=0)
+    control_score_total = db.Column(db.Float, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    controls = db.relationship('Control', backref='framework', lazy='dynamic',
+                               cascade='all, delete-orphan', passive_deletes=True)
+
+    __table_args__ = (
+        db.Index('ix_compliance_framework_tenant_name', 'tenant_id', 'name'),
+        db.Index('ix_compliance_framework_tenant_score', 'tenant_id', 'current_score'),
+        db.Index('ix_compliance_framework_tenant_next_assessment', 'tenant_id', 'next_assessment_date'),
+        db.Index('ix_compliance_framework_tenant_due', 'tenant_id', 'assessment_due'),
+        # Deadline alerts rescan rows changed since their last evaluation
+        db.Index('ix_compliance_framework_tenant_updated', 'tenant_id', 'updated_at'),
+    )
+
+    def to_summary(self):
+        return {'id': self.id, 'name': self.name, 'current_score': self.current_score,
+                'target_score': self.target_score}
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -77,27 +263,487 @@ class ComplianceFramework(db.Model):
             'target_score': self.target_score,
             'last_assessment_date': self.last_assessment_date,
             'next_assessment_date': self.next_assessment_date,
+            'assessment_due': self.assessment_due,
+            'control_count': self.control_count,
             'created_at': self.created_at,
             'updated_at': self.updated_at
         }
 
-class User(db.Model):
+class Control(TenantOwned, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    framework_id = db.Column(db.Integer, db.ForeignKey('compliance_framework.id', ondelete='CASCADE'), nullable=False)
+    family = db.Column(db.String(100), nullable=False)  # e.g. PR.AC, A.9, Requirement 8
+    reference = db.Column(db.String(50), nullable=False)  # e.g. PR.AC-1
+    title = db.Column(db.String(300), nullable=False)
+    description = db.Column(db.Text)
+    weight = db.Column(db.Float, nullable=False, default=1.0)
+    status = db.Column(db.String(30), nullable=False, default='Not Assessed')  # Not Assessed, Not Implemented, Partially Implemented, Implemented, Not Applicable
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    assessments = db.relationship('ControlAssessment', backref='control', lazy='dynamic',
+                                  cascade='all, delete-orphan', passive_deletes=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('framework_id', 'reference', name='uq_control_framework_reference'),
+        db.Index('ix_control_tenant_framework_family', 'tenant_id', 'framework_id', 'family', 'reference'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'framework_id': self.framework_id,
+            'family': self.family,
+            'reference': self.reference,
+            'title': self.title,
+            'description': self.description,
+            'weight': self.weight,
+            'status': self.status,
+            'updated_at': self.updated_at
+        }
+
+class ControlAssessment(TenantOwned, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    control_id = db.Column(db.Integer, db.ForeignKey('control.id', ondelete='CASCADE'), nullable=False)
+    status = db.Column(db.String(30), nullable=False)
+    notes = db.Column(db.Text)
+    assessed_by = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'))
+    assessed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_control_assessment_tenant_control_time', 'tenant_id', 'control_id', 'assessed_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'control_id': self.control_id,
+            'status': self.status,
+            'notes': self.notes,
+            'assessed_by': self.assessed_by,
+            'assessed_at': self.assessed_at
+        }
+
+class User(TenantOwned, db.Model):
+    # Usernames are unique across tenants, so login needs no tenant
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(200), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-class MaturityTrendPoint(db.Model):
+    __table_args__ = (
+        db.Index('ix_user_tenant_username', 'tenant_id', 'username'),
+    )
+
+class SavedFrameworkView(TenantOwned, db.Model):
+    # One row per framework name a user has chosen to see on the dashboard
     id = db.Column(db.Integer, primary_key=True)
-    month = db.Column(db.String(10), nullable=False)  # Format: YYYY-MM
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    framework_name = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'framework_name', name='uq_saved_framework_view'),
+        db.Index('ix_saved_framework_view_tenant_user', 'tenant_id', 'user_id'),
+    )
+
+class MaturityTrendPoint(TenantOwned, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Date, nullable=False)  # First day of the month
     score = db.Column(db.Float, nullable=False)
+    source = db.Column(db.String(10), nullable=False, default='manual')  # manual, rollup
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.UniqueConstraint('tenant_id', 'month', name='uq_maturity_trend_point_tenant_month'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
-            'month': self.month,
+            'month': self.month.strftime('%Y-%m'),
             'score': self.score,
+            'source': self.source,
+            'created_at': self.created_at
+        }
+
+class ScheduledJob(db.Model):
+    # Persistent state for a background job; locked_by/locked_until form a lease
+    # so only one worker runs a given job at a time. Jobs are shared by all
+    # tenants; per-tenant jobs loop over them (tenancy.for_each_tenant).
+    name = db.Column(db.String(100), primary_key=True)
+    interval_seconds = db.Column(db.Integer, nullable=False)
+    next_run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_run_at = db.Column(db.DateTime)
+    last_status = db.Column(db.String(20))  # success, failed
+    last_error = db.Column(db.Text)
+    last_duration_ms = db.Column(db.Integer)
+    locked_by = db.Column(db.String(100))
+    locked_until = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'interval_seconds': self.interval_seconds,
+            'next_run_at': self.next_run_at,
+            'last_run_at': self.last_run_at,
+            'last_status': self.last_status,
+            'last_error': self.last_error,
+            'last_duration_ms': self.last_duration_ms,
+            'locked_by': self.locked_by,
+            'locked_until': self.locked_until
+        }
+
+class PrecomputedResult(TenantOwned, db.Model):
+    # Serialized output of a background job, read by request handlers
+    key = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.PrimaryKeyConstraint('tenant_id', 'key'),
+    )
+
+class ReportJob(TenantOwned, db.Model):
+    # A monthly report pack requested through the API and rendered by reports.py.
+    # The artifact file is shared by every job with the same data_version.
+    id = db.Column(db.String(32), primary_key=True)
+    month = db.Column(db.Date, nullable=False)  # First day of the month reported on
+    format = db.Column(db.String(10), nullable=False)  # pdf, csv, xlsx
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    data_version = db.Column(db.String(64), nullable=False)
+    as_of = db.Column(db.DateTime, nullable=False)
+    artifact = db.Column(db.String(200), nullable=False)  # File name under REPORT_DIR
+    cached = db.Column(db.Boolean, nullable=False, default=False)
+    size = db.Column(db.Integer)
+    error = db.Column(db.Text)
+    requested_by = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # An identical report already queued or running is joined rather than rendered twice
+        db.Index('ix_report_job_tenant_version', 'tenant_id', 'month', 'format', 'data_version', 'status'),
+        db.Index('ix_report_job_tenant_created', 'tenant_id', 'created_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'month': self.month.strftime('%Y-%m'),
+            'format': self.format,
+            'status': self.status,
+            'data_version': self.data_version,
+            'as_of': self.as_of,
+            'cached': self.cached,
+            'size': self.size,
+            'error': self.error,
+            'requested_by': self.requested_by,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+class AlertState(TenantOwned, db.Model):
+    # High-water mark per alert rule; each evaluation only scans the interval since
+    rule = db.Column(db.String(50), nullable=False)
+    evaluated_until = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.PrimaryKeyConstraint('tenant_id', 'rule'),
+    )
+
+class SentAlert(TenantOwned, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    rule = db.Column(db.String(50), nullable=False)
+    entity_type = db.Column(db.String(50), nullable=False)  # project, compliance_framework
+    entity_id = db.Column(db.Integer, nullable=False)
+    due_at = db.Column(db.DateTime, nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    sent_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # A moved deadline is a new alert; the same deadline is only alerted once
+        db.UniqueConstraint('tenant_id', 'rule', 'entity_type', 'entity_id', 'due_at', name='uq_sent_alert'),
+        db.Index('ix_sent_alert_tenant_sent', 'tenant_id', 'sent_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'rule': self.rule,
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id,
+            'due_at': self.due_at,
+            'message': self.message,
+            'sent_at': self.sent_at
+        }
+
+class AuditLog(TenantOwned, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.Integer)
+    action = db.Column(db.String(20), nullable=False)  # create, update, delete
+    actor_id = db.Column(db.Integer)  # Null for system jobs
+    changes = db.Column(db.JSON, nullable=False)  # {field: [before, after]}
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_audit_log_tenant_created', 'tenant_id', 'created_at'),
+        db.Index('ix_audit_log_tenant_entity', 'tenant_id', 'entity_type', 'entity_id', 'created_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id,
+            'action': self.action,
+            'actor_id': self.actor_id,
+            'changes': self.changes,
             'created_at': self.created_at
-        }
\ No newline at end of file
+        }
+
+class OutboxEvent(TenantOwned, db.Model):
+    # Change events written in the same transaction as the change itself and
+    # delivered to webhook targets in id order, all tenants in one stream
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.Integer)
+    action = db.Column(db.String(20), nullable=False)  # create, update, delete
+    payload = db.Column(db.JSON, nullable=False)  # Row state after the change, before it for deletes
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'entity_type': self.entity_type,
+            'tenant_id': self.tenant_id,
+            'entity_id': self.entity_id,
+            'action': self.action,
+            'payload': self.payload,
+            'created_at': self.created_at.isoformat()
+        }
+
+class OutboxCursor(db.Model):
+    # Delivery position per webhook target; a failing target backs off
+    # without holding up the others
+    target = db.Column(db.String(50), primary_key=True)
+    delivered_until = db.Column(db.Integer, nullable=False, default=0)  # Last OutboxEvent.id acknowledged
+    gaps = db.Column(db.JSON, nullable=False, default=dict)  # Passed ids not committed yet -> first seen, ISO
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    last_delivered_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'target': self.target,
+            'delivered_until': self.delivered_until,
+            'gaps': self.gaps,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at,
+            'last_error': self.last_error,
+            'last_delivered_at': self.last_delivered_at
+        }
+
+class ArchivedRisk(TenantOwned, db.Model):
+    # Closed risks moved out of the risk table by archive.py; ids are kept so
+    # audit and outbox references still resolve
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    severity = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    likelihood = db.Column(db.Integer)
+    impact = db.Column(db.Integer)
+    asset_criticality = db.Column(db.Integer, nullable=False, default=3)
+    score = db.Column(db.Float)
+    fingerprint = db.Column(db.String(64))
+    source = db.Column(db.String(50))
+    last_seen_at = db.Column(db.DateTime)
+    auto_closed = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    project_ids = db.Column(db.JSON, nullable=False, default=list)  # Links at the time of archival
+    framework_ids = db.Column(db.JSON, nullable=False, default=list)
+
+    __table_args__ = (
+        db.Index('ix_archived_risk_tenant_fingerprint', 'tenant_id', 'fingerprint'),
+        db.Index('ix_archived_risk_tenant_archived', 'tenant_id', 'archived_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'severity': self.severity,
+            'status': self.status,
+            'likelihood': self.likelihood,
+            'impact': self.impact,
+            'asset_criticality': self.asset_criticality,
+            'score': self.score,
+            'source': self.source,
+            'last_seen_at': self.last_seen_at,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'archived': True,
+            'archived_at': self.archived_at,
+            'project_ids': self.project_ids,
+            'framework_ids': self.framework_ids
+        }
+
+class ArchivedProject(TenantOwned, db.Model):
+    # Completed projects moved out of the project table by archive.py
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    status = db.Column(db.String(20), nullable=False)
+    completion_percentage = db.Column(db.Float, default=0)
+    start_date = db.Column(db.DateTime)
+    due_date = db.Column(db.DateTime)
+    is_overdue = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    risk_ids = db.Column(db.JSON, nullable=False, default=list)  # Links at the time of archival
+
+    __table_args__ = (
+        db.Index('ix_archived_project_tenant_archived', 'tenant_id', 'archived_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'status': self.status,
+            'completion_percentage': self.completion_percentage,
+            'start_date': self.start_date,
+            'due_date': self.due_date,
+            'is_overdue': self.is_overdue,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'archived': True,
+            'archived_at': self.archived_at,
+            'risk_ids': self.risk_ids
+        }
+
+# Temporal versions of the dashboard entities, written by database triggers
+# (temporal.py) on every insert, update and delete. Each row is the entity
+# as it was over [valid_from, valid_to); the current version has valid_to
+# set to OPEN_ENDED so "valid at T" is a plain range on indexed columns.
+OPEN_ENDED = datetime(9999, 12, 31)
+
+class RiskVersion(TenantOwned, db.Model):
+    version_id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, nullable=False)  # Risk.id; kept after the risk is deleted
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    severity = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    likelihood = db.Column(db.Integer)
+    impact = db.Column(db.Integer)
+    asset_criticality = db.Column(db.Integer, nullable=False, default=3)
+    score = db.Column(db.Float)  # Refreshed in place on the open version, see temporal.py
+    source = db.Column(db.String(50))
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    valid_from = db.Column(db.DateTime, nullable=False)
+    valid_to = db.Column(db.DateTime, nullable=False, default=OPEN_ENDED)
+
+    __table_args__ = (
+        # Versions valid at T: recent T scans from the valid_to end, old T from the valid_from end
+        db.Index('ix_risk_version_tenant_valid_to', 'tenant_id', 'valid_to', 'valid_from'),
+        db.Index('ix_risk_version_tenant_valid_from', 'tenant_id', 'valid_from', 'valid_to'),
+        db.Index('ix_risk_version_entity', 'id', 'valid_to'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'severity': self.severity,
+            'status': self.status,
+            'likelihood': self.likelihood,
+            'impact': self.impact,
+            'asset_criticality': self.asset_criticality,
+            'score': self.score,
+            'source': self.source,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
+
+class ProjectVersion(TenantOwned, db.Model):
+    version_id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, nullable=False)  # Project.id
+    name = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    status = db.Column(db.String(20), nullable=False)
+    completion_percentage = db.Column(db.Float, default=0)
+    start_date = db.Column(db.DateTime)
+    due_date = db.Column(db.DateTime)
+    is_overdue = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    valid_from = db.Column(db.DateTime, nullable=False)
+    valid_to = db.Column(db.DateTime, nullable=False, default=OPEN_ENDED)
+
+    __table_args__ = (
+        db.Index('ix_project_version_tenant_valid_to', 'tenant_id', 'valid_to', 'valid_from'),
+        db.Index('ix_project_version_tenant_valid_from', 'tenant_id', 'valid_from', 'valid_to'),
+        db.Index('ix_project_version_entity', 'id', 'valid_to'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'status': self.status,
+            'completion_percentage': self.completion_percentage,
+            'start_date': self.start_date,
+            'due_date': self.due_date,
+            'is_overdue': self.is_overdue,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
+
+class ComplianceFrameworkVersion(TenantOwned, db.Model):
+    version_id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, nullable=False)  # ComplianceFramework.id
+    name = db.Column(db.String(50), nullable=False)
+    current_score = db.Column(db.Float, nullable=False)
+    target_score = db.Column(db.Float, nullable=False)
+    last_assessment_date = db.Column(db.DateTime)
+    next_assessment_date = db.Column(db.DateTime)
+    assessment_due = db.Column(db.Boolean, nullable=False, default=False)
+    control_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    valid_from = db.Column(db.DateTime, nullable=False)
+    valid_to = db.Column(db.DateTime, nullable=False, default=OPEN_ENDED)
+
+    __table_args__ = (
+        db.Index('ix_compliance_framework_version_tenant_valid_to', 'tenant_id', 'valid_to', 'valid_from'),
+        db.Index('ix_compliance_framework_version_tenant_valid_from', 'tenant_id', 'valid_from', 'valid_to'),
+        db.Index('ix_compliance_framework_version_entity', 'id', 'valid_to'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'current_score': self.current_score,
+            'target_score': self.target_score,
+            'last_assessment_date': self.last_assessment_date,
+            'next_assessment_date': self.next_assessment_date,
+            'assessment_due': self.assessment_due,
+            'control_count': self.control_count,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
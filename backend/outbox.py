@@ -0,0 +1,319 @@
+import http.client
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from sqlalchemy import and_, delete, event, insert, or_
+
+from audit import column_values, row_values
+from models.models import db, OutboxEvent, OutboxCursor, Risk, ThreatLevel, ComplianceFramework
+
+logger = logging.getLogger(__name__)
+
+# Models whose changes are mirrored to the webhook targets
+OUTBOX_MODELS = {
+    Risk: 'risk',
+    ThreatLevel: 'threat_level',
+    ComplianceFramework: 'compliance_framework',
+}
+
+# Retry delay for a failing target doubles per attempt up to the cap
+BACKOFF_BASE = timedelta(seconds=5)
+BACKOFF_MAX = timedelta(minutes=15)
+
+# Ids are allocated at insert but become visible at commit, so a slow
+# transaction can commit a lower id after a higher one was delivered. Ids a
+# cursor passes without seeing are kept as gaps and sent once they commit;
+# a gap still empty after this long was rolled back and is dropped.
+GAP_TIMEOUT = timedelta(minutes=10)
+
+
+def _after_flush(session, flush_context):
+    """Write events on the flush's own connection so they commit with the change"""
+    rows = []
+    now = datetime.utcnow()
+    for action, objects in (('create', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for obj in objects:
+            entity_type = OUTBOX_MODELS.get(type(obj))
+            if entity_type is None:
+                continue
+            if action == 'update' and not session.is_modified(obj, include_collections=False):
+                continue
+            rows.append({
+                'tenant_id': obj.tenant_id,
+                'entity_type': entity_type,
+                'entity_id': obj.id,
+                'action': action,
+                'payload': column_values(obj),
+                'created_at': now
+            })
+    if rows:
+        session.connection().execute(insert(OutboxEvent), rows)
+
+
+def record_events(entity_type, action, rows):
+    """Events for Core writes, which the flush hook does not see; rows are the RETURNING mappings"""
+    if not rows:
+        return
+    now = datetime.utcnow()
+    db.session.execute(insert(OutboxEvent), [
+        {'entity_type': entity_type, 'entity_id': row['id'], 'action': action, 'payload': row_values(row),
+         'created_at': now}
+        for row in rows
+    ])
+
+
+def init_outbox():
+    """Record change events for every ORM write, whether or not a target is configured.
+
+    A target added later receives the events still within retention.
+    """
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+
+
+class WebhookTarget:
+    """A webhook endpoint with one persistent keep-alive connection.
+
+    Delivery only ever runs on the scheduler's leased job, so a single
+    connection per target is the whole pool. It is reopened after any
+    error since the server may have dropped it.
+    """
+
+    def __init__(self, name, url, timeout=10):
+        self.name = name
+        self.url = url
+        self.timeout = timeout
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"Invalid outbox target URL for {name}: {url}")
+        self._connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = self._connection_class(self._host, self._port, timeout=self.timeout)
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def send(self, events):
+        body = json.dumps({'events': events}, default=str).encode('utf-8')
+        headers = {
+            'Content-Type': 'application/json',
+            # Receivers dedupe on this after a retried delivery
+            'X-Cybether-Batch': f"{events[0]['id']}-{events[-1]['id']}"
+        }
+        with self._lock:
+            try:
+                connection = self._connect()
+                connection.request('POST', self._path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except Exception:
+                self.close()
+                raise
+            if response.will_close:
+                self.close()
+        if response.status >= 300:
+            raise RuntimeError(f"{self.name} returned {response.status}")
+
+
+_targets = {}
+
+
+def build_targets(config):
+    """Targets named in OUTBOX_TARGETS (comma separated name=url pairs).
+
+    Instances are cached so their connections survive between job runs.
+    """
+    targets = []
+    for entry in [e.strip() for e in config.get('OUTBOX_TARGETS', '').split(',') if e.strip()]:
+        name, sep, url = entry.partition('=')
+        if not sep or not name.strip() or not url.strip():
+            raise ValueError(f"Invalid outbox target: {entry}")
+        key = (name.strip(), url.strip())
+        if key not in _targets:
+            _targets[key] = WebhookTarget(*key)
+        targets.append(_targets[key])
+    return targets
+
+
+def backoff_delay(attempts):
+    return min(BACKOFF_BASE * (2 ** (attempts - 1)), BACKOFF_MAX)
+
+
+def _get_cursor(name):
+    cursor = db.session.get(OutboxCursor, name)
+    if cursor is None:
+        cursor = OutboxCursor(target=name, delivered_until=0, attempts=0, gaps={})
+        db.session.add(cursor)
+    return cursor
+
+
+def _open_gaps(cursor, now):
+    """The cursor's gap ids still worth waiting for, dropping those past GAP_TIMEOUT"""
+    gaps = {}
+    for event_id, seen_at in (cursor.gaps or {}).items():
+        if now - datetime.fromisoformat(seen_at) < GAP_TIMEOUT:
+            gaps[int(event_id)] = seen_at
+        else:
+            logger.warning(f"Outbox event {event_id} never committed, {cursor.target} stops waiting for it")
+    return gaps
+
+
+def deliver_target(target, batch_size=100, max_batches=10, now=None):
+    """Send a target its pending events in id order, one batch at a time.
+
+    The cursor only moves past a batch once the target acknowledged it, so
+    delivery is at-least-once. Ids below the newest delivered one that were
+    not visible yet belong to transactions still running: they are kept as
+    gaps and sent, ahead of newer events, once they commit. Such a late
+    event arrives after events with higher ids; receivers order by id when
+    it matters. A failure schedules the next attempt with exponential
+    backoff and stops this target's run.
+    """
+    now = now or datetime.utcnow()
+    cursor = _get_cursor(target.name)
+    if cursor.next_attempt_at is not None and cursor.next_attempt_at > now:
+        db.session.commit()
+        return 0
+
+    gaps = _open_gaps(cursor, now)
+    delivered = 0
+    for _ in range(max_batches):
+        pending = OutboxEvent.id > cursor.delivered_until
+        if gaps:
+            pending = or_(pending, OutboxEvent.id.in_(list(gaps)))
+        events = OutboxEvent.query.filter(pending).order_by(OutboxEvent.id).limit(batch_size).all()
+        if not events:
+            break
+        try:
+            target.send([e.to_dict() for e in events])
+        except Exception as e:
+            cursor.attempts += 1
+            cursor.next_attempt_at = now + backoff_delay(cursor.attempts)
+            cursor.last_error = str(e)
+            logger.warning(f"Outbox delivery to {target.name} failed (attempt {cursor.attempts}): {str(e)}")
+            break
+        sent = {e.id for e in events}
+        for event_id in sent & set(gaps):
+            del gaps[event_id]
+        # A new cursor starts at the oldest event kept, not at pruned ids
+        passed_from = cursor.delivered_until + 1 if cursor.delivered_until else events[0].id
+        for event_id in range(passed_from, events[-1].id):
+            if event_id not in sent:
+                gaps[event_id] = now.isoformat()
+        cursor.delivered_until = max(cursor.delivered_until, events[-1].id)
+        cursor.gaps = {str(event_id): seen_at for event_id, seen_at in gaps.items()}
+        cursor.attempts = 0
+        cursor.next_attempt_at = None
+        cursor.last_error = None
+        cursor.last_delivered_at = now
+        db.session.commit()
+        delivered += len(events)
+    # Also keeps gaps that timed out when nothing was sent
+    cursor.gaps = {str(event_id): seen_at for event_id, seen_at in gaps.items()}
+    db.session.commit()
+    return delivered
+
+
+def deliver_outbox(targets, batch_size=100, max_batches=10, now=None):
+    return {target.name: deliver_target(target, batch_size, max_batches, now) for target in targets}
+
+
+def prune_outbox(targets, retention_days, now=None):
+    """Delete events past retention that every target has acknowledged.
+
+    With no targets configured, events are kept for retention only, so a
+    target added later still receives the recent ones.
+    """
+    now = now or datetime.utcnow()
+    expired = OutboxEvent.created_at < now - timedelta(days=retention_days)
+    if targets:
+        names = [target.name for target in targets]
+        cursors = OutboxCursor.query.filter(OutboxCursor.target.in_(names)).all()
+        if len(cursors) < len(names):
+            # A target that has never run still needs everything
+            return {'deleted': 0}
+        delivered_until = min(cursor.delivered_until for cursor in cursors)
+        expired = and_(expired, OutboxEvent.id <= delivered_until)
+    deleted = db.session.execute(delete(OutboxEvent).where(expired)).rowcount
+    db.session.commit()
+    return {'deleted': deleted}
+
+
+def outbox_status(targets):
+    cursors = {c.target: c for c in OutboxCursor.query.all()}
+    status = []
+    for target in targets:
+        cursor = cursors.get(target.name)
+        entry = cursor.to_dict() if cursor else {'target': target.name, 'delivered_until': 0}
+        entry['url'] = target.url
+        # Delivery is one stream for every tenant, whichever tenant's admin asks
+        gaps = [int(event_id) for event_id in entry.get('gaps', {})]
+        entry['pending'] = OutboxEvent.query.filter(
+            or_(OutboxEvent.id > entry['delivered_until'], OutboxEvent.id.in_(gaps))
+        ).execution_options(all_tenants=True).count()
+        status.append(entry)
+    return status
+
+
+class LocalWebhookReceiver:
+    """In-process HTTP stand-in for a SIEM webhook, for local runs and tests.
+
+    Records every batch it accepts; fail_next makes the next N requests
+    return 503 to exercise backoff.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        receiver = self
+        self.batches = []
+        self.fail_next = 0
+        self.connections = set()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                receiver.connections.add(self.client_address)
+                if receiver.fail_next > 0:
+                    receiver.fail_next -= 1
+                    status = 503
+                else:
+                    receiver.batches.append(json.loads(body)['events'])
+                    status = 200
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/events"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,173 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Thread id -> route of the request it is serving, e.g. 'GET /api/risks'
+_active_routes = {}
+
+_sampling = threading.Lock()
+
+_SOURCE_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is already running in this worker"""
+
+
+def track_request(route):
+    _active_routes[threading.get_ident()] = route
+
+
+def untrack_request():
+    _active_routes.pop(threading.get_ident(), None)
+
+
+# Code objects outlive the samples, so each is labelled once
+@lru_cache(maxsize=8192)
+def _frame_label(code):
+    filename = code.co_filename
+    if filename.startswith(_SOURCE_ROOT):
+        filename = os.path.relpath(filename, _SOURCE_ROOT)
+    else:
+        # Libraries are named from their package down
+        parts = filename.replace('\\', '/').split('/site-packages/')
+        filename = parts[-1] if len(parts) > 1 else os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+
+
+def _collapse(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+def sample_stacks(seconds, interval, all_threads=False):
+    """Sample every thread's stack for seconds, every interval seconds.
+
+    Returns collapsed stacks (root first, ';' separated, prefixed with the
+    Flask route or thread name) with their sample counts, ready for
+    flamegraph.pl or speedscope. Only one sampler runs per worker; the
+    sampler's own cost is reported as overhead_pct.
+    """
+    if not _sampling.acquire(blocking=False):
+        raise ProfilerBusy('A profile is already running in this worker')
+    try:
+        stacks = Counter()
+        routes = Counter()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = {threading.get_ident()}
+        samples = 0
+        busy = 0.0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while True:
+            tick = time.perf_counter()
+            if tick >= deadline:
+                break
+            for ident, frame in sys._current_frames().items():
+                if ident in own:
+                    continue
+                route = _active_routes.get(ident)
+                if route is None:
+                    if not all_threads:
+                        continue
+                    if ident not in names:
+                        names = {thread.ident: thread.name for thread in threading.enumerate()}
+                    route = f"[{names.get(ident, ident)}]"
+                stacks[';'.join([route] + _collapse(frame))] += 1
+                routes[route] += 1
+            samples += 1
+            spent = time.perf_counter() - tick
+            busy += spent
+            time.sleep(max(interval - spent, 0))
+        elapsed = time.perf_counter() - started
+    finally:
+        _sampling.release()
+    logger.info(f"Sampled {samples} ticks over {elapsed:.1f}s")
+
+    return {
+        'seconds': round(elapsed, 3),
+        'interval_ms': round(interval * 1000, 3),
+        'ticks': samples,
+        'overhead_pct': round(busy / elapsed * 100, 2) if elapsed else 0.0,
+        'routes': dict(routes.most_common()),
+        'collapsed': '\n'.join(f"{stack} {count}" for stack, count in stacks.most_common()),
+    }
+
+
+class RequestProfiler:
+    """cProfile for single requests, with tight limits on what it may cost.
+
+    At most max_concurrent requests are profiled at once per worker and no
+    more than one every min_interval seconds; requests past either limit run
+    unprofiled. Results are kept in memory, the most recent keep only.
+    """
+
+    def __init__(self, max_concurrent=1, min_interval=1.0, keep=20, top=40):
+        self.min_interval = min_interval
+        self.keep = keep
+        self.top = top
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._last_started = 0.0
+        self._results = OrderedDict()
+
+    def start(self):
+        """Begin profiling the calling thread's request; None when over the limits"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_started < self.min_interval:
+                return None
+            if not self._slots.acquire(blocking=False):
+                return None
+            self._last_started = now
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def finish(self, profile, route):
+        """Stop profiling and keep the report; returns its id"""
+        profile.disable()
+        self._slots.release()
+        out = io.StringIO()
+        stats = pstats.Stats(profile, stream=out)
+        stats.sort_stats('cumulative').print_stats(self.top)
+        profile_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._results[profile_id] = {
+                'id': profile_id,
+                'route': route,
+                'created_at': datetime.utcnow(),
+                'total_ms': round(stats.total_tt * 1000, 3),
+                'calls': stats.total_calls,
+                'report': out.getvalue(),
+            }
+            while len(self._results) > self.keep:
+                self._results.popitem(last=False)
+        logger.info(f"Profiled {route} as {profile_id}")
+        return profile_id
+
+    def get(self, profile_id):
+        with self._lock:
+            if profile_id not in self._results:
+                raise LookupError(profile_id)
+            return self._results[profile_id]
+
+    def list(self):
+        with self._lock:
+            return [{key: value for key, value in result.items() if key != 'report'}
+                    for result in reversed(self._results.values())]
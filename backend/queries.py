@@ -0,0 +1,108 @@
+"""Statements behind the dashboard's read endpoints.
+
+Shared by the Flask routes and the async read path (async_app.py) so both
+serve the same rows in the same order. Nothing here touches a session;
+tenancy.py scopes the statements to the bound tenant when they execute.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import false, select
+
+from history import METRICS
+from models.models import Risk, Project, ComplianceFramework, MaturityTrendPoint, SavedFrameworkView, CurrentMetric
+from temporal import parse_as_of, versioned_select
+
+# Frameworks shown on the dashboard until a user saves their own view
+DEFAULT_FRAMEWORK_VIEW = ['PCI DSS', 'NIST CSF', 'ISO 27001', 'SOC 2', 'NCSC CAF', 'Cyber Essentials']
+
+# Columns of ComplianceFramework, or of its versions for as_of reads
+COMPLIANCE_SORT_FIELDS = ('name', 'current_score', 'target_score', 'last_assessment_date', 'next_assessment_date')
+
+
+def parse_number_arg(args, name, cast=float):
+    try:
+        return cast(args[name])
+    except ValueError:
+        raise ValueError(f'Invalid {name} value')
+
+
+def risks_statement(as_of=None):
+    risk, stmt = versioned_select(Risk, as_of)
+    return stmt.order_by(risk.score.desc().nulls_last(), risk.updated_at.desc())
+
+
+def projects_statement(as_of=None):
+    project, stmt = versioned_select(Project, as_of)
+    return stmt.order_by(project.due_date.asc())
+
+
+def trend_statement():
+    return select(MaturityTrendPoint).order_by(MaturityTrendPoint.month)
+
+
+def saved_view_statement(user_id):
+    return select(SavedFrameworkView.framework_name).where(
+        SavedFrameworkView.user_id == user_id
+    ).order_by(SavedFrameworkView.id)
+
+
+def compliance_statement(args, saved_names=None):
+    """Translate request args into a filtered, sorted ComplianceFramework select.
+
+    saved_names is the caller's saved view when view=saved was requested.
+    With as_of the frameworks are read as they were at that time.
+    """
+    as_of = parse_as_of(args)
+    framework, stmt = versioned_select(ComplianceFramework, as_of)
+
+    # name may be repeated (?name=A&name=B) or comma separated (?name=A,B)
+    names = [n.strip() for value in args.getlist('name') for n in value.split(',') if n.strip()]
+    if saved_names is not None:
+        saved = saved_names or DEFAULT_FRAMEWORK_VIEW
+        names = [n for n in names if n in saved] if names else saved
+        if not names:
+            return stmt.where(false())
+    if names:
+        stmt = stmt.where(framework.name.in_(names))
+
+    if 'min_score' in args:
+        stmt = stmt.where(framework.current_score >= parse_number_arg(args, 'min_score'))
+    if 'max_score' in args:
+        stmt = stmt.where(framework.current_score <= parse_number_arg(args, 'max_score'))
+    if args.get('below_target', '').lower() == 'true':
+        stmt = stmt.where(framework.current_score < framework.target_score)
+    if 'due_within_days' in args:
+        due_by = (as_of or datetime.utcnow()) + timedelta(days=parse_number_arg(args, 'due_within_days', int))
+        stmt = stmt.where(framework.next_assessment_date <= due_by)
+
+    sort = args.get('sort', 'current_score')
+    if sort not in COMPLIANCE_SORT_FIELDS:
+        raise ValueError(f'Sort must be one of: {", ".join(COMPLIANCE_SORT_FIELDS)}')
+    order = args.get('order', 'desc')
+    if order not in ('asc', 'desc'):
+        raise ValueError('Order must be asc or desc')
+    column = getattr(framework, sort)
+    return stmt.order_by(column.asc() if order == 'asc' else column.desc(), framework.id)
+
+
+def latest_metric_statement(metric):
+    model = METRICS[metric]['model']
+    return select(model).order_by(model.updated_at.desc()).limit(1)
+
+
+def metric_from_row(metric, row):
+    """An unsaved CurrentMetric built from a history row"""
+    spec = METRICS[metric]
+    return CurrentMetric(metric=metric, value=spec['value'](row), label=spec['label'](row),
+                         description=spec['description'](row), updated_at=row.updated_at)
+
+
+def metric_payload(metric, current):
+    """Response body for a current metric, with defaults before any value exists"""
+    if metric == 'threat_level':
+        if current is None:
+            return {'level': 'Low', 'description': 'No current threats', 'updated_at': datetime.utcnow()}
+        return {'level': current.label, 'description': current.description, 'updated_at': current.updated_at}
+    if current is None:
+        return {'score': 1.0, 'trend': 'Stable', 'updated_at': datetime.utcnow()}
+    return {'score': current.value, 'trend': current.label, 'updated_at': current.updated_at}
@@ -0,0 +1,535 @@
+"""Monthly report packs: risks, projects, compliance and the maturity trend.
+
+POST /api/reports records a ReportJob and hands it to a process pool, so no
+request waits on rendering. Workers read through their own connection with
+streaming queries and write the artifact under REPORT_DIR, named after the
+data it was built from: asking again while the inputs are unchanged is
+answered with the file already there.
+"""
+import csv
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
+from functools import partial
+from xml.sax.saxutils import escape
+
+from flask import Flask
+from sqlalchemy import delete, func, select, update
+from werkzeug.datastructures import MultiDict
+
+from config import Config
+from models.models import db, Risk, MaturityTrendPoint, ReportJob
+from queries import risks_statement, projects_statement, compliance_statement
+from stats import compute_project_stats, compute_compliance_stats
+from temporal import VERSIONED_MODELS, versioned_select
+from tenancy import bound_tenant, init_tenancy, tenant_scope
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'pdf': 'application/pdf',
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# Part of every data version: bump it when the rendered content changes so
+# artifacts in the old layout are not served again
+LAYOUT_VERSION = 1
+
+ARTIFACT_PREFIX = 'cybether-report-'
+
+# Rows fetched per round trip while a section streams
+STREAM_BATCH_SIZE = 500
+
+# (header, attribute, width in characters for the PDF)
+SUMMARY_COLUMNS = [('Measure', 'measure', 40), ('Value', 'value', 40)]
+RISK_COLUMNS = [
+    ('ID', 'id', 6), ('Title', 'title', 50), ('Severity', 'severity', 9), ('Status', 'status', 12),
+    ('Likelihood', 'likelihood', 10), ('Impact', 'impact', 6), ('Score', 'score', 8),
+    ('Source', 'source', 12), ('Updated', 'updated_at', 16),
+]
+PROJECT_COLUMNS = [
+    ('ID', 'id', 6), ('Name', 'name', 50), ('Status', 'status', 12), ('Complete %', 'completion_percentage', 10),
+    ('Start', 'start_date', 16), ('Due', 'due_date', 16), ('Overdue', 'is_overdue', 7),
+]
+FRAMEWORK_COLUMNS = [
+    ('Framework', 'name', 24), ('Score', 'current_score', 8), ('Target', 'target_score', 8),
+    ('Last assessed', 'last_assessment_date', 16), ('Next assessment', 'next_assessment_date', 16),
+    ('Due', 'assessment_due', 5), ('Controls', 'control_count', 8),
+]
+TREND_COLUMNS = [('Month', 'month', 8), ('Score', 'score', 8), ('Source', 'source', 8)]
+
+PROJECT_STAT_LABELS = {
+    'total_projects': 'Projects',
+    'completed_projects': 'Projects completed',
+    'in_progress_projects': 'Projects in progress',
+    'overdue_projects': 'Projects overdue',
+    'completion_rate': 'Project completion rate (%)',
+}
+COMPLIANCE_STAT_LABELS = {
+    'average_score': 'Average compliance score',
+    'frameworks_meeting_target': 'Frameworks meeting target',
+    'frameworks_below_target': 'Frameworks below target',
+    'overall_compliance_status': 'Overall compliance status',
+    'upcoming_assessments': 'Assessments due within 30 days',
+}
+SEVERITIES = ('Critical', 'High', 'Medium', 'Low')
+
+
+def default_month(now=None):
+    """The last complete month"""
+    now = now or datetime.utcnow()
+    return (now.date().replace(day=1) - timedelta(days=1)).replace(day=1)
+
+
+def report_as_of(month, now=None):
+    """The time a month's report reads the data at: the end of the month, or now while it runs"""
+    now = now or datetime.utcnow()
+    if month > now.date():
+        raise ValueError('Month cannot be in the future')
+    next_month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return min(datetime.combine(next_month, datetime.min.time()) - timedelta(microseconds=1), now)
+
+
+def trend_points_statement(month):
+    return select(MaturityTrendPoint).where(MaturityTrendPoint.month <= month).order_by(MaturityTrendPoint.month)
+
+
+def data_version(month, as_of):
+    """Fingerprint of everything the bound tenant's report for month reads at as_of.
+
+    The versions current at as_of are identified by their count and highest
+    version_id, since any write adds a version or closes one. Trend points
+    are few and hashed as they are. Overdue and upcoming counts depend on
+    the date, so it is part of the fingerprint too.
+    """
+    digest = hashlib.sha256(
+        f"{LAYOUT_VERSION}|{bound_tenant()}|{month.isoformat()}|{as_of.date().isoformat()}".encode()
+    )
+    for model in VERSIONED_MODELS:
+        version, stmt = versioned_select(model, as_of)
+        count, highest = db.session.execute(
+            stmt.with_only_columns(func.count(), func.max(version.version_id))
+        ).one()
+        digest.update(f"|{count}:{highest}".encode())
+    for point in db.session.execute(trend_points_statement(month)).scalars():
+        digest.update(f"|{point.month.isoformat()}:{point.score}:{point.source}".encode())
+    return digest.hexdigest()[:32]
+
+
+def artifact_name(tenant_id, month, version, fmt):
+    return f"{ARTIFACT_PREFIX}{tenant_id}-{month.strftime('%Y-%m')}-{version}.{fmt}"
+
+
+def _stream(stmt):
+    # Server-side cursor where the driver has one; rows are never all in memory
+    yield from db.session.execute(stmt.execution_options(yield_per=STREAM_BATCH_SIZE)).scalars()
+
+
+def _summary_rows(month, as_of):
+    risk, stmt = versioned_select(Risk, as_of)
+    counts = db.session.execute(
+        stmt.with_only_columns(risk.status, risk.severity, func.count()).group_by(risk.status, risk.severity)
+    ).all()
+    open_counts = {}
+    for status, severity, count in counts:
+        if status != 'Closed':
+            open_counts[severity] = open_counts.get(severity, 0) + count
+
+    rows = [
+        {'measure': 'Report month', 'value': month.strftime('%Y-%m')},
+        {'measure': 'Data as of (UTC)', 'value': as_of},
+        {'measure': 'Risks', 'value': sum(count for _, _, count in counts)},
+        {'measure': 'Open risks', 'value': sum(open_counts.values())},
+    ]
+    rows.extend({'measure': f"Open risks ({severity})", 'value': open_counts.get(severity, 0)}
+                for severity in SEVERITIES)
+    for stats, labels in ((compute_project_stats(as_of=as_of), PROJECT_STAT_LABELS),
+                          (compute_compliance_stats(as_of=as_of), COMPLIANCE_STAT_LABELS)):
+        rows.extend({'measure': label, 'value': stats[key]} for key, label in labels.items() if key in stats)
+    return rows
+
+
+def report_sections(month, as_of):
+    """(title, columns, rows) for each part of the pack; the lists stream as they are written"""
+    return [
+        ('Summary', SUMMARY_COLUMNS, _summary_rows(month, as_of)),
+        ('Risks', RISK_COLUMNS, _stream(risks_statement(as_of))),
+        ('Projects', PROJECT_COLUMNS, _stream(projects_statement(as_of))),
+        ('Compliance', FRAMEWORK_COLUMNS, _stream(compliance_statement(MultiDict({'as_of': as_of.isoformat()})))),
+        ('Maturity Trend', TREND_COLUMNS, _stream(trend_points_statement(month))),
+    ]
+
+
+def _value(row, attribute):
+    value = row[attribute] if isinstance(row, dict) else getattr(row, attribute)
+    if attribute == 'month' and isinstance(value, date):
+        return value.strftime('%Y-%m')
+    return value
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'Yes' if value else 'No'
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float):
+        return f"{round(value, 2):g}"
+    return ' '.join(str(value).split())
+
+
+def write_csv(out, sections):
+    text = io.TextIOWrapper(out, encoding='utf-8', newline='')
+    writer = csv.writer(text)
+    for number, (title, columns, rows) in enumerate(sections):
+        if number:
+            writer.writerow([])
+        writer.writerow([title])
+        writer.writerow([header for header, _, _ in columns])
+        for row in rows:
+            cells = []
+            for _, attribute, _ in columns:
+                value = _value(row, attribute)
+                cell = _text(value)
+                # Keep spreadsheet apps from running scanner supplied text as a formula
+                if isinstance(value, str) and cell[:1] in ('=', '+', '-', '@'):
+                    cell = "'" + cell
+                cells.append(cell)
+            writer.writerow(cells)
+    text.flush()
+    text.detach()
+
+
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '{sheets}</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/></Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets>{sheets}</sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '{sheets}</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value!r}</v></c>'
+    text = escape(_XML_ILLEGAL.sub('', _text(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def write_xlsx(out, sections):
+    """A workbook with one sheet per section; rows are streamed into the zip"""
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as package:
+        for number, (title, columns, rows) in enumerate(sections, start=1):
+            with package.open(f'xl/worksheets/sheet{number}.xml', 'w') as sheet:
+                sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                            b'<sheetData>')
+                sheet.write(f'<row r="1">{"".join(_xlsx_cell(h) for h, _, _ in columns)}</row>'.encode())
+                for index, row in enumerate(rows, start=2):
+                    cells = ''.join(_xlsx_cell(_value(row, attribute)) for _, attribute, _ in columns)
+                    sheet.write(f'<row r="{index}">{cells}</row>'.encode())
+                sheet.write(b'</sheetData></worksheet>')
+
+        numbers = range(1, len(sections) + 1)
+        names = [escape(title[:31]) for title, _, _ in sections]
+        parts = {
+            '[Content_Types].xml': ''.join(
+                f'<Override PartName="/xl/worksheets/sheet{n}.xml" '
+                f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for n in numbers),
+            '_rels/.rels': '',
+            'xl/workbook.xml': ''.join(
+                f'<sheet name="{name}" sheetId="{n}" r:id="rId{n}"/>' for n, name in zip(numbers, names)),
+            'xl/_rels/workbook.xml.rels': ''.join(
+                f'<Relationship Id="rId{n}" '
+                f'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                f'Target="worksheets/sheet{n}.xml"/>' for n in numbers),
+        }
+        for name, sheets in parts.items():
+            package.writestr(name, _XLSX_PARTS[name].replace('{sheets}', sheets))
+
+
+# A4 landscape in points, set in 8pt Courier (0.6em per character)
+PDF_PAGE_SIZE = (842, 595)
+PDF_MARGIN = 36
+PDF_FONT_SIZE = 8
+PDF_LEADING = 10
+PDF_LINES_PER_PAGE = (PDF_PAGE_SIZE[1] - 2 * PDF_MARGIN) // PDF_LEADING
+
+
+class _PdfWriter:
+    """Just enough PDF for pages of monospaced text, written out page by page"""
+
+    def __init__(self, out):
+        self.out = out
+        self.offsets = {}
+        self.pages = []
+        self.position = 0
+        # 1 is the catalog, 2 the page tree and 3 the font, all written on close()
+        self.next_object = 4
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _write(self, data):
+        self.out.write(data)
+        self.position += len(data)
+
+    def _object(self, number, body):
+        self.offsets[number] = self.position
+        self._write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+
+    def page(self, lines):
+        top = PDF_PAGE_SIZE[1] - PDF_MARGIN
+        ops = [b'BT /F1 %d Tf %d TL %d %d Td' % (PDF_FONT_SIZE, PDF_LEADING, PDF_MARGIN, top)]
+        for line in lines:
+            encoded = line.encode('cp1252', 'replace')
+            encoded = encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+            ops.append(b'(' + encoded + b') Tj T*')
+        ops.append(b'ET')
+        stream = b'\n'.join(ops)
+
+        content, page = self.next_object, self.next_object + 1
+        self.next_object += 2
+        self._object(content, b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        self._object(page, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PDF_PAGE_SIZE[0]} {PDF_PAGE_SIZE[1]}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content} 0 R >>"
+        ).encode())
+        self.pages.append(page)
+
+    def close(self):
+        self._object(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>')
+        kids = ' '.join(f"{page} 0 R" for page in self.pages)
+        self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>".encode())
+        self._object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        xref = self.position
+        self._write(b'xref\n0 %d\n0000000000 65535 f \n' % self.next_object)
+        self._write(b''.join(b'%010d 00000 n \n' % self.offsets[n] for n in range(1, self.next_object)))
+        self._write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (self.next_object, xref))
+
+
+def _fixed_width(values, columns):
+    cells = []
+    for value, (_, _, width) in zip(values, columns):
+        cells.append(value if len(value) <= width else value[:width - 3] + '...')
+        cells[-1] = cells[-1].ljust(width)
+    return ' '.join(cells).rstrip()
+
+
+def write_pdf(out, sections):
+    pdf = _PdfWriter(out)
+    lines = []
+    for title, columns, rows in sections:
+        header = _fixed_width([h for h, _, _ in columns], columns)
+        heading = [title, header, '-' * len(header)]
+        if lines and len(lines) + len(heading) + 2 > PDF_LINES_PER_PAGE:
+            pdf.page(lines)
+            lines = []
+        lines.extend(([''] if lines else []) + heading)
+        for row in rows:
+            if len(lines) >= PDF_LINES_PER_PAGE:
+                pdf.page(lines)
+                lines = [f"{title} (continued)", header, heading[2]]
+            lines.append(_fixed_width([_text(_value(row, attribute)) for _, attribute, _ in columns], columns))
+    pdf.page(lines)
+    pdf.close()
+
+
+WRITERS = {'pdf': write_pdf, 'csv': write_csv, 'xlsx': write_xlsx}
+
+# One bare app per worker process: the database and nothing else
+_worker_apps = {}
+
+
+def _worker_app(database_url):
+    if database_url not in _worker_apps:
+        app = Flask(__name__)
+        app.config.from_object(Config)
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+        db.init_app(app)
+        init_tenancy()
+        _worker_apps[database_url] = app
+    return _worker_apps[database_url]
+
+
+def render_report(database_url, tenant_id, job_id, month, as_of, fmt, path):
+    """Render one of a tenant's reports to path; runs in a pool worker and returns the file size"""
+    with _worker_app(database_url).app_context(), tenant_scope(tenant_id):
+        db.session.execute(
+            update(ReportJob).where(ReportJob.id == job_id).values(status='running', started_at=datetime.utcnow())
+        )
+        db.session.commit()
+
+        # Written aside and renamed, so a reader never sees half a file
+        partial_path = f"{path}.{os.getpid()}.part"
+        try:
+            with open(partial_path, 'wb') as out:
+                WRITERS[fmt](out, report_sections(month, as_of))
+            os.replace(partial_path, path)
+        finally:
+            if os.path.exists(partial_path):
+                os.unlink(partial_path)
+        return os.path.getsize(path)
+
+
+class ReportService:
+    """Queues report jobs onto a process pool and records how they end.
+
+    The pool is started on the first render. Workers are spawned rather
+    than forked since the server is threaded.
+    """
+
+    def __init__(self, app, directory, workers=2, job_timeout=900):
+        self.app = app
+        self.directory = directory
+        self.workers = workers
+        self.job_timeout = job_timeout
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def path(self, job):
+        return os.path.join(self.directory, job.artifact)
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def create(self, month, fmt, user_id=None, now=None):
+        """Record a report job of the bound tenant for month and start it; returns the ReportJob.
+
+        A report whose inputs are unchanged is done at once from the cached
+        artifact, and an identical one already queued or running is returned
+        instead of being rendered twice.
+        """
+        now = now or datetime.utcnow()
+        as_of = report_as_of(month, now)
+        version = data_version(month, as_of)
+
+        active = ReportJob.query.filter(
+            ReportJob.month == month, ReportJob.format == fmt, ReportJob.data_version == version,
+            ReportJob.status.in_(ACTIVE_STATUSES),
+            ReportJob.created_at >= now - timedelta(seconds=self.job_timeout)
+        ).order_by(ReportJob.created_at).first()
+        if active is not None:
+            return active
+
+        tenant_id = bound_tenant()
+        job = ReportJob(id=uuid.uuid4().hex, month=month, format=fmt, data_version=version, as_of=as_of,
+                        artifact=artifact_name(tenant_id, month, version, fmt), requested_by=user_id,
+                        created_at=now)
+        path = self.path(job)
+        try:
+            # Touched so the retention sweep counts from the last request
+            os.utime(path)
+            job.status, job.cached, job.size, job.finished_at = 'done', True, os.path.getsize(path), now
+        except FileNotFoundError:
+            job.status = 'queued'
+        db.session.add(job)
+        db.session.commit()
+        if job.status == 'queued':
+            os.makedirs(self.directory, exist_ok=True)
+            future = self._executor().submit(render_report, self.app.config['SQLALCHEMY_DATABASE_URI'],
+                                             tenant_id, job.id, month, as_of, fmt, path)
+            future.add_done_callback(partial(self._finished, job.id))
+        return job
+
+    def _finished(self, job_id, future):
+        values = {'finished_at': datetime.utcnow()}
+        try:
+            values.update(status='done', size=future.result())
+            logger.info(f"Report {job_id} rendered ({values['size']} bytes)")
+        except Exception as e:
+            logger.error(f"Report {job_id} failed: {str(e)}")
+            values.update(status='failed', error=str(e) or type(e).__name__)
+            if isinstance(e, BrokenProcessPool):
+                # A worker died; the next report starts a new pool
+                with self._lock:
+                    self._pool = None
+        try:
+            with self.app.app_context():
+                db.session.execute(update(ReportJob).where(ReportJob.id == job_id).values(**values))
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Could not record the outcome of report {job_id}: {str(e)}")
+
+    def stop(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+def prune_reports(directory, retention_days, job_timeout, now=None):
+    """Fail jobs that never finished, and drop old jobs and unrequested artifacts"""
+    now = now or datetime.utcnow()
+    timed_out = db.session.execute(
+        update(ReportJob)
+        .where(ReportJob.status.in_(ACTIVE_STATUSES), ReportJob.created_at < now - timedelta(seconds=job_timeout))
+        .values(status='failed', error='Timed out', finished_at=now)
+    ).rowcount
+    cutoff = now - timedelta(days=retention_days)
+    jobs = db.session.execute(delete(ReportJob).where(ReportJob.created_at < cutoff)).rowcount
+    db.session.commit()
+
+    files = 0
+    if os.path.isdir(directory):
+        # File times are epoch seconds, not naive UTC
+        artifact_cutoff = time.time() - retention_days * 86400
+        partial_cutoff = time.time() - job_timeout
+        for name in os.listdir(directory):
+            if not name.startswith(ARTIFACT_PREFIX):
+                continue
+            path = os.path.join(directory, name)
+            limit = partial_cutoff if name.endswith('.part') else artifact_cutoff
+            try:
+                if os.path.getmtime(path) < limit:
+                    os.unlink(path)
+                    files += 1
+            except FileNotFoundError:
+                pass
+    return {'timed_out': timed_out, 'jobs': jobs, 'files': files}
@@ -0,0 +1,188 @@
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from models.models import db, ScheduledJob
+from tenancy import tenant_scope
+
+logger = logging.getLogger(__name__)
+
+# name -> {'func': callable, 'interval': seconds}
+JOBS = {}
+
+
+def register_job(name, interval_seconds):
+    """Decorator registering a function as a periodic background job"""
+    def wrapper(fn):
+        JOBS[name] = {'func': fn, 'interval': interval_seconds}
+        return fn
+    return wrapper
+
+
+class Scheduler:
+    """In-process job runner safe to start in every worker.
+
+    Job state lives in the ScheduledJob table. Before running a job a worker
+    takes a lease with a conditional UPDATE; only the worker whose UPDATE
+    matched runs it, so each job has a single leader at a time even with
+    many gunicorn workers or containers. The leader renews the lease while
+    the job runs, however long it takes; a crashed leader's lease simply
+    expires.
+    """
+
+    def __init__(self, app, tick_seconds=5, lease_seconds=300):
+        self.app = app
+        self.tick_seconds = tick_seconds
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name='cybether-scheduler', daemon=True)
+        self._thread.start()
+        logger.info(f"Scheduler started on {self.worker_id} with {len(JOBS)} jobs")
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                logger.error(f"Scheduler tick failed: {str(e)}")
+                logger.error(traceback.format_exc())
+            self._stop.wait(self.tick_seconds)
+
+    def sync_jobs(self):
+        """Create state rows for registered jobs and pick up interval changes"""
+        existing = {job.name: job for job in ScheduledJob.query.all()}
+        for name, spec in JOBS.items():
+            job = existing.get(name)
+            if job is None:
+                db.session.add(ScheduledJob(name=name, interval_seconds=spec['interval'],
+                                            next_run_at=datetime.utcnow()))
+            elif job.interval_seconds != spec['interval']:
+                job.interval_seconds = spec['interval']
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another worker created the rows first
+            db.session.rollback()
+
+    def run_pending(self):
+        with self.app.app_context():
+            self.sync_jobs()
+            now = datetime.utcnow()
+            due = [job.name for job in ScheduledJob.query.filter(ScheduledJob.next_run_at <= now)]
+            db.session.commit()
+            for name in due:
+                if name in JOBS and self._acquire(name, now, due_only=True):
+                    self._run(name)
+
+    def run_now(self, name):
+        """Run a job immediately if no other worker holds its lease"""
+        if name not in JOBS:
+            raise KeyError(name)
+        if not self._acquire(name, datetime.utcnow()):
+            return None
+        return self._run(name)
+
+    def _acquire(self, name, now, due_only=False):
+        conditions = [
+            ScheduledJob.name == name,
+            or_(ScheduledJob.locked_until.is_(None), ScheduledJob.locked_until < now)
+        ]
+        if due_only:
+            # The job may have been listed as due, then run and released by
+            # another worker before this UPDATE; it must not run again
+            conditions.append(ScheduledJob.next_run_at <= now)
+        acquired = db.session.execute(
+            update(ScheduledJob)
+            .where(*conditions)
+            .values(locked_by=self.worker_id, locked_until=now + timedelta(seconds=self.lease_seconds))
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+        db.session.commit()
+        return acquired
+
+    def _renew(self, name):
+        with self.app.app_context():
+            renewed = db.session.execute(
+                update(ScheduledJob)
+                .where(ScheduledJob.name == name, ScheduledJob.locked_by == self.worker_id)
+                .values(locked_until=datetime.utcnow() + timedelta(seconds=self.lease_seconds))
+                .execution_options(synchronize_session=False)
+            ).rowcount == 1
+            db.session.commit()
+        if not renewed:
+            logger.warning(f"Lease on job {name} was lost while it ran")
+
+    @contextmanager
+    def _leased(self, name):
+        """Renew the job's lease every third of its length until the block exits"""
+        done = threading.Event()
+
+        def renew():
+            while not done.wait(self.lease_seconds / 3):
+                try:
+                    self._renew(name)
+                except Exception as e:
+                    logger.error(f"Renewing lease on job {name} failed: {str(e)}")
+
+        thread = threading.Thread(target=renew, name=f'cybether-lease-{name}', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+
+    def _run(self, name):
+        spec = JOBS[name]
+        started = time.perf_counter()
+        started_at = datetime.utcnow()
+        status, error, result = 'success', None, None
+        try:
+            # Unbound even when run from a tenant admin's request: jobs cover every tenant
+            with tenant_scope(None), self._leased(name):
+                result = spec['func']()
+        except Exception as e:
+            db.session.rollback()
+            status, error = 'failed', str(e)
+            logger.error(f"Job {name} failed: {error}")
+            logger.error(traceback.format_exc())
+
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        db.session.execute(
+            update(ScheduledJob)
+            .where(ScheduledJob.name == name, ScheduledJob.locked_by == self.worker_id)
+            .values(
+                last_run_at=started_at,
+                last_status=status,
+                last_error=error,
+                last_duration_ms=duration_ms,
+                next_run_at=started_at + timedelta(seconds=spec['interval']),
+                locked_by=None,
+                locked_until=None
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        logger.info(f"Job {name} finished with {status} in {duration_ms}ms")
+        return {'name': name, 'status': status, 'error': error, 'duration_ms': duration_ms,
+                'result': result}
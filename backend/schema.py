@@ -0,0 +1,47 @@
+"""Database schema setup on start.
+
+The schema is versioned with Flask-Migrate (Alembic) revisions in
+migrations/. An empty database is created from the models in one pass
+and stamped with the head revision; any other database is upgraded to
+head. A database created by db.create_all() before migrations existed has
+no version table and is at the baseline revision, so it is stamped with
+that first.
+"""
+import logging
+import os
+
+from flask_migrate import stamp, upgrade
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# Schema of the first release, which unversioned databases are at
+BASELINE_REVISION = '0001'
+
+# Serializes schema setup between workers starting together
+_PG_MIGRATE_LOCK = 7_048_002
+
+
+def init_schema(db):
+    """Create or upgrade the schema; call inside an app context"""
+    dialect = db.engine.dialect.name
+    with db.engine.connect() as lock:
+        if dialect == 'postgresql':
+            # Session lock: Alembic runs on its own connection and commits
+            lock.execute(text("SELECT pg_advisory_lock(:key)"), {'key': _PG_MIGRATE_LOCK})
+        try:
+            tables = set(inspect(db.engine).get_table_names())
+            if not tables:
+                logger.info("Creating database schema at the head revision")
+                db.create_all()
+                stamp(directory=MIGRATIONS_DIR)
+                return
+            if 'alembic_version' not in tables:
+                logger.info(f"Unversioned database, stamping baseline revision {BASELINE_REVISION}")
+                stamp(directory=MIGRATIONS_DIR, revision=BASELINE_REVISION)
+            upgrade(directory=MIGRATIONS_DIR)
+        finally:
+            if dialect == 'postgresql':
+                lock.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': _PG_MIGRATE_LOCK})
@@ -0,0 +1,169 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import Numeric, case, cast, func, literal, update
+
+from models.models import db, check_dialect, dialect_insert, Risk, RiskScoringConfig
+from temporal import versioned_select
+from tenancy import bound_tenant
+
+logger = logging.getLogger(__name__)
+
+# Likelihood and impact assumed for risks that were only given a severity
+SEVERITY_DEFAULTS = {'Low': 2, 'Medium': 3, 'High': 4, 'Critical': 5}
+
+DEFAULT_CRITICALITY_WEIGHTS = {'1': 0.6, '2': 0.8, '3': 1.0, '4': 1.2, '5': 1.5}
+
+SCALE = range(1, 6)
+
+SCORE_PRECISION = 4
+
+
+def _default_scoring_config():
+    return dict(criticality_weights=dict(DEFAULT_CRITICALITY_WEIGHTS), decay_half_life_days=365, decay_floor=0.5)
+
+
+def seed_scoring_config():
+    """Insert the bound tenant's default scoring config unless it has one.
+
+    ON CONFLICT DO NOTHING, so workers seeding together do not race on the
+    tenant's unique key. Run for every tenant at startup, and before a
+    config is changed.
+    """
+    table = RiskScoringConfig.__table__
+    db.session.execute(dialect_insert(db.engine.dialect.name)(table).values(
+        tenant_id=bound_tenant(), updated_at=datetime.utcnow(), **_default_scoring_config()
+    ).on_conflict_do_nothing(index_elements=[table.c.tenant_id]))
+
+
+def get_scoring_config():
+    """The bound tenant's scoring config, or the unsaved defaults for a tenant created since startup"""
+    config = RiskScoringConfig.query.filter_by(tenant_id=bound_tenant()).first()
+    return config if config is not None else RiskScoringConfig(**_default_scoring_config())
+
+
+def score_risk(risk, config, now=None):
+    """Score a single risk in Python; mirrors score_expression() exactly"""
+    now = now or datetime.utcnow()
+    likelihood = risk.likelihood or SEVERITY_DEFAULTS.get(risk.severity, 3)
+    impact = risk.impact or SEVERITY_DEFAULTS.get(risk.severity, 3)
+    weight = config.criticality_weights.get(str(risk.asset_criticality or 3), 1.0)
+    age_days = max((now - (risk.updated_at or now)).total_seconds() / 86400.0, 0.0)
+    decay = max(config.decay_half_life_days / (config.decay_half_life_days + age_days), config.decay_floor)
+    return round(likelihood * impact * weight * decay, SCORE_PRECISION)
+
+
+def _severity_default(risk, column):
+    return func.coalesce(column, case(
+        *[(risk.severity == severity, value) for severity, value in SEVERITY_DEFAULTS.items()],
+        else_=3
+    ))
+
+
+def likelihood_expression(risk=Risk):
+    return _severity_default(risk, risk.likelihood)
+
+
+def impact_expression(risk=Risk):
+    return _severity_default(risk, risk.impact)
+
+
+def _age_days_expression(dialect, now):
+    check_dialect(dialect)
+    if dialect == 'postgresql':
+        return func.extract('epoch', literal(now) - Risk.updated_at) / 86400.0
+    return func.julianday(literal(now.isoformat(sep=' '))) - func.julianday(Risk.updated_at)
+
+
+def score_expression(config, dialect, now):
+    """Build the SQL expression that scores every row in one pass"""
+    weight = case(
+        *[(Risk.asset_criticality == int(level), float(value))
+          for level, value in config.criticality_weights.items()],
+        else_=1.0
+    )
+    age = _age_days_expression(dialect, now)
+    half_life = float(config.decay_half_life_days)
+    decay = case(
+        (age <= 0, 1.0),
+        else_=half_life / (half_life + age)
+    )
+    decay = case((decay < config.decay_floor, float(config.decay_floor)), else_=decay)
+    score = likelihood_expression() * impact_expression() * weight * decay
+    return func.round(cast(score, Numeric), SCORE_PRECISION)
+
+
+def rescore_risks(now=None, only_missing=False):
+    """Recompute Risk.score for the bound tenant's register with a single UPDATE.
+
+    The database evaluates the formula as a set-based pass over the table,
+    so no rows are shipped to Python and back.
+    """
+    now = now or datetime.utcnow()
+    config = get_scoring_config()
+    # Keep updated_at as is: it drives the decay and Risk has onupdate=utcnow
+    stmt = update(Risk).values(
+        score=score_expression(config, db.engine.dialect.name, now),
+        updated_at=Risk.updated_at
+    ).execution_options(synchronize_session=False)
+    if only_missing:
+        stmt = stmt.where(Risk.score.is_(None))
+    result = db.session.execute(stmt)
+    db.session.commit()
+    logger.info(f"Rescored {result.rowcount} risks")
+    return result.rowcount
+
+
+def validate_weights(data):
+    """Validate a scoring config update, returning cleaned values"""
+    cleaned = {}
+    if 'criticality_weights' in data:
+        weights = data['criticality_weights']
+        if not isinstance(weights, dict) or set(map(str, weights)) != {str(level) for level in SCALE}:
+            raise ValueError('Criticality weights must have an entry for each level 1-5')
+        try:
+            cleaned['criticality_weights'] = {str(k): float(v) for k, v in weights.items()}
+        except (TypeError, ValueError):
+            raise ValueError('Criticality weights must be numbers')
+        if any(v < 0 for v in cleaned['criticality_weights'].values()):
+            raise ValueError('Criticality weights cannot be negative')
+    for field in ('decay_half_life_days', 'decay_floor'):
+        if field in data:
+            try:
+                cleaned[field] = float(data[field])
+            except (TypeError, ValueError):
+                raise ValueError(f'Invalid {field} value')
+    if cleaned.get('decay_half_life_days', 1) <= 0:
+        raise ValueError('Decay half life must be greater than 0')
+    if not 0 <= cleaned.get('decay_floor', 0) <= 1:
+        raise ValueError('Decay floor must be between 0 and 1')
+    return cleaned
+
+
+def risk_heatmap(include_closed=False, as_of=None):
+    """Return the 5x5 likelihood/impact matrix with counts aggregated in SQL"""
+    risk, scored = versioned_select(Risk, as_of)
+    # Group over a subquery so the CASE defaults are not repeated in GROUP BY
+    scored = scored.with_only_columns(
+        likelihood_expression(risk).label('likelihood'),
+        impact_expression(risk).label('impact'),
+        risk.id,
+        risk.score
+    )
+    if not include_closed:
+        scored = scored.where(risk.status != 'Closed')
+    scored = scored.subquery()
+    rows = db.session.query(
+        scored.c.likelihood, scored.c.impact, func.count(scored.c.id), func.max(scored.c.score)
+    ).group_by(scored.c.likelihood, scored.c.impact).all()
+
+    cells = {(l, i): (count, max_score) for l, i, count, max_score in rows}
+    return [
+        [{
+            'likelihood': l,
+            'impact': i,
+            'count': cells.get((l, i), (0, None))[0],
+            'max_score': cells.get((l, i), (0, None))[1]
+        } for i in SCALE]
+        for l in SCALE
+    ]
@@ -0,0 +1,203 @@
+import html
+import logging
+import re
+
+from sqlalchemy import text
+
+from tenancy import bound_tenant
+
+logger = logging.getLogger(__name__)
+
+# Searchable entities: table name, title column and body column
+SEARCH_TARGETS = {
+    'risk': {'table': 'risk', 'title': 'title', 'body': 'description'},
+    'project': {'table': 'project', 'title': 'name', 'body': 'description'},
+}
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_STOP = '</mark>'
+
+# The database brackets matches with these control characters; the text is
+# HTML-escaped before they become <mark> tags, so stored markup is never live
+_MATCH_START = '\x02'
+_MATCH_STOP = '\x03'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize_query(query):
+    """Split a user supplied query into plain word tokens"""
+    return _TOKEN_RE.findall(query or '')[:16]
+
+
+def highlight_html(value):
+    """Escape a highlighted title or snippet, then turn its match markers into <mark> tags"""
+    return (html.escape(value or '')
+            .replace(_MATCH_START, HIGHLIGHT_START)
+            .replace(_MATCH_STOP, HIGHLIGHT_STOP))
+
+
+def _pg_vector(target):
+    # Must match the indexed expression exactly so the planner uses the GIN index
+    return (
+        f"to_tsvector('english', coalesce({target['title']}, '') || ' ' || "
+        f"coalesce({target['body']}, ''))"
+    )
+
+
+def _fts_table(target):
+    return f"{target['table']}_fts"
+
+
+def init_search_index(db):
+    """Create the full-text indexes for the current database backend.
+
+    On Postgres a GIN expression index is maintained by the database on every
+    write; it leads on tenant_id (btree_gin) so a search only reads the
+    searching tenant's postings. On SQLite an FTS5 external-content table is
+    kept in sync by triggers that only fire when the searchable columns change.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        db.session.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gin"))
+        for name, target in SEARCH_TARGETS.items():
+            # Replaced by the tenant-leading index
+            db.session.execute(text(f"DROP INDEX IF EXISTS ix_{target['table']}_search"))
+            db.session.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{target['table']}_tenant_search "
+                f"ON {target['table']} USING GIN (tenant_id, {_pg_vector(target)})"
+            ))
+        db.session.commit()
+    elif dialect == 'sqlite':
+        for name, target in SEARCH_TARGETS.items():
+            _init_sqlite_fts(db, target)
+        db.session.commit()
+    else:
+        logger.warning(f"No full-text index support for {dialect}, search will scan tables")
+
+
+def _init_sqlite_fts(db, target):
+    table, fts = target['table'], _fts_table(target)
+    title, body = target['title'], target['body']
+
+    exists = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': fts}
+    ).first()
+
+    db.session.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{title}, {body}, content='{table}', content_rowid='id', "
+        f"tokenize='porter unicode61')"
+    ))
+    db.session.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {title}, {body}) VALUES (new.id, new.{title}, new.{body}); END"
+    ))
+    db.session.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {title}, {body}) "
+        f"VALUES ('delete', old.id, old.{title}, old.{body}); END"
+    ))
+    db.session.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {title}, {body} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {title}, {body}) "
+        f"VALUES ('delete', old.id, old.{title}, old.{body}); "
+        f"INSERT INTO {fts}(rowid, {title}, {body}) VALUES (new.id, new.{title}, new.{body}); END"
+    ))
+
+    # Index rows that were written before the FTS table existed
+    if not exists:
+        db.session.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+def _search_postgres(db, target, tokens, limit):
+    tsquery = ' & '.join(f"{token}:*" for token in tokens)
+    vector = _pg_vector(target)
+    options = f"StartSel={_MATCH_START}, StopSel={_MATCH_STOP}"
+    sql = text(
+        f"SELECT id, "
+        f"ts_headline('english', coalesce({target['title']}, ''), q, :title_options) AS title, "
+        f"ts_headline('english', coalesce({target['body']}, ''), q, :snippet_options) AS snippet, "
+        f"ts_rank_cd({vector}, q) AS rank "
+        f"FROM {target['table']}, to_tsquery('english', :tsquery) AS q "
+        f"WHERE tenant_id = :tenant_id AND {vector} @@ q "
+        f"ORDER BY rank DESC LIMIT :limit"
+    )
+    return db.session.execute(sql, {
+        'tsquery': tsquery,
+        'title_options': f"HighlightAll=true, {options}",
+        'snippet_options': f"MaxFragments=1, MaxWords=24, MinWords=8, {options}",
+        'tenant_id': bound_tenant(),
+        'limit': limit
+    }).all()
+
+
+def _search_sqlite(db, target, tokens, limit):
+    fts = _fts_table(target)
+    match = ' '.join(f'"{token}"*' for token in tokens)
+    # bm25() is lower-is-better; negate it so every backend ranks descending.
+    # Title matches weigh ten times as much as description matches.
+    # FTS5 has no tenant column; matches are joined back to filter on it
+    sql = text(
+        f"SELECT {fts}.rowid AS id, "
+        f"highlight({fts}, 0, :start, :stop) AS title, "
+        f"snippet({fts}, 1, :start, :stop, '...', 24) AS snippet, "
+        f"-bm25({fts}, 10.0, 1.0) AS rank "
+        f"FROM {fts} JOIN {target['table']} ON {target['table']}.id = {fts}.rowid "
+        f"WHERE {fts} MATCH :match AND {target['table']}.tenant_id = :tenant_id "
+        f"ORDER BY rank DESC LIMIT :limit"
+    )
+    return db.session.execute(sql, {
+        'match': match,
+        'start': _MATCH_START,
+        'stop': _MATCH_STOP,
+        'tenant_id': bound_tenant(),
+        'limit': limit
+    }).all()
+
+
+def _search_scan(db, target, tokens, limit):
+    clauses = []
+    params = {'tenant_id': bound_tenant(), 'limit': limit}
+    for i, token in enumerate(tokens):
+        params[f't{i}'] = f"%{token}%"
+        clauses.append(
+            f"(lower({target['title']}) LIKE lower(:t{i}) "
+            f"OR lower({target['body']}) LIKE lower(:t{i}))"
+        )
+    sql = text(
+        f"SELECT id, {target['title']} AS title, {target['body']} AS snippet, 0 AS rank "
+        f"FROM {target['table']} WHERE tenant_id = :tenant_id AND {' AND '.join(clauses)} "
+        f"ORDER BY id DESC LIMIT :limit"
+    )
+    return db.session.execute(sql, params).all()
+
+
+def search(db, query, types=None, limit=20):
+    """Run a ranked prefix search over the bound tenant's rows and return highlighted hits, best first"""
+    tokens = tokenize_query(query)
+    if not tokens:
+        return []
+
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        runner = _search_postgres
+    elif dialect == 'sqlite':
+        runner = _search_sqlite
+    else:
+        runner = _search_scan
+
+    results = []
+    for name in types or SEARCH_TARGETS.keys():
+        for row in runner(db, SEARCH_TARGETS[name], tokens, limit):
+            results.append({
+                'type': name,
+                'id': row.id,
+                'title': highlight_html(row.title),
+                'snippet': highlight_html(row.snippet),
+                'rank': float(row.rank)
+            })
+
+    results.sort(key=lambda hit: hit['rank'], reverse=True)
+    return results[:limit]
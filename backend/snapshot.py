@@ -0,0 +1,375 @@
+import fcntl
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from flask import jsonify
+from sqlalchemy import event
+from werkzeug.datastructures import MultiDict
+
+from history import get_current
+from models.models import (db, current_tenant, Risk, Project, ComplianceFramework, MaturityTrendPoint, ThreatLevel,
+                           MaturityRating, CurrentMetric)
+from queries import risks_statement, projects_statement, trend_statement, compliance_statement, metric_payload
+from tenancy import tenant_ids, tenant_scope
+
+logger = logging.getLogger(__name__)
+
+# Request paths served from the snapshot, when called without query args.
+# Each tenant has its own snapshot, published and marked stale on its own.
+SNAPSHOT_PATHS = {
+    '/api/threat-level': 'threat_level',
+    '/api/maturity-rating': 'maturity_rating',
+    '/api/risks': 'risks',
+    '/api/projects': 'projects',
+    '/api/compliance': 'compliance',
+    '/api/maturity-trend': 'maturity_trend',
+}
+
+# Writes to these tables make the published snapshot stale
+WATCHED_TABLES = {model.__table__.name for model in (Risk, Project, ComplianceFramework, MaturityTrendPoint,
+                                                     ThreatLevel, MaturityRating, CurrentMetric)}
+
+# Control file: magic, seq, change generation, built generation, version, published_at.
+# seq is odd while the control file is being written (a seqlock), so
+# readers never lock. Snapshot files are never modified once published.
+CONTROL = struct.Struct('<8sQQQQd')
+CONTROL_MAGIC = b'CYBCTL01'
+# Snapshot file: magic, version, built generation, index length, then the
+# JSON index {key: [offset, length]} and the payloads
+SNAPSHOT = struct.Struct('<8sQQI')
+SNAPSHOT_MAGIC = b'CYBSNP01'
+CONTROL_SIZE = mmap.PAGESIZE
+
+_CHANGED_KEY = 'snapshot_changed'
+
+
+_TENANT_DIR_PREFIX = 'tenant-'
+
+
+def default_snapshot_dir(database_url):
+    """A directory per database, in shared memory where the platform has it"""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    digest = hashlib.sha1(database_url.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(base, f"cybether-snapshot-{digest}")
+
+
+def build_payloads():
+    """The serialized body of every snapshot path for the bound tenant, exactly as the routes render it"""
+    payloads = {
+        'threat_level': metric_payload('threat_level', get_current('threat_level')),
+        'maturity_rating': metric_payload('maturity_rating', get_current('maturity_rating')),
+        'risks': [risk.to_dict() for risk in db.session.execute(risks_statement()).scalars()],
+        'projects': [project.to_dict() for project in db.session.execute(projects_statement()).scalars()],
+        'compliance': [framework.to_dict() for framework in
+                       db.session.execute(compliance_statement(MultiDict())).scalars()],
+        'maturity_trend': [point.to_dict() for point in db.session.execute(trend_statement()).scalars()],
+    }
+    return {key: jsonify(payload).get_data() for key, payload in payloads.items()}
+
+
+class SnapshotStore:
+    """Dashboard payloads published once to a memory-mapped file, read by every worker.
+
+    A publisher serializes all snapshot paths into a new immutable file and
+    points the shared control file at it; workers map the current file and
+    serve slices of the mapping without copying or re-serializing. Each
+    committed write to a watched table bumps the change generation in the
+    control file, so every worker sees the snapshot as stale until one
+    built after that write is published, and serves those requests from
+    the database in the meantime, as it does when the snapshot is older
+    than max_age or missing.
+    """
+
+    def __init__(self, directory, max_age=60.0, keep=2):
+        self.directory = directory
+        self.max_age = max_age
+        self.keep = keep
+        self.control_path = os.path.join(directory, 'control')
+        self._mapping = None  # (version, mmap, index)
+        self._mapping_lock = threading.Lock()
+        self._control = None
+        self._control_fd = None
+        self._pid = None
+        self._open_lock = threading.Lock()
+
+    def _control_map(self):
+        # Opened per process: workers forked after opening would share the
+        # open file, and with it the flock that keeps publishers apart
+        if self._pid != os.getpid():
+            with self._open_lock:
+                if self._pid != os.getpid():
+                    os.makedirs(self.directory, exist_ok=True)
+                    fd = os.open(self.control_path, os.O_RDWR | os.O_CREAT, 0o600)
+                    try:
+                        with _locked(fd):
+                            if os.fstat(fd).st_size < CONTROL_SIZE:
+                                os.ftruncate(fd, CONTROL_SIZE)
+                                os.pwrite(fd, CONTROL.pack(CONTROL_MAGIC, 0, 0, 0, 0, 0.0), 0)
+                        self._control = mmap.mmap(fd, CONTROL_SIZE)
+                    except Exception:
+                        os.close(fd)
+                        raise
+                    self._control_fd = fd
+                    self._pid = os.getpid()
+        return self._control
+
+    def read_control(self):
+        """Consistent (change generation, built generation, version, published_at)"""
+        control = self._control_map()
+        for _ in range(100):
+            magic, seq, changed, built, version, published_at = CONTROL.unpack_from(control, 0)
+            if magic != CONTROL_MAGIC:
+                return None
+            if seq % 2 == 0 and CONTROL.unpack_from(control, 0)[1] == seq:
+                return changed, built, version, published_at
+        return None
+
+    def _write_control(self, **fields):
+        # Callers hold the control file lock
+        control = self._control
+        magic, seq, changed, built, version, published_at = CONTROL.unpack_from(control, 0)
+        values = {'changed': changed, 'built': built, 'version': version, 'published_at': published_at}
+        values.update(fields)
+        struct.pack_into('<Q', control, 8, seq + 1)
+        CONTROL.pack_into(control, 0, CONTROL_MAGIC, seq + 1, values['changed'], values['built'],
+                          values['version'], values['published_at'])
+        struct.pack_into('<Q', control, 8, seq + 2)
+
+    def mark_changed(self):
+        """Record that a watched table changed; the current snapshot is stale from now on"""
+        self._control_map()
+        with _locked(self._control_fd):
+            changed = CONTROL.unpack_from(self._control, 0)[2]
+            self._write_control(changed=changed + 1)
+
+    @staticmethod
+    def _fresh(state, max_age):
+        changed, built, version, published_at = state
+        return version > 0 and built >= changed and time.time() - published_at < max_age
+
+    def publish(self, build=build_payloads, force=False):
+        """Build and publish a snapshot unless the current one is fresh; returns its version or None.
+
+        Payloads are built outside the lock, so writers marking changes never
+        wait on a build. The generation is read first: everything committed
+        up to it is in the payloads, and anything committed later leaves the
+        new snapshot stale, as it should.
+        """
+        state = self.read_control()
+        if state is None:
+            raise ValueError(f"Unrecognised snapshot control file: {self.control_path}")
+        # Refreshed at half max_age so readers never see it expire while it is current
+        if not force and self._fresh(state, self.max_age / 2):
+            return None
+        generation = state[0]
+        # A fresh transaction, so the build sees everything committed so far
+        db.session.commit()
+        payloads = build()
+
+        index = {}
+        offset = 0
+        for key, body in payloads.items():
+            index[key] = [offset, len(body)]
+            offset += len(body)
+        index_bytes = json.dumps(index).encode('utf-8')
+
+        with _locked(self._control_fd):
+            _, built, version, _ = self.read_control()
+            if built > generation:
+                # Another worker published a newer build meanwhile
+                return None
+            new_version = version + 1
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.snapshot-')
+            try:
+                with os.fdopen(fd, 'wb') as handle:
+                    handle.write(SNAPSHOT.pack(SNAPSHOT_MAGIC, new_version, generation, len(index_bytes)))
+                    handle.write(index_bytes)
+                    for body in payloads.values():
+                        handle.write(body)
+                os.rename(tmp_path, os.path.join(self.directory, f"snapshot-{new_version}"))
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+            self._write_control(built=generation, version=new_version, published_at=time.time())
+
+            # Workers still serving an older file keep their mapping after the unlink
+            for old in range(new_version - self.keep, 0, -1):
+                old_path = os.path.join(self.directory, f"snapshot-{old}")
+                if not os.path.exists(old_path):
+                    break
+                os.unlink(old_path)
+        logger.info(f"Published dashboard snapshot {new_version} at generation {generation}")
+        return new_version
+
+    def _map(self, version):
+        mapping = self._mapping
+        if mapping is not None and mapping[0] == version:
+            return mapping
+        with self._mapping_lock:
+            if self._mapping is not None and self._mapping[0] == version:
+                return self._mapping
+            try:
+                with open(os.path.join(self.directory, f"snapshot-{version}"), 'rb') as handle:
+                    data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except (FileNotFoundError, ValueError):
+                return None
+            magic, file_version, built, index_length = SNAPSHOT.unpack_from(data, 0)
+            if magic != SNAPSHOT_MAGIC or file_version != version:
+                return None
+            start = SNAPSHOT.size + index_length
+            index = {key: (start + offset, start + offset + length)
+                     for key, (offset, length) in json.loads(data[SNAPSHOT.size:start]).items()}
+            # The previous mapping is left to the garbage collector: responses
+            # still being sent from it hold views into it
+            self._mapping = (version, data, index)
+            return self._mapping
+
+    def get(self, key):
+        """(version, memoryview of the serialized payload), or None when the caller should query the database"""
+        try:
+            state = self.read_control()
+        except OSError:
+            return None
+        if state is None or not self._fresh(state, self.max_age):
+            return None
+        version = state[2]
+        mapping = self._map(version)
+        if mapping is None or key not in mapping[2]:
+            return None
+        start, end = mapping[2][key]
+        return version, memoryview(mapping[1])[start:end]
+
+
+_stores = {}
+
+
+def _base_dir(config):
+    return config.get('SNAPSHOT_DIR') or default_snapshot_dir(config['SQLALCHEMY_DATABASE_URI'])
+
+
+def build_store(config, tenant_id):
+    """A tenant's store, under SNAPSHOT_DIR or a directory derived from the database URL; cached per directory"""
+    directory = os.path.join(_base_dir(config), f"{_TENANT_DIR_PREFIX}{tenant_id}")
+    if directory not in _stores:
+        _stores[directory] = SnapshotStore(directory, max_age=config['SNAPSHOT_MAX_AGE'])
+    return _stores[directory]
+
+
+def published_tenants(config):
+    """Tenants with a snapshot directory, from any worker"""
+    try:
+        names = os.listdir(_base_dir(config))
+    except FileNotFoundError:
+        return []
+    return [int(name[len(_TENANT_DIR_PREFIX):]) for name in names
+            if name.startswith(_TENANT_DIR_PREFIX) and name[len(_TENANT_DIR_PREFIX):].isdigit()]
+
+
+class _locked:
+    """Exclusive flock on a file descriptor, between processes"""
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    def __enter__(self):
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+
+class SnapshotPublisher:
+    """Background thread republishing tenants' snapshots soon after a local write.
+
+    Requests are coalesced: any number of commits while a publish runs lead
+    to one more publish of each tenant they touched.
+    """
+
+    def __init__(self, app, delay=0.2):
+        self.app = app
+        self.delay = delay
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='cybether-snapshot', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def request(self, tenants=(None,)):
+        """Republish these tenants; None stands for every tenant"""
+        with self._pending_lock:
+            self._pending.update(tenants)
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            if self._stop.is_set():
+                return
+            # Let a burst of commits settle into one publish
+            time.sleep(self.delay)
+            self._wake.clear()
+            with self._pending_lock:
+                pending, self._pending = self._pending, set()
+            try:
+                with self.app.app_context():
+                    for tenant_id in (tenant_ids() if None in pending else sorted(pending)):
+                        with tenant_scope(tenant_id):
+                            build_store(self.app.config, tenant_id).publish()
+            except Exception as e:
+                logger.error(f"Error publishing dashboard snapshot: {str(e)}")
+
+
+def init_snapshot(config, publisher=None):
+    """Mark a tenant's snapshot stale on every commit that touched its rows in a watched table"""
+
+    def changed(session, tenant_id):
+        session.info.setdefault(_CHANGED_KEY, set()).add(tenant_id)
+
+    @event.listens_for(db.session, 'after_flush')
+    def after_flush(session, flush_context):
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if getattr(obj, '__table__', None) is not None and obj.__table__.name in WATCHED_TABLES:
+                changed(session, obj.tenant_id)
+
+    @event.listens_for(db.session, 'do_orm_execute')
+    def do_orm_execute(state):
+        # Bulk Core writes (findings upserts, rescoring, archiving) skip the
+        # flush; they write the bound tenant's rows, or every tenant's when none is
+        table = getattr(state.statement, 'table', None)
+        if (state.is_insert or state.is_update or state.is_delete) and getattr(table, 'name', None) in WATCHED_TABLES:
+            changed(state.session, current_tenant.get())
+
+    @event.listens_for(db.session, 'after_commit')
+    def after_commit(session):
+        tenants = session.info.pop(_CHANGED_KEY, None)
+        if tenants:
+            try:
+                for tenant_id in (published_tenants(config) if None in tenants else tenants):
+                    build_store(config, tenant_id).mark_changed()
+            except OSError as e:
+                logger.error(f"Error marking dashboard snapshot stale: {str(e)}")
+            if publisher is not None:
+                publisher.request(tenants)
+
+    @event.listens_for(db.session, 'after_rollback')
+    def after_rollback(session):
+        session.info.pop(_CHANGED_KEY, None)
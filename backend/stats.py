@@ -0,0 +1,138 @@
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func, update
+
+from models.models import db, dialect_insert, Project, ComplianceFramework, PrecomputedResult
+from temporal import versioned_select
+from tenancy import bound_tenant
+
+logger = logging.getLogger(__name__)
+
+# Frameworks whose next assessment falls inside this window count as upcoming
+ASSESSMENT_DUE_WINDOW = timedelta(days=30)
+
+# Precomputed results older than this are recomputed on read
+STATS_MAX_AGE = timedelta(minutes=5)
+
+
+def compute_project_stats(now=None, as_of=None):
+    """Project totals now, or over the project versions current at as_of"""
+    now = as_of or now or datetime.utcnow()
+    project, stmt = versioned_select(Project, as_of)
+    total, completed, in_progress, overdue = db.session.execute(stmt.with_only_columns(
+        func.count(project.id),
+        func.count(case((project.status == 'Completed', 1))),
+        func.count(case((project.status == 'In Progress', 1))),
+        func.count(case(((project.due_date < now) & (project.status != 'Completed'), 1)))
+    )).one()
+
+    return {
+        'total_projects': total,
+        'completed_projects': completed,
+        'in_progress_projects': in_progress,
+        'overdue_projects': overdue,
+        'completion_rate': (completed / total * 100) if total > 0 else 0
+    }
+
+
+def compute_compliance_stats(now=None, as_of=None):
+    """Compliance totals now, or over the framework versions current at as_of"""
+    now = as_of or now or datetime.utcnow()
+    framework, stmt = versioned_select(ComplianceFramework, as_of)
+    total, score_sum, meeting_target, upcoming = db.session.execute(stmt.with_only_columns(
+        func.count(framework.id),
+        func.coalesce(func.sum(framework.current_score), 0),
+        func.count(case((framework.current_score >= framework.target_score, 1))),
+        func.count(case((framework.next_assessment_date <= now + ASSESSMENT_DUE_WINDOW, 1)))
+    )).one()
+
+    if total == 0:
+        return {
+            'average_score': 0,
+            'frameworks_meeting_target': 0,
+            'frameworks_below_target': 0,
+            'overall_compliance_status': 'No frameworks defined'
+        }
+
+    average_score = float(score_sum) / total
+
+    # Calculate overall compliance status
+    if average_score >= 90:
+        status = 'Excellent'
+    elif average_score >= 75:
+        status = 'Good'
+    elif average_score >= 60:
+        status = 'Fair'
+    else:
+        status = 'Needs Improvement'
+
+    return {
+        'average_score': round(average_score, 2),
+        'frameworks_meeting_target': meeting_target,
+        'frameworks_below_target': total - meeting_target,
+        'overall_compliance_status': status,
+        'upcoming_assessments': upcoming
+    }
+
+
+def flag_deadlines(now=None):
+    """Set Project.is_overdue and ComplianceFramework.assessment_due in bulk.
+
+    Only rows whose flag actually changes are written, and updated_at is
+    left alone since a flag flip is not a user edit.
+    """
+    now = now or datetime.utcnow()
+    overdue = case(
+        ((Project.due_date < now) & (Project.status != 'Completed'), True),
+        else_=False
+    )
+    projects = db.session.execute(
+        update(Project)
+        .where(Project.is_overdue != overdue)
+        .values(is_overdue=overdue, updated_at=Project.updated_at)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    due = case(
+        (ComplianceFramework.next_assessment_date <= now + ASSESSMENT_DUE_WINDOW, True),
+        else_=False
+    )
+    frameworks = db.session.execute(
+        update(ComplianceFramework)
+        .where(ComplianceFramework.assessment_due != due)
+        .values(assessment_due=due, updated_at=ComplianceFramework.updated_at)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    db.session.commit()
+    return {'projects': projects, 'frameworks': frameworks}
+
+
+def store_result(key, payload, computed_at=None):
+    """Save a payload under key for the bound tenant.
+
+    An upsert: a job and an inline recompute on read (read_result) may
+    store the same missing key at once.
+    """
+    table = PrecomputedResult.__table__
+    stmt = dialect_insert(db.engine.dialect.name)(table).values(
+        tenant_id=bound_tenant(), key=key, payload=payload, computed_at=computed_at or datetime.utcnow()
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.tenant_id, table.c.key],
+        set_={'payload': stmt.excluded.payload, 'computed_at': stmt.excluded.computed_at}
+    ))
+
+
+def read_result(key, compute, max_age=STATS_MAX_AGE):
+    """Return the bound tenant's precomputed payload, computing it inline only if missing or stale"""
+    result = db.session.get(PrecomputedResult, {'tenant_id': bound_tenant(), 'key': key})
+    if result is not None and datetime.utcnow() - result.computed_at <= max_age:
+        return result.payload
+
+    logger.debug(f"Precomputed result {key} missing or stale, computing inline")
+    payload = compute()
+    store_result(key, payload)
+    db.session.commit()
+    return payload
@@ -0,0 +1,223 @@
+import logging
+from datetime import date, datetime, time, timezone
+
+from sqlalchemy import DateTime, insert, literal, select, text
+
+from models.models import (OPEN_ENDED, Risk, Project, ComplianceFramework, RiskVersion, ProjectVersion,
+                           ComplianceFrameworkVersion, ArchivedRisk, ArchivedProject)
+
+logger = logging.getLogger(__name__)
+
+# Entities whose every write is kept as a version, and their version tables
+VERSIONED_MODELS = {
+    Risk: RiskVersion,
+    Project: ProjectVersion,
+    ComplianceFramework: ComplianceFrameworkVersion,
+}
+
+# Archive tables archive.py moves entities to. Archiving is not the end of
+# an entity, so its current version stays open; a row restored from the
+# archive closes it and opens a new one like any other write.
+ARCHIVE_MODELS = {
+    Risk: ArchivedRisk,
+    Project: ArchivedProject,
+}
+
+# Bookkeeping on the version tables; every other column is copied from the entity
+PERIOD_COLUMNS = {'version_id', 'valid_from', 'valid_to'}
+
+# Derived values that move without the entity changing: the daily rescore
+# shifts every score as it decays. They never open a version; the open
+# version is kept in step instead, so as_of reads still have a score.
+REFRESHED_COLUMNS = {'score'}
+
+# Serializes trigger setup and backfill between workers starting together
+_PG_SETUP_LOCK = 7_046_001
+
+
+def parse_as_of(args):
+    """The as_of request argument as a naive UTC datetime, or None when absent.
+
+    Takes an ISO 8601 date or datetime. A date on its own means the end of
+    that day, so as_of=2026-06-30 is the dashboard at close of the 30th.
+    """
+    value = args.get('as_of')
+    if not value:
+        return None
+    try:
+        if len(value) == 10:
+            as_of = datetime.combine(date.fromisoformat(value), time.max)
+        else:
+            as_of = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError('Invalid as_of value, expected an ISO 8601 date or datetime')
+    if as_of.tzinfo is not None:
+        as_of = as_of.astimezone(timezone.utc).replace(tzinfo=None)
+    if as_of >= OPEN_ENDED:
+        raise ValueError('Invalid as_of value, expected an ISO 8601 date or datetime')
+    return as_of
+
+
+def versioned_select(model, as_of=None):
+    """select() of model, or of its versions that were current at as_of.
+
+    Returns the entity selected from along with the statement; versions have
+    the entity's column names and to_dict(), so callers filter and order
+    against whichever comes back. The period test is a range over the
+    indexed valid_to/valid_from columns, never a replay of changes.
+    """
+    if as_of is None:
+        return model, select(model)
+    version = VERSIONED_MODELS[model]
+    return version, select(version).where(version.valid_from <= as_of, version.valid_to > as_of)
+
+
+def _copied_columns(version):
+    return [column.name for column in version.__table__.columns if column.name not in PERIOD_COLUMNS]
+
+
+def _versioned(columns):
+    return [column for column in columns if column != 'id' and column not in REFRESHED_COLUMNS]
+
+
+def _refreshed(columns):
+    return [column for column in columns if column in REFRESHED_COLUMNS]
+
+
+def _init_postgres(db, table, history, archive, columns, open_ended):
+    names = ', '.join(columns)
+    values = ', '.join(f"NEW.{column}" for column in columns)
+    changed = ' OR '.join(f"OLD.{column} IS DISTINCT FROM NEW.{column}" for column in _versioned(columns))
+    refreshed = _refreshed(columns)
+    close = f"UPDATE {history} SET valid_to = ts WHERE id = OLD.id AND valid_to = '{open_ended}'; "
+    if archive:
+        # Archival copies the row to the archive before deleting it; a restore
+        # inserts it back before deleting the archived copy
+        close = (
+            f"IF TG_OP = 'UPDATE' OR (TG_OP = 'DELETE' AND NOT EXISTS (SELECT 1 FROM {archive} WHERE id = OLD.id)) "
+            f"THEN {close}"
+            f"ELSIF TG_OP = 'INSERT' AND EXISTS (SELECT 1 FROM {archive} WHERE id = NEW.id) THEN "
+            f"UPDATE {history} SET valid_to = ts WHERE id = NEW.id AND valid_to = '{open_ended}'; "
+            f"END IF; "
+        )
+    else:
+        close = f"IF TG_OP <> 'INSERT' THEN {close}END IF; "
+    # Transaction time: every row a transaction writes changes at the same instant
+    db.session.execute(text(
+        f"CREATE OR REPLACE FUNCTION {history}_capture() RETURNS trigger AS $$ "
+        f"DECLARE ts timestamp := now() AT TIME ZONE 'UTC'; "
+        f"BEGIN "
+        f"{close}"
+        f"IF TG_OP <> 'DELETE' THEN "
+        f"INSERT INTO {history} ({names}, valid_from, valid_to) VALUES ({values}, ts, '{open_ended}'); "
+        f"END IF; "
+        f"RETURN NULL; "
+        f"END $$ LANGUAGE plpgsql"
+    ))
+    # Recreated on every start so the copied columns follow the model
+    for trigger in (f"{history}_write", f"{history}_update", f"{history}_refresh"):
+        db.session.execute(text(f"DROP TRIGGER IF EXISTS {trigger} ON {table}"))
+    db.session.execute(text(
+        f"CREATE TRIGGER {history}_write AFTER INSERT OR DELETE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION {history}_capture()"
+    ))
+    db.session.execute(text(
+        f"CREATE TRIGGER {history}_update AFTER UPDATE ON {table} "
+        f"FOR EACH ROW WHEN ({changed}) EXECUTE FUNCTION {history}_capture()"
+    ))
+    if refreshed:
+        assignments = ', '.join(f"{column} = NEW.{column}" for column in refreshed)
+        moved = ' OR '.join(f"OLD.{column} IS DISTINCT FROM NEW.{column}" for column in refreshed)
+        db.session.execute(text(
+            f"CREATE OR REPLACE FUNCTION {history}_refresh() RETURNS trigger AS $$ "
+            f"BEGIN "
+            f"UPDATE {history} SET {assignments} WHERE id = NEW.id AND valid_to = '{open_ended}'; "
+            f"RETURN NULL; "
+            f"END $$ LANGUAGE plpgsql"
+        ))
+        db.session.execute(text(
+            f"CREATE TRIGGER {history}_refresh AFTER UPDATE ON {table} "
+            f"FOR EACH ROW WHEN (NOT ({changed}) AND ({moved})) EXECUTE FUNCTION {history}_refresh()"
+        ))
+
+
+def _init_sqlite(db, table, history, archive, columns, open_ended):
+    names = ', '.join(columns)
+    values = ', '.join(f"new.{column}" for column in columns)
+    changed = ' OR '.join(f"old.{column} IS NOT new.{column}" for column in _versioned(columns))
+    refreshed = _refreshed(columns)
+    # Same text format SQLAlchemy stores DateTime columns in
+    now = "strftime('%Y-%m-%d %H:%M:%f', 'now') || '000'"
+    close = f"UPDATE {history} SET valid_to = {now} WHERE id = old.id AND valid_to = '{open_ended}';"
+    open_ = f"INSERT INTO {history} ({names}, valid_from, valid_to) VALUES ({values}, {now}, '{open_ended}');"
+
+    triggers = {
+        f"{history}_ai": f"AFTER INSERT ON {table} BEGIN {open_} END",
+        f"{history}_au": f"AFTER UPDATE ON {table} WHEN {changed} BEGIN {close} {open_} END",
+        f"{history}_ad": f"AFTER DELETE ON {table} BEGIN {close} END",
+    }
+    if archive:
+        # Archival copies the row to the archive before deleting it; a restore
+        # inserts it back before deleting the archived copy
+        restored = (f"UPDATE {history} SET valid_to = {now} WHERE id = new.id AND valid_to = '{open_ended}' "
+                    f"AND EXISTS (SELECT 1 FROM {archive} WHERE id = new.id);")
+        triggers[f"{history}_ai"] = f"AFTER INSERT ON {table} BEGIN {restored} {open_} END"
+        triggers[f"{history}_ad"] = (f"AFTER DELETE ON {table} "
+                                     f"WHEN NOT EXISTS (SELECT 1 FROM {archive} WHERE id = old.id) BEGIN {close} END")
+    if refreshed:
+        assignments = ', '.join(f"{column} = new.{column}" for column in refreshed)
+        moved = ' OR '.join(f"old.{column} IS NOT new.{column}" for column in refreshed)
+        triggers[f"{history}_ar"] = (
+            f"AFTER UPDATE ON {table} WHEN NOT ({changed}) AND ({moved}) "
+            f"BEGIN UPDATE {history} SET {assignments} WHERE id = new.id AND valid_to = '{open_ended}'; END"
+        )
+    for name, body in triggers.items():
+        db.session.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        db.session.execute(text(f"CREATE TRIGGER {name} {body}"))
+
+
+def _backfill(db, model, version, columns, now):
+    """Open a version for rows that have none, e.g. rows written before versioning existed"""
+    table, history = model.__table__, version.__table__
+    has_open_version = select(history.c.id).where(
+        history.c.id == table.c.id, history.c.valid_to == OPEN_ENDED
+    ).exists()
+    return db.session.execute(insert(history).from_select(
+        columns + ['valid_from', 'valid_to'],
+        select(*[table.c[column] for column in columns],
+               literal(now, DateTime), literal(OPEN_ENDED, DateTime)).where(~has_open_version)
+    )).rowcount
+
+
+def init_temporal(db, now=None):
+    """Install the versioning triggers for the current database backend.
+
+    The database writes the versions itself, so ORM writes and bulk Core
+    updates (findings import, deadline flags) are all captured in the
+    transaction that made them. Rescoring and findings seen again leave the
+    versioned columns as they were and write no version, and archival
+    leaves the archived row's version open, so as_of reads still have it.
+    History starts when versioning is first set up: existing rows get a
+    version valid from then.
+    """
+    now = now or datetime.utcnow()
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': _PG_SETUP_LOCK})
+        installer = _init_postgres
+    elif dialect == 'sqlite':
+        installer = _init_sqlite
+    else:
+        logger.warning(f"No temporal versioning support for {dialect}, as_of reads will be empty")
+        return
+
+    open_ended = OPEN_ENDED.isoformat(sep=' ', timespec='microseconds')
+    for model, version in VERSIONED_MODELS.items():
+        columns = _copied_columns(version)
+        archive = ARCHIVE_MODELS.get(model)
+        installer(db, model.__table__.name, version.__table__.name, archive and archive.__table__.name, columns,
+                  open_ended)
+        backfilled = _backfill(db, model, version, columns, now)
+        if backfilled:
+            logger.info(f"Opened versions for {backfilled} existing {model.__table__.name} rows")
+    db.session.commit()
@@ -0,0 +1,127 @@
+"""Tenant (business unit) scoping.
+
+One deployment serves every business unit. Each tenant-owned model has a
+tenant_id (models.TenantOwned); while a tenant is bound, every ORM select,
+update and delete gets a tenant_id criterion for each tenant-owned entity
+it touches, relationship loads and subqueries included, and new rows are
+written with the bound tenant. Requests are bound to the tenant in their
+access token (app.py); jobs bind each tenant in turn with for_each_tenant.
+
+Nothing is filtered while no tenant is bound, which is how system work
+that spans tenants runs (deadline flags, outbox delivery, pruning); a
+statement run with execution_options(all_tenants=True) is not filtered
+either, for the few deployment-wide reads made from a tenant's request.
+Statements against Core tables or text() SQL are not ORM statements:
+they filter on tenant_id themselves, with bound_tenant().
+"""
+import logging
+import re
+from contextlib import contextmanager
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from models.models import db, current_tenant, Tenant, TenantOwned, DEFAULT_TENANT_ID
+
+logger = logging.getLogger(__name__)
+
+# Claim carrying the tenant in access and refresh tokens, next to the user id in sub
+TENANT_CLAIM = 'tenant_id'
+
+SLUG_PATTERN = re.compile(r'[a-z0-9][a-z0-9-]{0,49}')
+
+
+def bind_tenant(tenant_id):
+    """Bind a tenant for the current context; returns the token for reset_tenant()"""
+    return current_tenant.set(tenant_id)
+
+
+def reset_tenant(token):
+    current_tenant.reset(token)
+
+
+@contextmanager
+def tenant_scope(tenant_id):
+    token = bind_tenant(tenant_id)
+    try:
+        yield tenant_id
+    finally:
+        reset_tenant(token)
+
+
+def bound_tenant():
+    """The bound tenant id, for statements the ORM criteria do not reach"""
+    tenant_id = current_tenant.get()
+    if tenant_id is None:
+        raise RuntimeError('No tenant bound')
+    return tenant_id
+
+
+def tenant_claims(user):
+    return {TENANT_CLAIM: user.tenant_id}
+
+
+def tenant_ids():
+    return db.session.execute(select(Tenant.id).order_by(Tenant.id)).scalars().all()
+
+
+def tenant_by_slug(slug):
+    """Tenant id for a slug, for the command line tools"""
+    tenant_id = db.session.execute(select(Tenant.id).where(Tenant.slug == slug)).scalar()
+    if tenant_id is None:
+        raise ValueError(f'Unknown tenant: {slug}')
+    return tenant_id
+
+
+def create_tenant(slug, name):
+    slug = (slug or '').strip().lower()
+    if not SLUG_PATTERN.fullmatch(slug):
+        raise ValueError('Tenant slug must be 1-50 lowercase letters, digits or hyphens')
+    if db.session.execute(select(Tenant.id).where(Tenant.slug == slug)).first() is not None:
+        raise ValueError(f'Tenant {slug} already exists')
+    tenant = Tenant(slug=slug, name=(name or '').strip() or slug)
+    db.session.add(tenant)
+    db.session.commit()
+    logger.info(f"Created tenant {slug} ({tenant.id})")
+    return tenant
+
+
+def for_each_tenant(fn, *args, **kwargs):
+    """Run fn once per tenant with that tenant bound; returns {tenant id: result}.
+
+    Each tenant's work only reads that tenant's rows, so its cost does not
+    grow with the other tenants' data.
+    """
+    results = {}
+    for tenant_id in tenant_ids():
+        with tenant_scope(tenant_id):
+            results[tenant_id] = fn(*args, **kwargs)
+    return results
+
+
+def _scope_statement(state):
+    tenant_id = current_tenant.get()
+    if tenant_id is None or not (state.is_select or state.is_update or state.is_delete):
+        return
+    if state.execution_options.get('all_tenants'):
+        return
+    # The lambda is cached as SQL; tenant_id is extracted as a bound parameter
+    state.statement = state.statement.options(with_loader_criteria(
+        TenantOwned, lambda cls: cls.tenant_id == tenant_id, include_aliases=True
+    ))
+
+
+def init_tenancy():
+    """Scope every session in this process to the bound tenant, async sessions included"""
+    if not event.contains(Session, 'do_orm_execute', _scope_statement):
+        event.listen(Session, 'do_orm_execute', _scope_statement)
+
+
+def ensure_default_tenant():
+    """Create the tenant that owns pre-existing rows and anonymous reads"""
+    if db.session.execute(select(Tenant.id).limit(1)).first() is None:
+        # Left to the id sequence, which hands an empty table DEFAULT_TENANT_ID
+        tenant = Tenant(slug='default', name='Default')
+        db.session.add(tenant)
+        db.session.commit()
+        logger.info(f"Created the default tenant {tenant.id}")
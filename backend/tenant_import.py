@@ -0,0 +1,251 @@
+"""Copy a business unit's own Cybether database into a tenant of this one.
+
+Units that ran a deployment of their own have a database with this
+schema. import_tenant() copies one tenant of it (the default tenant, for a
+database that never had others) into a new tenant here, in one
+transaction. Row ids are assigned by this database and every reference is
+rewritten to them: foreign keys, and the ids kept without one on archived
+rows, version rows, audit entries and sent alerts. Ids of rows the source
+has since deleted or archived get fresh ids from the same sequence, so the
+history of a risk never mixes with that of another tenant's risk.
+
+Rows are written with Core statements, which the audit and outbox hooks do
+not see; the search indexes and temporal triggers are maintained by the
+database as for any other write.
+"""
+import logging
+import time
+
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, delete, func, insert, select, text
+
+from models.models import db, Tenant, User
+from schema import MIGRATIONS_DIR
+from temporal import VERSIONED_MODELS
+from tenancy import create_tenant
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 1000
+
+# Not copied: cached results are recomputed, report artifacts live in the
+# source's REPORT_DIR and pending change events were for its receivers
+SKIPPED_TABLES = {'precomputed_result', 'report_job', 'outbox_event'}
+
+# Columns holding a table's ids without a foreign key: (table, column) -> table
+SOFT_REFERENCES = {
+    ('archived_risk', 'id'): 'risk',
+    ('archived_project', 'id'): 'project',
+    ('risk_version', 'id'): 'risk',
+    ('project_version', 'id'): 'project',
+    ('compliance_framework_version', 'id'): 'compliance_framework',
+    ('audit_log', 'actor_id'): 'user',
+}
+
+# Columns holding a list of a table's ids: (table, column) -> table
+LIST_REFERENCES = {
+    ('archived_risk', 'project_ids'): 'project',
+    ('archived_risk', 'framework_ids'): 'compliance_framework',
+    ('archived_project', 'risk_ids'): 'risk',
+}
+
+# Tables with a column naming the table whose id is in another: table -> (type column, id column)
+ENTITY_REFERENCES = {
+    'audit_log': ('entity_type', 'entity_id'),
+    'sent_alert': ('entity_type', 'entity_id'),
+}
+
+VERSION_TABLES = {version.__table__.name for version in VERSIONED_MODELS.values()}
+
+
+def _soft_columns(table):
+    columns = {column for (name, column) in SOFT_REFERENCES if name == table.name}
+    columns |= {column for (name, column) in LIST_REFERENCES if name == table.name}
+    if table.name in ENTITY_REFERENCES:
+        columns.add(ENTITY_REFERENCES[table.name][1])
+    return columns
+
+
+def _copy_order(tables):
+    # Tables holding ids without a foreign key come last, so every table they
+    # reference has its rows copied and the rest of its ids are reserved
+    return sorted(tables, key=lambda table: bool(_soft_columns(table)))
+
+
+def _generated_key(table):
+    """The single integer primary key this database assigns, if the table has one"""
+    keys = list(table.primary_key.columns)
+    if len(keys) != 1 or keys[0].foreign_keys or (table.name, keys[0].name) in SOFT_REFERENCES:
+        return None
+    return keys[0].name if keys[0].type.python_type is int else None
+
+
+class _TenantCopy:
+    """Copies the source tenant's rows into target_id within the session's transaction"""
+
+    def __init__(self, source, source_id, target_id):
+        self.source = source
+        self.source_id = source_id
+        self.target_id = target_id
+        self.sqlite = db.engine.dialect.name == 'sqlite'
+        self.ids = {}        # table name -> {source id: id here}
+        self.next_ids = {}   # table name -> next free id, on SQLite
+        self.counts = {}
+
+    def _source_rows(self, table):
+        if 'tenant_id' in table.c:
+            condition = table.c.tenant_id == self.source_id
+        else:
+            # Link tables: rows of the tenant's first parent
+            column = next(column for column in table.c if column.foreign_keys)
+            parent = next(iter(column.foreign_keys)).column.table
+            condition = column.in_(select(parent.c.id).where(parent.c.tenant_id == self.source_id))
+        statement = select(table).where(condition).order_by(*table.primary_key.columns)
+        with self.source.connect() as connection:
+            result = connection.execution_options(yield_per=IMPORT_BATCH_SIZE).execute(statement)
+            for rows in result.mappings().partitions():
+                yield [dict(row) for row in rows]
+
+    def _reserve(self, name, count):
+        """count ids of table name that no row here has or will be given"""
+        if self.sqlite:
+            # No sequences: every id above the highest one kept anywhere is free
+            if name not in self.next_ids:
+                columns = [db.metadata.tables[name].c.id] + [
+                    db.metadata.tables[table].c[column]
+                    for (table, column), target in SOFT_REFERENCES.items() if target == name]
+                self.next_ids[name] = max(
+                    db.session.execute(select(func.coalesce(func.max(column), 0))).scalar()
+                    for column in columns
+                ) + 1
+            start = self.next_ids[name]
+            self.next_ids[name] += count
+            return list(range(start, start + count))
+        return db.session.execute(
+            text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+            {'table': f'"{name}"', 'count': count}
+        ).scalars().all()
+
+    def _map(self, name, old_ids):
+        """The ids here for these source ids of table name, reserving ids the copy has not given out"""
+        mapping = self.ids.setdefault(name, {})
+        missing = sorted({old_id for old_id in old_ids if old_id is not None and old_id not in mapping})
+        if missing:
+            mapping.update(zip(missing, self._reserve(name, len(missing))))
+        return mapping
+
+    def _rewrite(self, table, rows):
+        for column in table.c:
+            if column.foreign_keys and column.name != 'tenant_id':
+                mapping = self.ids[next(iter(column.foreign_keys)).column.table.name]
+                for row in rows:
+                    if row[column.name] is not None:
+                        row[column.name] = mapping[row[column.name]]
+        for (name, column), target in SOFT_REFERENCES.items():
+            if name == table.name:
+                mapping = self._map(target, (row[column] for row in rows))
+                for row in rows:
+                    row[column] = mapping.get(row[column])
+        for (name, column), target in LIST_REFERENCES.items():
+            if name == table.name:
+                mapping = self._map(target, (old_id for row in rows for old_id in row[column] or []))
+                for row in rows:
+                    row[column] = [mapping[old_id] for old_id in row[column] or []]
+        if table.name in ENTITY_REFERENCES:
+            type_column, id_column = ENTITY_REFERENCES[table.name]
+            for entity in {row[type_column] for row in rows}:
+                if entity not in db.metadata.tables:
+                    continue
+                entity_rows = [row for row in rows if row[type_column] == entity]
+                mapping = self._map(entity, (row[id_column] for row in entity_rows))
+                for row in entity_rows:
+                    row[id_column] = mapping.get(row[id_column])
+        if 'tenant_id' in table.c:
+            for row in rows:
+                row['tenant_id'] = self.target_id
+
+    def copy_table(self, table):
+        if table.name in VERSION_TABLES:
+            # The copied entities opened versions as they were inserted; their
+            # history is the source's
+            db.session.execute(delete(table).where(table.c.tenant_id == self.target_id))
+        key = _generated_key(table)
+        self.ids.setdefault(table.name, {})
+        copied = 0
+        for rows in self._source_rows(table):
+            old_ids = [row.pop(key) for row in rows] if key else None
+            self._rewrite(table, rows)
+            if key:
+                # Executed as one multi-row statement; ids come back in row order
+                new_ids = db.session.execute(
+                    insert(table).returning(table.c[key], sort_by_parameter_order=True), rows
+                ).scalars().all()
+                self.ids[table.name].update(zip(old_ids, new_ids))
+            else:
+                db.session.execute(insert(table), rows)
+            copied += len(rows)
+        self.counts[table.name] = copied
+
+    def run(self):
+        tables = [table for table in db.metadata.sorted_tables
+                  if table.name not in SKIPPED_TABLES
+                  and ('tenant_id' in table.c or any(column.foreign_keys for column in table.c))]
+        for table in _copy_order(tables):
+            self.copy_table(table)
+        return self.counts
+
+
+def _check_source(source, source_slug):
+    """The source tenant's id and usernames, once the source is known to be at this schema"""
+    head = ScriptDirectory(MIGRATIONS_DIR).get_current_head()
+    with source.connect() as connection:
+        revision = MigrationContext.configure(connection).get_current_revision()
+        if revision != head:
+            raise ValueError(f'Source database is at revision {revision or "none"}, not {head}: '
+                             f'start its deployment once on this release to upgrade it')
+        tenant = Tenant.__table__
+        source_id = connection.execute(select(tenant.c.id).where(tenant.c.slug == source_slug)).scalar()
+        if source_id is None:
+            raise ValueError(f'Unknown source tenant: {source_slug}')
+        user = User.__table__
+        usernames = connection.execute(select(user.c.username).where(user.c.tenant_id == source_id)).scalars().all()
+    return source_id, usernames
+
+
+def import_tenant(source_url, slug, name=None, source_slug='default'):
+    """Create tenant slug holding a copy of source_slug's rows in the database at source_url.
+
+    Usernames are unique across tenants, so the import is refused while any
+    of the source's users has a username already taken here. Returns stats.
+    """
+    started = time.perf_counter()
+    source = create_engine(source_url)
+    try:
+        source_id, usernames = _check_source(source, source_slug)
+        taken = sorted(db.session.execute(
+            select(User.username).where(User.username.in_(usernames)).execution_options(all_tenants=True)
+        ).scalars()) if usernames else []
+        if taken:
+            raise ValueError(f"Usernames already used here: {', '.join(taken)}")
+
+        tenant = create_tenant(slug, name)
+        try:
+            counts = _TenantCopy(source, source_id, tenant.id).run()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            db.session.delete(tenant)
+            db.session.commit()
+            raise
+    finally:
+        source.dispose()
+
+    stats = {
+        'tenant': tenant.to_dict(),
+        'rows': sum(counts.values()),
+        'tables': {table: count for table, count in counts.items() if count},
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Imported tenant {slug} from {source_slug}: {stats['rows']} rows")
+    return stats
@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Set before app is imported: the app connects and creates the schema on import.
+# SQLite by default; TEST_DATABASE_URL runs the suite against an empty Postgres database.
+_DB_DIR = tempfile.mkdtemp(prefix='cybether-tests-')
+os.environ['DATABASE_URL'] = os.getenv('TEST_DATABASE_URL') or f"sqlite:///{os.path.join(_DB_DIR, 'tests.db')}"
+os.environ['SNAPSHOT_DIR'] = os.path.join(_DB_DIR, 'snapshots')
+os.environ['REPORT_DIR'] = os.path.join(_DB_DIR, 'reports')
+# Tests run jobs themselves
+os.environ['SCHEDULER_ENABLED'] = 'false'
+os.environ['SNAPSHOT_ENABLED'] = 'false'
+os.environ['AUDIT_ENABLED'] = 'false'
+os.environ['OUTBOX_TARGETS'] = ''
+os.environ['ADMISSION_ENABLED'] = 'false'
+os.environ.setdefault('JWT_SECRET_KEY', 'test-only-jwt-secret-key-of-32-bytes')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import app as flask_app  # noqa: E402
+from models.models import db, User, Tenant, DEFAULT_TENANT_ID  # noqa: E402
+from tenancy import tenant_claims, tenant_scope  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        yield flask_app
+        db.session.rollback()
+        # Every test starts from an empty register; the default tenant stays
+        for table in reversed(db.metadata.sorted_tables):
+            if table.name != 'tenant':
+                db.session.execute(table.delete())
+        db.session.execute(Tenant.__table__.delete().where(Tenant.id != DEFAULT_TENANT_ID))
+        db.session.commit()
+
+
+@pytest.fixture
+def tenant(app):
+    """Run the test bound to the default tenant, as a request from one of its users is"""
+    with tenant_scope(DEFAULT_TENANT_ID) as tenant_id:
+        yield tenant_id
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_headers(tenant):
+    admin = User(username='admin', password_hash='unused', is_admin=True)
+    db.session.add(admin)
+    db.session.commit()
+    token = create_access_token(identity=str(admin.id), additional_claims=tenant_claims(admin))
+    return {'Authorization': f'Bearer {token}'}
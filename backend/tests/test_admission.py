@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from admission import AdmissionController, Overloaded, classify, parse_class_values
+
+
+def controller(**overrides):
+    settings = dict(max_concurrent=2, limits={'read': 1}, queue_limits={'write': 1, 'read': 1},
+                    queue_timeout=0.2, retry_after=1)
+    settings.update(overrides)
+    return AdmissionController(**settings)
+
+
+def test_classify_and_parse():
+    assert classify('POST', '/api/login') == 'auth'
+    assert classify('PUT', '/api/risks/1') == 'write'
+    assert classify('GET', '/api/health') == 'health'
+    assert classify('GET', '/api/risks') == 'read'
+    assert parse_class_values('read=4, write=8') == {'read': 4, 'write': 8}
+    with pytest.raises(ValueError):
+        parse_class_values('reports=4')
+
+
+def test_full_queue_and_timeout_shed():
+    admission = controller()
+    admission.acquire('read')
+    started = time.monotonic()
+    # One read may wait for the slot, and gives up after the queue timeout
+    with pytest.raises(Overloaded) as shed:
+        admission.acquire('read')
+    assert time.monotonic() - started >= 0.2 and shed.value.retry_after == 1
+    # Nothing queues for auth, which has no queue configured
+    admission.acquire('auth')
+    with pytest.raises(Overloaded):
+        admission.acquire('auth')
+    assert admission.metrics()['classes']['read']['shed'] == 1
+
+
+def test_waiting_writes_are_admitted_before_reads():
+    admission = controller(max_concurrent=1, queue_timeout=5)
+    admission.acquire('write')
+    admitted = []
+    waiter = threading.Thread(target=lambda: (admission.acquire('write'), admitted.append('write')))
+    waiter.start()
+    while not admission.metrics()['queued']:
+        time.sleep(0.01)
+    # Reads are shed at once while a write is waiting
+    with pytest.raises(Overloaded):
+        admission.acquire('read')
+    admission.release('write', 0.05)
+    waiter.join(1)
+    assert admitted == ['write']
+    assert admission.metrics()['classes']['write']['in_flight'] == 1
+
+
+def test_overloaded_requests_get_503(client, monkeypatch):
+    admission = controller()
+    admission.acquire('read')
+    admission._queues['read'].append(object())
+    monkeypatch.setattr(app_module, 'admission', admission)
+    monkeypatch.setitem(client.application.config, 'ADMISSION_ENABLED', True)
+    response = client.get('/api/risks')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert response.get_json()['code'] == 'overloaded'
+    assert client.get('/api/health').status_code == 200
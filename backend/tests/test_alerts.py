@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import jobs
+from alerts import AlertSink, MemorySink, evaluate_alerts
+from models.models import db, Project, SentAlert, DEFAULT_TENANT_ID
+from tenancy import bound_tenant, create_tenant, tenant_scope
+
+
+class FailingSink(AlertSink):
+    def send(self, alerts):
+        raise RuntimeError('sink unavailable')
+
+
+def sent_rules(sink):
+    return sorted(alert['rule'] for batch in sink.batches for alert in batch)
+
+
+def add_project(due_in):
+    project = Project(name='Network segmentation', status='In Progress',
+                      due_date=datetime.utcnow() + due_in)
+    db.session.add(project)
+    db.session.commit()
+    return project
+
+
+def test_deadline_alert_is_sent_once(tenant):
+    add_project(timedelta(days=3))
+    sink = MemorySink()
+
+    evaluate_alerts([sink])
+    evaluate_alerts([sink])
+
+    assert sent_rules(sink) == ['project_due_soon']
+
+
+def test_item_created_past_its_trigger_is_alerted(tenant):
+    sink = MemorySink()
+    evaluate_alerts([sink])
+
+    add_project(timedelta(days=-1))
+    evaluate_alerts([sink])
+
+    # Overdue, without the due-soon warning for a deadline already gone
+    assert sent_rules(sink) == ['project_overdue']
+
+
+def test_item_rescheduled_into_the_window_is_alerted(tenant):
+    project = add_project(timedelta(days=60))
+    sink = MemorySink()
+    evaluate_alerts([sink])
+    assert sent_rules(sink) == []
+
+    project.due_date = datetime.utcnow() + timedelta(days=2)
+    db.session.commit()
+    evaluate_alerts([sink])
+
+    assert sent_rules(sink) == ['project_due_soon']
+
+
+def test_failed_send_is_retried(tenant):
+    add_project(timedelta(days=3))
+    with pytest.raises(RuntimeError):
+        evaluate_alerts([FailingSink()])
+    assert SentAlert.query.count() == 0
+
+    sink = MemorySink()
+    evaluate_alerts([sink])
+    assert sent_rules(sink) == ['project_due_soon']
+
+
+class TenantFailingSink(MemorySink):
+    """Accepts every tenant's alerts but those of failing_tenant"""
+
+    def __init__(self, failing_tenant):
+        super().__init__()
+        self.failing_tenant = failing_tenant
+
+    def send(self, alerts):
+        if bound_tenant() == self.failing_tenant:
+            raise RuntimeError('sink unavailable')
+        super().send(alerts)
+
+
+def test_one_tenants_failure_does_not_stop_the_others(app, monkeypatch):
+    other = create_tenant('unit', 'Unit').id
+    for tenant_id in (DEFAULT_TENANT_ID, other):
+        with tenant_scope(tenant_id):
+            add_project(timedelta(days=3))
+    sink = TenantFailingSink(failing_tenant=DEFAULT_TENANT_ID)
+    monkeypatch.setattr(jobs, 'build_sinks', lambda config: [sink])
+
+    with pytest.raises(RuntimeError, match=f'tenants {DEFAULT_TENANT_ID}$'):
+        jobs.send_deadline_alerts()
+    assert sent_rules(sink) == ['project_due_soon']
+    with tenant_scope(other):
+        assert SentAlert.query.count() == 1
+    with tenant_scope(DEFAULT_TENANT_ID):
+        assert SentAlert.query.count() == 0
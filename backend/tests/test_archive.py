@@ -0,0 +1,93 @@
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from models.models import (db, Risk, Project, ComplianceFramework, ArchivedRisk, ArchivedProject, RiskVersion,
+                           OPEN_ENDED, risk_project)
+from archive import archive_rows
+from findings import ingest_findings
+from queries import risks_statement
+
+NOW = datetime(2026, 6, 1)
+OLD = NOW - timedelta(days=400)
+
+
+@pytest.fixture
+def register(tenant):
+    project = Project(name='MFA rollout', status='Completed', updated_at=OLD)
+    framework = ComplianceFramework(name='ISO 27001', current_score=60, target_score=80)
+    risks = [
+        Risk(title='Old and closed', severity='High', status='Closed', updated_at=OLD,
+             projects=[project], frameworks=[framework]),
+        Risk(title='Recently closed', severity='Low', status='Closed', updated_at=NOW),
+        Risk(title='Old but open', severity='Low', status='Open', updated_at=OLD),
+    ]
+    db.session.add_all(risks)
+    db.session.commit()
+    return project, framework, risks
+
+
+def test_archive_moves_old_final_rows_with_their_links(register):
+    project, framework, risks = register
+    ids = (risks[0].id, project.id, framework.id)
+    assert archive_rows(365, now=NOW, batch_size=1) == {'risks': 1, 'projects': 1}
+
+    assert {risk.title for risk in Risk.query} == {'Recently closed', 'Old but open'}
+    archived = db.session.get(ArchivedRisk, ids[0])
+    assert (archived.archived_at, archived.project_ids, archived.framework_ids) == (NOW, [ids[1]], [ids[2]])
+    # The project was archived after the risk had taken its link with it
+    assert db.session.get(ArchivedProject, ids[1]).risk_ids == []
+    assert db.session.execute(risk_project.select()).all() == []
+    assert archive_rows(365, now=NOW) == {'risks': 0, 'projects': 0}
+
+
+def test_archived_rows_are_listed_on_request(client, admin_headers, register):
+    archive_rows(365, now=NOW)
+    assert len(client.get('/api/risks').get_json()) == 2
+    items = client.get('/api/risks?include_archived=true').get_json()
+    assert [item['title'] for item in items if item.get('archived')] == ['Old and closed']
+
+    page = client.get('/api/archive/projects', headers=admin_headers).get_json()
+    assert (page['total'], page['items'][0]['name']) == (1, 'MFA rollout')
+    assert client.get('/api/archive/users', headers=admin_headers).status_code == 404
+
+
+def test_as_of_still_has_archived_rows(register):
+    archived_id = register[2][0].id
+    archive_rows(365, now=NOW)
+    current = db.session.execute(risks_statement(datetime.utcnow())).scalars().all()
+    assert {risk.title for risk in current} == {'Old and closed', 'Recently closed', 'Old but open'}
+    assert db.session.execute(select(RiskVersion.valid_to).where(RiskVersion.id == archived_id)).scalars().all() == [
+        OPEN_ENDED]
+
+
+def test_finding_seen_again_restores_its_archived_risk(tenant):
+    findings = [{'title': 'TLS 1.0 enabled', 'host': 'web-1', 'severity': 'High'},
+                {'title': 'SMB signing disabled', 'host': 'fs-1', 'severity': 'Medium'}]
+
+    def scan(items, now):
+        ingest_findings(io.StringIO(''.join(json.dumps(item) + '\n' for item in items)), 'nessus', now=now)
+
+    scan(findings, OLD)
+    scan(findings[:1], OLD + timedelta(days=1))
+    smb = Risk.query.filter_by(title='SMB signing disabled on fs-1').one()
+    smb_id, project = smb.id, Project(name='Hardening', status='In Progress', risks=[smb])
+    db.session.add(project)
+    db.session.commit()
+    assert archive_rows(365, now=NOW)['risks'] == 1
+
+    scan(findings, NOW)
+    restored = db.session.get(Risk, smb_id)
+    assert (restored.status, restored.auto_closed) == ('Open', False)
+    assert [linked.id for linked in restored.projects] == [project.id]
+    assert ArchivedRisk.query.count() == 0
+    assert Risk.query.count() == 2
+    versions = db.session.execute(
+        select(RiskVersion.status, RiskVersion.valid_to).where(RiskVersion.id == smb_id)
+        .order_by(RiskVersion.version_id)
+    ).all()
+    assert [status for status, _ in versions][-1] == 'Open'
+    assert [valid_to for _, valid_to in versions].count(OPEN_ENDED) == 1
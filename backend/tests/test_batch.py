@@ -0,0 +1,64 @@
+from models.models import Risk, Project, MaturityTrendPoint
+
+RISK = {'title': 'Legacy VPN', 'severity': 'High', 'status': 'Open'}
+PROJECT = {'name': 'MFA rollout', 'status': 'In Progress', 'completion_percentage': 40}
+
+
+def batch(client, headers, *operations):
+    return client.post('/api/batch', json={'operations': list(operations)}, headers=headers)
+
+
+def test_batch_applies_across_collections(client, admin_headers):
+    response = batch(client, admin_headers,
+                     {'op': 'create', 'collection': 'risks', 'data': RISK},
+                     {'op': 'create', 'collection': 'projects', 'data': PROJECT})
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    risk_id = data['results'][0]['id']
+    assert set(data['versions']) == {'risks', 'projects'}
+
+    response = batch(client, admin_headers,
+                     {'op': 'update', 'collection': 'risks', 'id': risk_id, 'data': {'status': 'Closed'}},
+                     {'op': 'delete', 'collection': 'projects', 'id': data['results'][1]['id']})
+    assert response.status_code == 200
+    assert response.get_json()['data']['versions']['risks'] != data['versions']['risks']
+    assert Risk.query.one().status == 'Closed'
+    assert Project.query.count() == 0
+
+
+def test_failed_operation_rolls_back_the_batch(client, admin_headers):
+    response = batch(client, admin_headers,
+                     {'op': 'create', 'collection': 'risks', 'data': RISK},
+                     {'op': 'create', 'collection': 'projects', 'data': dict(PROJECT, completion_percentage=140)})
+    assert response.status_code == 400
+    assert response.get_json()['index'] == 1
+    assert Risk.query.count() == 0
+
+    response = batch(client, admin_headers,
+                     {'op': 'create', 'collection': 'risks', 'data': RISK},
+                     {'op': 'delete', 'collection': 'risks', 'id': 999999})
+    assert (response.status_code, response.get_json()['index']) == (404, 1)
+    assert Risk.query.count() == 0
+
+
+def test_batch_rejects_malformed_requests(client, admin_headers):
+    assert batch(client, admin_headers).status_code == 400
+    response = batch(client, admin_headers, {'op': 'create', 'collection': 'users', 'data': {}})
+    assert (response.status_code, response.get_json()['index']) == (400, 0)
+    assert client.post('/api/batch', json={'operations': [RISK]}).status_code == 422
+
+
+def test_trend_points_are_upserted(client, admin_headers):
+    point = {'op': 'create', 'collection': 'maturity_trend', 'data': {'month': '2026-01', 'score': 2.0}}
+    assert batch(client, admin_headers, point).status_code == 200
+    response = batch(client, admin_headers, dict(point, data={'month': '2026-01', 'score': 2.5}))
+    assert response.status_code == 200
+    assert MaturityTrendPoint.query.one().score == 2.5
+
+
+def test_single_item_routes_share_the_batch_validation(client, admin_headers):
+    response = client.post('/api/projects', json=dict(PROJECT, completion_percentage='most'), headers=admin_headers)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid completion_percentage value'
+    assert client.post('/api/risks', json=dict(RISK, severity='Severe'), headers=admin_headers).status_code == 400
+    assert client.post('/api/risks', json=RISK, headers=admin_headers).status_code == 201
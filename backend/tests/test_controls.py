@@ -0,0 +1,113 @@
+import pytest
+
+from models.models import db, AuditLog, ComplianceFramework, ControlAssessment, OutboxEvent
+from controls import DuplicateControl, create_controls, bulk_update_status, delete_control, recalculate_framework_score
+
+CONTROLS = [
+    {'family': 'Access', 'reference': 'AC-1', 'title': 'Policy', 'status': 'Implemented'},
+    {'family': 'Access', 'reference': 'AC-2', 'title': 'Accounts', 'status': 'Partially Implemented'},
+    {'family': 'Audit', 'reference': 'AU-1', 'title': 'Logging', 'weight': 2},
+    {'family': 'Audit', 'reference': 'AU-2', 'title': 'Review', 'status': 'Not Applicable'},
+]
+
+
+@pytest.fixture
+def framework(tenant):
+    framework = ComplianceFramework(name='NIST CSF', current_score=0, target_score=80)
+    db.session.add(framework)
+    db.session.commit()
+    return framework
+
+
+def sums(framework):
+    db.session.refresh(framework)
+    return (framework.control_count, framework.control_weight_total, framework.control_score_total,
+            framework.current_score)
+
+
+def test_running_sums_follow_control_changes(framework):
+    controls = create_controls(framework.id, CONTROLS)
+    db.session.commit()
+    # Not Applicable controls count but carry no weight
+    assert sums(framework) == (4, 4.0, 1.5, 37.5)
+
+    by_reference = {control.reference: control for control in controls}
+    changed = bulk_update_status(framework.id, [
+        {'id': by_reference['AU-1'].id, 'status': 'Implemented'},
+        {'reference': 'AU-2', 'status': 'Implemented', 'notes': 'Now in scope'},
+    ], user_id=None)
+    db.session.commit()
+    assert len(changed) == 2
+    assert sums(framework) == (4, 5.0, 4.5, 90.0)
+    assert ControlAssessment.query.count() == 2
+
+    delete_control(by_reference['AC-1'])
+    db.session.commit()
+    assert sums(framework) == (3, 4.0, 3.5, 87.5)
+
+    # The running sums agree with a rebuild from the controls
+    recalculate_framework_score(framework.id)
+    assert sums(framework) == (3, 4.0, 3.5, 87.5)
+
+
+def test_bulk_update_rejects_bad_items(framework):
+    create_controls(framework.id, CONTROLS)
+    db.session.commit()
+    with pytest.raises(LookupError):
+        bulk_update_status(framework.id, [{'reference': 'XX-1', 'status': 'Implemented'}])
+    with pytest.raises(ValueError):
+        bulk_update_status(framework.id, [{'reference': 'AC-1', 'status': 'Done'}])
+    with pytest.raises(ValueError):
+        bulk_update_status(framework.id, [{'reference': 'AC-1', 'status': 'Implemented'},
+                                          {'reference': 'AC-1', 'status': 'Not Implemented'}])
+    db.session.rollback()
+    assert sums(framework) == (4, 4.0, 1.5, 37.5)
+
+
+def test_create_controls_validates_input(framework):
+    with pytest.raises(ValueError):
+        create_controls(framework.id, [{'family': 'Access', 'reference': 'AC-1'}])
+    with pytest.raises(ValueError):
+        create_controls(framework.id, [dict(CONTROLS[0], weight=0)])
+    with pytest.raises(ValueError):
+        create_controls(framework.id, ['AC-1'])
+
+
+def test_duplicate_references_are_refused(framework):
+    create_controls(framework.id, CONTROLS[:1])
+    db.session.commit()
+    with pytest.raises(DuplicateControl):
+        create_controls(framework.id, [dict(CONTROLS[1], reference='AC-1')])
+    db.session.rollback()
+    with pytest.raises(DuplicateControl):
+        create_controls(framework.id, [dict(CONTROLS[1], reference='AC-9'), dict(CONTROLS[2], reference='AC-9')])
+    db.session.rollback()
+    with pytest.raises(ValueError):
+        bulk_update_status(framework.id, [{'id': 'AC-1', 'status': 'Implemented'}])
+    with pytest.raises(ValueError):
+        bulk_update_status(framework.id, [{'id': True, 'status': 'Implemented'}])
+
+
+def test_sums_settle_at_zero(framework):
+    controls = create_controls(framework.id, [
+        {'family': 'Access', 'reference': f'AC-{number}', 'title': 'Control', 'weight': 0.1,
+         'status': 'Implemented'} for number in range(10)
+    ])
+    db.session.commit()
+    # Ten 0.1 deltas do not add back up to exactly 1.0 in floats
+    bulk_update_status(framework.id, [{'id': control.id, 'status': 'Not Applicable'} for control in controls])
+    db.session.commit()
+    count, weight_total, score_total, _ = sums(framework)
+    assert (count, weight_total, score_total) == (10, 0.0, 0.0)
+
+
+def test_score_changes_record_events(framework):
+    create_controls(framework.id, CONTROLS)
+    db.session.commit()
+    bulk_update_status(framework.id, [{'reference': 'AU-1', 'status': 'Implemented'}])
+    db.session.commit()
+
+    events = OutboxEvent.query.filter_by(entity_type='compliance_framework', action='update').order_by(OutboxEvent.id)
+    assert [event.payload['current_score'] for event in events] == [37.5, 87.5]
+    audit = AuditLog.query.filter_by(entity_type='compliance_framework', entity_id=framework.id).order_by(AuditLog.id)
+    assert [entry.changes for entry in audit] == [{'current_score': [None, 37.5]}, {'current_score': [None, 87.5]}]
@@ -0,0 +1,90 @@
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.models import AuditLog, OutboxEvent, Risk
+from findings import ingest_findings, normalize_severity
+from scoring import get_scoring_config, score_risk
+
+FIRST_RUN = datetime(2026, 6, 1)
+
+FINDINGS = [
+    {'plugin_id': '10863', 'plugin_name': 'TLS 1.0 enabled', 'host': 'web01', 'port': 443, 'risk': 'Medium'},
+    {'plugin_id': '42873', 'plugin_name': 'SMB signing disabled', 'host': 'dc01', 'cvss': '7.5'},
+    {'plugin_id': '19506', 'plugin_name': 'Scan info', 'host': 'web01', 'risk': 'None'},
+]
+
+
+def export(findings):
+    return io.StringIO(''.join(json.dumps(finding) + '\n' for finding in findings))
+
+
+def risks():
+    return {risk.title: risk for risk in Risk.query}
+
+
+def test_rerun_updates_closes_and_reopens(tenant):
+    stats = ingest_findings(export(FINDINGS), 'Nessus', now=FIRST_RUN)
+    assert (stats['read'], stats['ingested'], stats['skipped'], stats['closed']) == (3, 2, 1, 0)
+    found = risks()
+    assert set(found) == {'TLS 1.0 enabled on web01:443', 'SMB signing disabled on dc01'}
+    assert found['SMB signing disabled on dc01'].severity == 'High'
+    assert all(risk.score is not None and risk.source == 'nessus' for risk in found.values())
+
+    # The same scan again changes nothing; a missing finding is closed
+    stats = ingest_findings(export(FINDINGS[:1]), 'nessus', now=FIRST_RUN + timedelta(days=1))
+    assert (stats['ingested'], stats['closed']) == (1, 1)
+    found = risks()
+    assert len(found) == 2
+    assert found['TLS 1.0 enabled on web01:443'].updated_at == FIRST_RUN
+    closed = found['SMB signing disabled on dc01']
+    assert (closed.status, closed.auto_closed) == ('Closed', True)
+
+    # Seen again it reopens, and a changed severity is rescored
+    third_run = FIRST_RUN + timedelta(days=2)
+    rerun = [dict(FINDINGS[0], risk='High'), FINDINGS[1]]
+    assert ingest_findings(export(rerun), 'nessus', now=third_run)['closed'] == 0
+    found = risks()
+    reopened = found['SMB signing disabled on dc01']
+    assert (reopened.status, reopened.auto_closed, reopened.updated_at) == ('Open', False, third_run)
+    tls = found['TLS 1.0 enabled on web01:443']
+    assert (tls.severity, tls.updated_at) == ('High', third_run)
+    assert tls.score == pytest.approx(score_risk(tls, get_scoring_config()), rel=1e-3)
+
+
+def test_import_and_auto_close_record_events(tenant):
+    ingest_findings(export(FINDINGS), 'nessus', now=FIRST_RUN)
+    # Only seen again: no event
+    ingest_findings(export(FINDINGS), 'nessus', now=FIRST_RUN + timedelta(days=1))
+    ingest_findings(export(FINDINGS[:1]), 'nessus', now=FIRST_RUN + timedelta(days=2))
+    closed = risks()['SMB signing disabled on dc01']
+
+    events = [(event.action, event.entity_id, event.payload['status'])
+              for event in OutboxEvent.query.order_by(OutboxEvent.id)]
+    assert sorted(events[:2]) == sorted(('create', risk.id, 'Open') for risk in risks().values())
+    assert events[2:] == [('update', closed.id, 'Closed')]
+    audit = [(entry.action, entry.entity_id, entry.changes.get('status'))
+             for entry in AuditLog.query.order_by(AuditLog.id)]
+    assert audit[2:] == [('update', closed.id, [None, 'Closed'])]
+
+
+def test_empty_export_closes_nothing(tenant):
+    ingest_findings(export(FINDINGS), 'nessus', now=FIRST_RUN)
+    assert ingest_findings(export([]), 'nessus', now=FIRST_RUN + timedelta(days=1))['closed'] == 0
+    assert Risk.query.filter_by(status='Open').count() == 2
+
+
+def test_csv_export_and_other_scanners(tenant):
+    ingest_findings(export(FINDINGS[:1]), 'nessus', now=FIRST_RUN)
+    csv_export = io.StringIO('qid,title,ip,severity\n38170,Weak SSH ciphers,10.0.0.5,low\n')
+    assert ingest_findings(csv_export, 'qualys', fmt='csv', now=FIRST_RUN)['closed'] == 0
+    assert set(risks()) == {'TLS 1.0 enabled on web01:443', 'Weak SSH ciphers on 10.0.0.5'}
+
+
+def test_normalize_severity():
+    assert [normalize_severity(value) for value in ('critical', ' Moderate', '9.8', '4.0', '0')] == [
+        'Critical', 'Medium', 'Critical', 'Medium', None]
+    with pytest.raises(ValueError):
+        normalize_severity('urgent')
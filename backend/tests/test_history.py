@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+from models.models import db, CurrentMetric, MaturityRating, MetricRollup
+from history import record_current, get_current, get_history, compact_history
+
+NOW = datetime(2026, 6, 1, 12, 0)
+
+
+def add_rating(score, at):
+    rating = MaturityRating(score=score, trend='Stable', updated_at=at)
+    db.session.add(rating)
+    record_current('maturity_rating', rating)
+    db.session.commit()
+    return rating
+
+
+def test_current_value_follows_writes(tenant):
+    add_rating(2.5, NOW - timedelta(days=1))
+    add_rating(2.8, NOW)
+    current = get_current('maturity_rating')
+    assert (current.value, current.label, current.updated_at) == (2.8, 'Stable', NOW)
+
+
+def test_current_value_is_seeded_from_history(tenant):
+    db.session.add(MaturityRating(score=3.1, trend='Increasing', updated_at=NOW))
+    db.session.commit()
+    assert get_current('maturity_rating').value == 3.1
+    assert get_current('threat_level') is None
+
+
+def test_first_writes_upsert_the_current_row(tenant):
+    # Two first writes in one transaction hit the same key rather than racing on it
+    for score in (1.5, 1.9):
+        record_current('maturity_rating', MaturityRating(score=score, trend='Stable', updated_at=NOW))
+    db.session.commit()
+    assert CurrentMetric.query.count() == 1
+    assert get_current('maturity_rating').value == 1.9
+
+
+def test_compaction_keeps_history_readable(tenant):
+    old_day = NOW - timedelta(days=200)
+    add_rating(2.0, old_day.replace(hour=9))
+    add_rating(3.0, old_day.replace(hour=15))
+    add_rating(3.5, NOW - timedelta(days=10))
+
+    assert compact_history(90, now=NOW) == {'threat_level': 0, 'maturity_rating': 2}
+    assert MaturityRating.query.count() == 1
+    # Re-running finds nothing left to fold and leaves the rollup as it was
+    assert compact_history(90, now=NOW) == {'threat_level': 0, 'maturity_rating': 0}
+    assert MetricRollup.query.count() == 1
+
+    points = get_history('maturity_rating', NOW - timedelta(days=365), NOW, 'day')
+    assert [(point['min'], point['max'], point['last'], point['count']) for point in points] == [
+        (2.0, 3.0, 3.0, 2), (3.5, 3.5, 3.5, 1)]
+    assert points[0]['bucket_start'] == old_day.replace(hour=0)
+    # Raw reads only reach back to the retention window
+    assert [point['value'] for point in get_history('maturity_rating', old_day, NOW, 'raw')] == [3.5]
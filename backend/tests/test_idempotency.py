@@ -0,0 +1,56 @@
+import uuid
+
+import pytest
+
+from models.models import Risk
+from idempotency import IdempotencyConflict, IdempotencyStore, StoredResponse
+
+RISK = {'op': 'create', 'collection': 'risks', 'data': {'title': 'Legacy VPN', 'severity': 'High', 'status': 'Open'}}
+
+
+def post(client, headers, key, operation=RISK):
+    return client.post('/api/batch', json={'operations': [operation]},
+                       headers=dict(headers, **{'Idempotency-Key': key}))
+
+
+def test_retry_is_replayed_without_rerunning(client, admin_headers):
+    key = str(uuid.uuid4())
+    first = post(client, admin_headers, key)
+    replay = post(client, admin_headers, key)
+    assert first.status_code == replay.status_code == 200
+    assert replay.headers['Idempotent-Replayed'] == 'true'
+    assert replay.get_json() == first.get_json()
+    assert Risk.query.count() == 1
+
+    # Another request under the same key is refused
+    other = dict(RISK, data=dict(RISK['data'], title='Other'))
+    assert post(client, admin_headers, key, other).status_code == 422
+
+
+def test_failed_requests_are_not_kept(client, admin_headers):
+    key = str(uuid.uuid4())
+    invalid = dict(RISK, data=dict(RISK['data'], severity='Severe'))
+    assert post(client, admin_headers, key, invalid).status_code == 400
+    retry = post(client, admin_headers, key, invalid)
+    assert retry.status_code == 400 and 'Idempotent-Replayed' not in retry.headers
+    assert post(client, admin_headers, 'k' * 256).status_code == 400
+
+
+def test_store_waits_for_the_first_request():
+    store = IdempotencyStore(ttl=60, max_entries=1, max_body_bytes=10, wait_seconds=0.05)
+    a, b, c = ('1', 'a'), ('1', 'b'), ('1', 'c')
+    assert store.begin(a, 'fingerprint') is None
+    with pytest.raises(IdempotencyConflict) as conflict:
+        store.begin(a, 'fingerprint')
+    assert conflict.value.status == 409
+
+    store.complete(a, StoredResponse(200, 'application/json', b'{}'))
+    assert store.begin(a, 'fingerprint').body == b'{}'
+    # Oversized bodies are not kept
+    assert store.begin(b, 'fingerprint') is None
+    store.complete(b, StoredResponse(200, 'application/json', b'x' * 11))
+    assert store.begin(b, 'fingerprint') is None
+    store.abandon(b)
+    # Over max_entries the oldest finished entry goes
+    assert store.begin(c, 'fingerprint') is None
+    assert store.begin(a, 'fingerprint') is None
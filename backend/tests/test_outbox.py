@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+from models.models import db, Risk, OutboxCursor, OutboxEvent
+from outbox import BACKOFF_BASE, GAP_TIMEOUT, LocalWebhookReceiver, WebhookTarget, deliver_target
+
+
+@pytest.fixture
+def receiver(tenant):
+    receiver = LocalWebhookReceiver().start()
+    yield receiver
+    receiver.stop()
+
+
+def write_risks(count):
+    risks = [Risk(title=f'Risk {i}', severity='High', status='Open') for i in range(count)]
+    db.session.add_all(risks)
+    db.session.commit()
+    risks[0].status = 'Closed'
+    db.session.commit()
+
+
+def test_events_are_delivered_in_order_on_one_connection(receiver):
+    write_risks(5)
+    target = WebhookTarget('siem', receiver.url)
+
+    assert deliver_target(target, batch_size=2) == 6
+    target.close()
+
+    events = [item for batch in receiver.batches for item in batch]
+    assert [len(batch) for batch in receiver.batches] == [2, 2, 2]
+    assert [item['action'] for item in events] == ['create'] * 5 + ['update']
+    assert [item['id'] for item in events] == sorted(item['id'] for item in events)
+    assert len(receiver.connections) == 1
+    assert OutboxCursor.query.one().delivered_until == events[-1]['id']
+
+
+def test_failed_delivery_backs_off_and_resumes(receiver):
+    write_risks(2)
+    target = WebhookTarget('siem', receiver.url)
+    receiver.fail_next = 1
+    now = datetime.utcnow()
+
+    assert deliver_target(target, now=now) == 0
+    cursor = OutboxCursor.query.one()
+    assert (cursor.attempts, cursor.next_attempt_at) == (1, now + BACKOFF_BASE)
+    # Not retried before the backoff is over
+    assert deliver_target(target, now=now + BACKOFF_BASE / 2) == 0
+
+    assert deliver_target(target, now=now + BACKOFF_BASE) == 3
+    target.close()
+    assert OutboxCursor.query.one().attempts == 0
+
+
+def write_event(event_id):
+    db.session.execute(insert(OutboxEvent), [{'id': event_id, 'entity_type': 'risk', 'entity_id': event_id,
+                                              'action': 'create', 'payload': {}, 'created_at': datetime.utcnow()}])
+    db.session.commit()
+
+
+def test_event_committed_late_is_delivered(receiver):
+    # Event 2 belongs to a transaction still running when 1 and 3 are sent
+    write_event(1)
+    write_event(3)
+    target = WebhookTarget('siem', receiver.url)
+    now = datetime.utcnow()
+
+    assert deliver_target(target, now=now) == 2
+    cursor = OutboxCursor.query.one()
+    assert cursor.delivered_until == 3 and list(cursor.gaps) == ['2']
+
+    write_event(2)
+    write_event(4)
+    assert deliver_target(target, now=now) == 2
+    target.close()
+    assert [[item['id'] for item in batch] for batch in receiver.batches] == [[1, 3], [2, 4]]
+    assert OutboxCursor.query.one().gaps == {}
+
+
+def test_gap_never_committed_is_dropped(receiver):
+    write_event(1)
+    write_event(3)
+    target = WebhookTarget('siem', receiver.url)
+    now = datetime.utcnow()
+    deliver_target(target, now=now)
+
+    assert deliver_target(target, now=now + GAP_TIMEOUT / 2) == 0
+    assert list(OutboxCursor.query.one().gaps) == ['2']
+    assert deliver_target(target, now=now + GAP_TIMEOUT) == 0
+    target.close()
+    assert OutboxCursor.query.one().gaps == {}
@@ -0,0 +1,49 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from models.models import db, Risk, Project, ComplianceFramework
+
+
+@contextmanager
+def counted_statements():
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+
+def add_linked_risks(count):
+    projects = [Project(name=f'Project {i}', status='In Progress') for i in range(5)]
+    frameworks = [ComplianceFramework(name=f'Framework {i}', current_score=50, target_score=80) for i in range(3)]
+    for i in range(count):
+        db.session.add(Risk(title=f'Risk {i}', severity='High', status='Open',
+                            projects=projects[i % 5:i % 5 + 2], frameworks=frameworks[i % 3:]))
+    db.session.commit()
+
+
+def get_page(client):
+    with counted_statements() as statements:
+        response = client.get('/api/risks/links?per_page=100')
+    assert response.status_code == 200
+    return response.json, statements
+
+
+def test_page_of_linked_risks_takes_a_fixed_number_of_queries(tenant, client):
+    add_linked_risks(10)
+    small, small_statements = get_page(client)
+
+    add_linked_risks(90)
+    page, statements = get_page(client)
+
+    assert len(page['items']) == 100
+    assert all(item['projects'] and item['frameworks'] for item in page['items'])
+    # Count, page, and one IN query per relationship
+    assert len(statements) == 4
+    assert len(small_statements) == len(statements)
@@ -0,0 +1,99 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from models.models import db, ScheduledJob
+from scheduler import JOBS, Scheduler, register_job
+
+CALLS = []
+
+
+@pytest.fixture
+def jobs(app):
+    register_job('test_ok', interval_seconds=60)(lambda: CALLS.append('ok') or {'ran': True})
+    register_job('test_broken', interval_seconds=60)(lambda: 1 / 0)
+    CALLS.clear()
+    yield
+    JOBS.pop('test_ok')
+    JOBS.pop('test_broken')
+
+
+def worker(app, name):
+    scheduler = Scheduler(app)
+    scheduler.worker_id = name
+    return scheduler
+
+
+def test_one_worker_holds_the_lease(app, jobs):
+    first, second = worker(app, 'first'), worker(app, 'second')
+    first.sync_jobs()
+    now = datetime.utcnow()
+    assert first._acquire('test_ok', now)
+    assert not second._acquire('test_ok', now)
+    assert second.run_now('test_ok') is None
+    assert CALLS == []
+
+    # A crashed leader's lease expires
+    assert second._acquire('test_ok', now + timedelta(seconds=first.lease_seconds + 1))
+    job = db.session.get(ScheduledJob, 'test_ok')
+    db.session.refresh(job)
+    assert job.locked_by == 'second'
+
+
+def test_run_records_outcome_and_releases_lease(app, jobs):
+    scheduler = worker(app, 'only')
+    scheduler.sync_jobs()
+    assert scheduler.run_now('test_ok')['result'] == {'ran': True}
+    failed = scheduler.run_now('test_broken')
+    assert failed['status'] == 'failed' and 'division' in failed['error']
+
+    ok, broken = (db.session.get(ScheduledJob, name) for name in ('test_ok', 'test_broken'))
+    db.session.refresh(ok)
+    db.session.refresh(broken)
+    assert (ok.last_status, ok.locked_by, ok.locked_until) == ('success', None, None)
+    assert ok.next_run_at == ok.last_run_at + timedelta(seconds=60)
+    assert (broken.last_status, broken.locked_by) == ('failed', None)
+    with pytest.raises(KeyError):
+        scheduler.run_now('missing')
+
+
+def test_scheduled_lease_requires_the_job_to_be_due(app, jobs):
+    first, second = worker(app, 'first'), worker(app, 'second')
+    first.sync_jobs()
+    listed_at = datetime.utcnow()
+    first.run_now('test_ok')
+    # second listed the job as due before first ran it and released the lease
+    assert not second._acquire('test_ok', listed_at, due_only=True)
+    assert second._acquire('test_ok', listed_at)
+
+
+def test_lease_is_renewed_while_the_job_runs(app, jobs):
+    scheduler = worker(app, 'slow')
+    scheduler.lease_seconds = 0.3
+    leases = []
+
+    def slow():
+        acquired = db.session.get(ScheduledJob, 'test_slow').locked_until
+        time.sleep(0.25)
+        with db.engine.connect() as connection:
+            renewed = connection.execute(
+                select(ScheduledJob.locked_until).where(ScheduledJob.name == 'test_slow')).scalar()
+        leases.append((acquired, renewed))
+
+    register_job('test_slow', interval_seconds=60)(slow)
+    try:
+        scheduler.sync_jobs()
+        assert scheduler.run_now('test_slow')['status'] == 'success'
+    finally:
+        JOBS.pop('test_slow')
+    (acquired, renewed), = leases
+    assert renewed > acquired
+
+
+def test_run_pending_runs_due_jobs_once(app, jobs):
+    scheduler = worker(app, 'only')
+    scheduler.run_pending()
+    scheduler.run_pending()
+    assert CALLS == ['ok']
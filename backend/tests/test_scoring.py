@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.models import db, dialect_insert, Risk, RiskScoringConfig
+from scoring import (get_scoring_config, score_expression, score_risk, rescore_risks, risk_heatmap, seed_scoring_config,
+                     validate_weights)
+
+NOW = datetime(2026, 6, 1)
+
+
+@pytest.fixture
+def risks(tenant):
+    risks = [
+        Risk(title='Fresh', severity='High', status='Open', likelihood=4, impact=5, asset_criticality=5,
+             updated_at=NOW),
+        Risk(title='A year old', severity='High', status='Open', likelihood=4, impact=5, asset_criticality=5,
+             updated_at=NOW - timedelta(days=365)),
+        Risk(title='Stale', severity='Critical', status='Open', updated_at=NOW - timedelta(days=3650)),
+        Risk(title='Closed', severity='Low', status='Closed', updated_at=NOW),
+    ]
+    db.session.add_all(risks)
+    db.session.commit()
+    return risks
+
+
+def test_rescore_decays_with_age_and_matches_python(risks):
+    assert rescore_risks(now=NOW) == 4
+    scores = {risk.title: risk.score for risk in Risk.query}
+    # 4 x 5 x 1.5, halved after one half life, never below the floor
+    assert scores['Fresh'] == 30.0
+    assert scores['A year old'] == 15.0
+    assert scores['Stale'] == 12.5
+    config = get_scoring_config()
+    for risk in Risk.query:
+        assert risk.score == pytest.approx(score_risk(risk, config, now=NOW))
+    # The decay is measured from the risk's own update time, which rescoring keeps
+    assert Risk.query.filter_by(title='Stale').one().updated_at == NOW - timedelta(days=3650)
+
+
+def test_rescore_only_missing(risks):
+    rescore_risks(now=NOW)
+    db.session.add(Risk(title='New', severity='Medium', status='Open', updated_at=NOW))
+    db.session.commit()
+    assert rescore_risks(now=NOW, only_missing=True) == 1
+    assert Risk.query.filter_by(title='New').one().score == 9.0
+
+
+def test_heatmap_counts_open_risks(risks):
+    rescore_risks(now=NOW)
+    matrix = risk_heatmap()
+    assert matrix[3][4] == {'likelihood': 4, 'impact': 5, 'count': 2, 'max_score': 30.0}
+    assert sum(cell['count'] for row in matrix for cell in row) == 3
+    assert sum(cell['count'] for row in risk_heatmap(include_closed=True) for cell in row) == 4
+
+
+def test_config_reads_do_not_write(tenant):
+    # A tenant created since startup reads the defaults without a row
+    assert get_scoring_config().decay_floor == 0.5
+    assert RiskScoringConfig.query.count() == 0
+
+    seed_scoring_config()
+    config = get_scoring_config()
+    config.decay_floor = 0.25
+    db.session.commit()
+    # Seeding again, as from another worker, keeps the existing row
+    seed_scoring_config()
+    assert get_scoring_config().decay_floor == 0.25
+    assert RiskScoringConfig.query.count() == 1
+
+
+def test_unsupported_backend_is_refused():
+    with pytest.raises(RuntimeError, match='PostgreSQL or SQLite'):
+        dialect_insert('mysql')
+    config = RiskScoringConfig(criticality_weights={}, decay_half_life_days=365, decay_floor=0.5)
+    with pytest.raises(RuntimeError, match='mysql'):
+        score_expression(config, 'mysql', NOW)
+
+
+def test_validate_weights():
+    assert validate_weights({'decay_floor': '0.25'}) == {'decay_floor': 0.25}
+    with pytest.raises(ValueError, match='each level'):
+        validate_weights({'criticality_weights': {'1': 1}})
+    with pytest.raises(ValueError, match='half life'):
+        validate_weights({'decay_half_life_days': 0})
+    with pytest.raises(ValueError, match='between 0 and 1'):
+        validate_weights({'decay_floor': 2})
@@ -0,0 +1,52 @@
+from models.models import db, Risk, Project
+
+
+def seed():
+    db.session.add_all([
+        Risk(title='Legacy VPN concentrator', description='Unpatched firmware on the remote access gateway',
+             severity='High', status='Open'),
+        Risk(title='Shared admin accounts', description='Break-glass passwords kept in a spreadsheet',
+             severity='Medium', status='Open'),
+        Project(name='VPN replacement', description='Move remote access to zero trust', status='In Progress'),
+    ])
+    db.session.commit()
+
+
+def test_search_ranks_prefix_matches_across_types(client, tenant):
+    seed()
+    response = client.get('/api/search?q=vpn')
+    assert response.status_code == 200
+    hits = response.get_json()['results']
+    assert {(hit['type'], hit['title'].replace('<mark>', '').replace('</mark>', '')) for hit in hits} == {
+        ('risk', 'Legacy VPN concentrator'), ('project', 'VPN replacement')}
+    assert all('<mark>VPN</mark>' in hit['title'] for hit in hits)
+
+    # Prefixes match, every token must match, and the type narrows the search
+    hits = client.get('/api/search?q=remote+gate&type=risk').get_json()['results']
+    assert [hit['id'] for hit in hits] == [db.session.query(Risk.id).filter_by(title='Legacy VPN concentrator').scalar()]
+
+
+def test_search_follows_edits(client, tenant):
+    seed()
+    risk = Risk.query.filter_by(title='Shared admin accounts').one()
+    risk.title = 'Shared root accounts'
+    db.session.commit()
+    assert client.get('/api/search?q=admin').get_json()['results'] == []
+    assert len(client.get('/api/search?q=root').get_json()['results']) == 1
+
+
+def test_search_rejects_bad_arguments(client):
+    assert client.get('/api/search').status_code == 400
+    assert client.get('/api/search?q=vpn&type=control').status_code == 400
+    assert client.get('/api/search?q=vpn&limit=many').status_code == 400
+
+
+def test_stored_markup_is_escaped_around_highlights(client, tenant):
+    db.session.add(Risk(title='<script>alert(1)</script> VPN', description='Uses <b>bold</b> VPN text',
+                        severity='High', status='Open'))
+    db.session.commit()
+    hit, = client.get('/api/search?q=vpn').get_json()['results']
+    assert hit['title'] == '&lt;script&gt;alert(1)&lt;/script&gt; <mark>VPN</mark>'
+    # Postgres drops tags from headlines and SQLite keeps them as text; neither is live
+    assert '<b>' not in hit['snippet']
+    assert '<mark>VPN</mark>' in hit['snippet']
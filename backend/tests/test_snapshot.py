@@ -0,0 +1,65 @@
+import json
+import multiprocessing
+import time
+
+import pytest
+
+from snapshot import SnapshotStore
+
+
+def read_snapshots(directory, seconds):
+    """Reader process: the versions it was served, in order, and how many bodies did not match their version"""
+    store = SnapshotStore(directory)
+    seen, mismatched = [], 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        snapshot = store.get('risks')
+        if snapshot is None:
+            continue
+        version, body = snapshot
+        if json.loads(bytes(body))['version'] != version:
+            mismatched += 1
+        if not seen or seen[-1] != version:
+            seen.append(version)
+    return seen, mismatched
+
+
+def is_stale(directory):
+    return SnapshotStore(directory).get('risks') is None
+
+
+@pytest.fixture
+def store(app, tmp_path):
+    return SnapshotStore(str(tmp_path / 'snapshot'))
+
+
+def publish(store):
+    version = store.read_control()[2] + 1
+    assert store.publish(lambda: {'risks': json.dumps({'version': version}).encode()}, force=True) == version
+
+
+def test_readers_in_other_processes_follow_new_snapshots(store):
+    publish(store)
+    # Spawned like the benchmark's readers: no state shared but the files
+    with multiprocessing.get_context('spawn').Pool(3) as pool:
+        pending = pool.starmap_async(read_snapshots, [(store.directory, 1.0)] * 3)
+        while not pending.ready():
+            store.mark_changed()
+            publish(store)
+            time.sleep(0.02)
+        results = pending.get()
+
+    for seen, mismatched in results:
+        assert mismatched == 0
+        assert len(seen) > 1
+        assert seen == sorted(seen)
+
+
+def test_change_marked_in_one_process_is_seen_by_another(store):
+    publish(store)
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        assert not pool.apply(is_stale, (store.directory,))
+        store.mark_changed()
+        assert pool.apply(is_stale, (store.directory,))
+        publish(store)
+        assert not pool.apply(is_stale, (store.directory,))
@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+
+from models.models import db, PrecomputedResult
+from stats import read_result, store_result
+
+
+def test_store_result_upserts(tenant):
+    store_result('project_stats', {'total': 1})
+    store_result('project_stats', {'total': 2})
+    db.session.commit()
+    result, = PrecomputedResult.query.all()
+    assert result.payload == {'total': 2}
+
+
+def test_read_result_recomputes_only_when_stale(tenant):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'total': len(calls)}
+
+    assert read_result('project_stats', compute) == {'total': 1}
+    assert read_result('project_stats', compute) == {'total': 1}
+    store_result('project_stats', {'total': 0}, computed_at=datetime.utcnow() - timedelta(hours=1))
+    db.session.commit()
+    db.session.expire_all()
+    assert read_result('project_stats', compute) == {'total': 2}
+    assert len(calls) == 2
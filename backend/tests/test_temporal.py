@@ -0,0 +1,60 @@
+import io
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+
+from findings import ingest_findings
+from models.models import db, Risk, RiskVersion
+from reports import data_version
+from scoring import rescore_risks
+
+FINDINGS = '\n'.join(json.dumps(finding) for finding in (
+    {'title': 'TLS 1.0 enabled', 'host': 'web-1', 'severity': 'High'},
+    {'title': 'SMB signing disabled', 'host': 'fs-1', 'severity': 'Medium'},
+))
+
+
+def version_count():
+    return db.session.execute(select(func.count()).select_from(RiskVersion)).scalar()
+
+
+def test_edit_opens_a_version(tenant):
+    risk = Risk(title='Legacy VPN', severity='High', status='Open')
+    db.session.add(risk)
+    db.session.commit()
+    assert version_count() == 1
+
+    risk.status = 'In Progress'
+    db.session.commit()
+    assert version_count() == 2
+
+
+def test_rescore_and_reingest_write_no_versions(tenant):
+    ingest_findings(io.StringIO(FINDINGS), 'nessus')
+    db.session.add(Risk(title='Legacy VPN', severity='High', status='Open',
+                        updated_at=datetime.utcnow() - timedelta(days=90)))
+    db.session.commit()
+    rescore_risks()
+    written = version_count()
+    month = datetime.utcnow().date().replace(day=1)
+    fingerprint = data_version(month, datetime.utcnow())
+
+    # A day of decay later, with the same scan imported again
+    rescore_risks(now=datetime.utcnow() + timedelta(days=1))
+    ingest_findings(io.StringIO(FINDINGS), 'nessus')
+
+    assert version_count() == written
+    assert data_version(month, datetime.utcnow()) == fingerprint
+
+
+def test_open_version_follows_the_score(tenant):
+    db.session.add(Risk(title='Legacy VPN', severity='High', status='Open'))
+    db.session.commit()
+    rescore_risks()
+    db.session.execute(update(Risk).values(score=Risk.score / 2, updated_at=Risk.updated_at))
+    db.session.commit()
+
+    current = db.session.execute(select(Risk.score)).scalar()
+    versions = db.session.execute(select(RiskVersion.score)).scalars().all()
+    assert versions == [current]
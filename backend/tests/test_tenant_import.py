@@ -0,0 +1,110 @@
+from datetime import datetime
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, insert, select
+
+from models.models import (db, Tenant, User, Risk, Project, ComplianceFramework, Control, ControlAssessment,
+                           ArchivedRisk, RiskVersion, AuditLog, SentAlert, AlertState, OPEN_ENDED,
+                           risk_project, risk_framework)
+from schema import MIGRATIONS_DIR
+from tenant_import import import_tenant
+
+NOW = datetime(2026, 6, 1)
+
+
+@pytest.fixture
+def source_url(tmp_path):
+    """A unit's own database at this schema, with ids that do not start at 1"""
+    url = f"sqlite:///{tmp_path / 'unit.db'}"
+    engine = create_engine(url)
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        MigrationContext.configure(connection).stamp(ScriptDirectory(MIGRATIONS_DIR), 'head')
+        rows = {
+            Tenant: [{'id': 1, 'slug': 'default', 'name': 'Default'}],
+            User: [{'id': 4, 'username': 'unit-admin', 'password_hash': 'hash', 'is_admin': True}],
+            Risk: [{'id': 5, 'title': 'Legacy VPN', 'severity': 'High', 'status': 'Open'},
+                   {'id': 7, 'title': 'Shared admin accounts', 'severity': 'Medium', 'status': 'Open'}],
+            Project: [{'id': 3, 'name': 'MFA rollout', 'status': 'In Progress'}],
+            ComplianceFramework: [{'id': 2, 'name': 'ISO 27001', 'current_score': 60, 'target_score': 80}],
+            Control: [{'id': 8, 'framework_id': 2, 'family': 'Organizational', 'reference': 'A.5.1',
+                       'title': 'Policies'}],
+            ControlAssessment: [{'id': 1, 'control_id': 8, 'status': 'Implemented', 'assessed_by': 4}],
+            ArchivedRisk: [{'id': 6, 'title': 'Old firewall', 'severity': 'Low', 'status': 'Closed',
+                            'archived_at': NOW, 'project_ids': [3], 'framework_ids': [2]}],
+            # Versions of a live, an archived and a deleted risk
+            RiskVersion: [{'id': risk_id, 'title': title, 'severity': 'High', 'status': 'Open',
+                           'valid_from': NOW, 'valid_to': OPEN_ENDED}
+                          for risk_id, title in ((5, 'Legacy VPN'), (6, 'Old firewall'), (9, 'Deleted'))],
+            AuditLog: [{'entity_type': 'risk', 'entity_id': 5, 'action': 'create', 'actor_id': 4, 'changes': {}},
+                       {'entity_type': 'risk', 'entity_id': 9, 'action': 'delete', 'actor_id': 4, 'changes': {}}],
+            SentAlert: [{'rule': 'project_overdue', 'entity_type': 'project', 'entity_id': 3, 'due_at': NOW,
+                         'message': 'MFA rollout is overdue'}],
+            AlertState: [{'rule': 'project_overdue', 'evaluated_until': NOW}],
+        }
+        for model, values in rows.items():
+            if model is not Tenant:
+                values = [dict(value, tenant_id=1) for value in values]
+            connection.execute(insert(model.__table__), values)
+        connection.execute(insert(risk_project), [{'risk_id': 5, 'project_id': 3}])
+        connection.execute(insert(risk_framework), [{'risk_id': 7, 'framework_id': 2}])
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def imported(app, source_url):
+    # Rows of another tenant here, holding the ids the source uses
+    db.session.execute(insert(Risk.__table__), [
+        {'title': f'Here {number}', 'severity': 'Low', 'status': 'Open', 'tenant_id': 1} for number in range(10)
+    ])
+    db.session.commit()
+    stats = import_tenant(source_url, 'unit', 'Unit')
+    return db.session.get(Tenant, stats['tenant']['id'])
+
+
+def rows(model, tenant):
+    return db.session.execute(select(model).where(model.tenant_id == tenant.id)).scalars().all()
+
+
+def test_import_rewrites_references(imported):
+    risks = {risk.title: risk for risk in rows(Risk, imported)}
+    project, = rows(Project, imported)
+    framework, = rows(ComplianceFramework, imported)
+    user, = rows(User, imported)
+    assert {risk.id for risk in risks.values()}.isdisjoint(range(1, 11))
+    assert db.session.execute(select(risk_project.c.risk_id, risk_project.c.project_id)).all() == [
+        (risks['Legacy VPN'].id, project.id)]
+    assert db.session.execute(select(risk_framework.c.risk_id, risk_framework.c.framework_id)).all() == [
+        (risks['Shared admin accounts'].id, framework.id)]
+    assessment, = rows(ControlAssessment, imported)
+    assert assessment.assessed_by == user.id and assessment.control.framework_id == framework.id
+
+    archived, = rows(ArchivedRisk, imported)
+    assert archived.project_ids == [project.id] and archived.framework_ids == [framework.id]
+    live_ids = set(db.session.execute(select(Risk.id)).scalars())
+    assert archived.id not in live_ids
+
+    # The source's history replaces the versions opened by the copy
+    versions = {version.title: version.id for version in rows(RiskVersion, imported)}
+    assert versions['Legacy VPN'] == risks['Legacy VPN'].id
+    assert versions['Old firewall'] == archived.id
+    assert versions['Deleted'] not in live_ids | {archived.id}
+    assert 'Shared admin accounts' not in versions
+
+    audit = {entry.action: entry for entry in rows(AuditLog, imported)}
+    assert audit['create'].entity_id == risks['Legacy VPN'].id and audit['create'].actor_id == user.id
+    assert audit['delete'].entity_id == versions['Deleted']
+    alert, = rows(SentAlert, imported)
+    assert alert.entity_id == project.id
+    assert rows(AlertState, imported)[0].evaluated_until == NOW
+
+
+def test_import_refuses_taken_usernames(app, source_url):
+    db.session.execute(insert(User.__table__).values(username='unit-admin', password_hash='hash', tenant_id=1))
+    db.session.commit()
+    with pytest.raises(ValueError, match='unit-admin'):
+        import_tenant(source_url, 'unit', 'Unit')
+    assert db.session.execute(select(Tenant).where(Tenant.slug == 'unit')).first() is None
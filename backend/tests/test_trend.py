@@ -0,0 +1,75 @@
+from datetime import date, datetime
+
+from models.models import db, MaturityRating, MaturityTrendPoint
+from history import record_current, get_current
+from trend import upsert_trend_points, derive_trend, rollup_maturity_trend, SOURCE_MANUAL, SOURCE_ROLLUP
+
+
+def add_rating(score, at):
+    rating = MaturityRating(score=score, trend='Stable', updated_at=at)
+    db.session.add(rating)
+    record_current('maturity_rating', rating)
+    db.session.commit()
+
+
+def points():
+    return [(point.month, point.score, point.source)
+            for point in MaturityTrendPoint.query.order_by(MaturityTrendPoint.month)]
+
+
+def test_rollup_writes_a_point_per_month(tenant):
+    add_rating(2.0, datetime(2026, 1, 1, 9))
+    add_rating(2.4, datetime(2026, 2, 1, 9))
+    add_rating(3.0, datetime(2026, 3, 1, 9))
+
+    assert rollup_maturity_trend(now=datetime(2026, 3, 1, 12)) == {'months': 3, 'trend': 'Increasing'}
+    assert points() == [(date(2026, 1, 1), 2.0, SOURCE_ROLLUP), (date(2026, 2, 1), 2.4, SOURCE_ROLLUP),
+                        (date(2026, 3, 1), 3.0, SOURCE_ROLLUP)]
+    assert get_current('maturity_rating').label == 'Increasing'
+
+    # Only the newest rolled-up month onward is recomputed
+    assert rollup_maturity_trend(now=datetime(2026, 3, 1, 12))['months'] == 1
+    assert len(points()) == 3
+
+
+def test_rollup_carries_ratings_forward_day_by_day(tenant):
+    add_rating(2.0, datetime(2026, 1, 30, 9))
+    add_rating(3.0, datetime(2026, 3, 16, 9))
+    now = datetime(2026, 3, 31, 12)
+
+    # February had no rating change; March averages 15 days at 2.0 and 16 at 3.0
+    expected = [(date(2026, 1, 1), 2.0, SOURCE_ROLLUP), (date(2026, 2, 1), 2.0, SOURCE_ROLLUP),
+                (date(2026, 3, 1), 2.52, SOURCE_ROLLUP)]
+    assert rollup_maturity_trend(now=now)['months'] == 3
+    assert points() == expected
+    # The recomputed month starts from the value in effect before it
+    assert rollup_maturity_trend(now=now)['months'] == 1
+    assert points() == expected
+
+
+def test_manual_points_win_over_the_rollup(tenant):
+    upsert_trend_points([{'month': date(2026, 1, 1), 'score': 4.0}], SOURCE_MANUAL)
+    db.session.commit()
+    add_rating(2.0, datetime(2026, 1, 1, 9))
+    rollup_maturity_trend(now=datetime(2026, 1, 1, 12))
+    assert points() == [(date(2026, 1, 1), 4.0, SOURCE_MANUAL)]
+
+    # A manual write for a rolled-up month replaces it
+    add_rating(2.0, datetime(2026, 2, 1, 9))
+    rollup_maturity_trend(now=datetime(2026, 2, 1, 12))
+    upsert_trend_points([{'month': date(2026, 2, 1), 'score': 1.5}], SOURCE_MANUAL)
+    db.session.commit()
+    assert points()[1] == (date(2026, 2, 1), 1.5, SOURCE_MANUAL)
+
+
+def test_month_api_keeps_the_yyyy_mm_format(client, tenant):
+    upsert_trend_points([{'month': date(2026, 1, 1), 'score': 2.2}], SOURCE_MANUAL)
+    db.session.commit()
+    assert client.get('/api/maturity-trend').get_json()[0]['month'] == '2026-01'
+
+
+def test_derive_trend():
+    assert derive_trend([2.0]) == 'Stable'
+    assert derive_trend([2.0, 2.0, 2.0, 2.5]) == 'Increasing'
+    assert derive_trend([3.0, 2.9, 3.0, 2.5]) == 'Decreasing'
+    assert derive_trend([3.0, 3.0, 3.0, 3.05]) == 'Stable'
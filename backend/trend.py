@@ -0,0 +1,110 @@
+import logging
+from datetime import date, datetime, timedelta
+
+from history import get_history, value_before
+from models.models import db, dialect_insert, MaturityTrendPoint, CurrentMetric
+from tenancy import bound_tenant
+
+logger = logging.getLogger(__name__)
+
+# Months compared against the latest point when deriving the trend label
+TREND_WINDOW_MONTHS = 3
+# Score change (on the 0-5 scale) below which the trend is reported as Stable
+TREND_THRESHOLD = 0.1
+
+SOURCE_MANUAL = 'manual'
+SOURCE_ROLLUP = 'rollup'
+
+
+def parse_month(value):
+    """Parse a YYYY-MM string into the first day of that month"""
+    parsed = datetime.strptime(value, '%Y-%m')
+    return date(parsed.year, parsed.month, 1)
+
+
+def upsert_trend_points(rows, source):
+    """Insert or update the bound tenant's trend points in one statement using ON CONFLICT.
+
+    Rollup writes never overwrite a month an admin has set by hand; manual
+    writes always win.
+    """
+    if not rows:
+        return
+    now = datetime.utcnow()
+    tenant_id = bound_tenant()
+    values = [{'tenant_id': tenant_id, 'month': row['month'], 'score': row['score'], 'source': source,
+               'created_at': now} for row in rows]
+    table = MaturityTrendPoint.__table__
+    stmt = dialect_insert(db.engine.dialect.name)(table).values(values)
+    update = {'score': stmt.excluded.score, 'source': stmt.excluded.source}
+    conflict = [table.c.tenant_id, table.c.month]
+    if source == SOURCE_MANUAL:
+        stmt = stmt.on_conflict_do_update(index_elements=conflict, set_=update)
+    else:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=conflict, set_=update,
+            where=table.c.source == SOURCE_ROLLUP
+        )
+    db.session.execute(stmt)
+
+
+def derive_trend(scores, window=TREND_WINDOW_MONTHS, threshold=TREND_THRESHOLD):
+    """Label the last score against the mean of the preceding window"""
+    if len(scores) < 2:
+        return 'Stable'
+    previous = scores[-window - 1:-1]
+    delta = scores[-1] - sum(previous) / len(previous)
+    if delta > threshold:
+        return 'Increasing'
+    if delta < -threshold:
+        return 'Decreasing'
+    return 'Stable'
+
+
+def recent_trend_scores(limit=TREND_WINDOW_MONTHS):
+    points = MaturityTrendPoint.query.order_by(MaturityTrendPoint.month.desc()).limit(limit).all()
+    return [point.score for point in reversed(points)]
+
+
+def rollup_maturity_trend(now=None):
+    """Compute the bound tenant's monthly maturity points from its maturity rating history.
+
+    Incremental: only the newest rolled-up month (which may have been
+    partial last run) and later months are recomputed. Each month's score is
+    the mean of its daily ratings: a day's rating is its closing value, or
+    the previous day's carried forward when the rating did not change, so
+    every day of the month counts (up to today for the current month).
+    """
+    now = now or datetime.utcnow()
+    watermark = db.session.query(db.func.max(MaturityTrendPoint.month)).filter(
+        MaturityTrendPoint.source == SOURCE_ROLLUP
+    ).scalar()
+
+    if watermark is None:
+        start = datetime(1970, 1, 1)
+    else:
+        start = datetime(watermark.year, watermark.month, 1)
+
+    closing = {day['bucket_start'].date(): day['last'] for day in get_history('maturity_rating', start, now, 'day')}
+    value = value_before('maturity_rating', start)
+    # Days before the first rating ever recorded have no value to average
+    day = start.date() if value is not None else min(closing, default=now.date() + timedelta(days=1))
+    months = {}
+    while day <= now.date():
+        value = closing.get(day, value)
+        months.setdefault(date(day.year, day.month, 1), []).append(value)
+        day += timedelta(days=1)
+
+    rows = [{'month': month, 'score': round(sum(values) / len(values), 2)}
+            for month, values in sorted(months.items())]
+    upsert_trend_points(rows, SOURCE_ROLLUP)
+
+    # Keep the dashboard's trend label in line with the precomputed chart
+    trend = derive_trend(recent_trend_scores(TREND_WINDOW_MONTHS + 1))
+    current = db.session.get(CurrentMetric, {'tenant_id': bound_tenant(), 'metric': 'maturity_rating'})
+    if current is not None:
+        current.label = trend
+
+    db.session.commit()
+    logger.info(f"Rolled up {len(rows)} maturity trend months since {start.date()}, trend {trend}")
+    return {'months': len(rows), 'trend': trend}
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""User provisioning and password operations.
+
+    python users.py import roster.csv --credentials new-users.csv
+    python users.py import roster.json --format json --update-existing
+    python users.py role admin alice bob
+    python users.py role user --roster leavers.csv
+    python users.py reset alice bob --credentials resets.csv
+    python users.py tenant emea "EMEA business unit"
+    python users.py tenant emea "EMEA business unit" --import-from postgresql://host/emea_grc
+    python users.py --tenant emea import emea-roster.csv --credentials emea-users.csv
+
+Every command works on the users of one tenant (--tenant, the default
+tenant unless given); usernames are unique across all tenants, since they
+log in without naming one. A roster has one user per row: a username and, optionally, a password and
+a role (admin or user). Users listed without a password get a generated
+one, written with every other generated password to the --credentials
+file. Passwords are hashed across a process pool and each command applies
+its changes in a single transaction, so a bad roster changes nothing.
+
+With --import-from, the new tenant is filled with a copy of a unit's own
+Cybether database (tenant_import.py), users and their passwords included.
+"""
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import secrets
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import bcrypt
+from sqlalchemy import bindparam, func, insert, select, update
+
+from models.models import db, User, AuditLog
+from tenancy import bound_tenant, create_tenant, tenant_by_slug, tenant_scope
+from tenant_import import import_tenant
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'json')
+ROLES = {'admin': True, 'user': False}
+MIN_PASSWORD_LENGTH = 8
+MAX_USERNAME_LENGTH = 80
+BCRYPT_ROUNDS = 12
+
+
+def parse_roster(items):
+    """Validate roster rows into {'username', 'password', 'is_admin'} dicts.
+
+    Every problem is collected so a roster can be fixed in one go.
+    """
+    users = []
+    errors = []
+    seen = set()
+    for number, item in enumerate(items, start=1):
+        username = str(item.get('username') or '').strip()
+        password = item.get('password') or None
+        role = str(item.get('role') or 'user').strip().lower()
+        if not username or len(username) > MAX_USERNAME_LENGTH:
+            errors.append(f"row {number}: username is required and at most {MAX_USERNAME_LENGTH} characters")
+        elif username in seen:
+            errors.append(f"row {number}: duplicate username {username}")
+        if password is not None and len(password) < MIN_PASSWORD_LENGTH:
+            errors.append(f"row {number}: password must be at least {MIN_PASSWORD_LENGTH} characters")
+        if role not in ROLES:
+            errors.append(f"row {number}: role must be one of: {', '.join(ROLES)}")
+        seen.add(username)
+        users.append({'username': username, 'password': password, 'is_admin': ROLES.get(role, False)})
+    if errors:
+        raise ValueError('Invalid roster:\n' + '\n'.join(errors))
+    return users
+
+
+def read_roster(stream, fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f'Format must be one of: {", ".join(FORMATS)}')
+    if fmt == 'csv':
+        return parse_roster(csv.DictReader(stream))
+    items = json.load(stream)
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise ValueError('A JSON roster must be a list of objects')
+    return parse_roster(items)
+
+
+def generate_password():
+    return secrets.token_urlsafe(12)
+
+
+def hash_password(password, rounds=BCRYPT_ROUNDS):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def hash_passwords(passwords, workers=1, rounds=BCRYPT_ROUNDS):
+    """Hash passwords in order, spread over a process pool when workers > 1"""
+    if workers <= 1 or len(passwords) < 2:
+        return [hash_password(password, rounds) for password in passwords]
+    # Spawned rather than forked so it is safe from any caller
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        chunksize = max(len(passwords) // (workers * 4), 1)
+        return list(pool.map(hash_password, passwords, [rounds] * len(passwords), chunksize=chunksize))
+
+
+def existing_usernames(usernames):
+    """The given usernames that belong to users of the bound tenant"""
+    return set(db.session.execute(select(User.username).where(User.username.in_(list(usernames)))).scalars())
+
+
+def _check_usernames_free(usernames):
+    taken = sorted(db.session.execute(
+        select(User.username)
+        .where(User.username.in_(list(usernames)), User.tenant_id != bound_tenant())
+        .execution_options(all_tenants=True)
+    ).scalars())
+    if taken:
+        raise ValueError(f"Usernames already used by another tenant: {', '.join(taken)}")
+
+
+def _record_audit(action, changes_by_username):
+    """Audit rows for these Core writes, which the ORM audit hook does not see"""
+    if not changes_by_username:
+        return
+    ids = dict(db.session.execute(
+        select(User.username, User.id).where(User.username.in_(list(changes_by_username)))
+    ).all())
+    now = datetime.utcnow()
+    db.session.execute(insert(AuditLog.__table__), [
+        {'entity_type': 'user', 'entity_id': ids.get(username), 'action': action, 'actor_id': None,
+         'changes': changes, 'created_at': now}
+        for username, changes in changes_by_username.items()
+    ])
+
+
+def _check_admin_remains():
+    # Refuse any change that would leave nobody able to administer the dashboard
+    if not db.session.execute(select(func.count()).select_from(User).where(User.is_admin.is_(True))).scalar():
+        raise ValueError('At least one admin user must remain')
+
+
+def provision_users(users, update_existing=False, workers=1, rounds=BCRYPT_ROUNDS):
+    """Create the roster's users, and with update_existing also apply roles and
+    passwords to users that already exist.
+
+    Only passwords that will be written are hashed: existing users are
+    skipped before hashing unless they are being updated with a password.
+    Returns (stats, credentials) where credentials lists generated passwords.
+    """
+    started = time.perf_counter()
+    existing = existing_usernames(user['username'] for user in users)
+    new_users = [user for user in users if user['username'] not in existing]
+    _check_usernames_free(user['username'] for user in new_users)
+    updates = [user for user in users if user['username'] in existing] if update_existing else []
+
+    credentials = []
+    for user in new_users:
+        if user['password'] is None:
+            user['password'] = generate_password()
+            credentials.append({'username': user['username'], 'password': user['password']})
+    with_password = new_users + [user for user in updates if user['password'] is not None]
+
+    hash_started = time.perf_counter()
+    hashes = hash_passwords([user['password'] for user in with_password], workers, rounds)
+    hash_seconds = time.perf_counter() - hash_started
+    for user, password_hash in zip(with_password, hashes):
+        user['password_hash'] = password_hash
+
+    # Executed with a list of parameter sets so each statement compiles once;
+    # the SET clause follows the keys of the parameters
+    table = User.__table__
+    tenant_id = bound_tenant()
+    if new_users:
+        db.session.execute(insert(table), [
+            {'tenant_id': tenant_id, 'username': user['username'], 'password_hash': user['password_hash'],
+             'is_admin': user['is_admin']}
+            for user in new_users
+        ])
+    by_username = (table.c.tenant_id == tenant_id) & (table.c.username == bindparam('b_username'))
+    role_updates = [{'b_username': user['username'], 'is_admin': user['is_admin']} for user in updates]
+    if role_updates:
+        db.session.execute(update(table).where(by_username), role_updates)
+    password_updates = [{'b_username': user['username'], 'password_hash': user['password_hash']}
+                        for user in updates if user['password'] is not None]
+    if password_updates:
+        db.session.execute(update(table).where(by_username), password_updates)
+    _record_audit('create', {user['username']: {'username': [None, user['username']],
+                                                 'is_admin': [None, user['is_admin']]} for user in new_users})
+    _record_audit('update', {user['username']: {'is_admin': [None, user['is_admin']]} | (
+        {'password': [None, 'reset']} if user['password'] is not None else {}) for user in updates})
+    _check_admin_remains()
+    db.session.commit()
+
+    seconds = time.perf_counter() - started
+    stats = {
+        'users': len(users),
+        'created': len(new_users),
+        'updated': len(updates),
+        'skipped': len(existing) - len(updates),
+        'generated_passwords': len(credentials),
+        'hashed': len(hashes),
+        'hash_seconds': round(hash_seconds, 3),
+        'hashes_per_second': round(len(hashes) / hash_seconds, 1) if hash_seconds > 0 else len(hashes),
+        'seconds': round(seconds, 3),
+    }
+    logger.info(f"Provisioned users: {stats}")
+    return stats, credentials
+
+
+def _require_users(usernames):
+    missing = sorted(set(usernames) - existing_usernames(usernames))
+    if missing:
+        raise ValueError(f"Unknown users: {', '.join(missing)}")
+
+
+def set_roles(usernames, role):
+    """Give every listed user the role, in one statement"""
+    if role not in ROLES:
+        raise ValueError(f'Role must be one of: {", ".join(ROLES)}')
+    usernames = sorted(set(usernames))
+    _require_users(usernames)
+    is_admin = ROLES[role]
+    changed = db.session.execute(
+        update(User)
+        .where(User.username.in_(usernames), User.is_admin.is_not(is_admin))
+        .values(is_admin=is_admin)
+        .returning(User.username)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    _record_audit('update', {username: {'is_admin': [not is_admin, is_admin]} for username in changed})
+    _check_admin_remains()
+    db.session.commit()
+    stats = {'users': len(usernames), 'changed': len(changed), 'role': role}
+    logger.info(f"Changed roles: {stats}")
+    return stats
+
+
+def reset_passwords(usernames, workers=1, rounds=BCRYPT_ROUNDS):
+    """Replace the listed users' passwords with generated ones.
+
+    Returns (stats, credentials); the new passwords exist nowhere else.
+    """
+    started = time.perf_counter()
+    usernames = sorted(set(usernames))
+    _require_users(usernames)
+    credentials = [{'username': username, 'password': generate_password()} for username in usernames]
+
+    hash_started = time.perf_counter()
+    hashes = hash_passwords([entry['password'] for entry in credentials], workers, rounds)
+    hash_seconds = time.perf_counter() - hash_started
+    table = User.__table__
+    db.session.execute(
+        update(table).where(table.c.tenant_id == bound_tenant(), table.c.username == bindparam('b_username')),
+        [{'b_username': username, 'password_hash': password_hash}
+         for username, password_hash in zip(usernames, hashes)]
+    )
+    _record_audit('update', {username: {'password': [None, 'reset']} for username in usernames})
+    db.session.commit()
+
+    seconds = time.perf_counter() - started
+    stats = {
+        'users': len(usernames),
+        'hashed': len(hashes),
+        'hash_seconds': round(hash_seconds, 3),
+        'hashes_per_second': round(len(hashes) / hash_seconds, 1) if hash_seconds > 0 else len(hashes),
+        'seconds': round(seconds, 3),
+    }
+    logger.info(f"Reset passwords: {stats}")
+    return stats, credentials
+
+
+def write_credentials(path, credentials):
+    """Write generated passwords as CSV, readable by the owner only; '-' for stdout"""
+    if path == '-':
+        writer = csv.DictWriter(sys.stdout, fieldnames=['username', 'password'])
+        writer.writeheader()
+        writer.writerows(credentials)
+        return
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', newline='', encoding='utf-8') as handle:
+        writer = csv.DictWriter(handle, fieldnames=['username', 'password'])
+        writer.writeheader()
+        writer.writerows(credentials)
+
+
+def _roster_usernames(path, fmt):
+    with open(path, encoding='utf-8', newline='') as stream:
+        return [user['username'] for user in read_roster(stream, fmt)]
+
+
+def run_command(args):
+    """Run an import, role or reset command for the bound tenant; returns its stats"""
+    if args.command == 'import':
+        if args.path == '-':
+            users = read_roster(sys.stdin, args.format)
+        else:
+            with open(args.path, encoding='utf-8', newline='') as stream:
+                users = read_roster(stream, args.format)
+        if not args.credentials and any(user['password'] is None for user in users):
+            raise ValueError('Some users have no password: pass --credentials to receive generated ones')
+        stats, credentials = provision_users(users, args.update_existing, args.workers, args.rounds)
+        if credentials:
+            write_credentials(args.credentials, credentials)
+        return stats
+
+    usernames = args.usernames + (_roster_usernames(args.roster, args.format) if args.roster else [])
+    if not usernames:
+        raise ValueError('No usernames given')
+    if args.command == 'role':
+        return set_roles(usernames, args.role)
+    stats, credentials = reset_passwords(usernames, args.workers, args.rounds)
+    write_credentials(args.credentials, credentials)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage Cybether users in bulk')
+    parser.add_argument('--workers', type=int, default=max(min(multiprocessing.cpu_count(), 8), 1),
+                        help='Processes used for password hashing')
+    parser.add_argument('--rounds', type=int, default=BCRYPT_ROUNDS, help='bcrypt cost factor')
+    parser.add_argument('--tenant', default='default', help='Slug of the tenant whose users are managed')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    tenant_parser = subparsers.add_parser('tenant', help='Create a tenant (business unit)')
+    tenant_parser.add_argument('slug', help='Short lowercase name, e.g. emea')
+    tenant_parser.add_argument('name', nargs='?', help='Display name')
+    tenant_parser.add_argument('--import-from', metavar='DATABASE_URL',
+                               help="Copy in the data of a unit's own Cybether database, at this release's schema")
+    tenant_parser.add_argument('--source-tenant', default='default',
+                               help='Slug of the tenant copied from that database')
+
+    import_parser = subparsers.add_parser('import', help='Create users from a roster')
+    import_parser.add_argument('path', help="Roster file, or '-' for stdin")
+    import_parser.add_argument('--format', choices=FORMATS, default='csv')
+    import_parser.add_argument('--update-existing', action='store_true',
+                               help="Apply the roster's roles and passwords to users that already exist")
+    import_parser.add_argument('--credentials', help="Where to write generated passwords, or '-' for stdout")
+
+    role_parser = subparsers.add_parser('role', help='Change the role of several users')
+    role_parser.add_argument('role', choices=ROLES)
+    role_parser.add_argument('usernames', nargs='*')
+    role_parser.add_argument('--roster', help='Take the usernames from a roster file')
+    role_parser.add_argument('--format', choices=FORMATS, default='csv')
+
+    reset_parser = subparsers.add_parser('reset', help='Force new generated passwords on several users')
+    reset_parser.add_argument('usernames', nargs='*')
+    reset_parser.add_argument('--roster', help='Take the usernames from a roster file')
+    reset_parser.add_argument('--format', choices=FORMATS, default='csv')
+    reset_parser.add_argument('--credentials', required=True, help="Where to write the new passwords, or '-'")
+    args = parser.parse_args()
+
+    from app import app
+
+    try:
+        with app.app_context():
+            if args.command == 'tenant' and args.import_from:
+                stats = import_tenant(args.import_from, args.slug, args.name, args.source_tenant)
+            elif args.command == 'tenant':
+                stats = create_tenant(args.slug, args.name).to_dict()
+            else:
+                with tenant_scope(tenant_by_slug(args.tenant)):
+                    stats = run_command(args)
+    except ValueError as ve:
+        print(str(ve), file=sys.stderr)
+        return 1
+    print(json.dumps(stats, default=str),
+          file=sys.stderr if getattr(args, 'credentials', None) == '-' else sys.stdout)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
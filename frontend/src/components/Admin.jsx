@@ -1,6 +1,6 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
-import api from '../api';
+import api, { newIdempotencyKey } from '../api';
 
 // Updated to include NCSC CAF and Cyber Essentials
 const SUPPORTED_FRAMEWORKS = ['PCI DSS', 'NIST CSF', 'ISO 27001', 'SOC 2', 'NCSC CAF', 'Cyber Essentials'];
@@ -160,6 +160,23 @@ const Admin = () => {
     }
   };
 
+// Apply several edits in one transaction; returns the changed rows in order
+const runBatch = async (operations, config) => {
+  const response = await api.post('/api/batch', { operations }, config);
+  return response.data.data.results;
+};
+
+// A create form keeps its Idempotency-Key until it succeeds, so submitting
+// again after a lost response does not add a second row
+const formKeys = useRef({});
+const formKeyConfig = (form) => {
+  formKeys.current[form] = formKeys.current[form] || newIdempotencyKey();
+  return { headers: { 'Idempotency-Key': formKeys.current[form] } };
+};
+const clearFormKey = (form) => {
+  delete formKeys.current[form];
+};
+
 // Handler for threat level updates
 const handleThreatSubmit = async (e) => {
   e.preventDefault();
@@ -204,7 +221,8 @@ const handleRiskSubmit = async (e) => {
   setIsSubmitting(true);
   
   try {
-    await api.post('/api/risks', newRisk);
+    await api.post('/api/risks', newRisk, formKeyConfig('risk'));
+    clearFormKey('risk');
     await refreshData();
     
     // Reset form
@@ -265,7 +283,8 @@ const handleProjectSubmit = async (e) => {
   setIsSubmitting(true);
   
   try {
-    await api.post('/api/projects', newProject);
+    await api.post('/api/projects', newProject, formKeyConfig('project'));
+    clearFormKey('project');
     await refreshData();
     
     // Reset form
@@ -342,21 +361,16 @@ const handleComplianceSubmit = async (e) => {
       return;
     }
 
-    // Proceed with the submission
-    await api.post('/api/compliance', newCompliance);
-    
-    // Refresh data
-    const complianceResponse = await api.get('/api/compliance');
-    if (complianceResponse.data) {
-      const filteredCompliance = complianceResponse.data.filter(
-        framework => SUPPORTED_FRAMEWORKS.includes(framework.name)
-      );
-      setCompliance(filteredCompliance);
-    }
+    // Proceed with the submission and patch the list from the returned row
+    const [created] = await runBatch([
+      { op: 'create', collection: 'compliance', data: newCompliance }
+    ], formKeyConfig('compliance'));
+    clearFormKey('compliance');
+    setCompliance(prev => [...prev, created.item]);
 
     // Find next available framework
     const availableFrameworks = SUPPORTED_FRAMEWORKS.filter(
-      framework => !compliance.some(f => f.name === framework)
+      framework => framework !== created.item.name && !compliance.some(f => f.name === framework)
     );
 
     // Reset form with next available framework
@@ -416,13 +430,11 @@ const handleTrendPointSubmit = async (e) => {
   setIsSubmitting(true);
   
   try {
-    await api.post('/api/maturity-trend', newTrendPoint);
-    
-    // Fetch updated trend points immediately
-    const trendResponse = await api.get('/api/maturity-trend');
-    if (trendResponse.data) {
-      setTrendPoints(trendResponse.data.sort((a, b) => a.month.localeCompare(b.month)));
-    }
+    const [saved] = await runBatch([
+      { op: 'create', collection: 'maturity_trend', data: newTrendPoint }
+    ]);
+    setTrendPoints(prev => [...prev.filter(p => p.month !== saved.item.month), saved.item]
+      .sort((a, b) => a.month.localeCompare(b.month)));
     
     showSuccessMessage('Maturity trend point added successfully');
     
@@ -446,13 +458,8 @@ const handleTrendPointDelete = async (month) => {
   setIsSubmitting(true);
   
   try {
-    await api.delete(`/api/maturity-trend/${month}`);
-    
-    // Fetch updated trend points immediately
-    const trendResponse = await api.get('/api/maturity-trend');
-    if (trendResponse.data) {
-      setTrendPoints(trendResponse.data.sort((a, b) => a.month.localeCompare(b.month)));
-    }
+    await runBatch([{ op: 'delete', collection: 'maturity_trend', id: month }]);
+    setTrendPoints(prev => prev.filter(p => p.month !== month));
     
     showSuccessMessage('Trend point deleted successfully');
   } catch (err) {
@@ -21,7 +21,7 @@ import {
   Filler
 } from 'chart.js';
 import { Doughnut, Line } from 'react-chartjs-2';
-import api from '../api';
+import { readApi } from '../api';
 
 Chart.register(
   ArcElement,
@@ -47,7 +47,7 @@ const Dashboard = () => {
   // Fetch functions using useCallback
   const fetchThreatLevel = useCallback(async () => {
     try {
-      const response = await api.get('/api/threat-level');
+      const response = await readApi.get('/api/threat-level');
       setThreatLevel(response.data);
     } catch (error) {
       console.error('Error fetching threat level:', error);
@@ -56,7 +56,7 @@ const Dashboard = () => {
 
   const fetchMaturityRating = useCallback(async () => {
     try {
-      const response = await api.get('/api/maturity-rating');
+      const response = await readApi.get('/api/maturity-rating');
       setMaturityRating(response.data);
     } catch (error) {
       console.error('Error fetching maturity rating:', error);
@@ -65,7 +65,7 @@ const Dashboard = () => {
 
   const fetchRisks = useCallback(async () => {
     try {
-      const response = await api.get('/api/risks');
+      const response = await readApi.get('/api/risks');
       setRisks(response.data);
     } catch (error) {
       console.error('Error fetching risks:', error);
@@ -74,7 +74,7 @@ const Dashboard = () => {
 
   const fetchProjects = useCallback(async () => {
     try {
-      const response = await api.get('/api/projects');
+      const response = await readApi.get('/api/projects');
       setProjects(response.data);
     } catch (error) {
       console.error('Error fetching projects:', error);
@@ -83,13 +83,9 @@ const Dashboard = () => {
 
   const fetchCompliance = useCallback(async () => {
     try {
-      const response = await api.get('/api/compliance');
-      // Filter only supported frameworks
-      const supportedFrameworks = ['PCI DSS', 'NIST CSF', 'ISO 27001', 'SOC 2', 'NCSC CAF', 'Cyber Essentials'];
-      const filteredCompliance = response.data.filter(
-        framework => supportedFrameworks.includes(framework.name)
-      );
-      setCompliance(filteredCompliance);
+      // The server filters to the user's saved framework view
+      const response = await readApi.get('/api/compliance', { params: { view: 'saved' } });
+      setCompliance(response.data);
     } catch (error) {
       console.error('Error fetching compliance:', error);
     }
@@ -108,7 +104,7 @@ const Dashboard = () => {
       ]);
 
       // Add the trend points fetch here
-      const trendResponse = await api.get('/api/maturity-trend');
+      const trendResponse = await readApi.get('/api/maturity-trend');
       if (trendResponse.data) {
         setTrendPoints(trendResponse.data.sort((a, b) => a.month.localeCompare(b.month)));
       }